@@ -12,20 +12,27 @@ Module complet de téléchargement YouTube avec :
 
 **Fonctionnalités principales :**
 - Téléchargement de vidéos individuelles et playlists complètes
+- Abonnements aux playlists : seules les nouvelles vidéos sont téléchargées
 - Choix de qualité (360p, 480p, 720p, 1080p, 1440p, 4K, audio MP3)
+- Sélection de formats natifs navigateur (H.264 + AAC) : pas de conversion MP4 après téléchargement
+- Conversion MP4 guidée par ffprobe : les flux déjà compatibles sont copiés, pas ré-encodés
 - Suivi en temps réel de la progression avec polling adaptatif
 - Gestion automatique des reprises en cas d'erreur (retry avec backoff exponentiel)
 
 **Robustesse :**
-- Limitation des téléchargements concurrents via sémaphore
+- File d'attente persistante (jobs en base, pool fixe de workers, baux renouvelés)
+- Nœuds de workers dédiés sans serveur HTTP (``odoo-bin youtube_worker``)
+- Conversions et réparations audio (YouTube, médias externes, Telegram) dans la même file, dédupliquées par fichier
+- Cœurs répartis entre conversions ffmpeg simultanées, priorité basse (nice / ionice) sous charge
 - Vérification de l'espace disque avant téléchargement
-- Nettoyage automatique des fichiers partiels en cas d'erreur
+- Fichiers partiels isolés par téléchargement (reprise après erreur), répertoires abandonnés purgés chaque jour
 - Support proxy (HTTP/SOCKS5)
+- Exécution optionnelle de yt-dlp dans des processus enfants recyclés
 
 **Interface utilisateur :**
 - Vues formulaire, liste, kanban, graphique, pivot et calendrier
 - Système de priorité et de tags avec code couleur
-- Tableau de bord avec statistiques
+- Tableau de bord avec statistiques (historique sur 12 mois pré-agrégé)
 - Notifications temps réel des changements d'état
 
 **API :**
@@ -46,6 +53,7 @@ Module complet de téléchargement YouTube avec :
         'data/server_actions.xml',
         'data/ir_cron.xml',
         'views/youtube_download_views.xml',
+        'views/youtube_download_job_views.xml',
         'views/youtube_account_views.xml',
         'views/youtube_playlist_views.xml',
         'views/youtube_external_media_views.xml',
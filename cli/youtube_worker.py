@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Commande ``odoo-bin youtube_worker`` : nœud dédié à la file de téléchargement.
+
+Le processus se connecte à la base (même configuration que le serveur
+Odoo), démarre un pool de workers sans serveur HTTP et réclame les jobs en
+file : téléchargements YouTube, récupération des infos, analyse de
+playlists, téléchargements Telegram. Il est réveillé par le NOTIFY émis à
+chaque mise en file, signale sa présence dans youtube.worker.node et, sur
+SIGTERM / SIGINT, cesse de réclamer puis attend ses jobs en cours.
+
+Exemples :
+    odoo-bin youtube_worker -c /etc/odoo/odoo.conf -d prod --concurrency 6
+    odoo-bin youtube_worker -c /etc/odoo/odoo.conf -d prod --job-types download
+
+Sur les nœuds HTTP, ``youtube_embedded_workers = False`` dans le fichier de
+configuration réserve l'exécution des jobs aux nœuds dédiés.
+"""
+import logging
+import optparse
+import selectors
+import signal
+import sys
+import threading
+from pathlib import Path
+
+import odoo
+from odoo import api, SUPERUSER_ID
+from odoo.cli import Command
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from ..models.youtube_download_job import JOB_HANDLERS, QUEUE_NOTIFY_CHANNEL, _get_worker_pool
+
+_logger = logging.getLogger(__name__)
+
+# Attente maximale d'un NOTIFY avant de revérifier la demande d'arrêt
+LISTEN_TIMEOUT = 5  # secondes
+# Délai avant reconnexion après la perte de la connexion d'écoute
+RECONNECT_DELAY = 10  # secondes
+
+
+def listen_for_jobs(dbname, pool, stopping):
+    """Réveille `pool` à chaque mise en file (LISTEN sur une connexion dédiée)."""
+    while not stopping.is_set():
+        try:
+            with odoo.sql_db.db_connect(dbname).cursor() as cr, \
+                    selectors.DefaultSelector() as selector:
+                cr.execute(f"LISTEN {QUEUE_NOTIFY_CHANNEL}")
+                cr.commit()
+                connection = cr._cnx
+                selector.register(connection, selectors.EVENT_READ)
+                while not stopping.is_set():
+                    if selector.select(LISTEN_TIMEOUT):
+                        connection.poll()
+                        if connection.notifies:
+                            connection.notifies.clear()
+                            pool.notify()
+        except Exception as e:
+            _logger.warning("Écoute de la file interrompue (%s) : %s", dbname, str(e))
+            stopping.wait(RECONNECT_DELAY)
+
+
+class YoutubeWorker(Command):
+    """Exécute la file de téléchargement YouTube / Telegram sans serveur HTTP"""
+    name = 'youtube_worker'
+
+    def run(self, args):
+        parser = config.parser
+        parser.prog = f'{Path(sys.argv[0]).name} {self.name}'
+        group = optparse.OptionGroup(parser, "Worker de la file de téléchargement")
+        group.add_option(
+            '--concurrency', dest='youtube_concurrency', type='int', default=0,
+            help="Nombre de workers (défaut : créneaux de téléchargement, de lots et Telegram).",
+        )
+        group.add_option(
+            '--job-types', dest='youtube_job_types', default='',
+            help="Types de jobs réclamés, séparés par des virgules (défaut : tous). "
+                 "Valeurs : %s." % ', '.join(JOB_HANDLERS),
+        )
+        group.add_option(
+            '--stop-timeout', dest='youtube_stop_timeout', type='int', default=60,
+            help="Attente maximale des jobs en cours à l'arrêt, en secondes (défaut : 60).",
+        )
+        parser.add_option_group(group)
+        opt = config.parse_config(args, setup_logging=True)
+
+        dbnames = [name for name in (config['db_name'] or '').split(',') if name]
+        if not dbnames:
+            sys.exit("youtube_worker : précisez la base de données (-d / --database).")
+        job_types = [t.strip() for t in opt.youtube_job_types.split(',') if t.strip()]
+        unknown = set(job_types) - set(JOB_HANDLERS)
+        if unknown:
+            sys.exit("youtube_worker : type(s) de job inconnu(s) : %s." % ', '.join(sorted(unknown)))
+
+        # Ce processus n'exécute que son propre pool, de taille fixe
+        config['youtube_embedded_workers'] = False
+        odoo.service.server.load_server_wide_modules()
+
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_args: stopping.set())
+        signal.signal(signal.SIGINT, lambda *_args: stopping.set())
+
+        pools = []
+        for dbname in dbnames:
+            registry = Registry(dbname)
+            with registry.cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                size = opt.youtube_concurrency or env['youtube.download.job']._get_pool_size()
+            pool = _get_worker_pool(dbname, size, mode='standalone', job_types=job_types)
+            threading.Thread(
+                target=listen_for_jobs,
+                args=(dbname, pool, stopping),
+                daemon=True,
+                name=f"yt-dl-listen-{dbname}",
+            ).start()
+            pools.append(pool)
+            _logger.info(
+                "Worker de file démarré sur %s : %d worker(s), jobs %s.",
+                dbname, size, ', '.join(job_types) or 'tous',
+            )
+
+        while not stopping.wait(1):
+            pass
+
+        _logger.info("Arrêt du worker de file : fin des jobs en cours (%d s max)...",
+                     opt.youtube_stop_timeout)
+        for pool in pools:
+            remaining = pool.stop(timeout=opt.youtube_stop_timeout)
+            if remaining:
+                _logger.warning(
+                    "%s : %d job(s) encore en cours, remis en file à l'expiration de leur bail.",
+                    pool.dbname, len(remaining),
+                )
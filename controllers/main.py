@@ -230,10 +230,15 @@ class YoutubeDownloaderController(http.Controller):
             record = request.env['youtube.download'].browse(record_id)
             if not record.exists():
                 return {'error': 'Record not found'}
+            live = record._get_live_progress()[record.id]
             return {
                 'id': record.id,
                 'state': record.state,
-                'progress': record.progress,
+                'progress': live['progress'],
+                'downloaded_bytes': live['downloaded_bytes'],
+                'total_bytes': live['total_bytes'],
+                'speed': live['speed'],
+                'eta': live['eta'],
                 'name': record.name or '',
                 'file_path': record.file_path or '',
                 'file_name': record.file_name or '',
@@ -254,15 +259,18 @@ class YoutubeDownloaderController(http.Controller):
         if not record_ids:
             return []
         try:
-            records = request.env['youtube.download'].browse(record_ids)
+            records = request.env['youtube.download'].browse(record_ids).exists()
+            live = records._get_live_progress()
             return [{
                 'id': r.id,
                 'state': r.state,
-                'progress': r.progress,
+                'progress': live[r.id]['progress'],
+                'speed': live[r.id]['speed'],
+                'eta': live[r.id]['eta'],
                 'name': r.name or '',
                 'file_size': r.file_size_display,
                 'retry_count': r.retry_count,
-            } for r in records if r.exists()]
+            } for r in records]
         except Exception as e:
             _logger.warning("Erreur vérification bulk statut: %s", str(e))
             return []
@@ -538,6 +538,8 @@ class YoutubeDownloaderMobileAPI(http.Controller):
             'quiet': True,
             'no_warnings': True,
             'skip_download': True,
+            # Même extraction que action_fetch_info : entrée de cache partagée
+            'extract_flat': request.env['youtube.download']._is_playlist_url(url),
         }
 
         # Ajouter les cookies si configuré (priorité : compte par défaut > fichier global)
@@ -553,39 +555,38 @@ class YoutubeDownloaderMobileAPI(http.Controller):
                 ydl_opts['cookiefile'] = cookie_file
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-
-                is_playlist = info.get('_type') == 'playlist' or 'entries' in info
-
-                if is_playlist:
-                    entries = list(itertools.islice(info.get('entries', []), 50))
-                    return _json_response(data={
-                        'is_playlist': True,
-                        'playlist_id': info.get('id', ''),
-                        'title': info.get('title', ''),
-                        'count': len(entries),
-                        'thumbnail': info.get('thumbnail', ''),
-                        'entries': [{
-                            'id': e.get('id', ''),
-                            'title': e.get('title', ''),
-                            'duration': e.get('duration', 0),
-                            'thumbnail': e.get('thumbnail', ''),
-                        } for e in entries],
-                    })
-                else:
-                    duration = info.get('duration', 0) or 0
-                    return _json_response(data={
-                        'is_playlist': False,
-                        'video_id': info.get('id', ''),
-                        'title': info.get('title', ''),
-                        'duration': duration,
-                        'author': info.get('uploader', ''),
-                        'views': info.get('view_count', 0),
-                        'description': (info.get('description', '') or '')[:500],
-                        'thumbnail': info.get('thumbnail', ''),
-                        'is_live': duration == 0,
-                    })
+            info = request.env['youtube.info.cache'].sudo()._extract_info(yt_dlp, url, ydl_opts)
+
+            is_playlist = info.get('_type') == 'playlist' or 'entries' in info
+
+            if is_playlist:
+                entries = list(itertools.islice(info.get('entries', []), 50))
+                return _json_response(data={
+                    'is_playlist': True,
+                    'playlist_id': info.get('id', ''),
+                    'title': info.get('title', ''),
+                    'count': len(entries),
+                    'thumbnail': info.get('thumbnail', ''),
+                    'entries': [{
+                        'id': e.get('id', ''),
+                        'title': e.get('title', ''),
+                        'duration': e.get('duration', 0),
+                        'thumbnail': e.get('thumbnail', ''),
+                    } for e in entries],
+                })
+            else:
+                duration = info.get('duration', 0) or 0
+                return _json_response(data={
+                    'is_playlist': False,
+                    'video_id': info.get('id', ''),
+                    'title': info.get('title', ''),
+                    'duration': duration,
+                    'author': info.get('uploader', ''),
+                    'views': info.get('view_count', 0),
+                    'description': (info.get('description', '') or '')[:500],
+                    'thumbnail': info.get('thumbnail', ''),
+                    'is_live': duration == 0,
+                })
 
         except Exception as e:
             return _json_error(
@@ -892,6 +893,11 @@ class YoutubeDownloaderMobileAPI(http.Controller):
             order='create_date desc', limit=5,
         )
 
+        # Historique sur 12 mois (statistiques pré-agrégées, coût constant)
+        history = request.env['youtube.download.stats.daily'].sudo()._get_monthly_history(
+            domain=[('user_id', '=', user.id)],
+        )
+
         return _json_response(data={
             'stats': {
                 'total': total,
@@ -905,6 +911,7 @@ class YoutubeDownloaderMobileAPI(http.Controller):
                 ),
             },
             'active_downloads': [_serialize_download(r) for r in active],
+            'history': history,
         })
 
     # ─── ANNULER UN TÉLÉCHARGEMENT ───────────────────────────────────────
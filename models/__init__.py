@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
+from . import youtube_media_engine
 from . import youtube_download
+from . import youtube_download_job
+from . import youtube_download_slot
+from . import youtube_download_blob
+from . import youtube_download_retry
+from . import youtube_download_concurrency
 from . import youtube_playlist
 from . import youtube_external_media
 from . import telegram_channel
+from . import youtube_download_stats
+from . import youtube_info_cache
 from . import res_config_settings
 from . import youtube_api_token
 from . import youtube_registration
 from . import youtube_account
+from . import ir_websocket
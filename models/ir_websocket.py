@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from odoo import models
+from odoo.exceptions import AccessError
+
+from .youtube_download import BUS_RECORD_CHANNEL_PREFIX
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        """N'autorise l'abonnement au canal d'un téléchargement que s'il est lisible."""
+        channels = list(channels)
+        for channel in list(channels):
+            if not isinstance(channel, str) or not channel.startswith(BUS_RECORD_CHANNEL_PREFIX):
+                continue
+            record_id = channel[len(BUS_RECORD_CHANNEL_PREFIX):]
+            try:
+                record = self.env['youtube.download'].browse(int(record_id)).exists()
+                record.check_access_rights('read')
+                record.check_access_rule('read')
+                if not record:
+                    channels.remove(channel)
+            except (ValueError, AccessError):
+                channels.remove(channel)
+        return super()._build_bus_channel_list(channels)
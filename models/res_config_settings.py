@@ -4,6 +4,8 @@ import shutil
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from .youtube_media_remux import available_cpus, ffmpeg_threads
+
 
 class ResConfigSettings(models.TransientModel):
     _inherit = 'res.config.settings'
@@ -33,12 +35,183 @@ class ResConfigSettings(models.TransientModel):
        config_parameter='youtube_downloader.default_format',
        default='mp4',
     )
+    youtube_format_selection = fields.Selection([
+        ('browser_native', 'Natif navigateur (H.264 + AAC)'),
+        ('default', 'Meilleur format disponible'),
+    ], string='Sélection des formats',
+       config_parameter='youtube_downloader.format_selection',
+       default='browser_native',
+       help="Natif navigateur : à hauteur égale, les flux H.264 (avc1) et AAC (mp4a) sont "
+            "préférés et fusionnés directement en MP4 ; la conversion MP4 après "
+            "téléchargement n'est nécessaire que si la vidéo n'en propose pas.",
+    )
     youtube_max_concurrent = fields.Integer(
         string='Téléchargements simultanés max',
         config_parameter='youtube_downloader.max_concurrent',
         default=3,
         help="Nombre maximum de téléchargements pouvant s'exécuter en parallèle.",
     )
+    youtube_adaptive_concurrency = fields.Boolean(
+        string='Concurrence adaptative',
+        config_parameter='youtube_downloader.adaptive_concurrency',
+        help="Ajuste chaque minute le nombre de téléchargements simultanés selon le débit "
+             "mesuré et les erreurs de bridage (429/403), entre les bornes ci-dessous. "
+             "Remplace alors la limite fixe.",
+    )
+    youtube_adaptive_min_concurrent = fields.Integer(
+        string='Minimum (adaptatif)',
+        config_parameter='youtube_downloader.adaptive_min_concurrent',
+        default=1,
+    )
+    youtube_adaptive_max_concurrent = fields.Integer(
+        string='Maximum (adaptatif)',
+        config_parameter='youtube_downloader.adaptive_max_concurrent',
+        default=10,
+    )
+    youtube_adaptive_target = fields.Integer(
+        string='Cible actuelle',
+        compute='_compute_adaptive_target',
+    )
+    youtube_bandwidth_global_cap = fields.Float(
+        string='Plafond global (Mo/s)',
+        config_parameter='youtube_downloader.bandwidth_global_cap',
+        default=0.0,
+        help="Débit total maximal de tous les téléchargements (0 = illimité).",
+    )
+    youtube_bandwidth_user_cap = fields.Float(
+        string='Plafond par utilisateur (Mo/s)',
+        config_parameter='youtube_downloader.bandwidth_user_cap',
+        default=0.0,
+        help="Débit maximal des téléchargements d'un même utilisateur (0 = illimité).",
+    )
+    youtube_bandwidth_low_cap = fields.Float(
+        string='Plafond priorité basse (Mo/s)',
+        config_parameter='youtube_downloader.bandwidth_low_cap',
+        default=0.0,
+    )
+    youtube_bandwidth_normal_cap = fields.Float(
+        string='Plafond priorité normale (Mo/s)',
+        config_parameter='youtube_downloader.bandwidth_normal_cap',
+        default=0.0,
+    )
+    youtube_bandwidth_high_cap = fields.Float(
+        string='Plafond priorité haute (Mo/s)',
+        config_parameter='youtube_downloader.bandwidth_high_cap',
+        default=0.0,
+    )
+    youtube_bandwidth_daytime_only = fields.Boolean(
+        string='Plafonds en journée uniquement',
+        config_parameter='youtube_downloader.bandwidth_daytime_only',
+        help="Hors de la plage de jour (fuseau horaire de la société), les téléchargements "
+             "ne sont pas bridés.",
+    )
+    youtube_bandwidth_day_start = fields.Float(
+        string='Début de journée',
+        config_parameter='youtube_downloader.bandwidth_day_start',
+        default=7.0,
+    )
+    youtube_bandwidth_day_end = fields.Float(
+        string='Fin de journée',
+        config_parameter='youtube_downloader.bandwidth_day_end',
+        default=22.0,
+    )
+    youtube_process_isolation = fields.Boolean(
+        string='Processus isolés',
+        config_parameter='youtube_downloader.process_isolation',
+        help="Exécute yt-dlp dans des processus enfants réutilisés : le worker Odoo ne fait "
+             "plus qu'ordonnancer et persister (pas de concurrence pour le GIL, mémoire "
+             "rendue au recyclage des processus).",
+    )
+    youtube_process_max_jobs = fields.Integer(
+        string='Téléchargements par processus',
+        config_parameter='youtube_downloader.process_max_jobs',
+        default=20,
+        help="Un processus enfant est remplacé après ce nombre de téléchargements (0 = jamais).",
+    )
+    youtube_process_max_memory_mb = fields.Integer(
+        string='Mémoire max par processus (Mo)',
+        config_parameter='youtube_downloader.process_max_memory_mb',
+        default=1024,
+        help="Un processus enfant dont la mémoire résidente dépasse ce seuil est remplacé "
+             "à la fin de son téléchargement (0 = illimité).",
+    )
+    youtube_progress_flush_interval = fields.Float(
+        string='Intervalle de flush de la progression (s)',
+        config_parameter='youtube_downloader.progress_flush_interval',
+        default=2.0,
+        help="Fréquence à laquelle la progression des téléchargements, tenue en mémoire, "
+             "est persistée en base en un seul UPDATE groupé (0,5 à 60 secondes).",
+    )
+    youtube_info_cache_ttl = fields.Integer(
+        string='Durée du cache des métadonnées (s)',
+        config_parameter='youtube_downloader.info_cache_ttl',
+        default=3600,
+        help="Durée de conservation des informations extraites par yt-dlp (formats compris), "
+             "réutilisées par la récupération des infos, le téléchargement et l'API "
+             "(0 = désactivé, 6 heures maximum).",
+    )
+    youtube_metadata_fetch_threads = fields.Integer(
+        string='Threads de récupération des infos',
+        config_parameter='youtube_downloader.metadata_fetch_threads',
+        default=4,
+        help="Nombre d'extractions yt-dlp menées en parallèle lors d'une récupération "
+             "des infos en lot (1 à 16).",
+    )
+    youtube_metadata_host_interval = fields.Float(
+        string='Espacement par hôte (s)',
+        config_parameter='youtube_downloader.metadata_host_interval',
+        default=0.5,
+        help="Délai minimal entre deux requêtes d'une récupération en lot vers un même "
+             "hôte, pour éviter le bridage (0 à 10 secondes).",
+    )
+    youtube_max_concurrent_conversions = fields.Integer(
+        string='Conversions simultanées max',
+        config_parameter='youtube_downloader.max_concurrent_conversions',
+        default=2,
+        help="Conversions MP4 et réparations audio exécutées en parallèle par toute la "
+             "base, tous modèles et nœuds confondus (1 à 32).",
+    )
+    youtube_conversion_threads = fields.Integer(
+        string='Threads ffmpeg par conversion',
+        config_parameter='youtube_downloader.conversion_threads',
+        default=0,
+        help="Threads accordés à chaque ffmpeg (0 = automatique : cœurs du nœud répartis "
+             "entre les conversions en cours sur ce nœud, pour que deux encodages ne se "
+             "disputent pas tous les cœurs).",
+    )
+    youtube_conversion_low_priority_load = fields.Float(
+        string='Priorité basse au-delà de la charge',
+        config_parameter='youtube_downloader.conversion_low_priority_load',
+        default=0.75,
+        help="Charge moyenne par cœur (1 minute) au-delà de laquelle une conversion est "
+             "lancée en priorité basse (nice / ionice) pour préserver le serveur HTTP "
+             "(0 = jamais).",
+    )
+    youtube_conversion_thread_split = fields.Char(
+        string='Répartition des cœurs',
+        compute='_compute_conversion_thread_split',
+    )
+    youtube_max_queued_conversions = fields.Integer(
+        string='Traitements en attente max',
+        config_parameter='youtube_downloader.max_queued_conversions',
+        default=500,
+        help="Au-delà de ce nombre de conversions / réparations en file, les nouvelles "
+             "demandes sont refusées jusqu'à ce que la file se vide.",
+    )
+    youtube_work_dir_max_age_days = fields.Integer(
+        string='Conservation des fichiers partiels (jours)',
+        config_parameter='youtube_downloader.work_dir_max_age_days',
+        default=7,
+        help="Les répertoires de travail sans écriture depuis ce nombre de jours "
+             "(téléchargements abandonnés) sont supprimés par le nettoyage quotidien.",
+    )
+    youtube_dead_video_ttl_days = fields.Integer(
+        string='Mémoire des vidéos indisponibles (jours)',
+        config_parameter='youtube_downloader.dead_video_ttl_days',
+        default=7,
+        help="Une vidéo en erreur définitive (privée, supprimée…) n'est plus retentée "
+             "pendant ce nombre de jours, quel que soit l'enregistrement (0 = désactivé).",
+    )
     youtube_auto_fetch_info = fields.Boolean(
         string='Récupérer automatiquement les infos',
         config_parameter='youtube_downloader.auto_fetch_info',
@@ -147,6 +320,27 @@ class ResConfigSettings(models.TransientModel):
             except OSError:
                 rec.youtube_disk_space_info = 'Impossible de déterminer'
 
+    @api.depends()
+    def _compute_adaptive_target(self):
+        Sample = self.env['youtube.concurrency.sample'].sudo()
+        _enabled, _low, _high, target = Sample._get_adaptive_settings()
+        for rec in self:
+            rec.youtube_adaptive_target = target
+
+    @api.depends('youtube_max_concurrent_conversions', 'youtube_conversion_threads')
+    def _compute_conversion_thread_split(self):
+        # Même calcul que youtube.media.mixin._media_ffmpeg_tuning, sur ce nœud
+        cpus = available_cpus()
+        Media = self.env['youtube.download'].sudo()
+        for rec in self:
+            slots = Media._media_local_slots(max(1, rec.youtube_max_concurrent_conversions or 1))
+            threads = ffmpeg_threads(cpus, slots, rec.youtube_conversion_threads)
+            rec.youtube_conversion_thread_split = _(
+                "%(cpus)s cœurs sur ce nœud, %(slots)s conversion(s) en cours "
+                "→ %(threads)s threads par conversion",
+                cpus=cpus, slots=slots, threads=threads,
+            )
+
     @api.depends()
     def _compute_stats(self):
         for rec in self:
@@ -2,17 +2,16 @@
 import asyncio
 import logging
 import os
-import shutil
-import subprocess
 import threading
 import time
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from .youtube_dashboard import DASHBOARD_CACHE_FIELDS, dashboard_cache
+
 # Extensions vidéo compatibles navigateur (HTML5 natif)
 BROWSER_COMPATIBLE_VIDEO = {'.mp4', '.webm', '.ogg', '.ogv'}
-AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.aac', '.wma', '.opus'}
 
 _logger = logging.getLogger(__name__)
 
@@ -405,9 +404,6 @@ class TelegramChannel(models.Model):
             config['api_hash'],
         )
 
-        auto_thread_ref = None
-        auto_video_ids = []
-
         try:
             await client.connect()
             if not await client.is_user_authorized():
@@ -589,40 +585,21 @@ class TelegramChannel(models.Model):
                 auto_dl = record.auto_download
                 cr.commit()
 
-            if auto_dl and created_count > 0:
-                # Lancer le téléchargement de toutes les vidéos non téléchargées
-                with self.pool.cursor() as cr:
-                    env = api.Environment(cr, self.env.uid, self.env.context)
-                    record = env['telegram.channel'].browse(record_id)
-                    pending = record.video_ids.filtered(lambda v: v.state == 'draft')
-                    if pending:
-                        # Lancer le batch download dans un thread séparé
-                        # (la session Telegram actuelle sera déconnectée avant)
-                        auto_video_ids = pending.ids
-                        cr.commit()
-                        # On ne peut pas réutiliser le même client car le scan
-                        # doit libérer sa connexion d'abord.
-                        auto_thread = threading.Thread(
-                            target=env['telegram.channel.video']._download_batch_thread,
-                            args=(auto_video_ids, config),
-                            daemon=True,
-                            name=f"tg-auto-dl-{record_id}",
-                        )
-                        # Le thread sera lancé APRÈS la déconnexion du client scan (ci-dessous)
-                        auto_thread_ref = auto_thread
-                    else:
-                        auto_thread_ref = None
-                        cr.commit()
-
         finally:
             await client.disconnect()
-            # Lancer l'auto-download APRÈS la déconnexion du client scan
-            try:
-                if auto_thread_ref is not None:
-                    _logger.info("Lancement auto-download de %d vidéo(s) après scan.", len(auto_video_ids))
-                    auto_thread_ref.start()
-            except Exception:
-                pass  # Variable non définie si pas d'auto-download
+
+        # Auto-téléchargement : job de lot mis en file APRÈS la déconnexion
+        # du client de scan (le lot ouvre son propre client)
+        if auto_dl and created_count > 0:
+            with self.pool.cursor() as cr:
+                env = api.Environment(cr, self.env.uid, self.env.context)
+                record = env['telegram.channel'].browse(record_id)
+                pending = record.video_ids.filtered(lambda v: v.state == 'draft')
+                if pending:
+                    _logger.info("Auto-download de %d vidéo(s) mis en file après scan.", len(pending))
+                    env['youtube.download.job']._enqueue(
+                        record, 'telegram_batch', payload={'video_ids': pending.ids},
+                    )
 
     def action_rescan(self):
         """Relance un scan du canal."""
@@ -665,8 +642,8 @@ class TelegramChannel(models.Model):
     def action_download_all(self):
         """Télécharge toutes les vidéos non encore téléchargées.
 
-        Utilise un SEUL thread et un SEUL client Telegram pour éviter
-        les conflits SQLite sur le fichier de session.
+        Met en file UN SEUL job de lot : un seul client Telegram pour toutes
+        les vidéos, pour éviter les conflits SQLite sur le fichier de session.
         """
         self.ensure_one()
         pending = self.video_ids.filtered(lambda v: v.state in ('draft', 'error'))
@@ -674,21 +651,16 @@ class TelegramChannel(models.Model):
             raise UserError(_("Aucune vidéo en attente de téléchargement."))
 
         # Vérifier les prérequis une seule fois
-        config = self._check_telegram_prerequisites()
+        self._check_telegram_prerequisites()
 
         # Marquer toutes les vidéos en attente
         video_ids = pending.ids
         pending.write({'state': 'downloading', 'progress': 0.0, 'error_message': False})
-        self.env.cr.commit()
 
-        # Lancer un SEUL thread avec sémaphore pour téléchargements concurrents
-        thread = threading.Thread(
-            target=self.env['telegram.channel.video']._download_batch_thread,
-            args=(video_ids, config),
-            daemon=True,
-            name=f"tg-dl-batch-{self.reference or self.id}",
+        # Exécuté par un worker de la file (nœud HTTP ou nœud dédié)
+        self.env['youtube.download.job']._enqueue(
+            self, 'telegram_batch', payload={'video_ids': video_ids},
         )
-        thread.start()
 
         # Récupérer la limite de concurrence pour le message
         max_conc = int(self.env['ir.config_parameter'].sudo().get_param(
@@ -708,11 +680,33 @@ class TelegramChannel(models.Model):
             },
         }
 
+    def _run_telegram_batch_job(self, payload):
+        """
+        Handler de la file : télécharge un lot de vidéos du canal avec un
+        seul client Telegram. Exécuté sans curseur (comme les handlers de
+        youtube.download), les prérequis sont relus sur le nœud qui l'exécute.
+        """
+        video_ids = payload.get('video_ids') or []
+        Video = self.env['telegram.channel.video']
+        try:
+            with self.pool.cursor() as cr:
+                channel = self.with_env(self.env(cr=cr))
+                config = channel._check_telegram_prerequisites()
+        except Exception as e:
+            with self.pool.cursor() as cr:
+                Video.with_env(self.env(cr=cr)).browse(video_ids).exists().write({
+                    'state': 'error',
+                    'error_message': str(e),
+                    'progress': 0.0,
+                })
+            raise
+        Video._download_batch_thread(video_ids, config)
+
 
 class TelegramChannelVideo(models.Model):
     _name = 'telegram.channel.video'
     _description = 'Vidéo Telegram'
-    _inherit = ['mail.thread']
+    _inherit = ['mail.thread', 'youtube.media.mixin']
     _order = 'telegram_date desc, id desc'
 
     # ─── Champs principaux ────────────────────────────────────────────────────
@@ -888,22 +882,15 @@ class TelegramChannelVideo(models.Model):
         if self.state == 'done' and self.file_exists:
             raise UserError(_("Cette vidéo est déjà téléchargée."))
 
-        config = self.channel_id._check_telegram_prerequisites()
+        self.channel_id._check_telegram_prerequisites()
 
         self.write({
             'state': 'downloading',
             'progress': 0.0,
             'error_message': False,
         })
-        self.env.cr.commit()
-
-        thread = threading.Thread(
-            target=self._download_video_thread,
-            args=(self.id, config),
-            daemon=True,
-            name=f"tg-dl-{self.id}",
-        )
-        thread.start()
+        # Exécuté par un worker de la file (nœud HTTP ou nœud dédié)
+        self.env['youtube.download.job']._enqueue(self, 'telegram_download')
 
         return {
             'type': 'ir.actions.client',
@@ -916,6 +903,19 @@ class TelegramChannelVideo(models.Model):
             },
         }
 
+    def _run_telegram_download_job(self, payload):
+        """
+        Handler de la file : télécharge la vidéo. Exécuté sans curseur, les
+        prérequis sont relus sur le nœud qui exécute le job.
+        """
+        with self.pool.cursor() as cr:
+            record = self.with_env(self.env(cr=cr))
+            if record.state != 'downloading':
+                _logger.info("Vidéo Telegram [%s] : plus en téléchargement, job ignoré.", self.id)
+                return
+            config = record.channel_id._check_telegram_prerequisites()
+        self._download_video_thread(self.id, config)
+
     @api.model
     def _download_video_thread(self, record_id, config):
         """Thread de téléchargement d'une seule vidéo Telegram.
@@ -1207,21 +1207,12 @@ class TelegramChannelVideo(models.Model):
                 "✅ Vidéo téléchargée : <b>%s</b> — %.2f Mo en %.0f secondes.",
                 record.name, file_size_mb, download_duration,
             ))
-            cr.commit()
 
-            # Auto-convertir en MP4 si le format vidéo n'est pas compatible navigateur
+            # Format vidéo non compatible navigateur : conversion MP4 mise en file
+            # (le média externe partage le fichier, il suit la conversion)
             if not is_audio and ext not in BROWSER_COMPATIBLE_VIDEO:
-                try:
-                    with self.pool.cursor() as conv_cr:
-                        conv_env = api.Environment(conv_cr, self.env.uid, self.env.context)
-                        conv_record = conv_env['telegram.channel.video'].browse(record_id)
-                        conv_record._remux_to_mp4(downloaded_path)
-                        conv_cr.commit()
-                except Exception as conv_err:
-                    _logger.warning(
-                        "Auto-conversion MP4 échouée pour vidéo Telegram [%s] : %s",
-                        downloaded_path, str(conv_err),
-                    )
+                record._enqueue_media_jobs('convert_mp4', enforce_capacity=False)
+            cr.commit()
 
     async def _async_download_video(self, record_id, config):
         """Téléchargement asynchrone d'une seule vidéo (crée son propre client)."""
@@ -1269,417 +1260,6 @@ class TelegramChannelVideo(models.Model):
             'target': 'current',
         }
 
-    # ─── Conversion MP4 ──────────────────────────────────────────────────────
-    def _remux_to_mp4(self, source_path):
-        """
-        Remuxe un fichier vidéo non compatible navigateur vers MP4.
-        Utilise 'ffmpeg -c copy' (quasi-instantané), avec fallback ré-encodage.
-        Met à jour les champs file_path/file_name/file_size.
-        """
-        if not source_path or not os.path.exists(source_path):
-            return
-        if not shutil.which('ffmpeg'):
-            _logger.warning("ffmpeg non disponible, impossible de convertir en MP4")
-            return
-
-        ext = os.path.splitext(source_path)[1].lower()
-        if ext == '.mp4':
-            return
-
-        mp4_path = os.path.splitext(source_path)[0] + '.mp4'
-
-        # Remuxage rapide : copier vidéo, ré-encoder audio en AAC
-        # Opus/Vorbis dans MP4 = son muet dans les navigateurs
-        cmd_remux = [
-            'ffmpeg', '-i', source_path,
-            '-c:v', 'copy',
-            '-c:a', 'aac', '-b:a', '192k',
-            '-movflags', '+faststart',
-            '-y',
-            mp4_path,
-        ]
-        _logger.info("Remuxage Telegram %s → MP4 (vidéo copy, audio AAC)...", ext)
-        try:
-            result = subprocess.run(cmd_remux, capture_output=True, timeout=600)
-            if result.returncode != 0:
-                _logger.info("Remuxage échoué, ré-encodage complet %s → MP4...", ext)
-                if os.path.exists(mp4_path):
-                    os.remove(mp4_path)
-                cmd_encode = [
-                    'ffmpeg', '-i', source_path,
-                    '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-                    '-c:a', 'aac', '-b:a', '192k',
-                    '-movflags', '+faststart',
-                    '-y',
-                    mp4_path,
-                ]
-                result = subprocess.run(cmd_encode, capture_output=True, timeout=3600)
-                if result.returncode != 0:
-                    stderr_msg = result.stderr.decode('utf-8', errors='replace')[-300:]
-                    raise Exception(f"Ré-encodage échoué: {stderr_msg}")
-
-            if not os.path.exists(mp4_path) or os.path.getsize(mp4_path) == 0:
-                raise Exception("Le fichier MP4 généré est vide ou inexistant")
-
-            new_size_mb = round(os.path.getsize(mp4_path) / (1024 * 1024), 2)
-            new_file_name = os.path.basename(mp4_path)
-
-            # Mettre à jour l'enregistrement
-            self.write({
-                'file_path': mp4_path,
-                'file_name': new_file_name,
-                'file_size': new_size_mb,
-            })
-
-            # Mettre à jour aussi le média externe associé si existant
-            if self.external_media_id:
-                self.external_media_id.write({
-                    'file_path': mp4_path,
-                    'file_name': new_file_name,
-                    'file_size': new_size_mb,
-                })
-
-            # Supprimer l'ancien fichier
-            try:
-                if os.path.exists(source_path) and source_path != mp4_path:
-                    os.remove(source_path)
-            except Exception:
-                _logger.warning("Impossible de supprimer l'ancien fichier: %s", source_path)
-
-            self.message_post(body=_(
-                "🔄 Fichier converti en MP4 : <b>%s</b> (%.2f Mo)",
-                new_file_name, new_size_mb,
-            ))
-
-            _logger.info("Conversion MP4 Telegram réussie : %s → %s", source_path, mp4_path)
-
-        except subprocess.TimeoutExpired:
-            _logger.error("Timeout lors de la conversion MP4 de %s", source_path)
-            if os.path.exists(mp4_path):
-                os.remove(mp4_path)
-            raise
-        except Exception as e:
-            _logger.error("Erreur conversion MP4 Telegram : %s", str(e))
-            if os.path.exists(mp4_path) and os.path.getsize(mp4_path) == 0:
-                os.remove(mp4_path)
-            raise
-
-    def action_convert_to_mp4(self):
-        """
-        Action manuelle pour convertir une vidéo Telegram non compatible en MP4.
-        """
-        self.ensure_one()
-        if self.state != 'done':
-            raise UserError(_("La vidéo n'est pas encore téléchargée."))
-        if not self.file_path or not os.path.exists(self.file_path):
-            raise UserError(_("Le fichier n'existe pas sur le serveur."))
-
-        ext = os.path.splitext(self.file_path)[1].lower()
-        if ext == '.mp4':
-            raise UserError(_("Le fichier est déjà au format MP4."))
-        if ext in AUDIO_EXTENSIONS:
-            raise UserError(_("Ce fichier est un fichier audio, la conversion en MP4 n'est pas applicable."))
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur. La conversion est impossible."))
-
-        self._remux_to_mp4(self.file_path)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Conversion réussie"),
-                'message': _("La vidéo a été convertie en MP4 avec succès."),
-                'type': 'success',
-                'sticky': False,
-            },
-        }
-
-    def action_convert_to_mp4_batch(self):
-        """
-        Action batch (multi-sélection) pour convertir les vidéos Telegram en MP4.
-        Utilise le sémaphore global partagé pour limiter la concurrence.
-        """
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur. La conversion est impossible."))
-
-        eligible = self.env['telegram.channel.video']
-        skipped = 0
-        for rec in self:
-            if rec.state != 'done' or not rec.file_path or not os.path.exists(rec.file_path):
-                skipped += 1
-                continue
-            ext = os.path.splitext(rec.file_path)[1].lower()
-            if ext in BROWSER_COMPATIBLE_VIDEO or ext in AUDIO_EXTENSIONS:
-                skipped += 1
-                continue
-            eligible |= rec
-
-        if not eligible:
-            raise UserError(_(
-                "Aucun fichier éligible à la conversion.\n"
-                "Seuls les fichiers vidéo non-MP4 terminés peuvent être convertis."
-            ))
-
-        from .youtube_download import _get_conversion_semaphore
-        max_concurrent = int(self.env['ir.config_parameter'].sudo().get_param(
-            'youtube_downloader.max_concurrent_conversions', '2'
-        ))
-        max_concurrent = max(1, min(max_concurrent, 5))
-        semaphore = _get_conversion_semaphore(max_concurrent)
-
-        # Compteur partagé pour notification de fin de lot
-        batch_tracker = {
-            'total': len(eligible),
-            'done': 0,
-            'errors': 0,
-            'lock': threading.Lock(),
-            'uid': self.env.uid,
-            'dbname': self.env.cr.dbname,
-        }
-
-        # Lancer via pool de workers (évite RuntimeError: can't start new thread)
-        from .youtube_download import _spawn_batch_coordinator
-        work_items = [(self._convert_thread, (rec.id, semaphore, batch_tracker)) for rec in eligible]
-        _spawn_batch_coordinator(work_items, max_concurrent)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Conversion en cours"),
-                'message': _(
-                    "%d vidéo(s) en cours de conversion en MP4 "
-                    "(max %d simultané(s)).%s",
-                    len(eligible), max_concurrent,
-                    _(' %d ignoré(s) (déjà MP4/audio/non prêt).', skipped) if skipped else '',
-                ),
-                'type': 'info',
-                'sticky': True,
-            },
-        }
-
-    @api.model
-    def _convert_thread(self, record_id, semaphore, batch_tracker=None):
-        """Thread de conversion MP4 contrôlé par sémaphore."""
-        success = False
-        try:
-            semaphore.acquire()
-            _logger.info("Conversion MP4 démarrée (sémaphore acquis) pour telegram.channel.video [%s]", record_id)
-            with self.pool.cursor() as new_cr:
-                new_env = self.env(cr=new_cr)
-                record = new_env['telegram.channel.video'].browse(record_id)
-                if record.exists() and record.state == 'done' and record.file_path:
-                    ext = os.path.splitext(record.file_path)[1].lower()
-                    if ext != '.mp4' and os.path.exists(record.file_path):
-                        record._remux_to_mp4(record.file_path)
-                        record.message_post(body=_(
-                            "✅ Conversion en MP4 terminée avec succès."
-                        ))
-                        new_cr.commit()
-                        success = True
-        except Exception as e:
-            _logger.error("Erreur conversion MP4 thread telegram [%s]: %s", record_id, str(e))
-            try:
-                with self.pool.cursor() as err_cr:
-                    err_env = self.env(cr=err_cr)
-                    rec = err_env['telegram.channel.video'].browse(record_id)
-                    if rec.exists():
-                        rec.message_post(body=_(
-                            "❌ Erreur lors de la conversion en MP4 : %s", str(e)
-                        ))
-                        err_cr.commit()
-            except Exception:
-                pass
-        finally:
-            semaphore.release()
-            _logger.info("Sémaphore libéré pour telegram.channel.video [%s]", record_id)
-            if batch_tracker:
-                self._notify_batch_progress(batch_tracker, success)
-
-    @api.model
-    def _notify_batch_progress(self, batch_tracker, success):
-        """Met à jour le compteur de lot et envoie une notification bus quand tout est fini."""
-        with batch_tracker['lock']:
-            if success:
-                batch_tracker['done'] += 1
-            else:
-                batch_tracker['errors'] += 1
-            done = batch_tracker['done']
-            errors = batch_tracker['errors']
-            total = batch_tracker['total']
-
-        if done + errors >= total:
-            try:
-                with self.pool.cursor() as bus_cr:
-                    bus_env = self.env(cr=bus_cr)
-                    channel = (batch_tracker['dbname'], 'res.partner', bus_env['res.users'].browse(batch_tracker['uid']).partner_id.id)
-                    message_body = _(
-                        "🎬 Conversion MP4 terminée : %d/%d réussi(s)",
-                        done, total,
-                    )
-                    if errors:
-                        message_body += _(" — %d erreur(s)", errors)
-                    bus_env['bus.bus']._sendone(channel, 'simple_notification', {
-                        'title': _("Conversion MP4 terminée"),
-                        'message': message_body,
-                        'type': 'success' if errors == 0 else 'warning',
-                        'sticky': True,
-                    })
-                    bus_cr.commit()
-            except Exception as e:
-                _logger.error("Erreur envoi notification fin de lot telegram : %s", str(e))
-
-    # ─── Réparation audio (MP4 avec Opus/Vorbis → AAC) ─────────────────────
-
-    def _fix_audio_aac(self, file_path):
-        """
-        Ré-encode uniquement l'audio d'un fichier en AAC.
-        Corrige les MP4 muets (Opus/Vorbis incompatible navigateur).
-        """
-        if not file_path or not os.path.exists(file_path):
-            return
-        if not shutil.which('ffmpeg'):
-            return
-
-        tmp_path = file_path + '.fixing.mp4'
-        cmd = [
-            'ffmpeg', '-i', file_path,
-            '-c:v', 'copy',
-            '-c:a', 'aac', '-b:a', '192k',
-            '-movflags', '+faststart',
-            '-y',
-            tmp_path,
-        ]
-        _logger.info("Réparation audio AAC Telegram : %s", file_path)
-        try:
-            result = subprocess.run(cmd, capture_output=True, timeout=600)
-            if result.returncode != 0:
-                _logger.info("Copy vidéo échoué, ré-encodage complet : %s", file_path)
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-                cmd_full = [
-                    'ffmpeg', '-i', file_path,
-                    '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-                    '-c:a', 'aac', '-b:a', '192k',
-                    '-movflags', '+faststart',
-                    '-y',
-                    tmp_path,
-                ]
-                result = subprocess.run(cmd_full, capture_output=True, timeout=3600)
-                if result.returncode != 0:
-                    stderr_msg = result.stderr.decode('utf-8', errors='replace')[-300:]
-                    raise Exception(f"Ré-encodage échoué: {stderr_msg}")
-
-            if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
-                raise Exception("Le fichier réparé est vide")
-
-            os.replace(tmp_path, file_path)
-            new_size_mb = round(os.path.getsize(file_path) / (1024 * 1024), 2)
-            self.write({'file_size': new_size_mb})
-            if self.external_media_id:
-                self.external_media_id.write({'file_size': new_size_mb})
-            _logger.info("Audio AAC réparé (Telegram) : %s", file_path)
-
-        except subprocess.TimeoutExpired:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-            raise
-        except Exception as e:
-            if os.path.exists(tmp_path) and os.path.getsize(tmp_path) == 0:
-                os.remove(tmp_path)
-            raise
-
-    def action_fix_audio_batch(self):
-        """
-        Action batch pour réparer l'audio des vidéos Telegram muettes.
-        """
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur."))
-
-        eligible = self.env['telegram.channel.video']
-        skipped = 0
-        for rec in self:
-            if rec.state != 'done' or not rec.file_path or not os.path.exists(rec.file_path):
-                skipped += 1
-                continue
-            ext = os.path.splitext(rec.file_path)[1].lower()
-            if ext in AUDIO_EXTENSIONS:
-                skipped += 1
-                continue
-            eligible |= rec
-
-        if not eligible:
-            raise UserError(_("Aucun fichier vidéo éligible à la réparation audio."))
-
-        from .youtube_download import _get_conversion_semaphore
-        max_concurrent = int(self.env['ir.config_parameter'].sudo().get_param(
-            'youtube_downloader.max_concurrent_conversions', '2'
-        ))
-        max_concurrent = max(1, min(max_concurrent, 5))
-        semaphore = _get_conversion_semaphore(max_concurrent)
-
-        batch_tracker = {
-            'total': len(eligible),
-            'done': 0,
-            'errors': 0,
-            'lock': threading.Lock(),
-            'uid': self.env.uid,
-            'dbname': self.env.cr.dbname,
-        }
-
-        # Lancer via pool de workers (évite RuntimeError: can't start new thread)
-        from .youtube_download import _spawn_batch_coordinator
-        work_items = [(self._fix_audio_thread, (rec.id, semaphore, batch_tracker)) for rec in eligible]
-        _spawn_batch_coordinator(work_items, max_concurrent)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Réparation audio en cours"),
-                'message': _(
-                    "%d vidéo(s) en cours de réparation audio AAC "
-                    "(max %d simultané(s)).%s",
-                    len(eligible), max_concurrent,
-                    _(' %d ignoré(s).', skipped) if skipped else '',
-                ),
-                'type': 'info',
-                'sticky': True,
-            },
-        }
-
-    @api.model
-    def _fix_audio_thread(self, record_id, semaphore, batch_tracker=None):
-        """Thread de réparation audio contrôlé par sémaphore."""
-        success = False
-        try:
-            semaphore.acquire()
-            with self.pool.cursor() as new_cr:
-                new_env = self.env(cr=new_cr)
-                record = new_env['telegram.channel.video'].browse(record_id)
-                if record.exists() and record.state == 'done' and record.file_path:
-                    if os.path.exists(record.file_path):
-                        record._fix_audio_aac(record.file_path)
-                        record.message_post(body=_("🔊 Audio réparé en AAC."))
-                        new_cr.commit()
-                        success = True
-        except Exception as e:
-            _logger.error("Erreur réparation audio Telegram [%s]: %s", record_id, str(e))
-            try:
-                with self.pool.cursor() as err_cr:
-                    err_env = self.env(cr=err_cr)
-                    rec = err_env['telegram.channel.video'].browse(record_id)
-                    if rec.exists():
-                        rec.message_post(body=_("❌ Échec réparation audio : %s", str(e)))
-                        err_cr.commit()
-            except Exception:
-                pass
-        finally:
-            semaphore.release()
-            if batch_tracker:
-                self._notify_batch_progress(batch_tracker, success)
-
     def action_delete_file(self):
         """Supprime le fichier téléchargé du disque."""
         for rec in self:
@@ -1697,6 +1277,20 @@ class TelegramChannelVideo(models.Model):
                 'progress': 0.0,
             })
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        dashboard_cache.invalidate(self.env)
+        return super().create(vals_list)
+
+    def write(self, vals):
+        if 'download_date' in vals:
+            self.env['youtube.download.stats.daily']._mark_days_dirty(
+                'telegram', self.mapped('download_date'))
+        res = super().write(vals)
+        if any(field in vals for field in DASHBOARD_CACHE_FIELDS):
+            dashboard_cache.invalidate(self.env)
+        return res
+
     def unlink(self):
         """Supprime les fichiers du disque."""
         for rec in self:
@@ -1705,6 +1299,9 @@ class TelegramChannelVideo(models.Model):
                     os.remove(rec.file_path)
                 except Exception as e:
                     _logger.warning("Impossible de supprimer %s : %s", rec.file_path, str(e))
+        self.env['youtube.download.stats.daily']._mark_days_dirty(
+            'telegram', self.mapped('download_date'))
+        dashboard_cache.invalidate(self.env)
         return super().unlink()
 
     @api.model
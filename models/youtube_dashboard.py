@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des données du tableau de bord (par processus, par utilisateur).
+
+get_dashboard_data agrège désormais en SQL (une requête groupée par source) ;
+le résultat est mis en cache par (base, utilisateur, sociétés). Toute écriture
+de ``state``, ``file_size`` ou ``download_date`` (et toute création /
+suppression) sur une source du tableau de bord incrémente, après commit, une
+séquence PostgreSQL de génération : chaque processus compare la génération
+courante à celle de son entrée en cache, l'invalidation vaut donc pour tous
+les workers et nœuds.
+"""
+import logging
+import threading
+
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+# Champs dont la modification invalide le cache du tableau de bord
+DASHBOARD_CACHE_FIELDS = ('state', 'file_size', 'download_date')
+DASHBOARD_GENERATION_SEQUENCE = 'youtube_dashboard_generation_seq'
+_PENDING_INVALIDATION_KEY = 'youtube_downloader.dashboard_invalidated'
+
+
+class DashboardCache:
+    """Données agrégées du tableau de bord, par base et par utilisateur."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # {dbname: {key: (génération, données)}}
+
+    @staticmethod
+    def generation(cr):
+        """Génération courante (partagée par tous les processus de la base)."""
+        cr.execute(f"SELECT last_value FROM {DASHBOARD_GENERATION_SEQUENCE}")
+        return cr.fetchone()[0]
+
+    def get(self, dbname, key, generation):
+        with self._lock:
+            entry = self._entries.get(dbname, {}).get(key)
+        if entry and entry[0] == generation:
+            return entry[1]
+        return None
+
+    def set(self, dbname, key, generation, data):
+        with self._lock:
+            self._entries.setdefault(dbname, {})[key] = (generation, data)
+
+    def clear(self, dbname):
+        with self._lock:
+            self._entries.pop(dbname, None)
+
+    def invalidate(self, env):
+        """
+        Invalide le cache : immédiatement dans ce processus, puis dans tous
+        les autres une fois la transaction validée (une seule fois par
+        transaction, quel que soit le nombre d'écritures).
+        """
+        cr = env.cr
+        dbname = cr.dbname
+        self.clear(dbname)
+        if cr.postcommit.data.get(_PENDING_INVALIDATION_KEY):
+            return
+        cr.postcommit.data[_PENDING_INVALIDATION_KEY] = True
+
+        @cr.postcommit.add
+        def _bump_generation():
+            self.clear(dbname)
+            try:
+                with Registry(dbname).cursor() as bump_cr:
+                    bump_cr.execute(f"SELECT nextval('{DASHBOARD_GENERATION_SEQUENCE}')")
+            except Exception as e:
+                _logger.warning("Invalidation du cache du tableau de bord échouée (%s) : %s",
+                                dbname, str(e))
+
+    @staticmethod
+    def has_pending_invalidation(cr):
+        """Vrai si la transaction courante a modifié des données du tableau de bord."""
+        return bool(cr.postcommit.data.get(_PENDING_INVALIDATION_KEY))
+
+
+def rule_filtered_sql(model, domain=None):
+    """
+    Retourne (from, where, params) des enregistrements de `model` visibles par
+    l'utilisateur courant (domaine + règles d'accès + active_test), à utiliser
+    dans des requêtes SQL agrégées.
+    """
+    model.check_access_rights('read')
+    query = model._where_calc(domain or [])
+    model._apply_ir_rules(query, 'read')
+    from_clause, where_clause, params = query.get_sql()
+    return from_clause, where_clause or 'TRUE', params
+
+
+dashboard_cache = DashboardCache()
@@ -1,74 +1,90 @@
 # -*- coding: utf-8 -*-
 import os
+import random
 import re
 import logging
-import subprocess
-import threading
 import time
 import shutil
-from datetime import datetime
+from datetime import datetime, timedelta
+
+import pytz
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 
-_logger = logging.getLogger(__name__)
-
-# Verrou global pour limiter les téléchargements simultanés
-_download_semaphore_lock = threading.Lock()
-_download_semaphores = {}
-
-# Sémaphore global pour limiter les conversions MP4 simultanées
-# Partagé entre youtube.download, youtube.external.media et telegram.channel.video
-_conversion_semaphore = None
-_conversion_semaphore_lock = threading.Lock()
-
-
-def _get_conversion_semaphore(max_concurrent=2):
-    """Retourne le sémaphore de conversion MP4 partagé entre tous les modèles."""
-    global _conversion_semaphore
-    with _conversion_semaphore_lock:
-        if _conversion_semaphore is None:
-            _conversion_semaphore = threading.Semaphore(max_concurrent)
-        return _conversion_semaphore
-
-
-def _spawn_batch_coordinator(work_items, max_workers):
-    """
-    Lance UN seul thread coordinateur qui exécute les work_items
-    via un ThreadPoolExecutor à concurrence limitée.
-    Évite de créer N threads (RuntimeError: can't start new thread).
+from .youtube_download_bandwidth import bandwidth_shaper
+from .youtube_dashboard import (
+    DASHBOARD_CACHE_FIELDS, DASHBOARD_GENERATION_SEQUENCE, dashboard_cache, rule_filtered_sql,
+)
+from .youtube_download_blob import file_sha256
+from .youtube_download_control import (
+    INTERRUPT_CANCEL, INTERRUPT_PAUSE, INTERRUPT_STATES, DownloadInterrupted, download_control,
+)
+from .youtube_download_process import runner_pool
+from .youtube_download_progress import progress_registry
+from .youtube_download_retry import (
+    ERROR_PERMANENT, ERROR_THROTTLED, ERROR_TRANSIENT, classify_download_error, retry_delay,
+)
+from .youtube_info_cache import extract_infos_parallel
+from .youtube_media_remux import AUDIO_EXTENSIONS, BROWSER_COMPATIBLE_EXTENSIONS
 
-    :param work_items: liste de (callable, args_tuple)
-    :param max_workers: nombre max de workers simultanés
-    """
-    from concurrent.futures import ThreadPoolExecutor
-
-    def _coordinator():
-        with ThreadPoolExecutor(max_workers=max_workers) as pool:
-            futures = [pool.submit(func, *args) for func, args in work_items]
-            for f in futures:
-                try:
-                    f.result()
-                except Exception as e:
-                    _logger.error("Batch worker error: %s", str(e))
-
-    thread = threading.Thread(target=_coordinator, daemon=True, name="batch-coordinator")
-    thread.start()
+_logger = logging.getLogger(__name__)
 
 
-def _get_semaphore(max_concurrent):
-    """Retourne un sémaphore partagé pour limiter les téléchargements."""
-    global _download_semaphores
-    with _download_semaphore_lock:
-        if max_concurrent not in _download_semaphores:
-            _download_semaphores[max_concurrent] = threading.Semaphore(max_concurrent)
-        return _download_semaphores[max_concurrent]
+# Types de notifications bus et préfixe des canaux par enregistrement
+BUS_PROGRESS = 'youtube_download/progress'
+BUS_STATE = 'youtube_download/state'
+BUS_FETCH_INFO = 'youtube_download/fetch_info'
+BUS_RECORD_CHANNEL_PREFIX = 'youtube_download_'
+
+# Rang dans la file de téléchargement par priorité (plus grand = servi d'abord)
+QUEUE_PRIORITY_RANK = {'1': 0, '0': 1, '2': 2, '3': 3}
+# Plafonds de bande passante par priorité (Mo/s) ; Urgente n'a que les plafonds global / utilisateur
+BANDWIDTH_PRIORITY_PARAMS = {
+    '1': 'youtube_downloader.bandwidth_low_cap',
+    '0': 'youtube_downloader.bandwidth_normal_cap',
+    '2': 'youtube_downloader.bandwidth_high_cap',
+}
+
+# Nombre maximum de téléchargements actifs détaillés dans le tableau de bord
+ACTIVE_DOWNLOADS_LIMIT = 50
+# Récupération des infos en lot : résultats écrits par paquets de cette taille
+FETCH_INFO_FLUSH_SIZE = 20
+# Analyse de playlist : taille du premier paquet de vidéos créées (démarrage
+# rapide des téléchargements), puis des suivants
+PLAYLIST_FIRST_BATCH = 10
+PLAYLIST_BATCH_SIZE = 100
+
+# Formats vidéo fusionnés par yt-dlp (merge_output_format)
+VIDEO_MERGE_FORMATS = ('mp4', 'mkv', 'avi', 'mov', 'flv', 'm4v', 'ogv', 'ts', '3gp')
+# Sélection des formats : 'browser_native' trie les formats yt-dlp pour
+# préférer H.264 (avc1) + AAC (mp4a) à hauteur égale, fusionnés directement
+# en MP4 ; 'default' garde le meilleur format quel que soit le codec
+FORMAT_SELECTION_PARAM = 'youtube_downloader.format_selection'
+BROWSER_NATIVE_FORMAT_SORT = ('vcodec:h264', 'acodec:aac')
+# Conteneurs servis par la sélection « natif navigateur » (WEBM / OGV restent
+# sur leurs codecs libres, déjà lus par les navigateurs)
+BROWSER_NATIVE_OUTPUT_FORMATS = ('mp4', 'mkv', 'avi', 'mov', 'flv', 'm4v', 'ts', '3gp')
+# Abonnements : playlists re-listées par passage du cron, et dispersion (±)
+# de l'échéance suivante pour étaler les vérifications dans le temps
+SUBSCRIPTION_CRON_BATCH = 10
+SUBSCRIPTION_JITTER = 0.1
+# Répertoires de travail : <destination>/.ytdl-work/<id>, sur le même système
+# de fichiers que la bibliothèque (déplacement final atomique)
+WORK_DIR_NAME = '.ytdl-work'
+PARTIAL_FILE_MARKERS = ('.part', '.ytdl', '.temp')
+DEFAULT_WORK_DIR_MAX_AGE_DAYS = 7
+ERROR_KIND_LABELS = {
+    ERROR_PERMANENT: 'erreur définitive',
+    ERROR_THROTTLED: 'limitation du débit',
+    ERROR_TRANSIENT: 'erreur temporaire',
+}
 
 
 class YoutubeDownload(models.Model):
     _name = 'youtube.download'
     _description = 'Téléchargement YouTube'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'youtube.media.mixin']
     _order = 'create_date desc'
     _check_company_auto = True
 
@@ -94,6 +110,7 @@ class YoutubeDownload(models.Model):
         ('draft', 'Brouillon'),
         ('pending', 'En attente'),
         ('downloading', 'Téléchargement en cours'),
+        ('paused', 'En pause'),
         ('done', 'Terminé'),
         ('error', 'Erreur'),
         ('cancelled', 'Annulé'),
@@ -197,6 +214,43 @@ class YoutubeDownload(models.Model):
         readonly=True,
     )
 
+    # ─── Abonnement (playlist suivie) ────────────────────────────────────────
+    subscription_active = fields.Boolean(
+        string='Abonnement actif',
+        copy=False,
+        index=True,
+        tracking=True,
+        help="La playlist est re-listée périodiquement et seules les nouvelles "
+             "vidéos sont téléchargées.",
+    )
+    subscription_interval_days = fields.Integer(
+        string='Vérifier tous les (jours)',
+        default=7,
+    )
+    subscription_date_sorted = fields.Boolean(
+        string='Nouveautés en tête',
+        help="La playlist est triée par date, plus récentes d'abord : la "
+             "vérification s'arrête à la première vidéo déjà connue.",
+    )
+    subscription_next_check = fields.Datetime(
+        string='Prochaine vérification',
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+    subscription_last_check = fields.Datetime(
+        string='Dernière vérification',
+        readonly=True,
+        copy=False,
+    )
+    subscription_known_ids = fields.Text(
+        string='Vidéos connues',
+        readonly=True,
+        copy=False,
+        prefetch=False,
+        help="IDs des vidéos déjà créées depuis cette playlist (un par ligne).",
+    )
+
     # ─── Retry / Robustesse ──────────────────────────────────────────────────
     retry_count = fields.Integer(
         string='Tentatives',
@@ -232,12 +286,22 @@ class YoutubeDownload(models.Model):
     thumbnail_image = fields.Binary(string='Miniature', readonly=True, attachment=True)
 
     # ─── Résultat du téléchargement ───────────────────────────────────────────
-    file_path = fields.Char(string='Chemin du fichier', readonly=True)
+    file_path = fields.Char(string='Chemin du fichier', readonly=True, index=True)
     file_name = fields.Char(string='Nom du fichier', readonly=True)
     file_size = fields.Float(string='Taille (Mo)', readonly=True, digits=(10, 2))
     file_size_display = fields.Char(
         string='Taille fichier', compute='_compute_file_size_display', store=True,
     )
+    blob_id = fields.Many2one(
+        'youtube.download.blob',
+        string='Fichier partagé',
+        readonly=True,
+        copy=False,
+        index=True,
+        ondelete='set null',
+        help="Entrée de déduplication : le fichier peut être partagé avec "
+             "d'autres téléchargements de la même vidéo, qualité et format.",
+    )
     file_exists = fields.Boolean(
         string='Fichier existe',
         compute='_compute_file_exists',
@@ -254,6 +318,15 @@ class YoutubeDownload(models.Model):
     progress = fields.Float(
         string='Progression (%)', readonly=True, digits=(5, 1), default=0.0,
     )
+    conversion_avoided = fields.Boolean(
+        string='Conversion évitée', readonly=True, copy=False,
+        help="Formats H.264 + AAC choisis au téléchargement (sélection « natif "
+             "navigateur ») : fusionnés directement en MP4, sans conversion ffmpeg.",
+    )
+    live_speed = fields.Float(
+        string='Débit instantané (o/s)', readonly=True, digits=(16, 0),
+        help="Dernière vitesse mesurée par yt-dlp, persistée avec la progression.",
+    )
     error_message = fields.Text(string="Message d'erreur", readonly=True)
 
     # ─── Métadonnées ──────────────────────────────────────────────────────────
@@ -317,6 +390,10 @@ class YoutubeDownload(models.Model):
          'Le nombre de tentatives max doit être positif !'),
     ]
 
+    def init(self):
+        # Génération du cache du tableau de bord (voir youtube_dashboard.py)
+        self.env.cr.execute(f"CREATE SEQUENCE IF NOT EXISTS {DASHBOARD_GENERATION_SEQUENCE}")
+
     # ─── Séquence ─────────────────────────────────────────────────────────────
     @api.model_create_multi
     def create(self, vals_list):
@@ -325,6 +402,7 @@ class YoutubeDownload(models.Model):
                 vals['reference'] = self.env['ir.sequence'].next_by_code(
                     'youtube.download'
                 ) or '/'
+        dashboard_cache.invalidate(self.env)
         return super().create(vals_list)
 
     def name_get(self):
@@ -336,6 +414,62 @@ class YoutubeDownload(models.Model):
             result.append((rec.id, name))
         return result
 
+    def write(self, vals):
+        if 'download_date' in vals:
+            self.env['youtube.download.stats.daily']._mark_days_dirty(
+                'youtube', self.mapped('download_date'))
+        res = super().write(vals)
+        if 'priority' in vals:
+            # Un passage en urgent double les jobs déjà en file
+            self.env['youtube.download.job']._reprioritize(self)
+        if any(field in vals for field in DASHBOARD_CACHE_FIELDS):
+            dashboard_cache.invalidate(self.env)
+        if 'state' in vals:
+            self._bus_send_state()
+        return res
+
+    # ─── Notifications temps réel (bus) ───────────────────────────────────────
+    @api.model
+    def _bus_record_channel(self, record_id):
+        """Canal bus d'un téléchargement (abonnement depuis son formulaire)."""
+        return f"{BUS_RECORD_CHANNEL_PREFIX}{record_id}"
+
+    def _bus_send(self, notification_type, payloads):
+        """Publie `payloads` ({id: dict}) par utilisateur (groupé) et par enregistrement."""
+        bus = self.env['bus.bus'].sudo()
+        by_partner = {}
+        for rec in self.sudo():
+            payload = payloads.get(rec.id)
+            if not payload:
+                continue
+            bus._sendone(self._bus_record_channel(rec.id), notification_type, [payload])
+            if rec.user_id.partner_id:
+                by_partner.setdefault(rec.user_id.partner_id, []).append(payload)
+        for partner, partner_payloads in by_partner.items():
+            bus._sendone(partner, notification_type, partner_payloads)
+
+    def _bus_send_state(self):
+        """Publie un changement d'état (compact : ce que les vues affichent)."""
+        self._bus_send(BUS_STATE, {rec.id: {
+            'id': rec.id,
+            'state': rec.state,
+            'progress': rec.progress,
+            'name': rec.name or '',
+            'file_size': rec.file_size_display,
+            'error_message': rec.error_message or '',
+            'retry_count': rec.retry_count,
+            'max_retries': rec.max_retries,
+        } for rec in self})
+
+    def _bus_send_progress(self, live):
+        """Publie la progression flushée ({id: entrée du registre en mémoire})."""
+        self._bus_send(BUS_PROGRESS, {rec_id: {
+            'id': rec_id,
+            'progress': entry['progress'],
+            'speed': entry.get('speed'),
+            'eta': entry.get('eta'),
+        } for rec_id, entry in live.items()})
+
     # ─── Contraintes Python ───────────────────────────────────────────────────
     @api.constrains('url')
     def _check_url(self):
@@ -532,6 +666,23 @@ class YoutubeDownload(models.Model):
             return {'cookiefile': cookie_file}
         return {}
 
+    @api.model
+    def _get_format_selection(self):
+        """Mode de sélection des formats ('browser_native' ou 'default')."""
+        mode = self.env['ir.config_parameter'].sudo().get_param(FORMAT_SELECTION_PARAM, 'browser_native')
+        return mode if mode in ('browser_native', 'default') else 'browser_native'
+
+    def _get_browser_native_format_sort(self):
+        """
+        Tri yt-dlp (format_sort) de la sélection « natif navigateur » : la
+        résolution reste le premier critère (plafonnée à la qualité choisie),
+        puis H.264 et AAC sont préférés. Sans flux avc1 / mp4a à cette
+        hauteur, le tri retombe sur le meilleur format disponible.
+        """
+        heights = {'1080p': 1080, '720p': 720, '480p': 480, '360p': 360}
+        height = heights.get(self.quality)
+        return [f'res:{height}' if height else 'res'] + list(BROWSER_NATIVE_FORMAT_SORT)
+
     def _get_format_string(self):
         """Construit la chaîne de format yt-dlp selon la qualité choisie."""
         format_map = {
@@ -580,40 +731,210 @@ class YoutubeDownload(models.Model):
             return -1
 
     def _get_max_concurrent(self):
-        """Retourne le nombre max de téléchargements simultanés."""
+        """
+        Retourne le nombre max de téléchargements simultanés (borne haute en
+        mode de concurrence adaptative).
+        """
+        return self.env['youtube.download.slot'].sudo()._get_capacity('download')
+
+    @api.model
+    def _get_process_settings(self):
+        """
+        Réglages du mode « processus isolés » (voir youtube_download_process),
+        ou None si yt-dlp s'exécute dans les threads du worker.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        if ICP.get_param('youtube_downloader.process_isolation', 'False') not in ('True', '1'):
+            return None
         try:
-            return int(self.env['ir.config_parameter'].sudo().get_param(
-                'youtube_downloader.max_concurrent', '3'
-            ))
+            max_jobs = max(int(ICP.get_param('youtube_downloader.process_max_jobs', 20)), 0)
+            max_memory_mb = max(float(ICP.get_param('youtube_downloader.process_max_memory_mb', 1024)), 0.0)
         except (ValueError, TypeError):
-            return 3
+            max_jobs, max_memory_mb = 20, 1024.0
+        return {
+            'max_jobs': max_jobs,
+            'max_memory_mb': max_memory_mb,
+            # Un enfant inactif au plus par téléchargement simultané possible
+            'max_idle': self._get_max_concurrent(),
+        }
 
-    def _cleanup_partial_files(self, dest_path, video_id):
-        """Nettoie les fichiers partiels après une erreur."""
-        if not dest_path:
-            return
-        try:
-            for f in os.listdir(dest_path):
-                full_path = os.path.join(dest_path, f)
-                if os.path.isfile(full_path) and (
-                    f.endswith('.part') or
-                    f.endswith('.ytdl') or
-                    f.endswith('.temp')
-                ):
-                    os.remove(full_path)
-                    _logger.info("Fichier partiel supprimé : %s", full_path)
-        except Exception as e:
-            _logger.warning("Erreur nettoyage fichiers partiels : %s", str(e))
+    @api.model
+    def _get_bandwidth_limits(self):
+        """
+        Plafonds de bande passante en vigueur (o/s, 0 = illimité) et
+        téléchargements en cours sur toute la base, pour la répartition des
+        plafonds entre processus (voir youtube_download_bandwidth). Hors de
+        la plage de jour, si les plafonds y sont restreints : aucun plafond.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
 
-    # ─── Actions (boutons) ────────────────────────────────────────────────────
-    def action_fetch_info(self):
-        """Récupère les informations de la vidéo sans la télécharger."""
+        def _cap(param):
+            try:
+                return max(float(ICP.get_param(param, 0) or 0), 0.0) * 1024 * 1024
+            except (ValueError, TypeError):
+                return 0.0
+
+        if ICP.get_param('youtube_downloader.bandwidth_daytime_only', 'False') in ('True', '1'):
+            try:
+                day_start = float(ICP.get_param('youtube_downloader.bandwidth_day_start', 7))
+                day_end = float(ICP.get_param('youtube_downloader.bandwidth_day_end', 22))
+            except (ValueError, TypeError):
+                day_start, day_end = 7.0, 22.0
+            tz = pytz.timezone(self.env.company.partner_id.tz or 'UTC')
+            local_now = datetime.now(tz)
+            hour = local_now.hour + local_now.minute / 60.0
+            in_day = (day_start <= hour < day_end) if day_start <= day_end \
+                else (hour >= day_start or hour < day_end)
+            if not in_day:
+                return {}
+
+        limits = {
+            'global': _cap('youtube_downloader.bandwidth_global_cap'),
+            'user': _cap('youtube_downloader.bandwidth_user_cap'),
+            'priorities': {
+                priority: _cap(param) for priority, param in BANDWIDTH_PRIORITY_PARAMS.items()
+            },
+        }
+        if not (limits['global'] or limits['user'] or any(limits['priorities'].values())):
+            return {}
+        self.flush_model(['state', 'user_id', 'priority'])
+        self.env.cr.execute("""
+            SELECT user_id, priority, COUNT(*) FROM youtube_download
+             WHERE state = 'downloading'
+          GROUP BY user_id, priority
+        """)
+        cluster = {'total': 0, 'users': {}, 'priorities': {}}
+        for user_id, priority, count in self.env.cr.fetchall():
+            cluster['total'] += count
+            cluster['users'][user_id] = cluster['users'].get(user_id, 0) + count
+            cluster['priorities'][priority] = cluster['priorities'].get(priority, 0) + count
+        limits['cluster'] = cluster
+        return limits
+
+    # ─── Répertoires de travail ──────────────────────────────────────────────
+    def _get_work_dir(self, dest_path):
+        """
+        Répertoire de travail propre à l'enregistrement : les fichiers partiels
+        y survivent aux tentatives et aux redémarrages (reprise continuedl)
+        sans jamais toucher ceux des autres téléchargements.
+        """
         self.ensure_one()
-        if not self.url:
-            raise UserError(_("Veuillez saisir une URL YouTube."))
+        return os.path.join(os.path.abspath(dest_path), WORK_DIR_NAME, str(self.id))
 
-        yt_dlp = self._get_yt_dlp()
+    @staticmethod
+    def _is_partial_file(name):
+        return any(marker in name for marker in PARTIAL_FILE_MARKERS)
+
+    def _move_to_library(self, work_dir, dest_path, downloaded_file):
+        """
+        Déplace les fichiers terminés (média, sous-titres, miniature) du
+        répertoire de travail vers la destination, puis supprime le
+        répertoire de travail. Retourne le nouveau chemin de `downloaded_file`.
+        """
+        moved = {}
+        for name in sorted(os.listdir(work_dir)):
+            source = os.path.join(work_dir, name)
+            if os.path.isfile(source) and not self._is_partial_file(name):
+                moved[source] = self._atomic_move(source, dest_path)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return moved.get(os.path.abspath(downloaded_file), downloaded_file)
+
+    @staticmethod
+    def _atomic_move(source, dest_dir):
+        """
+        Place `source` dans `dest_dir` sans jamais écraser un fichier existant
+        (suffixe « (2) », « (3) »… en cas de collision de titre). Le lien
+        physique puis la suppression de la source rendent l'opération
+        atomique : la bibliothèque ne voit jamais de fichier incomplet.
+        """
+        base, ext = os.path.splitext(os.path.basename(source))
+        for n in range(1, 1000):
+            target = os.path.join(dest_dir, f"{base}{ext}" if n == 1 else f"{base} ({n}){ext}")
+            try:
+                os.link(source, target)
+            except FileExistsError:
+                continue
+            except OSError:
+                # Liens physiques non supportés : renommage (atomique sur un même système de fichiers)
+                if os.path.exists(target):
+                    continue
+                os.replace(source, target)
+                return target
+            os.remove(source)
+            return target
+        raise UserError(_("Impossible de placer le fichier %s dans %s.", source, dest_dir))
+
+    def _remove_work_dir(self):
+        """Supprime le répertoire de travail (fichiers partiels compris)."""
+        for rec in self:
+            work_dir = rec._get_work_dir(rec.effective_path)
+            if os.path.isdir(work_dir):
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    @api.model
+    def _get_work_roots(self):
+        """Destinations connues (paramètre global et chemins des enregistrements)."""
+        default = self.env['ir.config_parameter'].sudo().get_param(
+            'youtube_downloader.download_path', '/tmp/youtube_downloads'
+        )
+        self.flush_model(['download_path'])
+        self.env.cr.execute(
+            "SELECT DISTINCT download_path FROM youtube_download WHERE download_path IS NOT NULL"
+        )
+        return {os.path.abspath(default)} | {os.path.abspath(row[0]) for row in self.env.cr.fetchall() if row[0]}
+
+    @api.model
+    def _cron_clean_work_dirs(self):
+        """
+        Supprime les répertoires de travail abandonnés : aucune écriture depuis
+        `youtube_downloader.work_dir_max_age_days` jours et aucun téléchargement
+        actif pour l'enregistrement.
+        """
+        try:
+            max_age_days = float(self.env['ir.config_parameter'].sudo().get_param(
+                'youtube_downloader.work_dir_max_age_days', DEFAULT_WORK_DIR_MAX_AGE_DAYS,
+            ))
+        except (ValueError, TypeError):
+            max_age_days = DEFAULT_WORK_DIR_MAX_AGE_DAYS
+        deadline = time.time() - max(max_age_days, 0.1) * 86400
+        candidates = {}
+        for root in self._get_work_roots():
+            base = os.path.join(root, WORK_DIR_NAME)
+            if not os.path.isdir(base):
+                continue
+            for name in os.listdir(base):
+                path = os.path.join(base, name)
+                if os.path.isdir(path) and self._last_write_time(path) < deadline:
+                    candidates[path] = int(name) if name.isdigit() else 0
+        active = set(self.sudo().search([
+            ('id', 'in', list(set(candidates.values()))),
+            ('state', 'in', ('pending', 'downloading', 'paused')),
+        ]).ids)
+        removed = 0
+        for path, record_id in candidates.items():
+            if record_id in active:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        if removed:
+            _logger.info("Répertoires de travail abandonnés supprimés : %d", removed)
+        return removed
+
+    @staticmethod
+    def _last_write_time(path):
+        """Date de dernière écriture dans un répertoire (fichiers compris)."""
+        latest = os.path.getmtime(path)
+        for name in os.listdir(path):
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(path, name)))
+            except OSError:
+                pass
+        return latest
 
+    # ─── Actions (boutons) ────────────────────────────────────────────────────
+    def _get_fetch_info_opts(self):
+        """Options yt-dlp de récupération des infos (sans téléchargement)."""
+        self.ensure_one()
         ydl_opts = {
             'quiet': True,
             'no_warnings': True,
@@ -623,50 +944,63 @@ class YoutubeDownload(models.Model):
         ydl_opts.update(self._get_cookie_opts())
         if self.use_proxy and self.proxy_url:
             ydl_opts['proxy'] = self.proxy_url
+        return ydl_opts
+
+    def _apply_fetched_info(self, info):
+        """Enregistre les informations extraites (vidéo ou playlist)."""
+        self.ensure_one()
+        if info.get('_type') == 'playlist' or 'entries' in info:
+            entries = list(info.get('entries', []))
+            self.write({
+                'is_playlist': True,
+                'playlist_id': info.get('id', ''),
+                'playlist_title': info.get('title', ''),
+                'playlist_count': len(entries),
+                'name': info.get('title', self.name),
+                'video_thumbnail_url': info.get('thumbnail', ''),
+            })
+            self.message_post(body=_(
+                "📋 Playlist détectée : <b>%s</b> — %d vidéo(s)",
+                info.get('title', ''), len(entries),
+            ))
+        else:
+            self.write({
+                'video_id': info.get('id', ''),
+                'video_title': info.get('title', ''),
+                'video_duration': info.get('duration', 0),
+                'video_author': info.get('uploader', ''),
+                'video_views': info.get('view_count', 0),
+                'video_description': (info.get('description', '') or '')[:2000],
+                'video_thumbnail_url': info.get('thumbnail', ''),
+                'name': info.get('title', self.name),
+            })
+            duration_val = info.get('duration', 0) or 0
+            if duration_val == 0:
+                self.message_post(body=_(
+                    "⚠️ <b>Attention</b> : cette vidéo a une durée de 0 seconde. "
+                    "Il s'agit probablement d'un <b>livestream en cours</b> ou d'une "
+                    "vidéo invalide. Le téléchargement sera bloqué."
+                ))
+            else:
+                self.message_post(body=_(
+                    "✅ Informations récupérées : <b>%s</b> (%s) — %s vues",
+                    info.get('title', ''),
+                    self.video_duration_display,
+                    f"{info.get('view_count', 0):,}",
+                ))
+
+    def action_fetch_info(self):
+        """Récupère les informations de la vidéo sans la télécharger."""
+        self.ensure_one()
+        if not self.url:
+            raise UserError(_("Veuillez saisir une URL YouTube."))
+
+        yt_dlp = self._get_yt_dlp()
+        ydl_opts = self._get_fetch_info_opts()
 
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-
-                if info.get('_type') == 'playlist' or 'entries' in info:
-                    entries = list(info.get('entries', []))
-                    self.write({
-                        'is_playlist': True,
-                        'playlist_id': info.get('id', ''),
-                        'playlist_title': info.get('title', ''),
-                        'playlist_count': len(entries),
-                        'name': info.get('title', self.name),
-                        'video_thumbnail_url': info.get('thumbnail', ''),
-                    })
-                    self.message_post(body=_(
-                        "📋 Playlist détectée : <b>%s</b> — %d vidéo(s)",
-                        info.get('title', ''), len(entries),
-                    ))
-                else:
-                    self.write({
-                        'video_id': info.get('id', ''),
-                        'video_title': info.get('title', ''),
-                        'video_duration': info.get('duration', 0),
-                        'video_author': info.get('uploader', ''),
-                        'video_views': info.get('view_count', 0),
-                        'video_description': (info.get('description', '') or '')[:2000],
-                        'video_thumbnail_url': info.get('thumbnail', ''),
-                        'name': info.get('title', self.name),
-                    })
-                    duration_val = info.get('duration', 0) or 0
-                    if duration_val == 0:
-                        self.message_post(body=_(
-                            "⚠️ <b>Attention</b> : cette vidéo a une durée de 0 seconde. "
-                            "Il s'agit probablement d'un <b>livestream en cours</b> ou d'une "
-                            "vidéo invalide. Le téléchargement sera bloqué."
-                        ))
-                    else:
-                        self.message_post(body=_(
-                            "✅ Informations récupérées : <b>%s</b> (%s) — %s vues",
-                            info.get('title', ''),
-                            self.video_duration_display,
-                            f"{info.get('view_count', 0):,}",
-                        ))
+            info = self.env['youtube.info.cache']._extract_info(yt_dlp, self.url, ydl_opts)
+            self._apply_fetched_info(info)
         except Exception as e:
             error_msg = str(e)
             self.message_post(body=_(
@@ -723,22 +1057,17 @@ class YoutubeDownload(models.Model):
             'state': 'pending',
             'progress': 0.0,
             'error_message': False,
+            'retry_count': 0,
         })
         self.message_post(body=_("⏳ Téléchargement mis en file d'attente..."))
 
-        # IMPORTANT: Commit avant de lancer le thread, sinon le nouveau curseur
-        # ne verra pas le changement d'état (la transaction n'est pas encore committée)
-        self.env.cr.commit()
-
-        # Lancement dans un thread séparé avec limitation de concurrence
-        max_concurrent = self._get_max_concurrent()
-        thread = threading.Thread(
-            target=self._download_thread,
-            args=(self.id, dest_path, max_concurrent),
-            daemon=True,
-            name=f"yt-dl-{self.reference or self.id}",
+        # Job persistant : les workers sont réveillés au commit de la transaction
+        # et un redémarrage d'Odoo ne perd pas les téléchargements en attente.
+        self.env['youtube.download.job']._enqueue(
+            self, 'download',
+            payload={'dest_path': dest_path},
+            priority=self._get_queue_priority(),
         )
-        thread.start()
 
         return {
             'type': 'ir.actions.client',
@@ -752,182 +1081,621 @@ class YoutubeDownload(models.Model):
         }
 
     def _start_playlist_download(self, dest_path):
-        """Crée les enregistrements pour chaque vidéo de la playlist."""
-        yt_dlp = self._get_yt_dlp()
-
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'skip_download': True,
-            'extract_flat': True,
+        """
+        Met en file l'analyse de la playlist : les vidéos sont créées et
+        lancées par paquets en arrière-plan (voir _run_expand_playlist_job).
+        """
+        self.write({
+            'state': 'pending',
+            'progress': 0.0,
+            'error_message': False,
+        })
+        self.message_post(body=_("📋 Analyse de la playlist mise en file d'attente..."))
+        self.env['youtube.download.job']._enqueue(
+            self, 'expand_playlist',
+            payload={'dest_path': dest_path},
+            priority=self._get_queue_priority(),
+        )
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Playlist en cours d\'analyse'),
+                'message': _(
+                    "Les vidéos de la playlist sont créées et téléchargées "
+                    "au fil de leur découverte."
+                ),
+                'type': 'info',
+                'sticky': False,
+            },
         }
-        ydl_opts.update(self._get_cookie_opts())
-        if self.use_proxy and self.proxy_url:
-            ydl_opts['proxy'] = self.proxy_url
-
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(self.url, download=False)
-                entries = list(info.get('entries', []))
-
-                if not entries:
-                    raise UserError(_("Aucune vidéo trouvée dans cette playlist."))
-
-                # Filtrer les entrées avec une durée nulle (livestreams, vidéos invalides)
-                valid_entries = []
-                skipped_count = 0
-                for entry in entries:
-                    entry_duration = entry.get('duration') or 0
-                    if entry_duration == 0:
-                        skipped_count += 1
-                    else:
-                        valid_entries.append(entry)
 
-                if skipped_count > 0:
-                    self.message_post(body=_(
-                        "⚠️ %d vidéo(s) ignorée(s) car leur durée est nulle "
-                        "(livestream ou vidéo invalide).", skipped_count,
-                    ))
+    def _run_expand_playlist_job(self, payload):
+        """
+        Exécuté par un worker de la file, sans curseur ouvert : les entrées
+        de la playlist sont consommées au fil de la pagination de yt-dlp et
+        les vidéos créées et mises en file par paquets, sur des curseurs
+        courts. Reprend sans doublon après un bail expiré.
+
+        En mode incrémental (abonnement), seules les vidéos inconnues sont
+        créées ; une playlist triée par date n'est listée que jusqu'à la
+        première vidéo déjà connue.
+        """
+        self.ensure_one()
+        incremental = bool(payload.get('incremental'))
+        with self._short_cursor() as rec:
+            allowed_states = ('pending', 'downloading') + (('done', 'error') if incremental else ())
+            if rec.state not in allowed_states:
+                _logger.info("Analyse de playlist ignorée pour [%s] : état %s", rec.id, rec.state)
+                return
+            rec.write({'state': 'downloading', 'error_message': False})
+            url = rec.url
+            yt_dlp = rec._get_yt_dlp()
+            ydl_opts = rec._get_fetch_info_opts()
+            # Un abonnement doit voir les nouveautés : pas d'info-dict en cache
+            cached_info = None if incremental else rec.env['youtube.info.cache']._get(url, ydl_opts)
+            children = rec.search([('parent_playlist_id', '=', rec.id)])
+            children_count = len(children)
+            known_ids = set(children.mapped('video_id')) | rec._get_known_video_ids()
+            stop_at_known = incremental and rec.subscription_date_sorted
+            dest_path = payload.get('dest_path') or rec.effective_path
+
+        previously_known = frozenset(known_ids)
+        counters = {'created': children_count, 'new': 0, 'skipped': 0}
+        new_ids = []
+        playlist = {}
+        batch = []
+
+        def flush():
+            with self._short_cursor() as rec:
+                alive = rec._create_playlist_children(batch, dest_path)
+                if alive:
+                    counters['created'] += len(batch)
+                    counters['new'] += len(batch)
+                    new_ids.extend(entry['id'] for _idx, entry in batch)
+                    rec.write({'playlist_count': counters['created']})
+            batch.clear()
+            return alive
+
+        for idx, entry in enumerate(self._iter_playlist_entries(yt_dlp, ydl_opts, cached_info, playlist, url), 1):
+            video_id = entry.get('id')
+            if not video_id:
+                continue
+            if video_id in known_ids:
+                # Nouveautés en tête : tout ce qui suit est déjà connu
+                if stop_at_known and video_id in previously_known:
+                    break
+                continue
+            known_ids.add(video_id)
+            # Durée nulle : livestream ou vidéo invalide
+            if not entry.get('duration'):
+                counters['skipped'] += 1
+                continue
+            batch.append((idx, entry))
+            limit = PLAYLIST_FIRST_BATCH if not counters['new'] else PLAYLIST_BATCH_SIZE
+            if len(batch) >= limit and not flush():
+                _logger.info("Analyse de playlist [%s] interrompue : annulée", self.id)
+                return
+        if batch and not flush():
+            return
 
-                if not valid_entries:
-                    raise UserError(_(
-                        "Aucune vidéo téléchargeable dans cette playlist. "
-                        "Toutes les vidéos ont une durée nulle."
-                    ))
+        with self._short_cursor() as rec:
+            rec._finish_playlist_expansion(
+                playlist.get('title') or '', counters,
+                previously_known | set(new_ids), incremental=incremental,
+            )
 
-                created_ids = []
-                for idx, entry in enumerate(valid_entries, 1):
-                    video_url = f"https://www.youtube.com/watch?v={entry.get('id', '')}"
-                    child = self.create({
-                        'url': video_url,
-                        'name': entry.get('title', f'Vidéo {idx}'),
-                        'video_id': entry.get('id', ''),
-                        'video_title': entry.get('title', ''),
-                        'video_duration': entry.get('duration') or 0,
-                        'quality': self.quality,
-                        'output_format': self.output_format,
-                        'download_path': dest_path,
-                        'download_subtitles': self.download_subtitles,
-                        'subtitle_lang': self.subtitle_lang,
-                        'embed_subtitles': self.embed_subtitles,
-                        'download_thumbnail': self.download_thumbnail,
-                        'use_proxy': self.use_proxy,
-                        'proxy_url': self.proxy_url,
-                        'parent_playlist_id': self.id,
-                        'playlist_index': idx,
-                        'tag_ids': [(6, 0, self.tag_ids.ids)],
-                        'auto_retry': self.auto_retry,
-                        'max_retries': self.max_retries,
-                        'priority': self.priority,
-                        'youtube_account_id': self.youtube_account_id.id,
-                    })
-                    created_ids.append(child.id)
+    def _iter_playlist_entries(self, yt_dlp, ydl_opts, info, playlist, url):
+        """
+        Entrées de la playlist `url`. Sans info-dict en cache, l'extraction
+        est faite sans traitement (process=False) : yt-dlp produit alors les
+        entrées page par page au lieu de toutes les lister d'abord.
+        Le titre de la playlist est reporté dans le dict `playlist`.
+        Appelé hors curseur : aucun champ de l'enregistrement n'est lu ici.
+        """
+        if info is not None:
+            playlist['title'] = info.get('title', '')
+            yield from info.get('entries') or []
+            return
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+            # URL de redirection (watch?v=…&list=…) : une seule indirection
+            if info.get('_type') in ('url', 'url_transparent'):
+                info = ydl.extract_info(
+                    info['url'], download=False, process=False, ie_key=info.get('ie_key'),
+                )
+            playlist['title'] = info.get('title', '')
+            for entry in info.get('entries') or []:
+                if entry:
+                    yield entry
 
-                self.write({
-                    'state': 'done',
-                    'playlist_count': len(valid_entries),
-                    'playlist_title': info.get('title', ''),
-                    'name': info.get('title', self.name),
-                })
-                self.message_post(body=_(
-                    "📋 %d vidéo(s) créée(s) depuis la playlist <b>%s</b>",
-                    len(valid_entries), info.get('title', ''),
-                ))
+    def _create_playlist_children(self, indexed_entries, dest_path):
+        """
+        Crée en un seul create() les vidéos de `indexed_entries` ([(index,
+        entrée)]) et les met en file. Retourne False si la playlist a été
+        annulée entre-temps (rien n'est créé).
+        """
+        self.ensure_one()
+        if self.state != 'downloading':
+            return False
+        children = self.create([{
+            'url': f"https://www.youtube.com/watch?v={entry['id']}",
+            'name': entry.get('title') or _('Vidéo %d', idx),
+            'video_id': entry['id'],
+            'video_title': entry.get('title', ''),
+            'video_duration': entry.get('duration') or 0,
+            'quality': self.quality,
+            'output_format': self.output_format,
+            'download_path': dest_path,
+            'download_subtitles': self.download_subtitles,
+            'subtitle_lang': self.subtitle_lang,
+            'embed_subtitles': self.embed_subtitles,
+            'download_thumbnail': self.download_thumbnail,
+            'use_proxy': self.use_proxy,
+            'proxy_url': self.proxy_url,
+            'parent_playlist_id': self.id,
+            'playlist_index': idx,
+            'tag_ids': [(6, 0, self.tag_ids.ids)],
+            'auto_retry': self.auto_retry,
+            'max_retries': self.max_retries,
+            'priority': self.priority,
+            'youtube_account_id': self.youtube_account_id.id,
+            'user_id': self.user_id.id,
+            'state': 'pending',
+        } for idx, entry in indexed_entries])
+        self.env['youtube.download.job']._enqueue(
+            children, 'download',
+            payload={'dest_path': dest_path},
+            priority=self._get_queue_priority(),
+        )
+        return True
 
-                # Démarrer les téléchargements
-                children = self.env['youtube.download'].browse(created_ids)
-                for child in children:
-                    child.action_start_download()
-
-                return {
-                    'type': 'ir.actions.act_window',
-                    'name': _('Vidéos de la playlist'),
-                    'res_model': 'youtube.download',
-                    'view_mode': 'tree,kanban,form',
-                    'domain': [('id', 'in', created_ids)],
-                }
-        except UserError:
-            raise
-        except Exception as e:
+    def _finish_playlist_expansion(self, title, counters, known_ids, incremental=False):
+        """Clôture l'analyse : état final, vidéos connues et bilan dans le chatter."""
+        self.ensure_one()
+        if counters['skipped'] and not incremental:
+            self.message_post(body=_(
+                "⚠️ %d vidéo(s) ignorée(s) car leur durée est nulle "
+                "(livestream ou vidéo invalide).", counters['skipped'],
+            ))
+        if not counters['created'] and not incremental:
             raise UserError(_(
-                "Erreur lors du traitement de la playlist :\n%s", str(e)
+                "Aucune vidéo téléchargeable dans cette playlist."
+            ))
+        vals = {
+            'state': 'done',
+            'progress': 100.0,
+            'playlist_count': counters['created'],
+            'subscription_known_ids': '\n'.join(sorted(known_ids)),
+        }
+        if title:
+            vals.update(name=title, playlist_title=title)
+        if incremental:
+            vals['subscription_last_check'] = fields.Datetime.now()
+        self.write(vals)
+        if not incremental:
+            self.message_post(body=_(
+                "📋 %d vidéo(s) créée(s) depuis la playlist <b>%s</b>",
+                counters['created'], title,
+            ))
+        elif counters['new']:
+            self.message_post(body=_(
+                "🔔 %d nouvelle(s) vidéo(s) dans la playlist <b>%s</b>",
+                counters['new'], title or self.playlist_title or '',
             ))
 
-    def _download_thread(self, record_id, dest_path, max_concurrent=3):
-        """Exécuté dans un thread séparé avec sémaphore."""
-        semaphore = _get_semaphore(max_concurrent)
-        try:
-            semaphore.acquire()
-            with self.pool.cursor() as new_cr:
-                new_env = self.env(cr=new_cr)
-                record = new_env['youtube.download'].browse(record_id)
-                if record.exists() and record.state == 'pending':
-                    record._do_download(dest_path)
-        except Exception as e:
-            _logger.error("Erreur dans le thread de téléchargement [%s] : %s",
-                          record_id, str(e))
-            try:
-                with self.pool.cursor() as err_cr:
-                    err_env = self.env(cr=err_cr)
-                    rec = err_env['youtube.download'].browse(record_id)
-                    if rec.exists():
-                        rec.write({
-                            'state': 'error',
-                            'error_message': str(e),
-                        })
-                        err_cr.commit()
-            except Exception:
-                _logger.error("Impossible de mettre à jour l'état d'erreur.")
-        finally:
-            semaphore.release()
-
-    def _do_download(self, dest_path):
-        """Effectue le téléchargement réel avec yt-dlp et système de retry."""
-        yt_dlp = self._get_yt_dlp()
-        start_time = datetime.now()
+    def _get_known_video_ids(self):
+        """IDs des vidéos déjà créées depuis cette playlist (mémorisés)."""
+        self.ensure_one()
+        return set((self.subscription_known_ids or '').split())
 
-        self.write({'state': 'downloading', 'progress': 0.0})
-        self.env.cr.commit()
+    # ─── Abonnements ─────────────────────────────────────────────────────────
+    def _next_subscription_check(self, initial=False):
+        """
+        Échéance de la prochaine vérification. La première est tirée au hasard
+        dans l'intervalle (pas de rafale quand de nombreux abonnements sont
+        activés ensemble), les suivantes dispersées de ±10 %.
+        """
+        self.ensure_one()
+        interval = timedelta(days=max(1, self.subscription_interval_days or 1))
+        factor = random.random() if initial else random.uniform(
+            1 - SUBSCRIPTION_JITTER, 1 + SUBSCRIPTION_JITTER,
+        )
+        return fields.Datetime.now() + interval * factor
 
-        # Template du nom de fichier
-        outtmpl = os.path.join(dest_path, '%(title)s.%(ext)s')
+    def action_subscribe(self):
+        """Suit la playlist : seules ses nouvelles vidéos seront téléchargées."""
+        for rec in self:
+            if not rec.is_playlist or rec.parent_playlist_id or not rec._is_playlist_url(rec.url):
+                raise UserError(_("Seule une playlist peut faire l'objet d'un abonnement."))
+            rec.write({
+                'subscription_active': True,
+                'subscription_next_check': rec._next_subscription_check(initial=True),
+            })
+            rec.message_post(body=_(
+                "🔔 Abonnement activé : prochaine vérification le %s.",
+                fields.Datetime.to_string(rec.subscription_next_check),
+            ))
 
-        # Construction des options yt-dlp
-        ydl_opts = {
-            'format': self._get_format_string(),
-            'outtmpl': outtmpl,
-            'quiet': True,
-            'no_warnings': True,
-            'progress_hooks': [self._make_progress_hook()],
-            'retries': 5,
-            'fragment_retries': 5,
-            'socket_timeout': 30,
-            'http_chunk_size': 10485760,  # 10 Mo
-            'continuedl': True,
-        }
-        ydl_opts.update(self._get_cookie_opts())
+    def action_unsubscribe(self):
+        """Arrête le suivi de la playlist."""
+        self.write({
+            'subscription_active': False,
+            'subscription_next_check': False,
+        })
+        for rec in self:
+            rec.message_post(body=_("🔕 Abonnement désactivé."))
 
-        # Post-traitement selon format
-        postprocessors = []
-        if self.quality == 'audio_only':
-            postprocessors.append({
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            })
-        elif self.quality == 'audio_wav':
-            postprocessors.append({
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-            })
-        elif self.output_format in ('mp4', 'mkv', 'avi', 'mov', 'flv', 'm4v', 'ogv', 'ts', '3gp'):
-            # Utiliser merge_output_format + remux au lieu de FFmpegVideoConvertor
-            # FFmpegVideoConvertor fait un ré-encodage complet (très lent : 15-25 min)
-            # merge_output_format fait un simple remux (quasi-instantané : quelques secondes)
-            ydl_opts['merge_output_format'] = self.output_format
+    @api.model
+    def _cron_check_subscriptions(self, limit=SUBSCRIPTION_CRON_BATCH):
+        """
+        Met en file la vérification incrémentale des abonnements arrivés à
+        échéance (au plus `limit` par passage, les plus en retard d'abord).
+        """
+        due = self.search([
+            ('subscription_active', '=', True),
+            ('subscription_next_check', '<=', fields.Datetime.now()),
+            ('state', 'in', ('done', 'error')),
+        ], order='subscription_next_check', limit=limit)
+        Job = self.env['youtube.download.job']
+        for rec in due:
+            Job._enqueue(
+                rec, 'expand_playlist',
+                payload={'dest_path': rec.effective_path, 'incremental': True},
+                priority=rec._get_queue_priority(),
+            )
+            rec.subscription_next_check = rec._next_subscription_check()
+        if due:
+            _logger.info("Abonnements : %d playlist(s) mise(s) en file", len(due))
+        return len(due)
+
+    def _enqueue_fetch_info(self):
+        """Met en file la récupération des infos de ces enregistrements (un seul job)."""
+        if not self:
+            return self.env['youtube.download.job']
+        return self.env['youtube.download.job']._enqueue(
+            self[0], 'fetch_info', payload={'record_ids': self.ids},
+        )
 
-        # Sous-titres
-        if self.download_subtitles:
+    def _run_fetch_info_job(self, payload):
+        """
+        Exécuté par un worker de la file, sans curseur ouvert : extractions
+        sur un pool de threads borné, espacées par hôte ; les résultats sont
+        écrits par paquets sur des curseurs courts et la progression est
+        publiée sur le bus à chaque paquet.
+        """
+        with self._short_cursor() as rec:
+            records = rec.browse(payload.get('record_ids') or rec.ids).exists().filtered('url')
+            yt_dlp = rec._get_yt_dlp()
+            InfoCache = rec.env['youtube.info.cache']
+            threads, host_interval = InfoCache._get_fetch_settings()
+            pending, items, opts_by_id = [], [], {}
+            for record in records:
+                opts = record._get_fetch_info_opts()
+                info = InfoCache._get(record.url, opts)
+                if info is not None:
+                    pending.append((record.id, info, None))
+                else:
+                    items.append((record.id, record.url, opts))
+                opts_by_id[record.id] = opts
+            urls = {record.id: record.url for record in records}
+        counters = {'done': 0, 'errors': 0, 'total': len(urls)}
+
+        def flush(finished=False):
+            results = list(pending)
+            pending.clear()
+            with self._short_cursor() as rec:
+                for record_id, info, error in results:
+                    counters['errors' if error else 'done'] += 1
+                    rec.browse(record_id)._store_fetch_result(
+                        urls[record_id], info, error, opts_by_id[record_id],
+                    )
+                rec._bus_send_fetch_progress(counters, finished)
+
+        def on_result(record_id, info, error):
+            pending.append((record_id, info, error))
+            if len(pending) >= FETCH_INFO_FLUSH_SIZE:
+                flush()
+
+        extract_infos_parallel(yt_dlp, items, threads, host_interval, on_result)
+        flush(finished=True)
+
+    def _store_fetch_result(self, url, info, error, ydl_opts=None):
+        """Persiste un résultat de récupération en lot (info-dict ou erreur)."""
+        self.ensure_one()
+        if not self.exists():
+            return
+        if error:
+            self.message_post(body=_(
+                "⚠️ Impossible de récupérer les informations : %s", error
+            ))
+            return
+        self.env['youtube.info.cache']._set(url, info, ydl_opts)
+        self._apply_fetched_info(info)
+
+    def _bus_send_fetch_progress(self, counters, finished):
+        """Publie l'avancement d'une récupération en lot au demandeur."""
+        partner = self.env.user.partner_id
+        if partner:
+            self.env['bus.bus'].sudo()._sendone(partner, BUS_FETCH_INFO, dict(
+                counters, finished=finished,
+            ))
+
+    def _get_queue_priority(self):
+        """Rang de l'enregistrement dans la file (plus grand = servi en premier)."""
+        self.ensure_one()
+        return QUEUE_PRIORITY_RANK.get(self.priority, 1)
+
+    def _run_download_job(self, payload):
+        """
+        Exécuté par un worker de la file (voir youtube.download.job), sans
+        curseur ouvert : l'état est vérifié sur un curseur court.
+        """
+        self.ensure_one()
+        with self._short_cursor() as rec:
+            if rec.state != 'pending':
+                _logger.info("Job ignoré pour [%s] : état %s", rec.id, rec.state)
+                return
+            dest_path = payload.get('dest_path') or rec.effective_path
+            # Vidéo en échec définitif récent : pas de nouvelle requête
+            if rec._fail_if_dead_video():
+                return
+            # Fichier déjà téléchargé ou en cours de téléchargement ailleurs
+            if rec._attach_or_wait_blob():
+                return
+        self._do_download(dest_path, resumed=payload.get('resumed', False))
+
+    def _fail_if_dead_video(self):
+        """
+        Cache négatif : une vidéo récemment en erreur permanente (privée,
+        supprimée…) échoue sans solliciter YouTube. Ignoré avec un compte
+        connecté, dont les cookies peuvent donner accès à la vidéo.
+        """
+        self.ensure_one()
+        if self.youtube_account_id:
+            return False
+        dead = self.env['youtube.dead.video'].sudo()._lookup(
+            self.video_id or self._extract_video_id(self.url)
+        )
+        if not dead:
+            return False
+        self.write({
+            'state': 'error',
+            'progress': 0.0,
+            'error_message': _(
+                "Erreur définitive déjà constatée pour cette vidéo :\n%s", dead.reason,
+            ),
+            'last_error_date': fields.Datetime.now(),
+        })
+        self.message_post(body=_(
+            "❌ <b>Vidéo indisponible</b> (échec définitif récent, non retentée).<br/>%s",
+            dead.reason,
+        ))
+        return True
+
+    # ─── Déduplication ───────────────────────────────────────────────────────
+    def _get_blob_key(self):
+        """Clé de déduplication (vidéo/qualité/format[/sous-titres]), ou None."""
+        self.ensure_one()
+        video_id = self.video_id or self._extract_video_id(self.url)
+        if not video_id or self.is_playlist:
+            return None
+        parts = [video_id, self.quality or '', self.output_format or '']
+        # Sous-titres incrustés : le contenu du fichier diffère
+        if self.download_subtitles and self.embed_subtitles:
+            parts.append(f"subs-{self.subtitle_lang or ''}")
+        return '/'.join(parts)
+
+    def _attach_or_wait_blob(self):
+        """
+        Réserve la clé de déduplication avant de télécharger. Retourne True
+        si le téléchargement n'a pas lieu : fichier existant réutilisé, ou
+        attente du téléchargement en cours de la même clé (l'enregistrement
+        reste en attente et sera servi par _publish_blob).
+        """
+        self.ensure_one()
+        key = self._get_blob_key()
+        if not key:
+            return False
+        blob, role = self.env['youtube.download.blob'].sudo()._acquire(key, self)
+        if role == 'attach':
+            self._attach_blob(blob)
+            return True
+        self.write({'blob_id': blob.id})
+        if role == 'wait':
+            self.message_post(body=_(
+                "⏳ Cette vidéo est déjà en cours de téléchargement (%s) : "
+                "le fichier sera partagé dès la fin du téléchargement.",
+                blob.owner_id.reference,
+            ))
+            return True
+        return False
+
+    def _attach_blob(self, blob):
+        """Termine l'enregistrement en référençant le fichier partagé `blob`."""
+        self.ensure_one()
+        progress_registry.discard(self.pool.db_name, self.id)
+        self.write({
+            'state': 'done',
+            'progress': 100.0,
+            'blob_id': blob.id,
+            'file_path': blob.file_path,
+            'file_name': os.path.basename(blob.file_path),
+            'file_size': blob.file_size,
+            'download_date': fields.Datetime.now(),
+            'download_duration': 0.0,
+            'error_message': False,
+        })
+        self.message_post(body=_(
+            "♻️ <b>Fichier déjà téléchargé réutilisé</b><br/>"
+            "📁 Fichier : <code>%s</code><br/>"
+            "📦 Taille : %.2f Mo",
+            os.path.basename(blob.file_path), blob.file_size,
+        ))
+
+    def _publish_blob(self, content_hash):
+        """
+        Fin de téléchargement du propriétaire : rend le fichier disponible
+        et sert les enregistrements qui l'attendaient. Un fichier identique
+        (même empreinte) déjà présent est réutilisé et la copie supprimée.
+        """
+        self.ensure_one()
+        blob = self.blob_id.sudo()
+        if not blob or blob.owner_id != self or not self.file_path:
+            return
+        twin = blob._find_twin(content_hash) if content_hash else blob.browse()
+        if twin and twin.file_path != self.file_path:
+            try:
+                os.remove(self.file_path)
+            except OSError as e:
+                _logger.warning("Copie en double non supprimée %s : %s", self.file_path, str(e))
+            else:
+                self.write({
+                    'file_path': twin.file_path,
+                    'file_name': os.path.basename(twin.file_path),
+                    'file_size': twin.file_size,
+                })
+                self.message_post(body=_(
+                    "♻️ Contenu identique à un fichier existant : copie supprimée, "
+                    "fichier partagé <code>%s</code>.", os.path.basename(twin.file_path),
+                ))
+        blob.write({
+            'state': 'done',
+            'owner_id': False,
+            'file_path': self.file_path,
+            'file_size': self.file_size,
+            'content_hash': content_hash or False,
+        })
+        waiting = self.sudo().search([
+            ('blob_id', '=', blob.id), ('state', '=', 'pending'), ('id', '!=', self.id),
+        ])
+        for rec in waiting:
+            rec._attach_blob(blob)
+
+    def _abandon_blob(self):
+        """
+        Échec ou annulation du propriétaire : la clé est libérée et les
+        enregistrements en attente sont remis en file (le premier servi
+        reprend le téléchargement, les autres l'attendent).
+        """
+        for rec in self:
+            blob = rec.blob_id.sudo()
+            if not blob or blob.owner_id != rec:
+                continue
+            blob.write({'state': 'error', 'owner_id': False})
+            rec.blob_id = False
+            waiting = rec.sudo().search([
+                ('blob_id', '=', blob.id), ('state', '=', 'pending'),
+            ])
+            if waiting:
+                self.env['youtube.download.job']._enqueue(
+                    waiting, 'download', priority=waiting[0]._get_queue_priority(),
+                )
+
+    @api.model
+    def _requeue_blob_waiters(self):
+        """
+        Remet en file les enregistrements qui attendent un fichier partagé
+        dont le téléchargement n'est plus en cours (propriétaire tué, job
+        abandonné) et qui n'ont plus de job actif.
+        """
+        waiting = self.sudo().search([('state', '=', 'pending'), ('blob_id', '!=', False)])
+        orphans = waiting.filtered(lambda r: r.blob_id.owner_id != r and (
+            r.blob_id.state != 'downloading'
+            or r.blob_id.owner_id.state not in ('pending', 'downloading')
+        ))
+        if not orphans:
+            return orphans
+        Job = self.env['youtube.download.job'].sudo()
+        active = Job.search([
+            ('res_model', '=', self._name),
+            ('res_id', 'in', orphans.ids),
+            ('state', 'in', ('queued', 'running')),
+        ])
+        orphans -= orphans.browse(active.mapped('res_id'))
+        for rec in orphans:
+            Job._enqueue(rec, 'download', priority=rec._get_queue_priority())
+        return orphans
+
+    def _release_file(self):
+        """
+        Libère la référence de l'enregistrement sur son fichier. Le fichier
+        n'est supprimé du disque que si plus aucun enregistrement ne le
+        référence. Retourne True si le fichier a été supprimé.
+        """
+        self.ensure_one()
+        path = self.file_path
+        others = self.sudo().search_count([('file_path', '=', path), ('id', '!=', self.id)])
+        removed = False
+        if not others and os.path.exists(path):
+            os.remove(path)
+            removed = True
+        self.write({
+            'file_path': False,
+            'file_name': False,
+            'file_size': 0.0,
+            'state': 'cancelled',
+            'blob_id': False,
+        })
+        if not others:
+            self.env['youtube.download.blob'].sudo().search([('file_path', '=', path)]).unlink()
+        if removed:
+            self.message_post(body=_("🗑️ Fichier physique supprimé : %s", path))
+        else:
+            self.message_post(body=_(
+                "🔗 Référence au fichier libérée : %s (conservé, encore utilisé par "
+                "%d autre(s) téléchargement(s)).", path, others,
+            ))
+        return removed
+
+    def _prepare_download_opts(self, dest_path):
+        """Construit les options yt-dlp (sans les hooks) à partir de l'enregistrement."""
+        # Template du nom de fichier
+        outtmpl = os.path.join(dest_path, '%(title)s.%(ext)s')
+
+        # Construction des options yt-dlp
+        ydl_opts = {
+            'format': self._get_format_string(),
+            'outtmpl': outtmpl,
+            'quiet': True,
+            'no_warnings': True,
+            'retries': 5,
+            'fragment_retries': 5,
+            'socket_timeout': 30,
+            'http_chunk_size': 10485760,  # 10 Mo
+            'continuedl': True,
+        }
+        ydl_opts.update(self._get_cookie_opts())
+
+        # Post-traitement selon format
+        postprocessors = []
+        if self.quality == 'audio_only':
+            postprocessors.append({
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            })
+        elif self.quality == 'audio_wav':
+            postprocessors.append({
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'wav',
+            })
+        elif self.output_format in VIDEO_MERGE_FORMATS:
+            # Utiliser merge_output_format + remux au lieu de FFmpegVideoConvertor
+            # FFmpegVideoConvertor fait un ré-encodage complet (très lent : 15-25 min)
+            # merge_output_format fait un simple remux (quasi-instantané : quelques secondes)
+            ydl_opts['merge_output_format'] = self.output_format
+            if (self.output_format in BROWSER_NATIVE_OUTPUT_FORMATS
+                    and self._get_format_selection() == 'browser_native'):
+                ydl_opts['format_sort'] = self._get_browser_native_format_sort()
+                if self.output_format != 'mp4':
+                    # Flux H.264 + AAC : fusion directe en MP4, sans la
+                    # conversion après téléchargement ; sinon conteneur
+                    # demandé, converti en MP4 ensuite comme auparavant
+                    ydl_opts['merge_output_format'] = f'mp4/{self.output_format}'
+
+        # Sous-titres
+        if self.download_subtitles:
             ydl_opts.update({
                 'writesubtitles': True,
                 'subtitleslangs': [self.subtitle_lang or 'fr'],
@@ -946,67 +1714,160 @@ class YoutubeDownload(models.Model):
 
         if postprocessors:
             ydl_opts['postprocessors'] = postprocessors
+        return ydl_opts
 
-        # Hook de post-traitement (ffmpeg) pour montrer la progression 95→99%
-        ydl_opts['postprocessor_hooks'] = [self._make_postprocessor_hook()]
-
-        # Boucle de retry
-        max_retries = self.max_retries or 3
-        last_error = None
+    def _do_download(self, dest_path, resumed=False):
+        """
+        Effectue une tentative de téléchargement avec yt-dlp ; un échec est
+        classé puis repris plus tard ou définitif (_handle_download_failure).
+        Une reprise après pause (`resumed`) poursuit la tentative interrompue :
+        elle ne consomme pas de tentative.
+
+        Aucun curseur n'est conservé pendant le travail long (yt-dlp, pauses,
+        ffmpeg) : les paramètres sont lus au départ et chaque persistance
+        passe par un curseur court (_short_cursor). En mode « processus
+        isolés », yt-dlp s'exécute dans un processus enfant (runner_pool).
+        """
+        start_time = datetime.now()
 
-        for attempt in range(1, max_retries + 1):
-            downloaded_file = None
-            try:
-                self.write({
-                    'retry_count': attempt,
-                    'progress': 0.0,
-                })
-                self.env.cr.commit()
+        with self._short_cursor() as rec:
+            yt_dlp = rec._get_yt_dlp()
+            attempt = max(rec.retry_count, 1) if resumed else rec.retry_count + 1
+            rec.write({'state': 'downloading', 'progress': 0.0, 'retry_count': attempt})
+            work_dir = rec._get_work_dir(dest_path)
+            ydl_opts = rec._prepare_download_opts(work_dir)
+            process_settings = rec._get_process_settings()
+            snapshot = {
+                'url': rec.url,
+                'name': rec.name,
+                'video_id': rec.video_id,
+                'video_title': rec.video_title,
+                'video_author': rec.video_author,
+                'video_duration': rec.video_duration,
+                'video_views': rec.video_views,
+                'max_retries': rec.max_retries or 3,
+                'user_id': rec.user_id.id,
+                'priority': rec.priority,
+                'owns_blob': bool(rec.blob_id) and rec.blob_id.sudo().owner_id == rec,
+            }
+            # Info-dict déjà extrait (récupération des infos, API) : pas de
+            # nouvelle extraction, yt-dlp traite directement le cache
+            cached_info = rec.env['youtube.info.cache']._get(rec.url, ydl_opts)
+            if cached_info and (cached_info.get('_type') == 'playlist' or 'entries' in cached_info):
+                cached_info = None
+
+        # Reprise : les fichiers partiels d'une tentative ou d'un démarrage
+        # précédent sont retrouvés dans ce répertoire (continuedl)
+        os.makedirs(work_dir, exist_ok=True)
+        progress_hook = self._make_progress_hook()
+        # Hook de post-traitement (ffmpeg) pour montrer la progression 95→99%
+        postprocessor_hook = self._make_postprocessor_hook()
 
-                if attempt > 1:
-                    self.message_post(body=_(
+        # Une seule tentative par job : en cas d'échec reprenable, le job est
+        # remis en file avec une date de prochaine tentative (voir
+        # _handle_download_failure), sans dormir en gardant le créneau.
+        max_retries = snapshot['max_retries']
+        downloaded_file = None
+        try:
+            progress_registry.discard(self.pool.db_name, self.id)
+            download_control.clear(self.pool.db_name, self.id)
+            bandwidth_shaper.register(
+                self.pool.db_name, self.id, snapshot['user_id'], snapshot['priority'],
+            )
+            if attempt > 1 and not resumed:
+                with self._short_cursor() as rec:
+                    rec.message_post(body=_(
                         "🔄 Tentative %d/%d...", attempt, max_retries,
                     ))
-                    self.env.cr.commit()
-                    time.sleep(min(2 ** attempt, 30))
 
+            def _on_cache_invalid(error):
+                # URLs de formats expirées ou refusées : extraction complète
+                _logger.info("Info-dict en cache inutilisable pour [%s] : %s",
+                             snapshot['url'], error)
+                with self._short_cursor() as rec:
+                    rec.env['youtube.info.cache']._invalidate(snapshot['url'], ydl_opts)
+
+            if process_settings:
+                # Processus enfant : ses hooks sont rejoués ici (progression,
+                # bande passante, annulation), seul le résultat revient
+                info, downloaded_file = runner_pool.run(
+                    {'url': snapshot['url'], 'opts': ydl_opts, 'cached_info': cached_info},
+                    progress_hook, postprocessor_hook, process_settings,
+                    on_cache_invalid=_on_cache_invalid,
+                )
+            else:
+                ydl_opts['progress_hooks'] = [progress_hook]
+                ydl_opts['postprocessor_hooks'] = [postprocessor_hook]
                 with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(self.url, download=True)
+                    info = None
+                    if cached_info:
+                        try:
+                            info = ydl.process_ie_result(cached_info, download=True)
+                        except DownloadInterrupted:
+                            raise
+                        except Exception as e:
+                            _on_cache_invalid(str(e))
+                    if info is None:
+                        info = ydl.extract_info(snapshot['url'], download=True)
                     if 'requested_downloads' in info:
                         downloaded_file = info['requested_downloads'][0].get('filepath')
                     else:
                         downloaded_file = ydl.prepare_filename(info)
 
-                end_time = datetime.now()
-                duration_sec = (end_time - start_time).total_seconds()
-
-                file_size_mb = 0.0
-                file_name = ''
-                if downloaded_file and os.path.exists(downloaded_file):
-                    file_size_mb = os.path.getsize(downloaded_file) / (1024 * 1024)
-                    file_name = os.path.basename(downloaded_file)
-
-                vals = {
-                    'state': 'done',
-                    'progress': 100.0,
-                    'file_path': downloaded_file or '',
-                    'file_name': file_name,
-                    'file_size': file_size_mb,
-                    'download_date': fields.Datetime.now(),
-                    'download_duration': duration_sec,
-                    'video_title': info.get('title', self.video_title or ''),
-                    'video_id': info.get('id', self.video_id or ''),
-                    'video_author': info.get('uploader', self.video_author or ''),
-                    'video_duration': info.get('duration', self.video_duration or 0),
-                    'video_views': info.get('view_count', self.video_views or 0),
-                    'video_thumbnail_url': info.get('thumbnail', ''),
-                    'error_message': False,
-                }
-                if not self.name or self.name.startswith(('Téléchargement -', 'Vidéo -')):
-                    vals['name'] = info.get('title', self.name)
-
-                self.write(vals)
-                self.message_post(body=_(
+            # Annulation / pause survenue en toute fin de transfert : l'état
+            # en base n'est jamais écrasé par « terminé »
+            with self._short_cursor() as rec:
+                interrupt = INTERRUPT_STATES.get(rec.state)
+            if interrupt:
+                raise DownloadInterrupted(interrupt)
+
+            # Fichiers terminés déplacés d'un bloc dans la bibliothèque
+            if downloaded_file and os.path.isdir(work_dir):
+                downloaded_file = self._move_to_library(work_dir, dest_path, downloaded_file)
+
+            end_time = datetime.now()
+            duration_sec = (end_time - start_time).total_seconds()
+
+            file_size_mb = 0.0
+            file_name = ''
+            if downloaded_file and os.path.exists(downloaded_file):
+                file_size_mb = os.path.getsize(downloaded_file) / (1024 * 1024)
+                file_name = os.path.basename(downloaded_file)
+
+            vals = {
+                'state': 'done',
+                'progress': 100.0,
+                'file_path': downloaded_file or '',
+                'file_name': file_name,
+                'file_size': file_size_mb,
+                'download_date': fields.Datetime.now(),
+                'download_duration': duration_sec,
+                'video_title': info.get('title', snapshot['video_title'] or ''),
+                'video_id': info.get('id', snapshot['video_id'] or ''),
+                'video_author': info.get('uploader', snapshot['video_author'] or ''),
+                'video_duration': info.get('duration', snapshot['video_duration'] or 0),
+                'video_views': info.get('view_count', snapshot['video_views'] or 0),
+                'video_thumbnail_url': info.get('thumbnail', ''),
+                'error_message': False,
+                # Fusion directe en MP4 (sélection « natif navigateur ») : la
+                # conversion MP4 après téléchargement n'a pas lieu
+                'conversion_avoided': bool(
+                    str(ydl_opts.get('merge_output_format') or '').startswith('mp4/')
+                    and downloaded_file
+                    and os.path.splitext(downloaded_file)[1].lower() == '.mp4'
+                ),
+            }
+            if vals['conversion_avoided']:
+                _logger.info("Téléchargement [%s] : formats natifs navigateur, conversion MP4 évitée.",
+                             self.id)
+            name = snapshot['name']
+            if not name or name.startswith(('Téléchargement -', 'Vidéo -')):
+                vals['name'] = info.get('title', name)
+
+            progress_registry.discard(self.pool.db_name, self.id)
+            with self._short_cursor() as rec:
+                rec.write(vals)
+                rec.message_post(body=_(
                     "✅ <b>Téléchargement terminé !</b><br/>"
                     "📁 Fichier : <code>%s</code><br/>"
                     "📦 Taille : %.2f Mo<br/>"
@@ -1014,120 +1875,277 @@ class YoutubeDownload(models.Model):
                     "🔄 Tentative : %d/%d",
                     file_name, file_size_mb, duration_sec, attempt, max_retries,
                 ))
-                self.env.cr.commit()
-
-                # Auto-convertir en MP4 si le format n'est pas compatible navigateur
-                if downloaded_file:
-                    ext = os.path.splitext(downloaded_file)[1].lower()
-                    browser_compatible = {'.mp4', '.webm', '.ogg', '.ogv'}
-                    audio_extensions = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.aac', '.wma', '.opus'}
-                    if ext not in browser_compatible and ext not in audio_extensions:
-                        try:
-                            self._auto_remux_to_mp4(downloaded_file)
-                        except Exception as e:
-                            _logger.warning(
-                                "Auto-conversion MP4 échouée pour [%s] : %s (le fichier original est conservé)",
-                                downloaded_file, str(e),
-                            )
 
-                return  # Succès
+            # Déduplication : empreinte calculée sans curseur, puis partage
+            if snapshot['owns_blob']:
+                content_hash = None
+                if downloaded_file and os.path.exists(downloaded_file):
+                    try:
+                        content_hash = file_sha256(downloaded_file)
+                    except OSError as e:
+                        _logger.warning("Empreinte impossible pour %s : %s", downloaded_file, str(e))
+                with self._short_cursor() as rec:
+                    rec._publish_blob(content_hash)
+
+            # Conteneur non lu par les navigateurs : conversion MP4 mise en file
+            # (après le partage, le job remplace le fichier d'origine)
+            if downloaded_file:
+                ext = os.path.splitext(downloaded_file)[1].lower()
+                if ext not in BROWSER_COMPATIBLE_EXTENSIONS and ext not in AUDIO_EXTENSIONS:
+                    with self._short_cursor() as rec:
+                        rec._enqueue_media_jobs('convert_mp4', enforce_capacity=False)
+
+            return  # Succès
+
+        except DownloadInterrupted as e:
+            progress_registry.discard(self.pool.db_name, self.id)
+            with self._short_cursor() as rec:
+                rec._finish_interrupted(e.action)
+        except Exception as e:
+            progress_registry.discard(self.pool.db_name, self.id)
+            with self._short_cursor() as rec:
+                rec._handle_download_failure(str(e), attempt, dest_path)
+        finally:
+            bandwidth_shaper.unregister(self.pool.db_name, self.id)
+            download_control.clear(self.pool.db_name, self.id)
 
-            except Exception as e:
-                last_error = str(e)
-                _logger.warning(
-                    "Tentative %d/%d échouée pour [%s] : %s",
-                    attempt, max_retries, self.url, last_error,
-                )
-                self._cleanup_partial_files(dest_path, self.video_id)
-                if attempt >= max_retries or not self.auto_retry:
-                    break
+    def _finish_interrupted(self, action):
+        """
+        Range un transfert interrompu par son hook. Annulation : fichiers
+        partiels supprimés. Pause : fichiers partiels conservés, la reprise
+        repart du même octet.
+        """
+        self.ensure_one()
+        # L'état en base fait foi (pause puis annulation, reprise immédiate...)
+        action = INTERRUPT_STATES.get(self.state) if self.state != 'downloading' else action
+        if not action:
+            self.write({'live_speed': 0.0})
+            return
+        self._abandon_blob()
+        if action == INTERRUPT_CANCEL:
+            self._remove_work_dir()
+            self.write({
+                'state': 'cancelled',
+                'progress': 0.0,
+                'live_speed': 0.0,
+                'blob_id': False,
+            })
+            self.message_post(body=_("🚫 Téléchargement interrompu et annulé."))
+        else:
+            self.write({'state': 'paused', 'live_speed': 0.0, 'blob_id': False})
+            self.message_post(body=_(
+                "⏸️ Téléchargement en pause à %.1f %% (données partielles conservées).",
+                self.progress,
+            ))
+
+    def _signal_interrupt(self, action):
+        """Pose le jeton d'interruption au commit (threads de ce processus)."""
+        dbname = self.env.cr.dbname
+        record_ids = self.ids
+
+        def _signal():
+            for record_id in record_ids:
+                download_control.request(dbname, record_id, action)
+        self.env.cr.postcommit.add(_signal)
+
+    def _handle_download_failure(self, error, attempt, dest_path):
+        """
+        Suite d'une tentative échouée. Erreur permanente : échec immédiat et
+        vidéo mémorisée dans le cache négatif. Erreur bridée ou transitoire :
+        nouveau job planifié après un backoff exponentiel avec gigue (les
+        fichiers partiels restent dans le répertoire de travail), tant que
+        des tentatives restent.
+        """
+        self.ensure_one()
+        kind = classify_download_error(error)
+        max_retries = self.max_retries or 3
+        _logger.warning(
+            "Tentative %d/%d échouée (%s) pour [%s] : %s",
+            attempt, max_retries, kind, self.url, error,
+        )
+        now = fields.Datetime.now()
+        if kind != ERROR_PERMANENT and self.auto_retry and attempt < max_retries:
+            next_attempt_at = now + timedelta(seconds=retry_delay(kind, attempt))
+            self.write({
+                'state': 'pending',
+                'progress': 0.0,
+                'error_message': error,
+                'last_error_date': now,
+            })
+            self.message_post(body=_(
+                "⏳ Tentative %d/%d échouée (%s) : nouvelle tentative prévue le %s.<br/>%s",
+                attempt, max_retries, ERROR_KIND_LABELS[kind],
+                fields.Datetime.to_string(next_attempt_at), error,
+            ))
+            self.env['youtube.download.job']._enqueue(
+                self, 'download',
+                payload={'dest_path': dest_path},
+                priority=self._get_queue_priority(),
+                next_attempt_at=next_attempt_at,
+            )
+            return
 
-        # Toutes les tentatives ont échoué
         _logger.error("Téléchargement échoué après %d tentative(s) [%s] : %s",
-                       max_retries, self.url, last_error)
+                      attempt, self.url, error)
+        if kind == ERROR_PERMANENT:
+            self.env['youtube.dead.video'].sudo()._remember(
+                self.video_id or self._extract_video_id(self.url), error,
+            )
+            message = _("Erreur définitive (nouvelle tentative inutile) :\n%s", error)
+        else:
+            message = _("Échec après %d tentative(s) :\n%s", attempt, error)
         self.write({
             'state': 'error',
-            'error_message': _(
-                "Échec après %d tentative(s) :\n%s", max_retries, last_error,
-            ),
+            'error_message': message,
             'progress': 0.0,
-            'last_error_date': fields.Datetime.now(),
+            'last_error_date': now,
         })
         self.message_post(body=_(
-            "❌ <b>Échec après %d tentative(s)</b><br/>%s",
-            max_retries, last_error,
+            "❌ <b>%s</b><br/>%s",
+            _("Erreur définitive") if kind == ERROR_PERMANENT
+            else _("Échec après %d tentative(s)", attempt),
+            error,
         ))
-        self.env.cr.commit()
+        self._abandon_blob()
+
+    def _get_live_progress(self):
+        """
+        Progression courante par enregistrement : registre en mémoire de ce
+        processus quand le téléchargement y tourne, sinon dernière valeur flushée.
+        """
+        result = {}
+        for rec in self:
+            live = None
+            if rec.state in ('pending', 'downloading'):
+                live = progress_registry.get(self.pool.db_name, rec.id)
+            live = live or {}
+            result[rec.id] = {
+                'progress': live.get('progress', rec.progress),
+                'downloaded_bytes': live.get('downloaded_bytes'),
+                'total_bytes': live.get('total_bytes'),
+                'speed': live.get('speed'),
+                'eta': live.get('eta'),
+            }
+        return result
 
     def _make_progress_hook(self):
-        """Crée un callback de progression avec throttling (0→95%)."""
-        last_update = {'time': 0, 'progress': 0}
+        """
+        Crée un callback de progression (0→95%).
+        La progression est publiée dans le registre en mémoire ; le flusher
+        la persiste par lots, sans écriture ORM depuis le hook. Chaque bloc
+        reçu passe aussi par la limitation de bande passante.
+        """
+        dbname = self.pool.db_name
+        record_id = self.id
+        received = {}  # {fichier: octets déjà décomptés de la bande passante}
 
         def hook(d):
+            # Annulation / pause : arrête le transfert yt-dlp (voir _finish_interrupted)
+            download_control.check(dbname, record_id)
             if d['status'] == 'downloading':
                 total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
                 downloaded = d.get('downloaded_bytes', 0)
+                # Limitation de bande passante : le bloc reçu est prélevé dans
+                # les seaux partagés, le thread dort s'ils sont à découvert
+                filename = d.get('filename')
+                delta = downloaded - received.get(filename, 0)
+                received[filename] = downloaded
+                bandwidth_shaper.consume(dbname, record_id, delta if delta > 0 else 0)
                 if total > 0:
                     # Plafonner à 94% pendant le téléchargement (95-100 réservé au post-traitement)
                     raw_progress = (downloaded / total) * 100
-                    progress = round(min(raw_progress, 94.0), 1)
-                    now = time.time()
-                    if (now - last_update['time'] >= 3 or
-                            progress - last_update['progress'] >= 5 or
-                            progress >= 93):
-                        try:
-                            self.write({'progress': progress})
-                            self.env.cr.commit()
-                            last_update['time'] = now
-                            last_update['progress'] = progress
-                        except Exception:
-                            pass
+                    progress_registry.update(
+                        dbname, record_id,
+                        round(min(raw_progress, 94.0), 1),
+                        downloaded_bytes=downloaded,
+                        total_bytes=total,
+                        speed=d.get('speed'),
+                        eta=d.get('eta'),
+                    )
             elif d['status'] == 'finished':
+                progress_registry.update(dbname, record_id, 95.0)
                 try:
-                    self.write({'progress': 95.0})
-                    self.message_post(body=_(
-                        "⬇️ Téléchargement terminé. Post-traitement ffmpeg en cours..."
-                    ))
-                    self.env.cr.commit()
+                    with self._short_cursor() as rec:
+                        rec.message_post(body=_(
+                            "⬇️ Téléchargement terminé. Post-traitement ffmpeg en cours..."
+                        ))
                 except Exception:
                     pass
         return hook
 
     def _make_postprocessor_hook(self):
         """Crée un callback pour suivre l'avancement du post-traitement ffmpeg (95→99%)."""
-        pp_state = {'started': False}
+        dbname = self.pool.db_name
+        record_id = self.id
 
         def hook(d):
+            download_control.check(dbname, record_id)
             status = d.get('status', '')
             postprocessor = d.get('postprocessor', '')
-            try:
-                if status == 'started':
-                    if not pp_state['started']:
-                        pp_state['started'] = True
-                        self.write({'progress': 96.0})
-                        self.env.cr.commit()
-                elif status == 'processing':
-                    # Certains post-processeurs envoient processing
-                    self.write({'progress': 97.0})
-                    self.env.cr.commit()
-                elif status == 'finished':
-                    self.write({'progress': 99.0})
-                    self.message_post(body=_(
-                        "⚙️ Post-traitement terminé (%s).", postprocessor or 'ffmpeg',
-                    ))
-                    self.env.cr.commit()
-            except Exception:
-                pass
+            if status == 'started':
+                progress_registry.update(dbname, record_id, 96.0)
+            elif status == 'processing':
+                # Certains post-processeurs envoient processing
+                progress_registry.update(dbname, record_id, 97.0)
+            elif status == 'finished':
+                progress_registry.update(dbname, record_id, 99.0)
+                try:
+                    with self._short_cursor() as rec:
+                        rec.message_post(body=_(
+                            "⚙️ Post-traitement terminé (%s).", postprocessor or 'ffmpeg',
+                        ))
+                except Exception:
+                    pass
         return hook
 
     # ─── Actions supplémentaires ──────────────────────────────────────────────
     def action_cancel(self):
-        """Annule un téléchargement en attente."""
+        """
+        Annule un téléchargement. En cours : le transfert est interrompu par
+        son hook de progression, qui range ensuite ses fichiers partiels.
+        """
         for rec in self:
-            if rec.state in ('draft', 'pending', 'error'):
-                rec.write({'state': 'cancelled', 'progress': 0.0})
+            if rec.state == 'downloading':
+                rec.write({'state': 'cancelled'})
+                rec._signal_interrupt(INTERRUPT_CANCEL)
+                rec.message_post(body=_("🚫 Annulation demandée, arrêt du transfert en cours..."))
+            elif rec.state in ('draft', 'pending', 'paused', 'error'):
+                if rec.state == 'pending':
+                    self.env['youtube.download.job']._cancel_for(rec)
+                    rec._abandon_blob()
+                rec.write({'state': 'cancelled', 'progress': 0.0, 'blob_id': False})
+                rec._remove_work_dir()
                 rec.message_post(body=_("🚫 Téléchargement annulé."))
 
+    def action_pause(self):
+        """
+        Met en pause un téléchargement en attente ou en cours ; les données
+        déjà reçues sont conservées pour la reprise.
+        """
+        for rec in self:
+            if rec.is_playlist:
+                continue
+            if rec.state == 'downloading':
+                rec.write({'state': 'paused'})
+                rec._signal_interrupt(INTERRUPT_PAUSE)
+            elif rec.state == 'pending':
+                self.env['youtube.download.job']._cancel_for(rec)
+                rec._abandon_blob()
+                rec.write({'state': 'paused', 'blob_id': False})
+                rec.message_post(body=_("⏸️ Téléchargement mis en pause."))
+
+    def action_resume(self):
+        """Reprend un téléchargement en pause là où il s'était arrêté."""
+        Job = self.env['youtube.download.job']
+        for rec in self.filtered(lambda r: r.state == 'paused'):
+            rec.write({'state': 'pending'})
+            rec.message_post(body=_("▶️ Reprise du téléchargement à %.1f %%...", rec.progress))
+            Job._enqueue(
+                rec, 'download',
+                payload={'dest_path': rec.effective_path, 'resumed': True},
+                priority=rec._get_queue_priority(),
+            )
+
     def action_reset_draft(self):
         """Remet en brouillon pour pouvoir relancer."""
         for rec in self:
@@ -1139,6 +2157,7 @@ class YoutubeDownload(models.Model):
                     'file_path': False,
                     'file_name': False,
                     'file_size': 0.0,
+                    'blob_id': False,
                     'download_date': False,
                     'retry_count': 0,
                     'last_error_date': False,
@@ -1149,6 +2168,10 @@ class YoutubeDownload(models.Model):
         """Relance le téléchargement d'un enregistrement en erreur."""
         for rec in self:
             if rec.state == 'error':
+                # Relance explicite : la vidéo sort du cache négatif
+                rec.env['youtube.dead.video'].sudo()._forget(
+                    rec.video_id or rec._extract_video_id(rec.url)
+                )
                 rec.write({
                     'state': 'draft',
                     'error_message': False,
@@ -1209,447 +2232,21 @@ class YoutubeDownload(models.Model):
             },
         }
 
-    def _auto_remux_to_mp4(self, source_path):
-        """
-        Remuxe un fichier vidéo non compatible navigateur vers MP4 sans ré-encodage.
-        Utilise 'ffmpeg -c copy' pour un remuxage quasi-instantané.
-        Si le remuxage échoue (codecs incompatibles avec MP4), fait un ré-encodage rapide.
-        """
-        if not source_path or not os.path.exists(source_path):
-            return
-
-        if not shutil.which('ffmpeg'):
-            _logger.warning("ffmpeg non disponible, impossible de convertir en MP4")
-            return
-
-        ext = os.path.splitext(source_path)[1].lower()
-        if ext == '.mp4':
-            return  # Déjà en MP4
-
-        mp4_path = os.path.splitext(source_path)[0] + '.mp4'
-
-        # Étape 1 : Remuxage rapide (copier vidéo, ré-encoder audio en AAC)
-        # On ré-encode toujours l'audio en AAC car Opus/Vorbis dans MP4
-        # ne sont pas supportés par les navigateurs (son muet).
-        cmd_remux = [
-            'ffmpeg', '-i', source_path,
-            '-c:v', 'copy',               # Copier la vidéo sans ré-encodage
-            '-c:a', 'aac', '-b:a', '192k', # Toujours ré-encoder l'audio en AAC
-            '-movflags', '+faststart',     # Optimiser pour le streaming web
-            '-y',                          # Écraser si existant
-            mp4_path,
-        ]
-
-        _logger.info("Remuxage %s → MP4 (vidéo copy, audio AAC)...", ext)
-        try:
-            result = subprocess.run(
-                cmd_remux,
-                capture_output=True,
-                timeout=600,  # 10 min max (audio encoding)
-            )
-
-            if result.returncode != 0:
-                # Le remuxage a échoué (codec vidéo non compatible MP4)
-                # Faire un ré-encodage complet
-                _logger.info("Remuxage échoué, ré-encodage complet %s → MP4...", ext)
-                if os.path.exists(mp4_path):
-                    os.remove(mp4_path)
-
-                cmd_encode = [
-                    'ffmpeg', '-i', source_path,
-                    '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-                    '-c:a', 'aac', '-b:a', '192k',
-                    '-movflags', '+faststart',
-                    '-y',
-                    mp4_path,
-                ]
-                result = subprocess.run(
-                    cmd_encode,
-                    capture_output=True,
-                    timeout=3600,  # 1h max pour le ré-encodage
-                )
-                if result.returncode != 0:
-                    stderr_msg = result.stderr.decode('utf-8', errors='replace')[-300:]
-                    raise Exception(f"Ré-encodage échoué: {stderr_msg}")
-
-            # Vérifier que le fichier MP4 est valide
-            if not os.path.exists(mp4_path) or os.path.getsize(mp4_path) == 0:
-                raise Exception("Le fichier MP4 généré est vide ou inexistant")
-
-            # Mettre à jour l'enregistrement
-            new_size_mb = os.path.getsize(mp4_path) / (1024 * 1024)
-            new_file_name = os.path.basename(mp4_path)
-            self.write({
-                'file_path': mp4_path,
-                'file_name': new_file_name,
-                'file_size': round(new_size_mb, 2),
-            })
-
-            # Supprimer l'ancien fichier
-            try:
-                if os.path.exists(source_path) and source_path != mp4_path:
-                    os.remove(source_path)
-            except Exception:
-                _logger.warning("Impossible de supprimer l'ancien fichier: %s", source_path)
-
-            self.message_post(body=_(
-                "🔄 <b>Converti automatiquement en MP4</b><br/>"
-                "Format original : <code>%s</code> → <code>.mp4</code><br/>"
-                "📦 Nouvelle taille : %.2f Mo",
-                ext, new_size_mb,
-            ))
-            self.env.cr.commit()
-            _logger.info("Conversion MP4 réussie : %s → %s", source_path, mp4_path)
-
-        except subprocess.TimeoutExpired:
-            _logger.error("Timeout lors de la conversion MP4 de %s", source_path)
-            if os.path.exists(mp4_path):
-                os.remove(mp4_path)
-            raise
-        except Exception as e:
-            _logger.error("Erreur conversion MP4 : %s", str(e))
-            if os.path.exists(mp4_path) and os.path.getsize(mp4_path) == 0:
-                os.remove(mp4_path)
-            raise
-
-    def action_convert_to_mp4(self):
-        """
-        Action manuelle pour convertir un fichier non compatible en MP4.
-        Utilisable depuis le formulaire pour les fichiers MKV, AVI, MOV, etc.
-        """
-        self.ensure_one()
-        if self.state != 'done':
-            raise UserError(_("Le téléchargement n'est pas terminé."))
-        if not self.file_path or not os.path.exists(self.file_path):
-            raise UserError(_("Le fichier n'existe pas sur le serveur."))
-
-        ext = os.path.splitext(self.file_path)[1].lower()
-        if ext == '.mp4':
-            raise UserError(_("Le fichier est déjà au format MP4."))
-
-        audio_extensions = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.aac', '.wma', '.opus'}
-        if ext in audio_extensions:
-            raise UserError(_("Ce fichier est un fichier audio, la conversion en MP4 n'est pas applicable."))
-
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur. La conversion est impossible."))
-
-        self._auto_remux_to_mp4(self.file_path)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Conversion réussie"),
-                'message': _("Le fichier a été converti en MP4 avec succès."),
-                'type': 'success',
-                'sticky': False,
-            },
-        }
-
-    def action_convert_to_mp4_batch(self):
-        """
-        Conversion groupée MP4 avec sémaphore pour limiter la concurrence.
-        Sélection multiple depuis la vue liste → menu Action.
-        Les conversions tournent en arrière-plan, contrôlées par un sémaphore
-        global pour ne pas saturer le CPU du serveur.
-        """
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur. La conversion est impossible."))
-
-        audio_extensions = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.aac', '.wma', '.opus'}
-        browser_compatible = {'.mp4', '.webm', '.ogg', '.ogv'}
-
-        # Filtrer les fichiers éligibles
-        eligible = self.env['youtube.download']
-        skipped = 0
-        for rec in self:
-            if rec.state != 'done' or not rec.file_path or not os.path.exists(rec.file_path):
-                skipped += 1
-                continue
-            ext = os.path.splitext(rec.file_path)[1].lower()
-            if ext in browser_compatible or ext in audio_extensions:
-                skipped += 1
-                continue
-            eligible |= rec
-
-        if not eligible:
-            raise UserError(_(
-                "Aucun fichier éligible à la conversion.\n"
-                "Seuls les fichiers vidéo non-MP4 terminés peuvent être convertis."
-            ))
-
-        # Récupérer la limite de concurrence depuis les paramètres
-        max_concurrent = int(self.env['ir.config_parameter'].sudo().get_param(
-            'youtube_downloader.max_concurrent_conversions', '2'
-        ))
-        max_concurrent = max(1, min(max_concurrent, 5))
-        semaphore = _get_conversion_semaphore(max_concurrent)
-
-        # Compteur partagé pour notification de fin de lot
-        batch_tracker = {
-            'total': len(eligible),
-            'done': 0,
-            'errors': 0,
-            'lock': threading.Lock(),
-            'uid': self.env.uid,
-            'dbname': self.env.cr.dbname,
-        }
-
-        # Lancer les conversions via un pool de workers (évite RuntimeError: can't start new thread)
-        work_items = [(self._convert_thread, (rec.id, semaphore, batch_tracker)) for rec in eligible]
-        _spawn_batch_coordinator(work_items, max_concurrent)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Conversion en cours"),
-                'message': _(
-                    "%d fichier(s) en cours de conversion en MP4 "
-                    "(max %d simultané(s)).%s",
-                    len(eligible), max_concurrent,
-                    _(' %d ignoré(s) (déjà MP4/audio/non prêt).', skipped) if skipped else '',
-                ),
-                'type': 'info',
-                'sticky': True,
-            },
-        }
-
-    @api.model
-    def _convert_thread(self, record_id, semaphore, batch_tracker=None):
-        """Thread de conversion MP4 contrôlé par sémaphore."""
-        success = False
+    def _media_content_hash(self, path):
         try:
-            semaphore.acquire()
-            _logger.info("Conversion MP4 démarrée (sémaphore acquis) pour youtube.download [%s]", record_id)
-            with self.pool.cursor() as new_cr:
-                new_env = self.env(cr=new_cr)
-                record = new_env['youtube.download'].browse(record_id)
-                if record.exists() and record.state == 'done' and record.file_path:
-                    ext = os.path.splitext(record.file_path)[1].lower()
-                    if ext != '.mp4' and os.path.exists(record.file_path):
-                        record._auto_remux_to_mp4(record.file_path)
-                        record.message_post(body=_(
-                            "✅ Conversion en MP4 terminée avec succès."
-                        ))
-                        new_cr.commit()
-                        success = True
-        except Exception as e:
-            _logger.error("Erreur conversion MP4 thread [%s]: %s", record_id, str(e))
-            try:
-                with self.pool.cursor() as err_cr:
-                    err_env = self.env(cr=err_cr)
-                    rec = err_env['youtube.download'].browse(record_id)
-                    if rec.exists():
-                        rec.message_post(body=_(
-                            "❌ Échec de la conversion MP4 : %s", str(e),
-                        ))
-                        err_cr.commit()
-            except Exception:
-                pass
-        finally:
-            semaphore.release()
-            _logger.info("Conversion MP4 terminée (sémaphore libéré) pour youtube.download [%s]", record_id)
-            # Notification de fin de lot
-            if batch_tracker:
-                self._notify_batch_progress(batch_tracker, success)
-
-    @api.model
-    def _notify_batch_progress(self, batch_tracker, success):
-        """Met à jour le compteur de lot et envoie une notification bus quand tout est fini."""
-        with batch_tracker['lock']:
-            if success:
-                batch_tracker['done'] += 1
-            else:
-                batch_tracker['errors'] += 1
-            done = batch_tracker['done']
-            errors = batch_tracker['errors']
-            total = batch_tracker['total']
-
-        if done + errors >= total:
-            try:
-                with self.pool.cursor() as bus_cr:
-                    bus_env = self.env(cr=bus_cr)
-                    channel = (batch_tracker['dbname'], 'res.partner', bus_env['res.users'].browse(batch_tracker['uid']).partner_id.id)
-                    message_body = _(
-                        "🎬 Conversion MP4 terminée : %d/%d réussi(s)",
-                        done, total,
-                    )
-                    if errors:
-                        message_body += _(" — %d erreur(s)", errors)
-                    bus_env['bus.bus']._sendone(channel, 'simple_notification', {
-                        'title': _("Conversion MP4 terminée"),
-                        'message': message_body,
-                        'type': 'success' if errors == 0 else 'warning',
-                        'sticky': True,
-                    })
-                    bus_cr.commit()
-                    _logger.info("Notification fin de lot MP4 envoyée : %d/%d réussi(s), %d erreur(s)", done, total, errors)
-            except Exception as e:
-                _logger.error("Erreur envoi notification fin de lot : %s", str(e))
-
-    # ─── Réparation audio (MP4 avec Opus/Vorbis → AAC) ─────────────────────
-
-    def _fix_audio_aac(self, file_path):
-        """
-        Ré-encode uniquement l'audio d'un fichier MP4 en AAC.
-        La vidéo est copiée sans ré-encodage (-c:v copy).
-        Corrige les MP4 muets (Opus/Vorbis incompatible navigateur).
-        """
-        if not file_path or not os.path.exists(file_path):
-            return
-        if not shutil.which('ffmpeg'):
-            _logger.warning("ffmpeg non disponible")
-            return
-
-        tmp_path = file_path + '.fixing.mp4'
-        cmd = [
-            'ffmpeg', '-i', file_path,
-            '-c:v', 'copy',
-            '-c:a', 'aac', '-b:a', '192k',
-            '-movflags', '+faststart',
-            '-y',
-            tmp_path,
-        ]
-        _logger.info("Réparation audio AAC pour : %s", file_path)
-        try:
-            result = subprocess.run(cmd, capture_output=True, timeout=600)
-            if result.returncode != 0:
-                # Fallback : ré-encodage complet
-                _logger.info("Copy vidéo échoué, ré-encodage complet pour : %s", file_path)
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-                cmd_full = [
-                    'ffmpeg', '-i', file_path,
-                    '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-                    '-c:a', 'aac', '-b:a', '192k',
-                    '-movflags', '+faststart',
-                    '-y',
-                    tmp_path,
-                ]
-                result = subprocess.run(cmd_full, capture_output=True, timeout=3600)
-                if result.returncode != 0:
-                    stderr_msg = result.stderr.decode('utf-8', errors='replace')[-300:]
-                    raise Exception(f"Ré-encodage échoué: {stderr_msg}")
-
-            if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
-                raise Exception("Le fichier réparé est vide ou inexistant")
-
-            # Remplacer l'original
-            os.replace(tmp_path, file_path)
-            new_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-            self.write({'file_size': round(new_size_mb, 2)})
-
-            self.message_post(body=_(
-                "🔊 <b>Audio réparé</b> : ré-encodé en AAC (%.2f Mo)", new_size_mb,
-            ))
-            _logger.info("Audio AAC réparé : %s", file_path)
-
-        except subprocess.TimeoutExpired:
-            _logger.error("Timeout réparation audio : %s", file_path)
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-            raise
-        except Exception as e:
-            _logger.error("Erreur réparation audio : %s", str(e))
-            if os.path.exists(tmp_path) and os.path.getsize(tmp_path) == 0:
-                os.remove(tmp_path)
-            raise
-
-    def action_fix_audio_batch(self):
-        """
-        Action batch pour réparer l'audio des MP4 muets.
-        Sélection multiple → menu Action → 🔊 Réparer l'audio.
-        Force le ré-encodage audio en AAC sur les fichiers MP4 existants.
-        """
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur."))
-
-        audio_extensions = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.aac', '.wma', '.opus'}
-
-        eligible = self.env['youtube.download']
-        skipped = 0
-        for rec in self:
-            if rec.state != 'done' or not rec.file_path or not os.path.exists(rec.file_path):
-                skipped += 1
-                continue
-            ext = os.path.splitext(rec.file_path)[1].lower()
-            if ext in audio_extensions:
-                skipped += 1
-                continue
-            eligible |= rec
-
-        if not eligible:
-            raise UserError(_("Aucun fichier vidéo éligible à la réparation audio."))
-
-        max_concurrent = int(self.env['ir.config_parameter'].sudo().get_param(
-            'youtube_downloader.max_concurrent_conversions', '2'
-        ))
-        max_concurrent = max(1, min(max_concurrent, 5))
-        semaphore = _get_conversion_semaphore(max_concurrent)
-
-        batch_tracker = {
-            'total': len(eligible),
-            'done': 0,
-            'errors': 0,
-            'lock': threading.Lock(),
-            'uid': self.env.uid,
-            'dbname': self.env.cr.dbname,
-        }
-
-        # Lancer via pool de workers (évite RuntimeError: can't start new thread)
-        work_items = [(self._fix_audio_thread, (rec.id, semaphore, batch_tracker)) for rec in eligible]
-        _spawn_batch_coordinator(work_items, max_concurrent)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Réparation audio en cours"),
-                'message': _(
-                    "%d fichier(s) en cours de réparation audio AAC "
-                    "(max %d simultané(s)).%s",
-                    len(eligible), max_concurrent,
-                    _(' %d ignoré(s).', skipped) if skipped else '',
-                ),
-                'type': 'info',
-                'sticky': True,
-            },
-        }
+            return file_sha256(path)
+        except OSError as e:
+            _logger.warning("Empreinte impossible pour %s : %s", path, str(e))
+            return None
 
-    @api.model
-    def _fix_audio_thread(self, record_id, semaphore, batch_tracker=None):
-        """Thread de réparation audio contrôlé par sémaphore."""
-        success = False
-        try:
-            semaphore.acquire()
-            _logger.info("Réparation audio démarrée pour youtube.download [%s]", record_id)
-            with self.pool.cursor() as new_cr:
-                new_env = self.env(cr=new_cr)
-                record = new_env['youtube.download'].browse(record_id)
-                if record.exists() and record.state == 'done' and record.file_path:
-                    if os.path.exists(record.file_path):
-                        record._fix_audio_aac(record.file_path)
-                        new_cr.commit()
-                        success = True
-        except Exception as e:
-            _logger.error("Erreur réparation audio thread [%s]: %s", record_id, str(e))
-            try:
-                with self.pool.cursor() as err_cr:
-                    err_env = self.env(cr=err_cr)
-                    rec = err_env['youtube.download'].browse(record_id)
-                    if rec.exists():
-                        rec.message_post(body=_(
-                            "❌ Échec réparation audio : %s", str(e),
-                        ))
-                        err_cr.commit()
-            except Exception:
-                pass
-        finally:
-            semaphore.release()
-            if batch_tracker:
-                self._notify_batch_progress(batch_tracker, success)
+    def _record_mp4_conversion(self, source_path, mp4_path, plan=None, content_hash=None):
+        # Le blob du fichier partagé suit la conversion
+        self.env['youtube.download.blob'].sudo().search([('file_path', '=', source_path)]).write({
+            'file_path': mp4_path,
+            'file_size': round(os.path.getsize(mp4_path) / (1024 * 1024), 2),
+            'content_hash': content_hash or False,
+        })
+        super()._record_mp4_conversion(source_path, mp4_path, plan, content_hash)
 
     def action_delete_file(self):
         """Supprime le fichier physique du disque."""
@@ -1658,16 +2255,8 @@ class YoutubeDownload(models.Model):
             raise UserError(_("Aucun fichier à supprimer."))
         if os.path.exists(self.file_path):
             try:
-                os.remove(self.file_path)
-                self.message_post(body=_(
-                    "🗑️ Fichier physique supprimé : %s", self.file_path,
-                ))
-                self.write({
-                    'file_path': False,
-                    'file_name': False,
-                    'file_size': 0.0,
-                    'state': 'cancelled',
-                })
+                # Fichier partagé : supprimé seulement à la dernière référence
+                self._release_file()
             except Exception as e:
                 raise UserError(_(
                     "Impossible de supprimer le fichier : %s", str(e),
@@ -1792,42 +2381,41 @@ class YoutubeDownload(models.Model):
     # ─── Actions groupées (server actions) ──────────────────────────────────
 
     def action_fetch_info_batch(self):
-        """Récupère les informations pour plusieurs enregistrements sélectionnés."""
+        """
+        Récupère en arrière-plan les informations des enregistrements
+        sélectionnés (un job de file : extractions parallèles, progression
+        sur le bus).
+        """
         records = self.filtered(lambda r: r.state == 'draft' and r.url)
         if not records:
             raise UserError(_(
                 "Aucun enregistrement en état Brouillon avec une URL sélectionné."
             ))
-        success = 0
-        errors_list = []
-        for rec in records:
-            try:
-                rec.action_fetch_info()
-                success += 1
-            except Exception as e:
-                errors_list.append(f"{rec.name or rec.url}: {str(e)}")
-        msg = _("%d information(s) récupérée(s).", success)
-        if errors_list:
-            msg += "\n" + _("%d erreur(s).", len(errors_list))
+        records._enqueue_fetch_info()
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
                 'title': _('Récupération des informations'),
-                'message': msg,
-                'type': 'success' if not errors_list else 'warning',
-                'sticky': bool(errors_list),
+                'message': _(
+                    "Récupération lancée en arrière-plan pour %d enregistrement(s).",
+                    len(records),
+                ),
+                'type': 'info',
+                'sticky': False,
             },
         }
 
     def action_cancel_batch(self):
         """Annule plusieurs téléchargements sélectionnés."""
-        records = self.filtered(lambda r: r.state in ('draft', 'pending', 'error'))
+        records = self.filtered(
+            lambda r: r.state in ('draft', 'pending', 'downloading', 'paused', 'error')
+        )
         if not records:
             raise UserError(_(
                 "Aucun enregistrement annulable sélectionné.\n"
-                "Seuls les enregistrements en Brouillon, En attente ou Erreur "
-                "peuvent être annulés."
+                "Seuls les enregistrements en Brouillon, En attente, En cours, "
+                "En pause ou Erreur peuvent être annulés."
             ))
         records.action_cancel()
         return {
@@ -1893,16 +2481,7 @@ class YoutubeDownload(models.Model):
         for rec in records:
             if rec.file_path and os.path.exists(rec.file_path):
                 try:
-                    os.remove(rec.file_path)
-                    rec.message_post(body=_(
-                        "🗑️ Fichier supprimé : %s", rec.file_path,
-                    ))
-                    rec.write({
-                        'file_path': False,
-                        'file_name': False,
-                        'file_size': 0.0,
-                        'state': 'cancelled',
-                    })
+                    rec._release_file()
                     deleted += 1
                 except Exception as e:
                     errors_list.append(f"{rec.file_name}: {str(e)}")
@@ -2017,58 +2596,158 @@ class YoutubeDownload(models.Model):
         }
 
     # ─── Statistiques pour le dashboard ───────────────────────────────────────
+    @api.model
+    def _format_size_mb(self, size_mb):
+        if size_mb >= 1024:
+            return f"{size_mb / 1024:.2f} Go"
+        return f"{size_mb:.2f} Mo"
+
+    @api.model
+    def _format_duration_sec(self, duration_sec):
+        hours = duration_sec // 3600
+        minutes = (duration_sec % 3600) // 60
+        if hours > 0:
+            return f"{hours}h {minutes:02d}min"
+        return f"{minutes}min"
+
+    @api.model
+    def _dashboard_cache_key(self):
+        return (self.env.uid, tuple(self.env.companies.ids))
+
     @api.model
     def get_dashboard_data(self):
-        """Retourne les données enrichies pour le tableau de bord professionnel."""
-        from datetime import timedelta
-        from collections import defaultdict
-
-        downloads = self.search([])
-        total = len(downloads)
-        done = downloads.filtered(lambda r: r.state == 'done')
-        errors = downloads.filtered(lambda r: r.state == 'error')
-        in_progress = downloads.filtered(
-            lambda r: r.state in ('pending', 'downloading')
-        )
-        pending = downloads.filtered(lambda r: r.state == 'pending')
-        downloading = downloads.filtered(lambda r: r.state == 'downloading')
-        drafts = downloads.filtered(lambda r: r.state == 'draft')
-        cancelled = downloads.filtered(lambda r: r.state == 'cancelled')
+        """
+        Retourne les données enrichies pour le tableau de bord professionnel.
 
-        total_size_mb = sum(done.mapped('file_size'))
+        Les agrégats (une requête SQL groupée par source, règles d'accès
+        appliquées) sont mis en cache par utilisateur et invalidés dès qu'un
+        état, une taille ou une date de téléchargement change ; seuls les
+        téléchargements actifs et les canaux Telegram récents sont relus à
+        chaque appel.
+        """
+        self.env.flush_all()
+        dbname = self.env.cr.dbname
+        key = self._dashboard_cache_key()
+        generation = dashboard_cache.generation(self.env.cr)
+        data = dashboard_cache.get(dbname, key, generation)
+        if data is None:
+            data = self._compute_dashboard_aggregates()
+            # Données non validées de cette transaction : pas de mise en cache
+            if not dashboard_cache.has_pending_invalidation(self.env.cr):
+                dashboard_cache.set(dbname, key, generation, data)
+
+        data = dict(data, telegram=dict(data['telegram']))
+        data['active_downloads'] = self._get_dashboard_active_downloads()
+        data['telegram'].update(self._get_dashboard_telegram_channels())
+        return data
 
-        if total_size_mb >= 1024:
-            total_size_display = f"{total_size_mb / 1024:.2f} Go"
-        else:
-            total_size_display = f"{total_size_mb:.2f} Mo"
+    @api.model
+    def _get_dashboard_active_downloads(self):
+        """Téléchargements actifs détaillés, avec la progression en mémoire."""
+        active = self.search(
+            [('state', 'in', ('pending', 'downloading'))],
+            order='state, id', limit=ACTIVE_DOWNLOADS_LIMIT,
+        )
+        live = active._get_live_progress()
+        quality_sel = dict(self._fields['quality'].selection)
+        return [{
+            'id': rec.id,
+            'name': rec.name or rec.video_title or rec.reference,
+            'state': rec.state,
+            'progress': live[rec.id]['progress'],
+            'quality': quality_sel.get(rec.quality, rec.quality),
+            'thumbnail': rec.video_thumbnail_url or '',
+        } for rec in active]
 
-        # Par qualité
-        quality_stats = {}
-        for rec in done:
-            key = dict(rec._fields['quality'].selection).get(rec.quality, rec.quality)
-            quality_stats[key] = quality_stats.get(key, 0) + 1
+    @api.model
+    def _get_dashboard_telegram_channels(self):
+        """Nombre de canaux Telegram et derniers canaux scannés."""
+        TelegramChannel = self.env['telegram.channel']
+        recent_channels = TelegramChannel.search(
+            [('state', '=', 'scanned')],
+            order='last_scan_date desc',
+            limit=5,
+        )
+        return {
+            'channels': TelegramChannel.search_count([]),
+            'recent_channels': [{
+                'id': ch.id,
+                'name': ch.channel_title or ch.name,
+                'video_count': ch.video_count,
+                'downloaded': ch.video_downloaded_count,
+                'subscribers': ch.subscriber_count,
+            } for ch in recent_channels],
+        }
 
-        # Par format
-        format_stats = {}
-        for rec in done:
-            key = dict(rec._fields['output_format'].selection).get(
-                rec.output_format, rec.output_format
-            )
-            format_stats[key] = format_stats.get(key, 0) + 1
+    @api.model
+    def _compute_dashboard_aggregates(self):
+        """Agrégats du tableau de bord (hors téléchargements actifs)."""
+        from datetime import timedelta
 
-        # Récents (7 jours)
+        cr = self.env.cr
         now = fields.Datetime.now()
         week_ago = now - timedelta(days=7)
         two_weeks_ago = now - timedelta(days=14)
-        recent = self.search_count([
-            ('download_date', '>=', week_ago),
-            ('state', '=', 'done'),
-        ])
-        previous_week = self.search_count([
-            ('download_date', '>=', two_weeks_ago),
-            ('download_date', '<', week_ago),
-            ('state', '=', 'done'),
-        ])
+        from_clause, where_clause, where_params = rule_filtered_sql(self)
+
+        # ── Une requête groupée pour tous les compteurs YouTube ──
+        cr.execute(f"""
+            SELECT state, quality, output_format,
+                   count(*),
+                   COALESCE(sum(file_size), 0)::float8,
+                   COALESCE(sum(video_duration), 0),
+                   count(*) FILTER (WHERE download_date >= %s),
+                   count(*) FILTER (WHERE download_date >= %s AND download_date < %s),
+                   COALESCE(sum(file_size / download_duration)
+                            FILTER (WHERE download_duration > 0 AND file_size > 0), 0)::float8,
+                   count(*) FILTER (WHERE download_duration > 0 AND file_size > 0),
+                   count(*) FILTER (WHERE is_playlist AND parent_playlist_id IS NULL),
+                   count(*) FILTER (WHERE conversion_avoided)
+              FROM {from_clause}
+             WHERE {where_clause}
+          GROUP BY state, quality, output_format
+        """, [week_ago, two_weeks_ago, week_ago] + where_params)
+        rows = cr.fetchall()
+
+        quality_sel = dict(self._fields['quality'].selection)
+        format_sel = dict(self._fields['output_format'].selection)
+        state_counts = {}
+        done_by_quality = {}
+        format_stats = {}
+        total_size_mb = 0.0
+        total_duration_sec = 0
+        recent = previous_week = playlist_count = conversions_avoided = 0
+        speed_sum = 0.0
+        speed_count = 0
+        for (state, quality, output_format, count, size, duration, recent_cnt,
+             previous_cnt, speeds, speeds_cnt, playlists, avoided) in rows:
+            state_counts[state] = state_counts.get(state, 0) + count
+            if state != 'done':
+                continue
+            done_by_quality[quality] = done_by_quality.get(quality, 0) + count
+            format_key = format_sel.get(output_format, output_format)
+            format_stats[format_key] = format_stats.get(format_key, 0) + count
+            total_size_mb += size
+            total_duration_sec += duration
+            recent += recent_cnt
+            previous_week += previous_cnt
+            speed_sum += speeds
+            speed_count += speeds_cnt
+            playlist_count += playlists
+            conversions_avoided += avoided
+
+        total = sum(state_counts.values())
+        done_count = state_counts.get('done', 0)
+        errors_count = state_counts.get('error', 0)
+        pending_count = state_counts.get('pending', 0)
+        downloading_count = state_counts.get('downloading', 0)
+        in_progress_count = pending_count + downloading_count
+
+        # Par qualité
+        quality_stats = {}
+        for quality, count in done_by_quality.items():
+            label = quality_sel.get(quality, quality)
+            quality_stats[label] = quality_stats.get(label, 0) + count
 
         # Tendance hebdomadaire (pourcentage)
         if previous_week > 0:
@@ -2079,69 +2758,42 @@ class YoutubeDownload(models.Model):
             weekly_trend = 0.0
 
         # Top auteurs
-        author_stats = {}
-        for rec in done:
-            if rec.video_author:
-                author_stats[rec.video_author] = author_stats.get(
-                    rec.video_author, 0
-                ) + 1
-        top_authors = sorted(
-            author_stats.items(), key=lambda x: x[1], reverse=True
-        )[:5]
-
-        # ── Données avancées pour dashboard intelligent ──
+        cr.execute(f"""
+            SELECT video_author, count(*)
+              FROM {from_clause}
+             WHERE {where_clause}
+               AND state = 'done' AND COALESCE(video_author, '') != ''
+          GROUP BY video_author
+          ORDER BY count(*) DESC, video_author
+             LIMIT 5
+        """, where_params)
+        top_authors = cr.fetchall()
 
         # Graphique des 14 derniers jours (téléchargements par jour)
+        first_day = (now - timedelta(days=13)).date()
+        cr.execute(f"""
+            SELECT download_date::date, count(*)
+              FROM {from_clause}
+             WHERE {where_clause}
+               AND state = 'done' AND download_date >= %s
+          GROUP BY download_date::date
+        """, where_params + [datetime.combine(first_day, datetime.min.time())])
+        per_day = dict(cr.fetchall())
         daily_chart = []
-        for i in range(13, -1, -1):
-            day = (now - timedelta(days=i)).date()
-            day_start = fields.Datetime.to_string(
-                datetime.combine(day, datetime.min.time())
-            )
-            day_end = fields.Datetime.to_string(
-                datetime.combine(day, datetime.max.time())
-            )
-            count = self.search_count([
-                ('download_date', '>=', day_start),
-                ('download_date', '<=', day_end),
-                ('state', '=', 'done'),
-            ])
+        for i in range(14):
+            day = first_day + timedelta(days=i)
             daily_chart.append({
                 'date': day.strftime('%d/%m'),
-                'count': count,
+                'count': per_day.get(day, 0),
             })
 
-        # Durée totale de contenu téléchargé
-        total_duration_sec = sum(done.mapped('video_duration'))
-        total_hours = total_duration_sec // 3600
-        total_minutes = (total_duration_sec % 3600) // 60
-        if total_hours > 0:
-            total_duration_display = f"{total_hours}h {total_minutes:02d}min"
-        else:
-            total_duration_display = f"{total_minutes}min"
-
         # Vitesse moyenne de téléchargement
-        speeds = [r.file_size / r.download_duration
-                  for r in done
-                  if r.download_duration and r.download_duration > 0 and r.file_size > 0]
-        if speeds:
-            avg_speed = sum(speeds) / len(speeds)
+        if speed_count:
+            avg_speed = speed_sum / speed_count
             avg_speed_display = f"{avg_speed:.1f} Mo/s" if avg_speed >= 1 else f"{avg_speed * 1024:.0f} Ko/s"
         else:
             avg_speed_display = '—'
 
-        # Téléchargements actifs détaillés
-        active_downloads = []
-        for rec in in_progress:
-            active_downloads.append({
-                'id': rec.id,
-                'name': rec.name or rec.video_title or rec.reference,
-                'state': rec.state,
-                'progress': rec.progress,
-                'quality': dict(rec._fields['quality'].selection).get(rec.quality, rec.quality),
-                'thumbnail': rec.video_thumbnail_url or '',
-            })
-
         # Derniers téléchargements terminés (5 derniers)
         recent_done = self.search([
             ('state', '=', 'done'),
@@ -2156,7 +2808,7 @@ class YoutubeDownload(models.Model):
                 'duration': rec.video_duration_display,
                 'date': rec.download_date.strftime('%d/%m %H:%M') if rec.download_date else '—',
                 'thumbnail': rec.video_thumbnail_url or '',
-                'quality': dict(rec._fields['quality'].selection).get(rec.quality, ''),
+                'quality': quality_sel.get(rec.quality, ''),
             })
 
         # Erreurs récentes (5 dernières)
@@ -2174,163 +2826,128 @@ class YoutubeDownload(models.Model):
                 'date': rec.last_error_date.strftime('%d/%m %H:%M') if rec.last_error_date else '—',
             })
 
-        # Répartition audio vs vidéo
-        audio_count = len(done.filtered(lambda r: r.quality in ('audio_only', 'audio_wav')))
-        video_count = len(done) - audio_count
+        # Historique des 12 derniers mois (statistiques pré-agrégées)
+        monthly_chart = self.env['youtube.download.stats.daily']._get_monthly_history()
 
-        # Playlists stats
-        playlists = done.filtered(lambda r: r.is_playlist and not r.parent_playlist_id)
-        playlist_count = len(playlists)
+        # Répartition audio vs vidéo
+        audio_count = done_by_quality.get('audio_only', 0) + done_by_quality.get('audio_wav', 0)
+        video_count = done_count - audio_count
 
-        # Max simultaneous quality breakdown for chart
+        # Répartition par qualité pour le graphique
         quality_chart = []
-        quality_sel = dict(self._fields['quality'].selection)
         for key, label in quality_sel.items():
-            cnt = len(done.filtered(lambda r, k=key: r.quality == k))
+            cnt = done_by_quality.get(key, 0)
             if cnt > 0:
                 quality_chart.append({'label': label, 'count': cnt, 'key': key})
         quality_chart.sort(key=lambda x: x['count'], reverse=True)
 
-        # ── Statistiques Telegram ──
-        TelegramChannel = self.env['telegram.channel']
+        # ── Statistiques Telegram (une requête groupée) ──
         TelegramVideo = self.env['telegram.channel.video']
-        tg_channels = TelegramChannel.search([])
-        tg_videos = TelegramVideo.search([])
-        tg_done = tg_videos.filtered(lambda v: v.state == 'done')
-        tg_downloading = tg_videos.filtered(lambda v: v.state == 'downloading')
-        tg_errors = tg_videos.filtered(lambda v: v.state == 'error')
-        tg_pending = tg_videos.filtered(lambda v: v.state == 'draft')
-        tg_total_size_mb = sum(tg_done.mapped('file_size'))
-        if tg_total_size_mb >= 1024:
-            tg_size_display = f"{tg_total_size_mb / 1024:.2f} Go"
-        else:
-            tg_size_display = f"{tg_total_size_mb:.2f} Mo"
-
-        tg_total_duration_sec = sum(tg_done.mapped('video_duration'))
-        tg_hours = tg_total_duration_sec // 3600
-        tg_minutes = (tg_total_duration_sec % 3600) // 60
-        if tg_hours > 0:
-            tg_duration_display = f"{tg_hours}h {tg_minutes:02d}min"
-        else:
-            tg_duration_display = f"{tg_minutes}min"
-
-        # Canaux récents (5 derniers scannés)
-        recent_channels = TelegramChannel.search(
-            [('state', '=', 'scanned')],
-            order='last_scan_date desc',
-            limit=5,
-        )
-        tg_recent_channels = []
-        for ch in recent_channels:
-            tg_recent_channels.append({
-                'id': ch.id,
-                'name': ch.channel_title or ch.name,
-                'video_count': ch.video_count,
-                'downloaded': ch.video_downloaded_count,
-                'subscribers': ch.subscriber_count,
-            })
-
-        # ── Statistiques Médias externes ──
+        tg_from, tg_where, tg_params = rule_filtered_sql(TelegramVideo)
+        cr.execute(f"""
+            SELECT state, count(*),
+                   COALESCE(sum(file_size), 0)::float8,
+                   COALESCE(sum(video_duration), 0)
+              FROM {tg_from}
+             WHERE {tg_where}
+          GROUP BY state
+        """, tg_params)
+        tg_stats = {state: (count, size, duration) for state, count, size, duration in cr.fetchall()}
+        tg_done, tg_total_size_mb, tg_total_duration_sec = tg_stats.get('done', (0, 0.0, 0))
+        tg_downloading = tg_stats.get('downloading', (0,))[0]
+        tg_errors = tg_stats.get('error', (0,))[0]
+
+        # ── Statistiques Médias externes (une requête groupée) ──
         ExternalMedia = self.env['youtube.external.media']
-        ext_all = ExternalMedia.search([])
-        ext_done = ext_all.filtered(lambda m: m.state == 'done')
-        ext_videos = ext_done.filtered(lambda m: m.media_type == 'video')
-        ext_audios = ext_done.filtered(lambda m: m.media_type == 'audio')
-        ext_total_size_mb = sum(ext_done.mapped('file_size'))
-        if ext_total_size_mb >= 1024:
-            ext_size_display = f"{ext_total_size_mb / 1024:.2f} Go"
-        else:
-            ext_size_display = f"{ext_total_size_mb:.2f} Mo"
-
-        ext_total_duration_sec = sum(ext_done.mapped('video_duration'))
-        ext_hours = ext_total_duration_sec // 3600
-        ext_minutes = (ext_total_duration_sec % 3600) // 60
-        if ext_hours > 0:
-            ext_duration_display = f"{ext_hours}h {ext_minutes:02d}min"
-        else:
-            ext_duration_display = f"{ext_minutes}min"
+        ext_from, ext_where, ext_params = rule_filtered_sql(ExternalMedia)
+        cr.execute(f"""
+            SELECT state, media_type, count(*),
+                   COALESCE(sum(file_size), 0)::float8,
+                   COALESCE(sum(video_duration), 0)
+              FROM {ext_from}
+             WHERE {ext_where}
+          GROUP BY state, media_type
+        """, ext_params)
+        ext_total = ext_done = ext_videos = ext_audios = 0
+        ext_total_size_mb = 0.0
+        ext_total_duration_sec = 0
+        for state, media_type, count, size, duration in cr.fetchall():
+            ext_total += count
+            if state != 'done':
+                continue
+            ext_done += count
+            ext_total_size_mb += size
+            ext_total_duration_sec += duration
+            if media_type == 'video':
+                ext_videos += count
+            elif media_type == 'audio':
+                ext_audios += count
 
         # ── Statistiques globales (toutes sources) ──
         global_total_size = total_size_mb + tg_total_size_mb + ext_total_size_mb
-        if global_total_size >= 1024:
-            global_size_display = f"{global_total_size / 1024:.2f} Go"
-        else:
-            global_size_display = f"{global_total_size:.2f} Mo"
-
         global_total_duration = total_duration_sec + tg_total_duration_sec + ext_total_duration_sec
-        g_hours = global_total_duration // 3600
-        g_minutes = (global_total_duration % 3600) // 60
-        if g_hours > 0:
-            global_duration_display = f"{g_hours}h {g_minutes:02d}min"
-        else:
-            global_duration_display = f"{g_minutes}min"
-
-        global_total_downloads = len(done) + len(tg_done) + len(ext_done)
-        global_in_progress = len(in_progress) + len(tg_downloading)
-        global_errors_count = len(errors) + len(tg_errors)
 
         return {
             'total': total,
-            'done': len(done),
-            'errors': len(errors),
-            'in_progress': len(in_progress),
-            'pending': len(pending),
-            'downloading': len(downloading),
-            'drafts': len(drafts),
-            'cancelled': len(cancelled),
-            'total_size': total_size_display,
+            'done': done_count,
+            'errors': errors_count,
+            'in_progress': in_progress_count,
+            'pending': pending_count,
+            'downloading': downloading_count,
+            'drafts': state_counts.get('draft', 0),
+            'cancelled': state_counts.get('cancelled', 0),
+            'total_size': self._format_size_mb(total_size_mb),
             'total_size_mb': total_size_mb,
-            'success_rate': round(len(done) / total * 100, 1) if total else 0,
+            'success_rate': round(done_count / total * 100, 1) if total else 0,
             'quality_stats': quality_stats,
             'format_stats': format_stats,
             'recent_count': recent,
             'previous_week_count': previous_week,
             'weekly_trend': weekly_trend,
             'top_authors': top_authors,
-            'avg_size': round(total_size_mb / len(done), 2) if done else 0,
+            'avg_size': round(total_size_mb / done_count, 2) if done_count else 0,
             # Nouvelles données avancées
             'daily_chart': daily_chart,
-            'total_duration': total_duration_display,
+            'monthly_chart': monthly_chart,
+            'total_duration': self._format_duration_sec(total_duration_sec),
             'total_duration_sec': total_duration_sec,
             'avg_speed': avg_speed_display,
-            'active_downloads': active_downloads,
             'recent_completed': recent_completed,
             'error_list': error_list,
             'audio_count': audio_count,
             'video_count': video_count,
             'playlist_count': playlist_count,
+            'conversions_avoided': conversions_avoided,
             'quality_chart': quality_chart,
             # ── Telegram ──
             'telegram': {
-                'channels': len(tg_channels),
-                'total_videos': len(tg_videos),
-                'done': len(tg_done),
-                'downloading': len(tg_downloading),
-                'errors': len(tg_errors),
-                'pending': len(tg_pending),
-                'total_size': tg_size_display,
+                'total_videos': sum(stat[0] for stat in tg_stats.values()),
+                'done': tg_done,
+                'downloading': tg_downloading,
+                'errors': tg_errors,
+                'pending': tg_stats.get('draft', (0,))[0],
+                'total_size': self._format_size_mb(tg_total_size_mb),
                 'total_size_mb': tg_total_size_mb,
-                'total_duration': tg_duration_display,
-                'recent_channels': tg_recent_channels,
+                'total_duration': self._format_duration_sec(tg_total_duration_sec),
             },
             # ── Médias externes ──
             'external_media': {
-                'total': len(ext_all),
-                'done': len(ext_done),
-                'videos': len(ext_videos),
-                'audios': len(ext_audios),
-                'total_size': ext_size_display,
+                'total': ext_total,
+                'done': ext_done,
+                'videos': ext_videos,
+                'audios': ext_audios,
+                'total_size': self._format_size_mb(ext_total_size_mb),
                 'total_size_mb': ext_total_size_mb,
-                'total_duration': ext_duration_display,
+                'total_duration': self._format_duration_sec(ext_total_duration_sec),
             },
             # ── Global (toutes sources) ──
             'global': {
-                'total_downloads': global_total_downloads,
-                'total_size': global_size_display,
+                'total_downloads': done_count + tg_done + ext_done,
+                'total_size': self._format_size_mb(global_total_size),
                 'total_size_mb': global_total_size,
-                'total_duration': global_duration_display,
-                'in_progress': global_in_progress,
-                'errors': global_errors_count,
+                'total_duration': self._format_duration_sec(global_total_duration),
+                'in_progress': in_progress_count + tg_downloading,
+                'errors': errors_count + tg_errors,
             },
         }
 
@@ -2342,6 +2959,10 @@ class YoutubeDownload(models.Model):
                     "Impossible de supprimer un téléchargement en cours.\n"
                     "Annulez-le d'abord."
                 ))
+        self.env['youtube.download.stats.daily']._mark_days_dirty(
+            'youtube', self.mapped('download_date'))
+        dashboard_cache.invalidate(self.env)
+        self._remove_work_dir()
         return super().unlink()
 
 
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Limitation de bande passante des téléchargements (seaux à jetons partagés).
+
+Le hook de progression yt-dlp, appelé à chaque bloc reçu, consomme les
+octets du bloc dans les seaux qui s'appliquent au téléchargement : global,
+utilisateur et priorité. Quand un seau est à découvert, le thread de
+téléchargement dort le temps de le renflouer : tous les téléchargements
+concurrents d'un processus partagent ainsi les mêmes seaux, contrairement à
+l'option ``ratelimit`` de yt-dlp, fixée par téléchargement.
+
+Sur plusieurs processus / nœuds, chaque plafond est réparti au prorata des
+téléchargements en cours localement par rapport à l'ensemble de la base.
+Plafonds et répartition sont relus toutes les LIMITS_REFRESH_INTERVAL
+secondes (voir youtube.download._get_bandwidth_limits) : un changement de
+paramètre ou de plage horaire s'applique en cours de téléchargement.
+"""
+import logging
+import threading
+import time
+
+from odoo import api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+# Rafale autorisée : capacité d'un seau en secondes de débit
+BURST_SECONDS = 2.0
+# Relecture des plafonds et de la répartition entre processus
+LIMITS_REFRESH_INTERVAL = 5.0  # secondes
+# Pause maximale d'un appel (le découvert restant est rattrapé au bloc suivant)
+MAX_SLEEP = 5.0  # secondes
+
+
+class TokenBucket:
+    """Seau à jetons (octets) ; le solde peut devenir négatif (découvert)."""
+
+    def __init__(self, rate, now):
+        self.rate = rate
+        self.capacity = rate * BURST_SECONDS
+        self.tokens = self.capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate, now):
+        self._refill(now)
+        self.rate = rate
+        self.capacity = rate * BURST_SECONDS
+        self.tokens = min(self.tokens, self.capacity)
+
+    def reserve(self, nbytes, now):
+        """Prélève `nbytes` ; retourne l'attente (s) nécessaire pour combler le découvert."""
+        self._refill(now)
+        self.tokens -= nbytes
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class BandwidthShaper:
+    """Seaux à jetons partagés par les téléchargements de ce processus, par base."""
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._downloads = {}  # {dbname: {record_id: (user_id, priority)}}
+        self._buckets = {}    # {(dbname, scope): TokenBucket}
+        self._limits = {}     # {dbname: (instant de relecture, plafonds)}
+
+    def register(self, dbname, record_id, user_id, priority):
+        with self._lock:
+            self._downloads.setdefault(dbname, {})[record_id] = (user_id, priority)
+
+    def unregister(self, dbname, record_id):
+        with self._lock:
+            self._downloads.get(dbname, {}).pop(record_id, None)
+
+    def set_limits(self, dbname, limits):
+        """Impose les plafonds de la base (valables jusqu'à la prochaine relecture)."""
+        with self._lock:
+            self._limits[dbname] = (self._clock() + LIMITS_REFRESH_INTERVAL, limits)
+
+    def _get_limits(self, dbname):
+        with self._lock:
+            cached = self._limits.get(dbname)
+        if cached and cached[0] > self._clock():
+            return cached[1]
+        try:
+            limits = self._load_limits(dbname)
+        except Exception as e:
+            _logger.warning("Lecture des plafonds de bande passante échouée : %s", str(e))
+            limits = cached[1] if cached else {}
+        self.set_limits(dbname, limits)
+        return limits
+
+    def _load_limits(self, dbname):
+        with Registry(dbname).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            return env['youtube.download']._get_bandwidth_limits()
+
+    def _local_rates(self, dbname, record_id, limits):
+        """{portée: débit local (o/s)} des seaux applicables au téléchargement."""
+        downloads = self._downloads.get(dbname, {})
+        if record_id not in downloads:
+            return {}
+        user_id, priority = downloads[record_id]
+        cluster = limits.get('cluster', {})
+        scopes = [
+            ('global', limits.get('global'), len(downloads), cluster.get('total', 0)),
+            (f'user:{user_id}', limits.get('user'),
+             sum(1 for u, _p in downloads.values() if u == user_id),
+             cluster.get('users', {}).get(user_id, 0)),
+            (f'priority:{priority}', limits.get('priorities', {}).get(priority),
+             sum(1 for _u, p in downloads.values() if p == priority),
+             cluster.get('priorities', {}).get(priority, 0)),
+        ]
+        return {
+            scope: cap * local / max(local, total)
+            for scope, cap, local, total in scopes if cap
+        }
+
+    def consume(self, dbname, record_id, nbytes):
+        """Prélève `nbytes` reçus par `record_id` et dort si un plafond est dépassé."""
+        if nbytes <= 0:
+            return 0.0
+        limits = self._get_limits(dbname)
+        wait = 0.0
+        with self._lock:
+            now = self._clock()
+            for scope, rate in self._local_rates(dbname, record_id, limits).items():
+                bucket = self._buckets.get((dbname, scope))
+                if bucket is None:
+                    bucket = self._buckets[(dbname, scope)] = TokenBucket(rate, now)
+                elif bucket.rate != rate:
+                    bucket.set_rate(rate, now)
+                wait = max(wait, bucket.reserve(nbytes, now))
+        if wait > 0:
+            wait = min(wait, MAX_SLEEP)
+            self._sleep(wait)
+        return wait
+
+
+bandwidth_shaper = BandwidthShaper()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Index de déduplication des fichiers téléchargés.
+
+Une entrée par clé (ID vidéo, qualité, format, sous-titres incrustés) : le
+premier téléchargement de la clé en devient propriétaire et la télécharge ;
+les demandes suivantes réutilisent le fichier (référence partagée) ou, si
+le téléchargement est en cours, attendent sa fin au lieu d'en lancer un
+second. L'empreinte SHA-256 du contenu rapproche en outre deux clés qui
+produisent le même fichier (ex. « meilleure qualité » et « 1080p »).
+
+Le fichier n'est supprimé du disque que lorsque le dernier enregistrement
+qui le référence le libère (voir youtube.download._release_file).
+"""
+import hashlib
+import logging
+import os
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 Mo
+
+
+def file_sha256(path):
+    """Empreinte SHA-256 d'un fichier, lu par blocs (sans curseur ouvert)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class YoutubeDownloadBlob(models.Model):
+    _name = 'youtube.download.blob'
+    _description = "Fichier téléchargé partagé (déduplication)"
+    _order = 'id desc'
+
+    key = fields.Char(string='Clé', required=True, readonly=True)
+    video_id = fields.Char(string='ID Vidéo', readonly=True, index=True)
+    quality = fields.Char(string='Qualité', readonly=True)
+    output_format = fields.Char(string='Format', readonly=True)
+    state = fields.Selection([
+        ('downloading', 'Téléchargement en cours'),
+        ('done', 'Disponible'),
+        ('error', 'Échec'),
+    ], string='État', required=True, default='downloading', readonly=True)
+    owner_id = fields.Many2one(
+        'youtube.download', string='Téléchargé par', readonly=True, ondelete='set null',
+        help="Enregistrement qui télécharge le fichier (tant qu'il est en cours).",
+    )
+    file_path = fields.Char(string='Chemin du fichier', readonly=True, index=True)
+    file_size = fields.Float(string='Taille (Mo)', readonly=True, digits=(10, 2))
+    content_hash = fields.Char(string='Empreinte SHA-256', readonly=True, index=True)
+    ref_count = fields.Integer(string='Références', compute='_compute_ref_count')
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', 'Un seul fichier partagé par clé !'),
+    ]
+
+    def _compute_ref_count(self):
+        Download = self.env['youtube.download'].sudo()
+        for blob in self:
+            blob.ref_count = Download.search_count(
+                [('file_path', '=', blob.file_path)]
+            ) if blob.file_path else 0
+
+    @api.model
+    def _acquire(self, key, download):
+        """
+        Réserve la clé pour `download`. Retourne (entrée, rôle) avec rôle :
+        - 'attach' : fichier disponible, à réutiliser ;
+        - 'wait' : téléchargement en cours par un autre enregistrement ;
+        - 'download' : `download` devient propriétaire et télécharge.
+        La ligne est verrouillée jusqu'à la fin de la transaction : deux
+        workers ne peuvent pas devenir propriétaires de la même clé.
+        """
+        video_id, quality, output_format = (key.split('/') + ['', '', ''])[:3]
+        self.env.cr.execute("""
+            INSERT INTO youtube_download_blob
+                   (key, video_id, quality, output_format, state, owner_id,
+                    create_uid, write_uid, create_date, write_date)
+            VALUES (%s, %s, %s, %s, 'downloading', %s, %s, %s,
+                    now() at time zone 'UTC', now() at time zone 'UTC')
+            ON CONFLICT (key) DO NOTHING
+            RETURNING id
+        """, (key, video_id, quality, output_format, download.id, self.env.uid, self.env.uid))
+        row = self.env.cr.fetchone()
+        if row:
+            return self.browse(row[0]), 'download'
+
+        self.env.cr.execute(
+            "SELECT id FROM youtube_download_blob WHERE key = %s FOR UPDATE", (key,)
+        )
+        blob = self.browse(self.env.cr.fetchone()[0])
+        self.invalidate_model()
+        if blob.state == 'done' and blob.file_path and os.path.exists(blob.file_path):
+            return blob, 'attach'
+        owner = blob.owner_id
+        if (blob.state == 'downloading' and owner and owner != download
+                and owner.state in ('pending', 'downloading')):
+            return blob, 'wait'
+        # Échec précédent, fichier disparu ou propriétaire abandonné : reprise
+        blob.write({
+            'state': 'downloading',
+            'owner_id': download.id,
+            'file_path': False,
+            'file_size': 0.0,
+            'content_hash': False,
+        })
+        return blob, 'download'
+
+    def _find_twin(self, content_hash):
+        """Autre fichier disponible au contenu identique (même empreinte)."""
+        self.ensure_one()
+        twins = self.search([
+            ('content_hash', '=', content_hash),
+            ('state', '=', 'done'),
+            ('id', '!=', self.id),
+        ])
+        return twins.filtered(lambda b: b.file_path and os.path.exists(b.file_path))[:1]
+
+    @api.autovacuum
+    def _gc_orphans(self):
+        """Supprime les entrées dont le fichier n'est plus référencé ni présent."""
+        blobs = self.search([('state', '!=', 'downloading')])
+        orphans = blobs.filtered(
+            lambda b: not b.file_path or not os.path.exists(b.file_path) or not b.ref_count
+        )
+        orphans.unlink()
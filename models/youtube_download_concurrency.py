@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Contrôleur adaptatif du nombre de téléchargements simultanés (AIMD).
+
+En mode adaptatif, la limite des créneaux 'download' n'est plus
+``youtube_downloader.max_concurrent`` mais une cible réévaluée chaque minute
+par cron, entre deux bornes réglées par l'administrateur :
+- erreurs de bridage (HTTP 429 / 403, contrôle anti-robot) depuis la mesure
+  précédente : la cible est divisée par deux (décroissance multiplicative) ;
+- débit agrégé en baisse après une augmentation : le créneau ajouté est
+  retiré (flux googlevideo ralentis) ;
+- créneaux tous occupés et jobs en attente : un créneau de plus (croissance
+  additive).
+
+Le débit agrégé est la somme des vitesses instantanées des hooks de
+progression (colonne live_speed, persistée par le flush de progression),
+donc valable sur tous les processus / nœuds. Chaque évaluation est
+historisée dans youtube.concurrency.sample (visible depuis les paramètres).
+"""
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+from .youtube_download_retry import ERROR_THROTTLED, classify_download_error
+from .youtube_download_slot import SLOT_LIMIT_PARAMS
+
+_logger = logging.getLogger(__name__)
+
+ADAPTIVE_PARAM = 'youtube_downloader.adaptive_concurrency'
+ADAPTIVE_MIN_PARAM = 'youtube_downloader.adaptive_min_concurrent'
+ADAPTIVE_MAX_PARAM = 'youtube_downloader.adaptive_max_concurrent'
+ADAPTIVE_TARGET_PARAM = 'youtube_downloader.adaptive_concurrency_target'
+DEFAULT_ADAPTIVE_MIN = 1
+DEFAULT_ADAPTIVE_MAX = 10
+
+# Facteur de décroissance sur erreur de bridage
+DECREASE_FACTOR = 0.5
+# Baisse relative de débit tolérée après une augmentation
+THROUGHPUT_DROP_TOLERANCE = 0.1
+# Conservation de l'historique des évaluations
+SAMPLE_RETENTION_DAYS = 7
+
+
+def aimd_next_target(target, low, high, throttle_errors, saturated,
+                     throughput, previous_throughput, last_decision):
+    """
+    Nouvelle cible et décision ('increase' / 'decrease' / 'hold') à partir
+    de la mesure courante. Fonction pure : aucun accès base.
+    """
+    target = max(low, min(target, high))
+    if throttle_errors:
+        new_target = max(low, int(target * DECREASE_FACTOR))
+    elif (last_decision == 'increase' and previous_throughput
+          and throughput < previous_throughput * (1 - THROUGHPUT_DROP_TOLERANCE)):
+        new_target = max(low, target - 1)
+    elif saturated:
+        new_target = min(high, target + 1)
+    else:
+        new_target = target
+    if new_target > target:
+        return new_target, 'increase'
+    if new_target < target:
+        return new_target, 'decrease'
+    return new_target, 'hold'
+
+
+def _to_int(value, default):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+
+class YoutubeConcurrencySample(models.Model):
+    _name = 'youtube.concurrency.sample'
+    _description = "Évaluation du contrôleur de concurrence adaptatif"
+    _order = 'sampled_at desc, id desc'
+
+    sampled_at = fields.Datetime(
+        string='Date', required=True, readonly=True, index=True,
+        default=fields.Datetime.now,
+    )
+    target = fields.Integer(string='Cible', readonly=True, group_operator='avg')
+    previous_target = fields.Integer(string='Cible précédente', readonly=True)
+    active_slots = fields.Integer(string='Créneaux occupés', readonly=True, group_operator='avg')
+    queued_jobs = fields.Integer(string='Jobs en attente', readonly=True, group_operator='avg')
+    throughput = fields.Float(
+        string='Débit agrégé (Mo/s)', readonly=True, digits=(10, 2), group_operator='avg',
+    )
+    throttle_errors = fields.Integer(string='Erreurs de bridage', readonly=True)
+    decision = fields.Selection([
+        ('increase', 'Augmentation'),
+        ('decrease', 'Diminution'),
+        ('hold', 'Maintien'),
+    ], string='Décision', readonly=True)
+
+    # ─── Paramètres ──────────────────────────────────────────────────────────
+    @api.model
+    def _get_adaptive_settings(self):
+        """
+        (actif, borne basse, borne haute, cible courante) lus directement en
+        base, comme youtube.download.slot._get_limit, pour qu'un changement
+        soit vu aussitôt par tous les nœuds.
+        """
+        keys = (ADAPTIVE_PARAM, ADAPTIVE_MIN_PARAM, ADAPTIVE_MAX_PARAM, ADAPTIVE_TARGET_PARAM)
+        self.env['ir.config_parameter'].flush_model(['key', 'value'])
+        self.env.cr.execute(
+            "SELECT key, value FROM ir_config_parameter WHERE key IN %s", (keys,)
+        )
+        values = dict(self.env.cr.fetchall())
+        enabled = (values.get(ADAPTIVE_PARAM) or '').lower() in ('1', 'true')
+        _param, _default, floor, ceiling = SLOT_LIMIT_PARAMS['download']
+        low = max(floor, min(_to_int(values.get(ADAPTIVE_MIN_PARAM), DEFAULT_ADAPTIVE_MIN), ceiling))
+        high = max(low, min(_to_int(values.get(ADAPTIVE_MAX_PARAM), DEFAULT_ADAPTIVE_MAX), ceiling))
+        target = max(low, min(_to_int(values.get(ADAPTIVE_TARGET_PARAM), low), high))
+        return enabled, low, high, target
+
+    @api.model
+    def _get_adaptive_limit(self):
+        """Limite adaptative des créneaux de téléchargement, ou None si désactivée."""
+        enabled, _low, _high, target = self._get_adaptive_settings()
+        return target if enabled else None
+
+    # ─── Mesures ─────────────────────────────────────────────────────────────
+    @api.model
+    def _measure_throughput(self):
+        """Débit agrégé instantané (Mo/s) des téléchargements en cours, tous nœuds."""
+        self.env['youtube.download'].flush_model(['state', 'live_speed'])
+        self.env.cr.execute("""
+            SELECT COALESCE(SUM(live_speed), 0) FROM youtube_download
+             WHERE state = 'downloading' AND live_speed > 0
+        """)
+        return self.env.cr.fetchone()[0] / (1024 * 1024)
+
+    @api.model
+    def _count_throttle_errors(self, since):
+        """Erreurs de bridage (429, 403, anti-robot) survenues depuis `since`."""
+        errors = self.env['youtube.download'].sudo().search_read([
+            ('last_error_date', '>', since),
+            ('error_message', '!=', False),
+        ], ['error_message'])
+        return sum(
+            1 for row in errors
+            if classify_download_error(row['error_message']) == ERROR_THROTTLED
+            or 'http error 403' in row['error_message'].lower()
+        )
+
+    @api.model
+    def _count_queued_downloads(self):
+        now = fields.Datetime.now()
+        return self.env['youtube.download.job'].sudo().search_count([
+            ('state', '=', 'queued'),
+            ('job_type', '=', 'download'),
+            '|', ('next_attempt_at', '=', False), ('next_attempt_at', '<=', now),
+        ])
+
+    # ─── Cron ─────────────────────────────────────────────────────────────────
+    @api.model
+    def _cron_adapt(self):
+        """Cron : réévalue la cible de téléchargements simultanés (mode adaptatif)."""
+        enabled, low, high, target = self._get_adaptive_settings()
+        if not enabled:
+            return False
+        now = fields.Datetime.now()
+        last = self.search([], limit=1)
+        active = self.env['youtube.download.slot'].sudo()._count_active('download')
+        queued = self._count_queued_downloads()
+        throughput = self._measure_throughput()
+        throttle_errors = self._count_throttle_errors(
+            last.sampled_at if last else now - timedelta(minutes=1)
+        )
+        new_target, decision = aimd_next_target(
+            target, low, high,
+            throttle_errors=throttle_errors,
+            saturated=queued > 0 and active >= target,
+            throughput=throughput,
+            previous_throughput=last.throughput if last else 0.0,
+            last_decision=last.decision if last else None,
+        )
+        if new_target != target:
+            _logger.info(
+                "Concurrence adaptative : %d → %d (%.2f Mo/s, %d erreur(s) de bridage, %d/%d créneaux, %d en attente)",
+                target, new_target, throughput, throttle_errors, active, target, queued,
+            )
+        self.env['ir.config_parameter'].sudo().set_param(ADAPTIVE_TARGET_PARAM, new_target)
+        sample = self.create({
+            'sampled_at': now,
+            'target': new_target,
+            'previous_target': target,
+            'active_slots': active,
+            'queued_jobs': queued,
+            'throughput': throughput,
+            'throttle_errors': throttle_errors,
+            'decision': decision,
+        })
+        if decision == 'increase':
+            # Le pool de workers grandit jusqu'à la borne haute au réveil
+            self.env['youtube.download.job']._wake_workers_after_commit()
+        return sample
+
+    @api.autovacuum
+    def _gc_old_samples(self):
+        """Supprime l'historique de plus de SAMPLE_RETENTION_DAYS jours."""
+        self.search([
+            ('sampled_at', '<', fields.Datetime.now() - timedelta(days=SAMPLE_RETENTION_DAYS)),
+        ]).unlink()
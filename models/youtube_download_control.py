@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Jetons d'interruption des téléchargements en cours (annulation / pause).
+
+L'annulation ou la mise en pause d'un téléchargement en cours écrit son
+nouvel état en base ; le thread qui exécute yt-dlp l'apprend par un jeton
+en mémoire, consulté à chaque appel du hook de progression :
+- dans le même processus, le jeton est posé au commit de la transaction ;
+- depuis un autre processus / nœud, le flush de progression constate que
+  la ligne n'est plus « en cours » et pose le jeton (quelques secondes).
+
+Le hook lève alors DownloadInterrupted, qui interrompt le transfert
+yt-dlp ; _do_download libère le créneau et range : fichiers partiels
+supprimés pour une annulation, conservés pour une pause (reprise au même
+octet grâce à continuedl).
+"""
+import threading
+
+INTERRUPT_CANCEL = 'cancel'
+INTERRUPT_PAUSE = 'pause'
+
+# État final en base → interruption à signaler au thread de téléchargement
+INTERRUPT_STATES = {
+    'cancelled': INTERRUPT_CANCEL,
+    'paused': INTERRUPT_PAUSE,
+}
+
+
+class DownloadInterrupted(Exception):
+    """Levée depuis un hook yt-dlp pour arrêter un transfert (annulation / pause)."""
+
+    def __init__(self, action):
+        super().__init__(action)
+        self.action = action
+
+
+class DownloadControl:
+    """Jetons d'interruption des téléchargements de ce processus, par base."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}  # {(dbname, record_id): action}
+
+    def request(self, dbname, record_id, action):
+        with self._lock:
+            self._tokens[(dbname, record_id)] = action
+
+    def get(self, dbname, record_id):
+        """Interruption demandée pour ce téléchargement, ou None."""
+        with self._lock:
+            return self._tokens.get((dbname, record_id))
+
+    def check(self, dbname, record_id):
+        """Lève DownloadInterrupted si une interruption est demandée."""
+        action = self.get(dbname, record_id)
+        if action:
+            raise DownloadInterrupted(action)
+
+    def clear(self, dbname, record_id):
+        with self._lock:
+            self._tokens.pop((dbname, record_id), None)
+
+
+download_control = DownloadControl()
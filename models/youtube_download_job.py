@@ -0,0 +1,832 @@
+# -*- coding: utf-8 -*-
+"""
+File d'attente persistante des téléchargements.
+
+Chaque téléchargement lancé crée un job en base. Un pool fixe de workers
+(par processus Odoo) réclame les jobs via ``SELECT ... FOR UPDATE SKIP LOCKED``,
+les exécute sous bail (lease) renouvelé périodiquement, puis les acquitte.
+Un bail expiré (redémarrage, worker tué) remet le job en file : aucun
+téléchargement en attente n'est perdu et plusieurs workers / nœuds Odoo
+peuvent vider la même file.
+
+Ordre de service : priorité, puis part équitable entre utilisateurs (tour
+de rôle : le n-ième job d'un utilisateur passe après le (n-1)-ième de tous
+les autres, ses jobs déjà en cours comptant comme servis), puis ancienneté.
+Une playlist de milliers de vidéos n'affame donc plus les autres
+utilisateurs, et un job urgent passe devant tout ce qui est en file.
+
+Les jobs peuvent aussi être exécutés par des nœuds dédiés, sans serveur
+HTTP : ``odoo-bin youtube_worker`` (voir cli/youtube_worker.py). Les nœuds
+HTTP déclarent alors ``youtube_embedded_workers = False`` dans leur fichier
+de configuration et se contentent de mettre en file ; la mise en file émet
+un NOTIFY PostgreSQL qui réveille les nœuds dédiés. Chaque pool, intégré ou
+dédié, signale sa présence dans youtube.worker.node.
+
+Les traitements média (conversion MP4, réparation audio) des trois sources
+— youtube.download, youtube.external.media, telegram.channel.video — sont
+des jobs comme les autres (voir youtube_media_engine) : même pool borné,
+créneaux « conversion » partagés par toute la base. Un job porte une clé
+de déduplication (un seul job actif par fichier, garanti par un index
+unique partiel) et une référence de lot (notification à la fin du lot).
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+import psycopg2
+
+from odoo import models, fields, api, tools, SUPERUSER_ID, _
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+from .youtube_download_slot import get_cluster_semaphore
+
+_logger = logging.getLogger(__name__)
+
+# Durée d'un bail avant qu'un job en cours soit considéré comme abandonné
+LEASE_DURATION = 300  # secondes
+# Intervalle de polling de la file quand aucun job n'est disponible
+POLL_INTERVAL = 5  # secondes
+# Nombre max de réclamations d'un même job (protège des jobs "poison")
+MAX_JOB_ATTEMPTS = 3
+# Intervalle de heartbeat des pools (baux des jobs et présence du nœud)
+HEARTBEAT_INTERVAL = 30  # secondes
+# Canal NOTIFY PostgreSQL émis à chaque mise en file (payload : nom de la base)
+QUEUE_NOTIFY_CHANNEL = 'youtube_download_job'
+
+# Méthode appelée sur l'enregistrement cible pour chaque type de job
+JOB_HANDLERS = {
+    'download': '_run_download_job',
+    'fetch_info': '_run_fetch_info_job',
+    'expand_playlist': '_run_expand_playlist_job',
+    'telegram_download': '_run_telegram_download_job',
+    'telegram_batch': '_run_telegram_batch_job',
+    'convert_mp4': '_run_convert_mp4_job',
+    'fix_audio': '_run_fix_audio_job',
+}
+# Type de créneau partagé (youtube.download.slot) consommé par chaque type de job
+JOB_SLOT_KINDS = {
+    'download': 'download',
+    'fetch_info': 'metadata',
+    'expand_playlist': 'metadata',
+    'telegram_download': 'telegram',
+    'telegram_batch': 'telegram',
+    'convert_mp4': 'conversion',
+    'fix_audio': 'conversion',
+}
+# Types de jobs dont l'échec passe leur enregistrement cible en erreur
+JOB_TARGET_STATE_TYPES = ('download', 'expand_playlist', 'telegram_download')
+JOB_TYPE_SELECTION = [
+    ('download', 'Téléchargement YouTube'),
+    ('fetch_info', 'Récupération des infos (lot)'),
+    ('expand_playlist', 'Analyse de playlist'),
+    ('telegram_download', 'Téléchargement Telegram'),
+    ('telegram_batch', 'Téléchargement Telegram (lot)'),
+    ('convert_mp4', 'Conversion MP4'),
+    ('fix_audio', 'Réparation audio'),
+]
+# Notification bus de la progression des jobs média (ffmpeg)
+BUS_MEDIA_PROGRESS = 'youtube_media/progress'
+# Titre de la notification de fin de lot, par type de job
+BATCH_DONE_TITLES = {
+    'convert_mp4': "Conversion MP4 terminée",
+    'fix_audio': "Réparation audio terminée",
+}
+
+# Rang de service des jobs réclamables. user_turn : tour de l'utilisateur
+# (rang du job parmi les siens à même priorité + jobs déjà en cours) ;
+# last_started_at départage au profit de l'utilisateur servi le moins
+# récemment. Partagé par _claim et la vue youtube.download.job.schedule.
+SCHEDULE_RANKING_QUERY = """
+    SELECT j.id,
+           j.job_type,
+           j.priority,
+           j.user_id,
+           ROW_NUMBER() OVER (
+               PARTITION BY j.job_type, j.priority, j.user_id ORDER BY j.id
+           ) + COALESCE(u.running, 0) AS user_turn,
+           u.last_started_at
+      FROM youtube_download_job j
+ LEFT JOIN (
+           SELECT user_id, job_type,
+                  COUNT(*) FILTER (WHERE state = 'running') AS running,
+                  MAX(started_at) AS last_started_at
+             FROM youtube_download_job
+            WHERE state = 'running'
+               OR started_at > (now() at time zone 'UTC') - interval '1 day'
+         GROUP BY user_id, job_type
+           ) u ON u.user_id IS NOT DISTINCT FROM j.user_id AND u.job_type = j.job_type
+     WHERE j.state = 'queued'
+       AND (j.next_attempt_at IS NULL OR j.next_attempt_at <= (now() at time zone 'UTC'))
+"""
+SCHEDULE_ORDER = "r.priority DESC, r.user_turn, r.last_started_at NULLS FIRST, r.id"
+
+# Pools de workers par base de données (un seul par processus)
+_worker_pools = {}
+_worker_pools_lock = threading.Lock()
+
+
+def embedded_workers_enabled():
+    """
+    Les processus HTTP / cron de ce nœud exécutent-ils les jobs ? Option
+    ``youtube_embedded_workers`` du fichier de configuration (vrai par défaut).
+    """
+    value = config.get('youtube_embedded_workers', True)
+    return str(value).strip().lower() not in ('0', 'false', 'no', 'off', '')
+
+
+class _JobWorkerPool:
+    """Pool fixe de threads qui vident la file d'une base de données."""
+
+    def __init__(self, dbname, mode='embedded', job_types=None):
+        self.dbname = dbname
+        self.mode = mode
+        # Types de jobs réclamés par ce pool (None : tous)
+        self.job_types = tuple(job_types) if job_types else None
+        self.node_name = f"{socket.gethostname()}:{os.getpid()}"
+        self.size = 0
+        self.threads = []
+        self.running_job_ids = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.heartbeat_thread = None
+
+    def ensure_size(self, size):
+        """Démarre des workers supplémentaires jusqu'à atteindre `size`."""
+        with self.lock:
+            while len(self.threads) < size:
+                index = len(self.threads)
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    args=(index,),
+                    daemon=True,
+                    name=f"yt-dl-worker-{self.dbname}-{index}",
+                )
+                self.threads.append(thread)
+                thread.start()
+            self.size = max(self.size, size)
+            if self.heartbeat_thread is None:
+                self.heartbeat_thread = threading.Thread(
+                    target=self._heartbeat_loop,
+                    daemon=True,
+                    name=f"yt-dl-heartbeat-{self.dbname}",
+                )
+                self.heartbeat_thread.start()
+
+    def notify(self):
+        """Réveille les workers en attente (nouveau job en file)."""
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        """
+        Arrêt propre : plus aucune réclamation, attente des jobs en cours
+        (au plus `timeout` secondes ; les baux non acquittés expireront et
+        leurs jobs seront remis en file). Retourne les jobs encore en cours.
+        """
+        self.stopping.set()
+        self.wakeup.set()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for thread in self.threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        self._heartbeat(stopped=True)
+        with self.lock:
+            return set(self.running_job_ids)
+
+    def _worker_loop(self, index):
+        worker_id = f"{self.node_name}:{index}"
+        while not self.stopping.is_set():
+            try:
+                processed = self._process_one(worker_id)
+            except Exception as e:
+                _logger.error("Erreur worker de file [%s] : %s", worker_id, str(e))
+                processed = False
+            if not processed:
+                self.wakeup.wait(POLL_INTERVAL)
+                self.wakeup.clear()
+
+    def _process_one(self, worker_id):
+        """
+        Réclame et exécute un job. Retourne False si rien n'a été exécuté.
+
+        Aucun curseur n'est conservé pendant l'exécution : la réclamation et
+        l'acquittement utilisent chacun un curseur court, le handler gère ses
+        propres curseurs courts.
+        """
+        registry = Registry(self.dbname)
+        with registry.cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            job_types = env['youtube.download.job']._get_queued_job_types()
+        if self.job_types:
+            job_types = [job_type for job_type in job_types if job_type in self.job_types]
+        for job_type in job_types:
+            # Un créneau partagé (tous workers / nœuds) doit être libre avant de réclamer
+            semaphore = get_cluster_semaphore(self.dbname, JOB_SLOT_KINDS[job_type])
+            if not semaphore.acquire(blocking=False):
+                continue
+            try:
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, SUPERUSER_ID, {})
+                    job = env['youtube.download.job']._claim(worker_id, job_types=[job_type])
+                    job_id = job.id
+                    call = job._get_execution() if job else None
+                if job_id:
+                    self._run_claimed(job_id, call)
+                    return True
+            finally:
+                semaphore.release()
+        return False
+
+    def _run_claimed(self, job_id, call):
+        with self.lock:
+            self.running_job_ids.add(job_id)
+        error = None
+        try:
+            if call:
+                call()
+        except Exception as e:
+            _logger.error("Job de file [%s] échoué : %s", job_id, str(e))
+            error = str(e)
+        finally:
+            with self.lock:
+                self.running_job_ids.discard(job_id)
+        with Registry(self.dbname).cursor() as cr:
+            job = api.Environment(cr, SUPERUSER_ID, {})['youtube.download.job'].browse(job_id)
+            if error is None:
+                job._ack('done')
+            else:
+                job._fail(error)
+            job._notify_batch_done()
+
+    def _heartbeat(self, stopped=False):
+        """Renouvelle le bail des jobs en cours et signale la présence du nœud."""
+        with self.lock:
+            job_ids = list(self.running_job_ids)
+        try:
+            with Registry(self.dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                if job_ids:
+                    env['youtube.download.job']._renew_leases(job_ids)
+                env['youtube.worker.node']._heartbeat(self.node_name, {
+                    'mode': self.mode,
+                    'concurrency': 0 if stopped else len(self.threads),
+                    'running_jobs': len(job_ids),
+                    'job_types': ','.join(self.job_types or ()),
+                    'stopped': stopped,
+                })
+                cr.commit()
+        except Exception as e:
+            _logger.warning("Heartbeat du pool de workers échoué : %s", str(e))
+
+    def _heartbeat_loop(self):
+        """Heartbeat périodique (baux des jobs exécutés par ce processus, nœud)."""
+        self._heartbeat()
+        while not self.stopping.wait(HEARTBEAT_INTERVAL):
+            self._heartbeat()
+
+
+def _get_worker_pool(dbname, size, mode='embedded', job_types=None):
+    """Retourne (et démarre si besoin) le pool de workers de la base."""
+    with _worker_pools_lock:
+        pool = _worker_pools.get(dbname)
+        if pool is None:
+            pool = _worker_pools[dbname] = _JobWorkerPool(dbname, mode=mode, job_types=job_types)
+    pool.ensure_size(size)
+    return pool
+
+
+class YoutubeDownloadJob(models.Model):
+    _name = 'youtube.download.job'
+    _description = "Job de la file de téléchargement"
+    _order = 'priority desc, id'
+
+    name = fields.Char(
+        string='Description',
+        compute='_compute_name',
+    )
+    job_type = fields.Selection(
+        JOB_TYPE_SELECTION, string='Type', required=True, default='download', index=True,
+    )
+    state = fields.Selection([
+        ('queued', 'En file'),
+        ('running', 'En cours'),
+        ('done', 'Terminé'),
+        ('failed', 'Échoué'),
+        ('cancelled', 'Annulé'),
+    ], string='État', default='queued', required=True, index=True)
+    res_model = fields.Char(
+        string='Modèle cible',
+        required=True,
+        index=True,
+    )
+    res_id = fields.Many2oneReference(
+        string='ID cible',
+        model_field='res_model',
+        required=True,
+        index=True,
+    )
+    user_id = fields.Many2one(
+        'res.users',
+        string='Demandé par',
+        default=lambda self: self.env.user,
+        index=True,
+    )
+    priority = fields.Integer(
+        string='Priorité',
+        default=0,
+        index=True,
+    )
+    payload = fields.Text(
+        string='Paramètres (JSON)',
+    )
+    worker_id = fields.Char(
+        string='Worker',
+        readonly=True,
+    )
+    lease_expires_at = fields.Datetime(
+        string='Fin du bail',
+        readonly=True,
+    )
+    next_attempt_at = fields.Datetime(
+        string='Pas avant',
+        readonly=True,
+        index=True,
+        help="Job différé (reprise après échec) : non réclamé avant cette date.",
+    )
+    attempts = fields.Integer(
+        string='Réclamations',
+        default=0,
+        readonly=True,
+    )
+    started_at = fields.Datetime(string='Démarré le', readonly=True, index=True)
+    finished_at = fields.Datetime(string='Terminé le', readonly=True)
+    error_message = fields.Text(string="Message d'erreur", readonly=True)
+    progress = fields.Float(
+        string='Progression (%)', readonly=True, digits=(5, 1),
+        help="Jobs média : part de la durée du média déjà traitée par ffmpeg.",
+    )
+    encode_speed = fields.Float(
+        string="Vitesse d'encodage (× temps réel)", readonly=True, digits=(8, 2), group_operator='avg',
+        help="Jobs média : secondes de média traitées par seconde (2,0 = deux fois plus "
+             "vite que la lecture). Moyenne mesurée une fois le job terminé.",
+    )
+    media_duration = fields.Float(
+        string='Durée du média (s)', readonly=True, digits=(10, 1),
+        help="Jobs média : durée du fichier traité, selon ffprobe.",
+    )
+    processing_time = fields.Float(
+        string='Temps ffmpeg (s)', readonly=True, digits=(10, 1),
+    )
+    ffmpeg_threads = fields.Integer(
+        string='Threads ffmpeg', readonly=True, group_operator='avg',
+        help="Jobs média : threads accordés à ffmpeg (cœurs répartis entre les "
+             "conversions simultanées).",
+    )
+    low_priority = fields.Boolean(
+        string='Priorité basse', readonly=True,
+        help="Jobs média : ffmpeg lancé sous nice / ionice, la machine étant chargée.",
+    )
+    dedup_key = fields.Char(
+        string='Clé de déduplication',
+        readonly=True,
+        index=True,
+        help="Un seul job en file ou en cours par clé (ex. un fichier converti).",
+    )
+    batch_ref = fields.Char(
+        string='Lot',
+        readonly=True,
+        index=True,
+        help="Jobs lancés ensemble : le demandeur est notifié quand le dernier se termine.",
+    )
+
+    def init(self):
+        # Un seul job actif par clé, même mis en file par deux transactions concurrentes
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS youtube_download_job_dedup_active_uniq
+                ON youtube_download_job (dedup_key)
+             WHERE dedup_key IS NOT NULL AND state IN ('queued', 'running')
+        """)
+
+    def _compute_name(self):
+        labels = dict(self._fields['job_type'].selection)
+        for job in self:
+            record = self.env[job.res_model].browse(job.res_id).exists() if job.res_model else None
+            target = record.display_name if record else f"{job.res_model},{job.res_id}"
+            job.name = f"{labels.get(job.job_type, job.job_type)} — {target}"
+
+    # ─── API de la file ───────────────────────────────────────────────────────
+    @api.model
+    def _enqueue(self, records, job_type, payload=None, priority=0, next_attempt_at=None,
+                 dedup_keys=None, batch_ref=None):
+        """
+        Met en file un job par enregistrement et réveille les workers au commit.
+        `next_attempt_at` diffère la réclamation (reprise après backoff) sans
+        occuper de worker ni de créneau pendant l'attente.
+
+        `dedup_keys` ({id: clé}) : un enregistrement dont la clé a déjà un
+        job en file ou en cours n'est pas remis en file (les jobs retournés
+        ne couvrent alors que les enregistrements réellement mis en file).
+        `batch_ref` regroupe les jobs d'un même lot (_notify_batch_done).
+        """
+        vals_list = [{
+            'job_type': job_type,
+            'res_model': rec._name,
+            'res_id': rec.id,
+            'user_id': self.env.uid,
+            'priority': priority,
+            'payload': json.dumps(payload or {}),
+            'next_attempt_at': next_attempt_at or False,
+            'dedup_key': (dedup_keys or {}).get(rec.id) or False,
+            'batch_ref': batch_ref or False,
+        } for rec in records]
+        if dedup_keys:
+            jobs = self._create_deduplicated(vals_list)
+        else:
+            jobs = self.sudo().create(vals_list)
+        if jobs:
+            self._wake_workers_after_commit()
+        return jobs
+
+    @api.model
+    def _create_deduplicated(self, vals_list):
+        """Crée les jobs dont la clé est libre ; une course perdue est ignorée."""
+        keys = [vals['dedup_key'] for vals in vals_list if vals['dedup_key']]
+        active = set(self.sudo().search([
+            ('dedup_key', 'in', keys),
+            ('state', 'in', ('queued', 'running')),
+        ]).mapped('dedup_key'))
+        jobs = self.sudo().browse()
+        for vals in vals_list:
+            key = vals['dedup_key']
+            if key and key in active:
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    jobs |= self.sudo().create(vals)
+            except psycopg2.IntegrityError:
+                # Mis en file entre-temps par une autre transaction
+                pass
+            if key:
+                active.add(key)
+        return jobs
+
+    @api.model
+    def _get_pool_size(self):
+        """Un worker par créneau de téléchargement, plus ceux des lots, de Telegram et des conversions."""
+        Slot = self.env['youtube.download.slot']
+        return (
+            self.env['youtube.download']._get_max_concurrent()
+            + Slot._get_limit('metadata')
+            + Slot._get_limit('telegram')
+            + Slot._get_limit('conversion')
+        )
+
+    @api.model
+    def _wake_workers_after_commit(self):
+        """
+        Réveille les workers une fois la transaction committée : le pool
+        local (démarré si ce nœud exécute les jobs) et, par NOTIFY, les
+        nœuds dédiés à l'écoute.
+        """
+        dbname = self.env.cr.dbname
+        # NOTIFY est transactionnel : délivré au commit seulement
+        self.env.cr.execute("SELECT pg_notify(%s, %s)", (QUEUE_NOTIFY_CHANNEL, dbname))
+        size = self._get_pool_size() if embedded_workers_enabled() else 0
+
+        def _wake():
+            if size:
+                _get_worker_pool(dbname, size).notify()
+            else:
+                # Nœud sans workers intégrés : seul un pool dédié de ce
+                # processus (odoo-bin youtube_worker) est réveillé
+                pool = _worker_pools.get(dbname)
+                if pool:
+                    pool.notify()
+        self.env.cr.postcommit.add(_wake)
+
+    @api.model
+    def _get_queued_job_types(self):
+        """Types de jobs ayant au moins un job en file et réclamable maintenant."""
+        self.flush_model(['state', 'job_type', 'next_attempt_at'])
+        self.env.cr.execute("""
+            SELECT DISTINCT job_type FROM youtube_download_job
+             WHERE state = 'queued'
+               AND (next_attempt_at IS NULL OR next_attempt_at <= (now() at time zone 'UTC'))
+        """)
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _claim(self, worker_id, job_types=None):
+        """
+        Réclame atomiquement le prochain job en file (SKIP LOCKED), dans
+        l'ordre de service : priorité, tour de l'utilisateur, ancienneté.
+        """
+        job_types = tuple(job_types or JOB_HANDLERS)
+        self.flush_model()
+        self.env.cr.execute(f"""
+            UPDATE youtube_download_job
+               SET state = 'running',
+                   worker_id = %s,
+                   attempts = attempts + 1,
+                   started_at = (now() at time zone 'UTC'),
+                   lease_expires_at = (now() at time zone 'UTC') + %s * interval '1 second',
+                   write_date = (now() at time zone 'UTC')
+             WHERE id = (
+                   SELECT j.id FROM youtube_download_job j
+                     JOIN ({SCHEDULE_RANKING_QUERY}) r ON r.id = j.id
+                    WHERE j.state = 'queued' AND j.job_type IN %s
+                 ORDER BY {SCHEDULE_ORDER}
+                    LIMIT 1
+                      FOR UPDATE OF j SKIP LOCKED
+             )
+         RETURNING id
+        """, (worker_id, LEASE_DURATION, job_types))
+        row = self.env.cr.fetchone()
+        self.invalidate_model()
+        return self.browse(row[0]) if row else self.browse()
+
+    @api.model
+    def _renew_leases(self, job_ids):
+        """Prolonge le bail des jobs encore en cours."""
+        self.env.cr.execute("""
+            UPDATE youtube_download_job
+               SET lease_expires_at = (now() at time zone 'UTC') + %s * interval '1 second'
+             WHERE id IN %s AND state = 'running'
+        """, (LEASE_DURATION, tuple(job_ids)))
+
+    def _get_payload(self):
+        self.ensure_one()
+        try:
+            return json.loads(self.payload or '{}')
+        except ValueError:
+            return {}
+
+    def _get_execution(self):
+        """
+        Prépare l'appel du handler sur l'enregistrement cible, au nom du demandeur.
+        Retourne un callable sans argument, ou None si la cible a été supprimée.
+        """
+        self.ensure_one()
+        handler = JOB_HANDLERS[self.job_type]
+        # youtube_job_id : le handler peut rattacher sa progression au job
+        env = api.Environment(
+            self.env.cr, self.user_id.id or SUPERUSER_ID, {'youtube_job_id': self.id}, su=True,
+        )
+        record = env[self.res_model].browse(self.res_id).exists()
+        if not record:
+            _logger.info("Job [%s] : enregistrement cible supprimé, ignoré.", self.id)
+            return None
+        payload = self._get_payload()
+        method = getattr(record, handler)
+        return lambda: method(payload)
+
+    def _execute(self):
+        """Exécute le job dans la transaction courante."""
+        call = self._get_execution()
+        if call:
+            call()
+
+    def _ack(self, state='done'):
+        self.write({
+            'state': state,
+            'finished_at': fields.Datetime.now(),
+            'lease_expires_at': False,
+        })
+
+    def _fail(self, error):
+        self.write({
+            'state': 'failed',
+            'finished_at': fields.Datetime.now(),
+            'lease_expires_at': False,
+            'error_message': error,
+        })
+        for job in self.filtered(lambda j: j.job_type in JOB_TARGET_STATE_TYPES):
+            record = self.env[job.res_model].browse(job.res_id).exists()
+            if record and 'state' in record._fields:
+                record.write({'state': 'error', 'error_message': error})
+
+    def _notify_batch_done(self):
+        """
+        Notifie le demandeur quand le dernier job du lot de ce job se
+        termine. Le verrou consultatif sérialise les fins de jobs d'un même
+        lot : le dernier à valider voit tous les autres terminés.
+        """
+        self.ensure_one()
+        if not self.batch_ref:
+            return False
+        cr = self.env.cr
+        cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.batch_ref,))
+        self.flush_model(['state', 'batch_ref'])
+        cr.execute("""
+            SELECT state, count(*) FROM youtube_download_job
+             WHERE batch_ref = %s GROUP BY state
+        """, (self.batch_ref,))
+        counts = dict(cr.fetchall())
+        if counts.get('queued') or counts.get('running'):
+            return False
+        done, failed = counts.get('done', 0), counts.get('failed', 0)
+        total = done + failed + counts.get('cancelled', 0)
+        partner = self.user_id.partner_id
+        if partner:
+            title = BATCH_DONE_TITLES.get(self.job_type, "Traitement terminé")
+            message = _("%d/%d réussi(s)", done, total)
+            if failed:
+                message += _(" — %d erreur(s)", failed)
+            self.env['bus.bus'].sudo()._sendone(partner, 'simple_notification', {
+                'title': title,
+                'message': message,
+                'type': 'success' if not failed else 'warning',
+                'sticky': True,
+            })
+        _logger.info("Lot %s terminé : %d/%d réussi(s), %d erreur(s)",
+                     self.batch_ref, done, total, failed)
+        return True
+
+    def _bus_send_progress(self, live):
+        """Publie la progression flushée des jobs média ({id: entrée du registre})."""
+        by_partner = {}
+        for job in self:
+            partner = job.user_id.partner_id
+            if not partner or job.id not in live:
+                continue
+            entry = live[job.id]
+            by_partner.setdefault(partner, []).append({
+                'id': job.id,
+                'job_type': job.job_type,
+                'res_model': job.res_model,
+                'res_id': job.res_id,
+                'progress': entry['progress'],
+                'speed': entry.get('speed'),
+                'eta': entry.get('eta'),
+            })
+        bus = self.env['bus.bus'].sudo()
+        for partner, payloads in by_partner.items():
+            bus._sendone(partner, BUS_MEDIA_PROGRESS, payloads)
+
+    @api.model
+    def _reprioritize(self, records):
+        """Aligne la priorité des jobs en file sur celle de leurs enregistrements."""
+        jobs = self.sudo().search([
+            ('res_model', '=', records._name),
+            ('res_id', 'in', records.ids),
+            ('state', '=', 'queued'),
+        ])
+        priorities = {rec.id: rec._get_queue_priority() for rec in records}
+        for job in jobs:
+            if job.priority != priorities[job.res_id]:
+                job.priority = priorities[job.res_id]
+        return jobs
+
+    @api.model
+    def _cancel_for(self, records):
+        """Annule les jobs encore en file pour ces enregistrements."""
+        jobs = self.sudo().search([
+            ('res_model', '=', records._name),
+            ('res_id', 'in', records.ids),
+            ('state', '=', 'queued'),
+        ])
+        jobs._ack('cancelled')
+        return jobs
+
+    # ─── Actions (boutons) ────────────────────────────────────────────────────
+    def action_cancel(self):
+        """Annule des jobs encore en file."""
+        self.filtered(lambda j: j.state == 'queued')._ack('cancelled')
+
+    # ─── Cron ─────────────────────────────────────────────────────────────────
+    @api.model
+    def _requeue_expired(self):
+        """Remet en file les jobs dont le bail a expiré (worker mort, redémarrage)."""
+        expired = self.search([
+            ('state', '=', 'running'),
+            ('lease_expires_at', '<', fields.Datetime.now()),
+        ])
+        poisoned = expired.filtered(lambda j: j.attempts >= MAX_JOB_ATTEMPTS)
+        if poisoned:
+            poisoned._fail(_("Abandonné après %d tentatives interrompues.", MAX_JOB_ATTEMPTS))
+        requeued = expired - poisoned
+        if requeued:
+            _logger.warning("File : %d job(s) au bail expiré remis en file.", len(requeued))
+            requeued.write({'state': 'queued', 'worker_id': False, 'lease_expires_at': False})
+            for job in requeued.filtered(lambda j: j.job_type == 'download'):
+                record = self.env[job.res_model].browse(job.res_id).exists()
+                if record and record.state == 'downloading':
+                    record.write({'state': 'pending', 'progress': 0.0})
+        return requeued
+
+    @api.model
+    def _cron_process_queue(self):
+        """Cron : récupère les jobs abandonnés et s'assure qu'un pool vide la file."""
+        self._requeue_expired()
+        self.env['youtube.download']._requeue_blob_waiters()
+        if self.search_count([('state', '=', 'queued')]):
+            self._wake_workers_after_commit()
+
+    @api.autovacuum
+    def _gc_finished_jobs(self):
+        """Supprime les jobs terminés depuis plus de 30 jours."""
+        self.search([
+            ('state', 'in', ('done', 'failed', 'cancelled')),
+            ('finished_at', '<', fields.Datetime.now() - timedelta(days=30)),
+        ]).unlink()
+
+
+class YoutubeDownloadJobSchedule(models.Model):
+    """Ordre dans lequel les workers réclameront les jobs en file (lecture seule)."""
+    _name = 'youtube.download.job.schedule'
+    _description = "Ordre de planification de la file"
+    _auto = False
+    _order = 'job_type, position'
+
+    position = fields.Integer(string='Rang', readonly=True)
+    job_id = fields.Many2one('youtube.download.job', string='Job', readonly=True)
+    job_type = fields.Selection(JOB_TYPE_SELECTION, string='Type', readonly=True)
+    priority = fields.Integer(string='Priorité', readonly=True)
+    user_id = fields.Many2one('res.users', string='Demandé par', readonly=True)
+    user_turn = fields.Integer(
+        string="Tour de l'utilisateur", readonly=True,
+        help="Rang du job parmi ceux de l'utilisateur à même priorité, jobs en cours compris.",
+    )
+    queued_at = fields.Datetime(string='Mis en file le', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE OR REPLACE VIEW {self._table} AS (
+                SELECT r.id,
+                       r.id AS job_id,
+                       r.job_type,
+                       r.priority,
+                       r.user_id,
+                       r.user_turn,
+                       j.create_date AS queued_at,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY r.job_type ORDER BY {SCHEDULE_ORDER}
+                       ) AS position
+                  FROM ({SCHEDULE_RANKING_QUERY}) r
+                  JOIN youtube_download_job j ON j.id = r.id
+            )
+        """)
+
+
+class YoutubeWorkerNode(models.Model):
+    """Pool de workers (intégré ou dédié) ayant récemment vidé la file."""
+    _name = 'youtube.worker.node'
+    _description = "Nœud de workers de la file"
+    _order = 'last_heartbeat desc'
+
+    name = fields.Char(string='Nœud', required=True, readonly=True, index=True)
+    hostname = fields.Char(string='Hôte', readonly=True)
+    pid = fields.Integer(string='PID', readonly=True)
+    mode = fields.Selection([
+        ('embedded', 'Intégré (serveur Odoo)'),
+        ('standalone', 'Dédié (youtube_worker)'),
+    ], string='Mode', readonly=True)
+    concurrency = fields.Integer(string='Workers', readonly=True)
+    running_jobs = fields.Integer(string='Jobs en cours', readonly=True)
+    job_types = fields.Char(
+        string='Types de jobs', readonly=True,
+        help="Types de jobs réclamés par ce nœud (vide : tous).",
+    )
+    started_at = fields.Datetime(string='Démarré le', readonly=True)
+    last_heartbeat = fields.Datetime(string='Dernier signal', readonly=True, index=True)
+    stopped = fields.Boolean(string='Arrêté', readonly=True)
+    is_alive = fields.Boolean(string='Actif', compute='_compute_is_alive')
+
+    _sql_constraints = [
+        ('name_unique', 'unique(name)', "Un nœud de workers est identifié par son hôte et son PID."),
+    ]
+
+    @api.depends('stopped', 'last_heartbeat')
+    def _compute_is_alive(self):
+        threshold = fields.Datetime.now() - timedelta(seconds=3 * HEARTBEAT_INTERVAL)
+        for node in self:
+            node.is_alive = bool(
+                not node.stopped and node.last_heartbeat and node.last_heartbeat >= threshold
+            )
+
+    @api.model
+    def _heartbeat(self, name, vals):
+        """Crée ou met à jour la ligne du nœud `name` (hôte:pid)."""
+        now = fields.Datetime.now()
+        vals = dict(vals, last_heartbeat=now)
+        node = self.search([('name', '=', name)], limit=1)
+        if node:
+            node.write(vals)
+            return node
+        hostname, _sep, pid = name.rpartition(':')
+        return self.create(dict(
+            vals, name=name, hostname=hostname, pid=int(pid) if pid.isdigit() else 0,
+            started_at=now,
+        ))
+
+    @api.autovacuum
+    def _gc_stale_nodes(self):
+        """Supprime les nœuds sans signal depuis plus d'un jour."""
+        self.search([
+            ('last_heartbeat', '<', fields.Datetime.now() - timedelta(days=1)),
+        ]).unlink()
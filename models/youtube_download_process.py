@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Exécution de yt-dlp dans des processus enfants (mode « processus isolés »).
+
+Par défaut, yt-dlp tourne dans les threads workers du processus Odoo :
+extraction, déchiffrement des signatures et boucle de téléchargement
+disputent le GIL au traitement des requêtes HTTP, et la mémoire du worker
+grossit au fil des téléchargements. En mode isolé, chaque téléchargement
+est confié à un processus enfant (youtube_download_runner.py) réutilisé
+pour les jobs suivants ; le parent ne fait plus qu'ordonnancer et persister.
+
+Chaque événement de hook de l'enfant est rejoué dans le parent par les
+hooks habituels (registre de progression, limitation de bande passante,
+annulation / pause) avant la réponse : la réponse différée par le seau à
+jetons bride l'enfant, et une interruption lui est renvoyée dans la réponse.
+
+Les enfants sont recyclés après ``youtube_downloader.process_max_jobs``
+téléchargements ou au-delà de ``youtube_downloader.process_max_memory_mb``
+(mémoire résidente) ; un enfant mort en cours de job est une erreur
+transitoire comme une autre (reprise via la file).
+"""
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+from .youtube_download_control import DownloadInterrupted
+
+_logger = logging.getLogger(__name__)
+
+RUNNER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'youtube_download_runner.py')
+# Délai accordé à un enfant pour se terminer après fermeture de son stdin
+CLOSE_TIMEOUT = 5  # secondes
+
+
+class RunnerProcess:
+    """Processus enfant yt-dlp et son canal JSON ligne à ligne."""
+
+    def __init__(self, command):
+        self.command = command
+        self.proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+            close_fds=True,
+        )
+
+    @property
+    def pid(self):
+        return self.proc.pid
+
+    def is_alive(self):
+        return self.proc.poll() is None
+
+    def send(self, message):
+        self.proc.stdin.write(json.dumps(message) + '\n')
+        self.proc.stdin.flush()
+
+    def receive(self):
+        """Message suivant de l'enfant, ou None s'il s'est terminé."""
+        line = self.proc.stdout.readline()
+        if not line:
+            return None
+        return json.loads(line)
+
+    def close(self):
+        """Fin de l'enfant : stdin fermé (sortie propre), puis kill si besoin."""
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=CLOSE_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc.stdout.close()
+
+
+class RunnerPool:
+    """Processus enfants inactifs de ce processus Odoo, réutilisés d'un job à l'autre."""
+
+    def __init__(self, command=None):
+        self._command = command or [sys.executable, RUNNER_SCRIPT]
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _build_command(self, settings):
+        return self._command + [
+            '--max-jobs', str(settings.get('max_jobs') or 0),
+            '--max-memory-mb', str(settings.get('max_memory_mb') or 0),
+        ]
+
+    def _acquire(self, settings):
+        command = self._build_command(settings)
+        stale = []
+        runner = None
+        with self._lock:
+            while self._idle:
+                candidate = self._idle.pop()
+                if candidate.command == command and candidate.is_alive():
+                    runner = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            candidate.close()
+        if runner is None:
+            runner = RunnerProcess(command)
+            _logger.info("Processus de téléchargement démarré (pid %d)", runner.pid)
+        return runner
+
+    def _release(self, runner, max_idle):
+        with self._lock:
+            if runner.is_alive() and len(self._idle) < max_idle:
+                self._idle.append(runner)
+                return
+        runner.close()
+
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    def shutdown(self):
+        """Termine les enfants inactifs."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for runner in idle:
+            runner.close()
+
+    def run(self, job, progress_hook, postprocessor_hook, settings, on_cache_invalid=None):
+        """
+        Exécute `job` ({url, opts, cached_info}) dans un enfant ; retourne
+        (info réduite, chemin du fichier). Lève DownloadInterrupted sur
+        annulation / pause, une exception portant le message yt-dlp sinon.
+        """
+        runner = self._acquire(settings)
+        reusable = False
+        try:
+            runner.send(dict(job, type='job'))
+            while True:
+                message = runner.receive()
+                if message is None:
+                    raise RuntimeError(
+                        "Processus de téléchargement terminé inopinément (code %s)"
+                        % runner.proc.wait()
+                    )
+                kind = message.get('type')
+                if kind in ('progress', 'postprocess'):
+                    hook = progress_hook if kind == 'progress' else postprocessor_hook
+                    action = None
+                    try:
+                        hook(message['data'])
+                    except DownloadInterrupted as e:
+                        action = e.action
+                    runner.send({'type': 'reply', 'action': action})
+                elif kind == 'cache_invalid':
+                    if on_cache_invalid:
+                        on_cache_invalid(message.get('error'))
+                elif kind in ('result', 'error'):
+                    if message.get('recycle'):
+                        _logger.info(
+                            "Processus de téléchargement recyclé (pid %d, %.0f Mo)",
+                            runner.pid, message.get('rss_mb') or 0.0,
+                        )
+                    else:
+                        reusable = True
+                    if kind == 'result':
+                        return message.get('info') or {}, message.get('filepath')
+                    if message.get('interrupt'):
+                        raise DownloadInterrupted(message['interrupt'])
+                    raise RuntimeError(message.get('message'))
+        finally:
+            if reusable:
+                self._release(runner, settings.get('max_idle') or 1)
+            else:
+                runner.close()
+
+
+runner_pool = RunnerPool()
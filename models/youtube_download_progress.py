@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+Registre de progression en mémoire (par processus).
+
+Les hooks yt-dlp / ffmpeg n'écrivent plus en base : ils mettent à jour ce
+registre (pourcentage, octets, vitesse, ETA). Un unique thread flusher par
+base persiste les lignes modifiées en un seul UPDATE groupé, à l'intervalle
+``youtube_downloader.progress_flush_interval`` (avec la vitesse, qui
+alimente le contrôleur de concurrence adaptatif). Les lecteurs (check_status,
+bulk_status) lisent d'abord ce registre, puis la base. Chaque flush publie
+aussi la progression sur le bus (voir youtube.download._bus_send_progress).
+
+Une ligne que le flush ne met pas à jour n'est plus en cours : si elle a été
+annulée ou mise en pause (depuis n'importe quel processus), le jeton
+d'interruption du téléchargement est posé (voir youtube_download_control).
+
+media_progress_registry suit de la même façon les conversions ffmpeg en
+cours, par job de la file (youtube.download.job) : pourcentage et vitesse
+d'encodage sont flushés sur le job puis publiés sur le bus.
+"""
+import logging
+import threading
+import time
+
+from odoo import api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+
+from .youtube_download_control import INTERRUPT_STATES, download_control
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 2.0  # secondes
+MIN_FLUSH_INTERVAL = 0.5
+MAX_FLUSH_INTERVAL = 60.0
+
+
+class ProgressRegistry:
+    """Progression des téléchargements en cours dans ce processus, par base."""
+
+    def __init__(self, autostart=True):
+        self.autostart = autostart
+        self._lock = threading.Lock()
+        self._entries = {}   # {dbname: {record_id: dict}}
+        self._dirty = {}     # {dbname: set(record_ids)}
+        self._flushers = {}  # {dbname: Thread}
+
+    def update(self, dbname, record_id, progress, downloaded_bytes=None,
+               total_bytes=None, speed=None, eta=None):
+        """Met à jour la progression d'un téléchargement (aucun accès base)."""
+        with self._lock:
+            entries = self._entries.setdefault(dbname, {})
+            entry = entries.setdefault(record_id, {})
+            entry.update({
+                'progress': progress,
+                'downloaded_bytes': downloaded_bytes,
+                'total_bytes': total_bytes,
+                'speed': speed,
+                'eta': eta,
+                'updated_at': time.time(),
+            })
+            self._dirty.setdefault(dbname, set()).add(record_id)
+            if self.autostart and dbname not in self._flushers:
+                thread = threading.Thread(
+                    target=self._flush_loop, args=(dbname,),
+                    daemon=True, name=f"yt-progress-flusher-{dbname}",
+                )
+                self._flushers[dbname] = thread
+                thread.start()
+
+    def get(self, dbname, record_id):
+        """Progression connue en mémoire, ou None."""
+        with self._lock:
+            entry = self._entries.get(dbname, {}).get(record_id)
+            return dict(entry) if entry else None
+
+    def discard(self, dbname, record_id):
+        """Oublie un téléchargement (état final persisté par ailleurs)."""
+        with self._lock:
+            self._entries.get(dbname, {}).pop(record_id, None)
+            self._dirty.get(dbname, set()).discard(record_id)
+
+    def _has_dirty(self, dbname):
+        with self._lock:
+            return bool(self._dirty.get(dbname))
+
+    def _pop_dirty(self, dbname):
+        with self._lock:
+            dirty = self._dirty.get(dbname) or set()
+            entries = self._entries.get(dbname, {})
+            rows = {rid: dict(entries[rid]) for rid in dirty if rid in entries}
+            self._dirty[dbname] = set()
+        return rows
+
+    def flush(self, cr, dbname):
+        """
+        Persiste les progressions modifiées en un seul UPDATE.
+        Retourne {id: entrée} des téléchargements effectivement mis à jour.
+        """
+        rows = self._pop_dirty(dbname)
+        if not rows:
+            return {}
+        return self._persist(cr, dbname, rows)
+
+    def _persist(self, cr, dbname, rows):
+        values = ", ".join(["(%s, %s, %s)"] * len(rows))
+        params = [
+            value for rid, entry in rows.items()
+            for value in (rid, entry['progress'], entry.get('speed'))
+        ]
+        # Seuls les téléchargements encore actifs sont mis à jour : un état
+        # final écrit entre-temps n'est jamais écrasé par une progression.
+        cr.execute(f"""
+            UPDATE youtube_download AS d
+               SET progress = v.progress::float8,
+                   live_speed = v.speed::float8
+              FROM (VALUES {values}) AS v(id, progress, speed)
+             WHERE d.id = v.id
+               AND d.state IN ('pending', 'downloading')
+         RETURNING d.id
+        """, params)
+        updated = {row[0]: rows[row[0]] for row in cr.fetchall()}
+        stopped = set(rows) - set(updated)
+        if stopped:
+            cr.execute(
+                "SELECT id, state FROM youtube_download WHERE id IN %s AND state IN %s",
+                (tuple(stopped), tuple(INTERRUPT_STATES)),
+            )
+            for record_id, state in cr.fetchall():
+                download_control.request(dbname, record_id, INTERRUPT_STATES[state])
+        return updated
+
+    def _get_flush_interval(self, cr):
+        cr.execute(
+            "SELECT value FROM ir_config_parameter WHERE key = %s",
+            ('youtube_downloader.progress_flush_interval',),
+        )
+        row = cr.fetchone()
+        try:
+            interval = float(row[0]) if row else DEFAULT_FLUSH_INTERVAL
+        except (ValueError, TypeError):
+            interval = DEFAULT_FLUSH_INTERVAL
+        return max(MIN_FLUSH_INTERVAL, min(interval, MAX_FLUSH_INTERVAL))
+
+    def _flush_loop(self, dbname):
+        interval = DEFAULT_FLUSH_INTERVAL
+        while True:
+            time.sleep(interval)
+            # Rien de modifié : pas de curseur ni de lecture du paramètre
+            if not self._has_dirty(dbname):
+                continue
+            try:
+                with Registry(dbname).cursor() as cr:
+                    interval = self._get_flush_interval(cr)
+                    updated = self.flush(cr, dbname)
+                    if updated:
+                        self._publish(api.Environment(cr, SUPERUSER_ID, {}), updated)
+            except Exception as e:
+                _logger.warning("Flush de progression échoué (%s) : %s", dbname, str(e))
+
+    def _publish(self, env, updated):
+        env['youtube.download'].browse(list(updated))._bus_send_progress(updated)
+
+
+class MediaProgressRegistry(ProgressRegistry):
+    """Progression des conversions ffmpeg en cours dans ce processus, par job."""
+
+    def _persist(self, cr, dbname, rows):
+        values = ", ".join(["(%s, %s, %s)"] * len(rows))
+        params = [
+            value for job_id, entry in rows.items()
+            for value in (job_id, entry['progress'], entry.get('speed'))
+        ]
+        cr.execute(f"""
+            UPDATE youtube_download_job AS j
+               SET progress = v.progress::float8,
+                   encode_speed = v.speed::float8
+              FROM (VALUES {values}) AS v(id, progress, speed)
+             WHERE j.id = v.id
+               AND j.state = 'running'
+         RETURNING j.id
+        """, params)
+        return {row[0]: rows[row[0]] for row in cr.fetchall()}
+
+    def _publish(self, env, updated):
+        env['youtube.download.job'].browse(list(updated))._bus_send_progress(updated)
+
+
+progress_registry = ProgressRegistry()
+media_progress_registry = MediaProgressRegistry()
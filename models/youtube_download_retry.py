@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Classement des erreurs de téléchargement et planification des reprises.
+
+Une erreur yt-dlp est classée :
+- permanente (vidéo privée, supprimée, soumise à l'âge, géo-bloquée…) :
+  échec immédiat, l'ID vidéo est mémorisé dans le cache négatif
+  (youtube.dead.video) pour ne pas être retenté par d'autres enregistrements ;
+- bridée (HTTP 429, contrôle anti-robot) : reprise après un long délai ;
+- transitoire (réseau, 5xx…) : reprise rapide.
+
+Les reprises ne dorment plus dans le worker : le job est remis en file avec
+une date de prochaine tentative (backoff exponentiel avec gigue), le créneau
+de téléchargement est libéré aussitôt.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+ERROR_PERMANENT = 'permanent'
+ERROR_THROTTLED = 'throttled'
+ERROR_TRANSIENT = 'transient'
+
+# Fragments (en minuscules) des messages yt-dlp, testés dans cet ordre
+THROTTLED_ERROR_PATTERNS = (
+    'http error 429',
+    'too many requests',
+    'not a bot',
+    'rate-limit',
+    'rate limit',
+    'throttl',
+)
+PERMANENT_ERROR_PATTERNS = (
+    'private video',
+    'video unavailable',
+    'has been removed',
+    'been terminated',
+    'no longer available',
+    'copyright',
+    'confirm your age',
+    'age-restricted',
+    'inappropriate for some users',
+    'not available in your country',
+    'geo restrict',
+    'geo-restrict',
+    'members-only',
+    'join this channel',
+    'unsupported url',
+    'http error 404',
+    'http error 410',
+)
+
+# (délai de base, plafond) en secondes par classe d'erreur reprise
+RETRY_BACKOFF = {
+    ERROR_TRANSIENT: (10, 600),
+    ERROR_THROTTLED: (120, 3600),
+}
+DEFAULT_DEAD_VIDEO_TTL_DAYS = 7
+
+
+def classify_download_error(message):
+    """Classe un message d'erreur : permanente, bridée ou transitoire."""
+    text = (message or '').lower()
+    if any(pattern in text for pattern in THROTTLED_ERROR_PATTERNS):
+        return ERROR_THROTTLED
+    if any(pattern in text for pattern in PERMANENT_ERROR_PATTERNS):
+        return ERROR_PERMANENT
+    return ERROR_TRANSIENT
+
+
+def retry_delay(kind, attempt):
+    """
+    Délai avant la tentative suivante (secondes) : backoff exponentiel
+    plafonné, tiré entre la moitié et la totalité du palier (gigue) pour
+    que des échecs simultanés ne reviennent pas tous au même instant.
+    """
+    base, cap = RETRY_BACKOFF.get(kind, RETRY_BACKOFF[ERROR_TRANSIENT])
+    ceiling = min(cap, base * 2 ** max(attempt - 1, 0))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class YoutubeDeadVideo(models.Model):
+    _name = 'youtube.dead.video'
+    _description = "Vidéo en échec définitif (cache négatif)"
+    _order = 'write_date desc'
+
+    video_id = fields.Char(string='ID Vidéo', required=True, readonly=True)
+    reason = fields.Text(string='Erreur', readonly=True)
+    hit_count = fields.Integer(string='Demandes refusées', readonly=True, default=0)
+    expires_at = fields.Datetime(string='Expire le', required=True, index=True, readonly=True)
+
+    _sql_constraints = [
+        ('video_id_uniq', 'unique(video_id)', 'Une seule entrée par vidéo !'),
+    ]
+
+    @api.model
+    def _get_ttl(self):
+        try:
+            days = float(self.env['ir.config_parameter'].sudo().get_param(
+                'youtube_downloader.dead_video_ttl_days', DEFAULT_DEAD_VIDEO_TTL_DAYS,
+            ))
+        except (ValueError, TypeError):
+            days = DEFAULT_DEAD_VIDEO_TTL_DAYS
+        return timedelta(days=max(days, 0))
+
+    @api.model
+    def _lookup(self, video_id):
+        """Entrée non expirée pour `video_id` (compteur incrémenté), ou vide."""
+        if not video_id:
+            return self.browse()
+        entry = self.search([
+            ('video_id', '=', video_id),
+            ('expires_at', '>', fields.Datetime.now()),
+        ], limit=1)
+        if entry:
+            entry.hit_count += 1
+        return entry
+
+    @api.model
+    def _remember(self, video_id, reason):
+        """Mémorise une vidéo en échec permanent (prolonge l'entrée existante)."""
+        ttl = self._get_ttl()
+        if not video_id or not ttl:
+            return
+        self.env.cr.execute("""
+            INSERT INTO youtube_dead_video
+                   (video_id, reason, hit_count, expires_at,
+                    create_uid, write_uid, create_date, write_date)
+            VALUES (%s, %s, 0, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')
+            ON CONFLICT (video_id) DO UPDATE
+               SET reason = EXCLUDED.reason,
+                   expires_at = EXCLUDED.expires_at,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, (video_id, reason, fields.Datetime.now() + ttl, self.env.uid, self.env.uid))
+        self.invalidate_model()
+
+    @api.model
+    def _forget(self, video_id):
+        """Retire une vidéo du cache négatif (relance explicite)."""
+        if video_id:
+            self.search([('video_id', '=', video_id)]).unlink()
+
+    @api.autovacuum
+    def _gc_expired(self):
+        """Supprime les entrées expirées."""
+        self.search([('expires_at', '<=', fields.Datetime.now())]).unlink()
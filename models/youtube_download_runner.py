@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Processus enfant d'exécution de yt-dlp (mode « processus isolés »).
+
+Lancé par youtube_download_process.RunnerPool avec l'interpréteur d'Odoo,
+ce script n'importe ni Odoo ni l'addon : seulement la bibliothèque standard
+et yt-dlp. Il enchaîne les téléchargements reçus sur stdin et répond sur
+stdout, un message JSON par ligne :
+
+parent → enfant
+    {"type": "job", "url": ..., "opts": {...}, "cached_info": {...} | null}
+    {"type": "reply", "action": null | "cancel" | "pause"}
+        réponse à chaque événement de hook : le parent y applique la
+        limitation de bande passante (réponse différée) et l'annulation.
+
+enfant → parent
+    {"type": "progress", "data": {...}}      hook de progression (attend "reply")
+    {"type": "postprocess", "data": {...}}   hook de post-traitement (attend "reply")
+    {"type": "cache_invalid", "error": ...}  info-dict en cache inutilisable
+    {"type": "result", "info": {...}, "filepath": ..., "rss_mb": ..., "recycle": bool}
+    {"type": "error", "message": ..., "interrupt": null | action, "rss_mb": ..., "recycle": bool}
+
+Après chaque job, l'enfant se termine de lui-même (recycle) s'il a traité
+--max-jobs téléchargements ou si sa mémoire résidente maximale dépasse
+--max-memory-mb : la croissance mémoire de yt-dlp ne s'accumule jamais.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+
+# Clés de l'info-dict renvoyées au parent (le reste : formats, etc. reste ici)
+RESULT_INFO_KEYS = ('id', 'title', 'uploader', 'duration', 'view_count', 'thumbnail')
+# Clés des événements de hook utiles au parent
+PROGRESS_KEYS = (
+    'status', 'filename', 'downloaded_bytes', 'total_bytes',
+    'total_bytes_estimate', 'speed', 'eta',
+)
+POSTPROCESS_KEYS = ('status', 'postprocessor')
+# Options yt-dlp transmises en liste par JSON mais attendues en tuple
+TUPLE_OPTS = ('cookiesfrombrowser',)
+
+
+class Interrupted(Exception):
+    """Interruption demandée par le parent en réponse à un hook."""
+
+    def __init__(self, action):
+        super().__init__(action)
+        self.action = action
+
+
+def max_rss_mb():
+    """Mémoire résidente maximale du processus (Mo ; ru_maxrss est en Ko sous Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class Channel:
+    """Messages JSON ligne à ligne sur les flux standard."""
+
+    def __init__(self, stdin, stdout):
+        self.stdin = stdin
+        self.stdout = stdout
+
+    def send(self, message):
+        self.stdout.write(json.dumps(message, default=str) + '\n')
+        self.stdout.flush()
+
+    def receive(self):
+        line = self.stdin.readline()
+        if not line:
+            return None
+        return json.loads(line)
+
+    def ask(self, message):
+        """Envoie un événement de hook et attend la réponse du parent."""
+        self.send(message)
+        reply = self.receive()
+        if reply is None:
+            # Parent disparu : inutile de poursuivre le transfert
+            raise Interrupted('cancel')
+        if reply.get('action'):
+            raise Interrupted(reply['action'])
+
+
+def _pick(data, keys):
+    return {key: data.get(key) for key in keys if data.get(key) is not None}
+
+
+def run_job(yt_dlp, channel, job):
+    """Exécute un téléchargement ; retourne (info réduite, chemin du fichier)."""
+    opts = dict(job['opts'])
+    for key in TUPLE_OPTS:
+        if isinstance(opts.get(key), list):
+            opts[key] = tuple(opts[key])
+    opts['progress_hooks'] = [
+        lambda d: channel.ask({'type': 'progress', 'data': _pick(d, PROGRESS_KEYS)})
+    ]
+    opts['postprocessor_hooks'] = [
+        lambda d: channel.ask({'type': 'postprocess', 'data': _pick(d, POSTPROCESS_KEYS)})
+    ]
+    cached_info = job.get('cached_info')
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = None
+        if cached_info:
+            try:
+                info = ydl.process_ie_result(cached_info, download=True)
+            except Interrupted:
+                raise
+            except Exception as e:
+                channel.send({'type': 'cache_invalid', 'error': str(e)})
+        if info is None:
+            info = ydl.extract_info(job['url'], download=True)
+        if 'requested_downloads' in info:
+            filepath = info['requested_downloads'][0].get('filepath')
+        else:
+            filepath = ydl.prepare_filename(info)
+    return _pick(info, RESULT_INFO_KEYS), filepath
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--max-jobs', type=int, default=0)
+    parser.add_argument('--max-memory-mb', type=float, default=0)
+    args = parser.parse_args(argv)
+
+    # stdout est réservé au protocole : toute sortie parasite part sur stderr
+    channel = Channel(sys.stdin, sys.stdout)
+    sys.stdout = sys.stderr
+
+    import yt_dlp
+
+    done = 0
+    while True:
+        job = channel.receive()
+        if job is None or job.get('type') != 'job':
+            return 0
+        done += 1
+        try:
+            info, filepath = run_job(yt_dlp, channel, job)
+            message = {'type': 'result', 'info': info, 'filepath': filepath}
+        except Interrupted as e:
+            message = {'type': 'error', 'message': 'interrupted', 'interrupt': e.action}
+        except BaseException as e:  # yt-dlp lève aussi SystemExit / KeyboardInterrupt
+            message = {'type': 'error', 'message': str(e) or type(e).__name__, 'interrupt': None}
+        rss = max_rss_mb()
+        recycle = bool(
+            (args.max_jobs and done >= args.max_jobs)
+            or (args.max_memory_mb and rss >= args.max_memory_mb)
+        )
+        message.update({'rss_mb': round(rss, 1), 'recycle': recycle, 'pid': os.getpid()})
+        channel.send(message)
+        if recycle:
+            return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
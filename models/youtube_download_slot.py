@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Créneaux de concurrence partagés au niveau de la base de données.
+
+Les sémaphores Python ne valent que pour un processus : avec ``--workers=8``
+ou plusieurs nœuds, la limite « 3 téléchargements simultanés » était multipliée
+d'autant. Chaque téléchargement / conversion en cours détient désormais un bail
+(ligne de ``youtube.download.slot``) renouvelé par un heartbeat ; l'attribution
+est sérialisée par un verrou consultatif PostgreSQL et la limite est relue à
+chaque demande, donc un changement de paramètre s'applique immédiatement.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+from odoo import models, fields, api, SUPERUSER_ID
+from odoo.modules.registry import Registry
+
+_logger = logging.getLogger(__name__)
+
+# Durée d'un bail de créneau sans heartbeat (processus mort, nœud arrêté)
+SLOT_LEASE_DURATION = 120  # secondes
+# Intervalle de renouvellement des baux détenus par ce processus
+SLOT_HEARTBEAT_INTERVAL = 30  # secondes
+# Intervalle entre deux tentatives d'acquisition bloquante
+SLOT_RETRY_INTERVAL = 2  # secondes
+
+# Paramètre de limite, valeur par défaut et bornes par type de créneau
+SLOT_LIMIT_PARAMS = {
+    'download': ('youtube_downloader.max_concurrent', 3, 1, 50),
+    # ffmpeg se partage les cœurs (youtube_downloader.conversion_threads)
+    'conversion': ('youtube_downloader.max_concurrent_conversions', 2, 1, 32),
+    'metadata': ('youtube_downloader.max_concurrent_metadata_batches', 1, 1, 5),
+    # Un job Telegram ouvre la session Telethon (fichier SQLite partagé)
+    'telegram': ('youtube_downloader.max_concurrent_telegram_jobs', 1, 1, 5),
+}
+
+_cluster_semaphores = {}
+_cluster_semaphores_lock = threading.Lock()
+_held_slots = {}  # {dbname: set(slot_ids)} détenus par ce processus
+_held_slots_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+def _slot_heartbeat_loop():
+    """Renouvelle les baux de tous les créneaux détenus par ce processus."""
+    while True:
+        time.sleep(SLOT_HEARTBEAT_INTERVAL)
+        with _held_slots_lock:
+            held = {db: list(ids) for db, ids in _held_slots.items() if ids}
+        for dbname, slot_ids in held.items():
+            try:
+                with Registry(dbname).cursor() as cr:
+                    env = api.Environment(cr, SUPERUSER_ID, {})
+                    env['youtube.download.slot']._renew(slot_ids)
+                    cr.commit()
+            except Exception as e:
+                _logger.warning("Renouvellement des créneaux échoué (%s) : %s", dbname, str(e))
+
+
+def _ensure_heartbeat():
+    global _heartbeat_thread
+    with _held_slots_lock:
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(
+                target=_slot_heartbeat_loop, daemon=True, name="yt-slot-heartbeat",
+            )
+            _heartbeat_thread.start()
+
+
+class ClusterSemaphore:
+    """
+    Sémaphore partagé par tous les processus / nœuds d'une même base.
+
+    Même interface que ``threading.Semaphore`` (acquire / release) : le bail
+    acquis est mémorisé par thread pour que ``release()`` sans argument libère
+    le bon créneau.
+    """
+
+    def __init__(self, dbname, kind):
+        self.dbname = dbname
+        self.kind = kind
+        self._local = threading.local()
+
+    def _holder(self):
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+
+    def _try_acquire(self):
+        with Registry(self.dbname).cursor() as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            slot_id = env['youtube.download.slot']._try_acquire(self.kind, self._holder())
+            cr.commit()
+        return slot_id
+
+    def acquire(self, blocking=True, timeout=None):
+        """Acquiert un créneau ; attend qu'un créneau se libère si `blocking`."""
+        deadline = time.monotonic() + timeout if timeout else None
+        while True:
+            slot_id = self._try_acquire()
+            if slot_id:
+                break
+            if not blocking or (deadline and time.monotonic() >= deadline):
+                return False
+            time.sleep(SLOT_RETRY_INTERVAL)
+        stack = getattr(self._local, 'slot_ids', None)
+        if stack is None:
+            stack = self._local.slot_ids = []
+        stack.append(slot_id)
+        with _held_slots_lock:
+            _held_slots.setdefault(self.dbname, set()).add(slot_id)
+        _ensure_heartbeat()
+        return True
+
+    def release(self):
+        """Libère le dernier créneau acquis par le thread courant."""
+        stack = getattr(self._local, 'slot_ids', None)
+        if not stack:
+            return
+        slot_id = stack.pop()
+        with _held_slots_lock:
+            _held_slots.get(self.dbname, set()).discard(slot_id)
+        try:
+            with Registry(self.dbname).cursor() as cr:
+                env = api.Environment(cr, SUPERUSER_ID, {})
+                env['youtube.download.slot']._release([slot_id])
+                cr.commit()
+        except Exception as e:
+            # Le bail expirera de lui-même faute de heartbeat
+            _logger.warning("Libération du créneau %s échouée : %s", slot_id, str(e))
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def get_cluster_semaphore(dbname, kind):
+    """Retourne le sémaphore partagé `kind` ('download' / 'conversion') de la base."""
+    with _cluster_semaphores_lock:
+        key = (dbname, kind)
+        if key not in _cluster_semaphores:
+            _cluster_semaphores[key] = ClusterSemaphore(dbname, kind)
+        return _cluster_semaphores[key]
+
+
+class YoutubeDownloadSlot(models.Model):
+    _name = 'youtube.download.slot'
+    _description = "Créneau de concurrence (bail partagé)"
+    _order = 'kind, id'
+
+    kind = fields.Selection([
+        ('download', 'Téléchargement'),
+        ('conversion', 'Conversion ffmpeg'),
+        ('metadata', 'Récupération des infos'),
+        ('telegram', 'Téléchargement Telegram'),
+    ], string='Type', required=True, index=True)
+    holder = fields.Char(string='Détenteur', readonly=True)
+    expires_at = fields.Datetime(string='Expire le', required=True, index=True)
+
+    @api.model
+    def _get_limit(self, kind):
+        """
+        Limite courante de créneaux `kind`. Lue directement en base (et non via
+        le cache ormcache de get_param, propre à chaque processus) pour qu'une
+        modification du paramètre s'applique immédiatement sur tous les nœuds.
+        """
+        if kind == 'download':
+            # Mode adaptatif : cible réévaluée par youtube.concurrency.sample
+            adaptive = self.env['youtube.concurrency.sample']._get_adaptive_limit()
+            if adaptive is not None:
+                return adaptive
+        param, default, low, high = SLOT_LIMIT_PARAMS[kind]
+        self.env['ir.config_parameter'].flush_model(['key', 'value'])
+        self.env.cr.execute("SELECT value FROM ir_config_parameter WHERE key = %s", (param,))
+        row = self.env.cr.fetchone()
+        try:
+            value = int(row[0]) if row else default
+        except (ValueError, TypeError):
+            value = default
+        return max(low, min(value, high))
+
+    @api.model
+    def _get_capacity(self, kind):
+        """
+        Nombre maximal de créneaux `kind` atteignable : la limite courante, ou
+        la borne haute en mode adaptatif (taille du pool de workers).
+        """
+        if kind == 'download':
+            Sample = self.env['youtube.concurrency.sample']
+            enabled, _low, high, _target = Sample._get_adaptive_settings()
+            if enabled:
+                return high
+        return self._get_limit(kind)
+
+    @api.model
+    def _lock_key(self, kind):
+        return zlib.crc32(f"youtube_downloader.slot.{kind}".encode())
+
+    @api.model
+    def _try_acquire(self, kind, holder):
+        """Attribue un créneau si la limite le permet ; retourne son id ou False."""
+        # Sérialise les attributions d'un même type jusqu'à la fin de la transaction
+        self.env.cr.execute("SELECT pg_advisory_xact_lock(%s)", (self._lock_key(kind),))
+        now = fields.Datetime.now()
+        self.search([('kind', '=', kind), ('expires_at', '<', now)]).unlink()
+        if self.search_count([('kind', '=', kind)]) >= self._get_limit(kind):
+            return False
+        slot = self.create({
+            'kind': kind,
+            'holder': holder,
+            'expires_at': now + timedelta(seconds=SLOT_LEASE_DURATION),
+        })
+        return slot.id
+
+    @api.model
+    def _renew(self, slot_ids):
+        self.browse(slot_ids).exists().write({
+            'expires_at': fields.Datetime.now() + timedelta(seconds=SLOT_LEASE_DURATION),
+        })
+
+    @api.model
+    def _release(self, slot_ids):
+        self.browse(slot_ids).exists().unlink()
+
+    @api.model
+    def _count_active(self, kind):
+        return self.search_count([
+            ('kind', '=', kind),
+            ('expires_at', '>=', fields.Datetime.now()),
+        ])
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Statistiques journalières pré-agrégées (historique long du tableau de bord).
+
+Une ligne par (jour, source, qualité, utilisateur) : nombre de téléchargements
+terminés, taille, durée de contenu et temps de téléchargement. Le cron ne
+recalcule que les jours touchés par des lignes modifiées depuis le dernier
+filigrane (``youtube_downloader.stats_watermark``), plus les jours marqués
+« à recalculer » par un changement de date ou une suppression.
+"""
+import logging
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import models, fields, api
+
+from .youtube_dashboard import dashboard_cache
+
+_logger = logging.getLogger(__name__)
+
+STATS_WATERMARK_PARAM = 'youtube_downloader.stats_watermark'
+# Recouvrement du filigrane : rattrape les transactions longues validées
+# après le passage précédent du cron (le recalcul d'un jour est idempotent)
+STATS_WATERMARK_OVERLAP = timedelta(hours=1)
+STATS_HISTORY_MONTHS = 12
+
+# Requête de recalcul par source : (table, requête d'agrégation des jours %(days)s)
+STATS_SOURCE_QUERIES = {
+    'youtube': ('youtube_download', """
+        SELECT d.download_date::date, d.quality, d.user_id, count(*),
+               COALESCE(sum(d.file_size), 0), COALESCE(sum(d.video_duration), 0),
+               COALESCE(sum(d.download_duration), 0)
+          FROM youtube_download d
+         WHERE d.state = 'done' AND d.download_date::date = ANY(%(days)s)
+      GROUP BY 1, 2, 3
+    """, 'download_date'),
+    'telegram': ('telegram_channel_video', """
+        SELECT v.download_date::date, NULL, c.user_id, count(*),
+               COALESCE(sum(v.file_size), 0), COALESCE(sum(v.video_duration), 0), 0
+          FROM telegram_channel_video v
+          JOIN telegram_channel c ON c.id = v.channel_id
+         WHERE v.state = 'done' AND v.download_date::date = ANY(%(days)s)
+      GROUP BY 1, 2, 3
+    """, 'download_date'),
+    'external': ('youtube_external_media', """
+        SELECT m.create_date::date, NULL, m.user_id, count(*),
+               COALESCE(sum(m.file_size), 0), COALESCE(sum(m.video_duration), 0), 0
+          FROM youtube_external_media m
+         WHERE m.state = 'done' AND m.create_date::date = ANY(%(days)s)
+      GROUP BY 1, 2, 3
+    """, 'create_date'),
+}
+
+
+class YoutubeDownloadStatsDaily(models.Model):
+    _name = 'youtube.download.stats.daily'
+    _description = "Statistiques journalières de téléchargement"
+    _order = 'day desc, source, id'
+
+    day = fields.Date(string='Jour', required=True, index=True, readonly=True)
+    source = fields.Selection([
+        ('youtube', 'YouTube'),
+        ('telegram', 'Telegram'),
+        ('external', 'Média externe'),
+    ], string='Source', required=True, index=True, readonly=True)
+    quality = fields.Char(string='Qualité', readonly=True)
+    user_id = fields.Many2one('res.users', string='Utilisateur', index=True, readonly=True)
+    download_count = fields.Integer(string='Téléchargements', readonly=True)
+    size_mb = fields.Float(string='Taille (Mo)', readonly=True)
+    duration_sec = fields.Integer(string='Contenu (secondes)', readonly=True)
+    download_time = fields.Float(string='Temps de téléchargement (s)', readonly=True)
+    dirty = fields.Boolean(
+        string='À recalculer', readonly=True, index=True,
+        help="Jour dont une ligne a changé de date ou a été supprimée.",
+    )
+
+    def init(self):
+        # Le cron sélectionne les lignes modifiées depuis le filigrane
+        # (modèle chargé après les trois sources : leurs tables existent)
+        for table in ('youtube_download', 'telegram_channel_video', 'youtube_external_media'):
+            self.env.cr.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_write_date_index ON {table} (write_date)"
+            )
+
+    # ─── Marquage des jours à recalculer ──────────────────────────────────────
+    @api.model
+    def _mark_days_dirty(self, source, days):
+        """Marque les jours `days` de `source` à recalculer au prochain passage."""
+        days = sorted({d.date() if hasattr(d, 'date') else d for d in days if d})
+        if not days:
+            return
+        self.flush_model(['source', 'day', 'dirty'])
+        self.env.cr.execute("""
+            UPDATE youtube_download_stats_daily
+               SET dirty = true
+             WHERE source = %s AND day = ANY(%s) AND NOT dirty
+        """, (source, days))
+        self.invalidate_model(['dirty'])
+
+    # ─── Cron d'agrégation ────────────────────────────────────────────────────
+    @api.model
+    def _cron_rollup(self):
+        """Met à jour les statistiques depuis le dernier filigrane."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        watermark = ICP.get_param(STATS_WATERMARK_PARAM)
+        since = fields.Datetime.to_datetime(watermark) - STATS_WATERMARK_OVERLAP if watermark else None
+        new_watermark = fields.Datetime.now()
+        self.env.flush_all()
+        recomputed = 0
+        for source in STATS_SOURCE_QUERIES:
+            recomputed += self._rollup_source(source, since)
+        ICP.set_param(STATS_WATERMARK_PARAM, fields.Datetime.to_string(new_watermark))
+        if recomputed:
+            dashboard_cache.invalidate(self.env)
+        _logger.info("Statistiques journalières : %d jour(s) recalculé(s)", recomputed)
+        return recomputed
+
+    @api.model
+    def _rollup_source(self, source, since=None):
+        """Recalcule les jours de `source` touchés depuis `since` (tous si None)."""
+        table, query, date_column = STATS_SOURCE_QUERIES[source]
+        cr = self.env.cr
+        if since:
+            cr.execute(f"""
+                SELECT DISTINCT {date_column}::date FROM {table}
+                 WHERE write_date >= %s AND {date_column} IS NOT NULL
+            """, (since,))
+        else:
+            cr.execute(f"SELECT DISTINCT {date_column}::date FROM {table} WHERE {date_column} IS NOT NULL")
+        days = {row[0] for row in cr.fetchall()}
+        cr.execute(
+            "SELECT DISTINCT day FROM youtube_download_stats_daily WHERE source = %s AND dirty",
+            (source,),
+        )
+        days.update(row[0] for row in cr.fetchall())
+        if not days:
+            return 0
+        days = sorted(days)
+
+        cr.execute(
+            "DELETE FROM youtube_download_stats_daily WHERE source = %s AND day = ANY(%s)",
+            (source, days),
+        )
+        self.invalidate_model()
+        cr.execute(query, {'days': days})
+        rows = cr.fetchall()
+        if rows:
+            self.create([{
+                'day': day,
+                'source': source,
+                'quality': quality or False,
+                'user_id': user_id or False,
+                'download_count': count,
+                'size_mb': float(size),
+                'duration_sec': int(duration),
+                'download_time': float(download_time),
+            } for day, quality, user_id, count, size, duration, download_time in rows])
+        return len(days)
+
+    # ─── Lecture ──────────────────────────────────────────────────────────────
+    @api.model
+    def _get_monthly_history(self, months=STATS_HISTORY_MONTHS, domain=None):
+        """
+        Historique mensuel (mois courant inclus) lu dans les statistiques
+        pré-agrégées, règles d'accès appliquées : coût indépendant du volume
+        de téléchargements.
+        """
+        first_month = fields.Date.today().replace(day=1) - relativedelta(months=months - 1)
+        groups = self._read_group(
+            [('day', '>=', first_month)] + (domain or []),
+            ['day:month', 'source'],
+            ['download_count:sum', 'size_mb:sum', 'duration_sec:sum', 'download_time:sum'],
+        )
+        history = {}
+        for i in range(months):
+            month = first_month + relativedelta(months=i)
+            history[month] = {
+                'date': month.strftime('%m/%Y'),
+                'count': 0,
+                'youtube': 0,
+                'telegram': 0,
+                'external': 0,
+                'size_mb': 0.0,
+                'duration_sec': 0,
+                'download_time': 0.0,
+            }
+        for month, source, count, size, duration, download_time in groups:
+            entry = history.get(fields.Date.to_date(month).replace(day=1))
+            if entry is None:
+                continue
+            entry['count'] += count
+            entry[source] += count
+            entry['size_mb'] += size
+            entry['duration_sec'] += duration
+            entry['download_time'] += download_time
+        return list(history.values())
@@ -2,14 +2,13 @@
 import base64
 import os
 import logging
-import shutil
-import subprocess
-import threading
 import uuid
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 
+from .youtube_dashboard import DASHBOARD_CACHE_FIELDS, dashboard_cache
+
 _logger = logging.getLogger(__name__)
 
 # Extensions vidéo et audio autorisées
@@ -26,7 +25,7 @@ ALLOWED_EXTENSIONS = ALLOWED_VIDEO_EXTENSIONS + ALLOWED_AUDIO_EXTENSIONS
 class YoutubeExternalMedia(models.Model):
     _name = 'youtube.external.media'
     _description = 'Média externe (non YouTube)'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'youtube.media.mixin']
     _order = 'create_date desc'
 
     # ─── Champs principaux ────────────────────────────────────────────────────
@@ -159,10 +158,13 @@ class YoutubeExternalMedia(models.Model):
         for rec in records:
             if rec.file_data and rec.file_upload_name:
                 rec._save_file_to_disk()
+        dashboard_cache.invalidate(self.env)
         return records
 
     def write(self, vals):
         res = super().write(vals)
+        if any(field in vals for field in DASHBOARD_CACHE_FIELDS):
+            dashboard_cache.invalidate(self.env)
         if vals.get('file_data') and vals.get('file_upload_name'):
             for rec in self:
                 rec._save_file_to_disk()
@@ -219,16 +221,8 @@ class YoutubeExternalMedia(models.Model):
 
             _logger.info("Média externe sauvegardé : %s (%.2f Mo)", dest_path, file_size_mb)
 
-            # Auto-convertir en MP4 si le format vidéo n'est pas compatible navigateur
-            browser_compatible = {'.mp4', '.webm', '.ogg', '.ogv'}
-            if ext in ALLOWED_VIDEO_EXTENSIONS and ext not in browser_compatible:
-                try:
-                    self._remux_to_mp4(dest_path)
-                except Exception as conv_err:
-                    _logger.warning(
-                        "Auto-conversion MP4 échouée pour média externe [%s] : %s",
-                        dest_path, str(conv_err),
-                    )
+            # Format vidéo non compatible navigateur : conversion MP4 mise en file
+            self._enqueue_media_jobs('convert_mp4', enforce_capacity=False)
 
         except Exception as e:
             _logger.error("Erreur sauvegarde média externe : %s", str(e))
@@ -278,400 +272,6 @@ class YoutubeExternalMedia(models.Model):
         for rec in self:
             rec.in_playlist_count = len(rec.in_playlist_item_ids)
 
-    # ─── Conversion MP4 ──────────────────────────────────────────────────────
-    def _remux_to_mp4(self, source_path):
-        """
-        Remuxe un fichier vidéo non compatible navigateur vers MP4.
-        Utilise 'ffmpeg -c copy' (quasi-instantané), avec fallback ré-encodage.
-        """
-        if not source_path or not os.path.exists(source_path):
-            return
-        if not shutil.which('ffmpeg'):
-            _logger.warning("ffmpeg non disponible, impossible de convertir en MP4")
-            return
-
-        ext = os.path.splitext(source_path)[1].lower()
-        if ext == '.mp4':
-            return
-
-        mp4_path = os.path.splitext(source_path)[0] + '.mp4'
-
-        # Remuxage rapide : copier vidéo, ré-encoder audio en AAC
-        # Opus/Vorbis dans MP4 = son muet dans les navigateurs
-        cmd_remux = [
-            'ffmpeg', '-i', source_path,
-            '-c:v', 'copy',
-            '-c:a', 'aac', '-b:a', '192k',
-            '-movflags', '+faststart',
-            '-y',
-            mp4_path,
-        ]
-        _logger.info("Remuxage externe %s → MP4 (vidéo copy, audio AAC)...", ext)
-        try:
-            result = subprocess.run(cmd_remux, capture_output=True, timeout=600)
-            if result.returncode != 0:
-                _logger.info("Remuxage échoué, ré-encodage complet %s → MP4...", ext)
-                if os.path.exists(mp4_path):
-                    os.remove(mp4_path)
-                cmd_encode = [
-                    'ffmpeg', '-i', source_path,
-                    '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-                    '-c:a', 'aac', '-b:a', '192k',
-                    '-movflags', '+faststart',
-                    '-y',
-                    mp4_path,
-                ]
-                result = subprocess.run(cmd_encode, capture_output=True, timeout=3600)
-                if result.returncode != 0:
-                    stderr_msg = result.stderr.decode('utf-8', errors='replace')[-300:]
-                    raise Exception(f"Ré-encodage échoué: {stderr_msg}")
-
-            if not os.path.exists(mp4_path) or os.path.getsize(mp4_path) == 0:
-                raise Exception("Le fichier MP4 généré est vide ou inexistant")
-
-            new_size_mb = os.path.getsize(mp4_path) / (1024 * 1024)
-            new_file_name = os.path.basename(mp4_path)
-            self.sudo().write({
-                'file_path': mp4_path,
-                'file_name': new_file_name,
-                'file_size': round(new_size_mb, 2),
-            })
-
-            try:
-                if os.path.exists(source_path) and source_path != mp4_path:
-                    os.remove(source_path)
-            except Exception:
-                _logger.warning("Impossible de supprimer l'ancien fichier: %s", source_path)
-
-            _logger.info("Conversion MP4 externe réussie : %s → %s", source_path, mp4_path)
-
-        except subprocess.TimeoutExpired:
-            _logger.error("Timeout lors de la conversion MP4 de %s", source_path)
-            if os.path.exists(mp4_path):
-                os.remove(mp4_path)
-            raise
-        except Exception as e:
-            _logger.error("Erreur conversion MP4 externe : %s", str(e))
-            if os.path.exists(mp4_path) and os.path.getsize(mp4_path) == 0:
-                os.remove(mp4_path)
-            raise
-
-    def action_convert_to_mp4(self):
-        """
-        Action manuelle pour convertir un fichier externe non compatible en MP4.
-        """
-        self.ensure_one()
-        if self.state != 'done':
-            raise UserError(_("Le média n'est pas prêt."))
-        if not self.file_path or not os.path.exists(self.file_path):
-            raise UserError(_("Le fichier n'existe pas sur le serveur."))
-
-        ext = os.path.splitext(self.file_path)[1].lower()
-        if ext == '.mp4':
-            raise UserError(_("Le fichier est déjà au format MP4."))
-        if ext in ALLOWED_AUDIO_EXTENSIONS:
-            raise UserError(_("Ce fichier est un fichier audio, la conversion en MP4 n'est pas applicable."))
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur. La conversion est impossible."))
-
-        self._remux_to_mp4(self.file_path)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Conversion réussie"),
-                'message': _("Le fichier a été converti en MP4 avec succès."),
-                'type': 'success',
-                'sticky': False,
-            },
-        }
-
-    def action_convert_to_mp4_batch(self):
-        """
-        Action batch (multi-sélection) pour convertir les fichiers externes en MP4.
-        Utilise le sémaphore global partagé pour limiter la concurrence.
-        """
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur. La conversion est impossible."))
-
-        browser_compatible = {'.mp4', '.webm', '.ogg', '.ogv'}
-
-        eligible = self.env['youtube.external.media']
-        skipped = 0
-        for rec in self:
-            if rec.state != 'done' or not rec.file_path or not os.path.exists(rec.file_path):
-                skipped += 1
-                continue
-            ext = os.path.splitext(rec.file_path)[1].lower()
-            if ext in browser_compatible or ext in ALLOWED_AUDIO_EXTENSIONS:
-                skipped += 1
-                continue
-            eligible |= rec
-
-        if not eligible:
-            raise UserError(_(
-                "Aucun fichier éligible à la conversion.\n"
-                "Seuls les fichiers vidéo non-MP4 terminés peuvent être convertis."
-            ))
-
-        from .youtube_download import _get_conversion_semaphore
-        max_concurrent = int(self.env['ir.config_parameter'].sudo().get_param(
-            'youtube_downloader.max_concurrent_conversions', '2'
-        ))
-        max_concurrent = max(1, min(max_concurrent, 5))
-        semaphore = _get_conversion_semaphore(max_concurrent)
-
-        # Compteur partagé pour notification de fin de lot
-        batch_tracker = {
-            'total': len(eligible),
-            'done': 0,
-            'errors': 0,
-            'lock': threading.Lock(),
-            'uid': self.env.uid,
-            'dbname': self.env.cr.dbname,
-        }
-
-        # Lancer via pool de workers (évite RuntimeError: can't start new thread)
-        from .youtube_download import _spawn_batch_coordinator
-        work_items = [(self._convert_thread, (rec.id, semaphore, batch_tracker)) for rec in eligible]
-        _spawn_batch_coordinator(work_items, max_concurrent)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Conversion en cours"),
-                'message': _(
-                    "%d fichier(s) en cours de conversion en MP4 "
-                    "(max %d simultané(s)).%s",
-                    len(eligible), max_concurrent,
-                    _(' %d ignoré(s) (déjà MP4/audio/non prêt).', skipped) if skipped else '',
-                ),
-                'type': 'info',
-                'sticky': True,
-            },
-        }
-
-    @api.model
-    def _convert_thread(self, record_id, semaphore, batch_tracker=None):
-        """Thread de conversion MP4 contrôlé par sémaphore."""
-        success = False
-        try:
-            semaphore.acquire()
-            _logger.info("Conversion MP4 démarrée (sémaphore acquis) pour youtube.external.media [%s]", record_id)
-            with self.pool.cursor() as new_cr:
-                new_env = self.env(cr=new_cr)
-                record = new_env['youtube.external.media'].browse(record_id)
-                if record.exists() and record.state == 'done' and record.file_path:
-                    ext = os.path.splitext(record.file_path)[1].lower()
-                    if ext != '.mp4' and os.path.exists(record.file_path):
-                        record._remux_to_mp4(record.file_path)
-                        record.message_post(body=_(
-                            "✅ Conversion en MP4 terminée avec succès."
-                        ))
-                        new_cr.commit()
-                        success = True
-        except Exception as e:
-            _logger.error("Erreur conversion MP4 thread external [%s]: %s", record_id, str(e))
-            try:
-                with self.pool.cursor() as err_cr:
-                    err_env = self.env(cr=err_cr)
-                    rec = err_env['youtube.external.media'].browse(record_id)
-                    if rec.exists():
-                        rec.message_post(body=_(
-                            "❌ Erreur lors de la conversion en MP4 : %s", str(e)
-                        ))
-                        err_cr.commit()
-            except Exception:
-                pass
-        finally:
-            semaphore.release()
-            _logger.info("Sémaphore libéré pour youtube.external.media [%s]", record_id)
-            if batch_tracker:
-                self._notify_batch_progress(batch_tracker, success)
-
-    @api.model
-    def _notify_batch_progress(self, batch_tracker, success):
-        """Met à jour le compteur de lot et envoie une notification bus quand tout est fini."""
-        with batch_tracker['lock']:
-            if success:
-                batch_tracker['done'] += 1
-            else:
-                batch_tracker['errors'] += 1
-            done = batch_tracker['done']
-            errors = batch_tracker['errors']
-            total = batch_tracker['total']
-
-        if done + errors >= total:
-            try:
-                with self.pool.cursor() as bus_cr:
-                    bus_env = self.env(cr=bus_cr)
-                    channel = (batch_tracker['dbname'], 'res.partner', bus_env['res.users'].browse(batch_tracker['uid']).partner_id.id)
-                    message_body = _(
-                        "🎬 Conversion MP4 terminée : %d/%d réussi(s)",
-                        done, total,
-                    )
-                    if errors:
-                        message_body += _(" — %d erreur(s)", errors)
-                    bus_env['bus.bus']._sendone(channel, 'simple_notification', {
-                        'title': _("Conversion MP4 terminée"),
-                        'message': message_body,
-                        'type': 'success' if errors == 0 else 'warning',
-                        'sticky': True,
-                    })
-                    bus_cr.commit()
-            except Exception as e:
-                _logger.error("Erreur envoi notification fin de lot externe : %s", str(e))
-
-    # ─── Réparation audio (MP4 avec Opus/Vorbis → AAC) ─────────────────────
-
-    def _fix_audio_aac(self, file_path):
-        """
-        Ré-encode uniquement l'audio d'un fichier en AAC.
-        Corrige les MP4 muets (Opus/Vorbis incompatible navigateur).
-        """
-        if not file_path or not os.path.exists(file_path):
-            return
-        if not shutil.which('ffmpeg'):
-            return
-
-        tmp_path = file_path + '.fixing.mp4'
-        cmd = [
-            'ffmpeg', '-i', file_path,
-            '-c:v', 'copy',
-            '-c:a', 'aac', '-b:a', '192k',
-            '-movflags', '+faststart',
-            '-y',
-            tmp_path,
-        ]
-        _logger.info("Réparation audio AAC externe : %s", file_path)
-        try:
-            result = subprocess.run(cmd, capture_output=True, timeout=600)
-            if result.returncode != 0:
-                _logger.info("Copy vidéo échoué, ré-encodage complet : %s", file_path)
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-                cmd_full = [
-                    'ffmpeg', '-i', file_path,
-                    '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
-                    '-c:a', 'aac', '-b:a', '192k',
-                    '-movflags', '+faststart',
-                    '-y',
-                    tmp_path,
-                ]
-                result = subprocess.run(cmd_full, capture_output=True, timeout=3600)
-                if result.returncode != 0:
-                    stderr_msg = result.stderr.decode('utf-8', errors='replace')[-300:]
-                    raise Exception(f"Ré-encodage échoué: {stderr_msg}")
-
-            if not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
-                raise Exception("Le fichier réparé est vide")
-
-            os.replace(tmp_path, file_path)
-            new_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-            self.sudo().write({'file_size': round(new_size_mb, 2)})
-            _logger.info("Audio AAC réparé (externe) : %s", file_path)
-
-        except subprocess.TimeoutExpired:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-            raise
-        except Exception as e:
-            if os.path.exists(tmp_path) and os.path.getsize(tmp_path) == 0:
-                os.remove(tmp_path)
-            raise
-
-    def action_fix_audio_batch(self):
-        """
-        Action batch pour réparer l'audio des fichiers vidéo muets.
-        """
-        if not shutil.which('ffmpeg'):
-            raise UserError(_("ffmpeg n'est pas installé sur le serveur."))
-
-        eligible = self.env['youtube.external.media']
-        skipped = 0
-        for rec in self:
-            if rec.state != 'done' or not rec.file_path or not os.path.exists(rec.file_path):
-                skipped += 1
-                continue
-            ext = os.path.splitext(rec.file_path)[1].lower()
-            if ext in ALLOWED_AUDIO_EXTENSIONS:
-                skipped += 1
-                continue
-            eligible |= rec
-
-        if not eligible:
-            raise UserError(_("Aucun fichier vidéo éligible à la réparation audio."))
-
-        from .youtube_download import _get_conversion_semaphore
-        max_concurrent = int(self.env['ir.config_parameter'].sudo().get_param(
-            'youtube_downloader.max_concurrent_conversions', '2'
-        ))
-        max_concurrent = max(1, min(max_concurrent, 5))
-        semaphore = _get_conversion_semaphore(max_concurrent)
-
-        batch_tracker = {
-            'total': len(eligible),
-            'done': 0,
-            'errors': 0,
-            'lock': threading.Lock(),
-            'uid': self.env.uid,
-            'dbname': self.env.cr.dbname,
-        }
-
-        # Lancer via pool de workers (évite RuntimeError: can't start new thread)
-        from .youtube_download import _spawn_batch_coordinator
-        work_items = [(self._fix_audio_thread, (rec.id, semaphore, batch_tracker)) for rec in eligible]
-        _spawn_batch_coordinator(work_items, max_concurrent)
-
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("Réparation audio en cours"),
-                'message': _(
-                    "%d fichier(s) en cours de réparation audio AAC "
-                    "(max %d simultané(s)).%s",
-                    len(eligible), max_concurrent,
-                    _(' %d ignoré(s).', skipped) if skipped else '',
-                ),
-                'type': 'info',
-                'sticky': True,
-            },
-        }
-
-    @api.model
-    def _fix_audio_thread(self, record_id, semaphore, batch_tracker=None):
-        """Thread de réparation audio contrôlé par sémaphore."""
-        success = False
-        try:
-            semaphore.acquire()
-            with self.pool.cursor() as new_cr:
-                new_env = self.env(cr=new_cr)
-                record = new_env['youtube.external.media'].browse(record_id)
-                if record.exists() and record.state == 'done' and record.file_path:
-                    if os.path.exists(record.file_path):
-                        record._fix_audio_aac(record.file_path)
-                        record.message_post(body=_("🔊 Audio réparé en AAC."))
-                        new_cr.commit()
-                        success = True
-        except Exception as e:
-            _logger.error("Erreur réparation audio externe [%s]: %s", record_id, str(e))
-            try:
-                with self.pool.cursor() as err_cr:
-                    err_env = self.env(cr=err_cr)
-                    rec = err_env['youtube.external.media'].browse(record_id)
-                    if rec.exists():
-                        rec.message_post(body=_("❌ Échec réparation audio : %s", str(e)))
-                        err_cr.commit()
-            except Exception:
-                pass
-        finally:
-            semaphore.release()
-            if batch_tracker:
-                self._notify_batch_progress(batch_tracker, success)
-
     # ─── Actions ──────────────────────────────────────────────────────────────
     def action_set_done(self):
         """Marquer comme prêt (si le fichier existe déjà)."""
@@ -709,6 +309,9 @@ class YoutubeExternalMedia(models.Model):
                     _logger.info("Fichier externe supprimé (unlink) : %s", rec.file_path)
                 except Exception as e:
                     _logger.warning("Impossible de supprimer %s : %s", rec.file_path, str(e))
+        self.env['youtube.download.stats.daily']._mark_days_dirty(
+            'external', self.mapped('create_date'))
+        dashboard_cache.invalidate(self.env)
         return super().unlink()
 
     def action_add_to_playlist(self):
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Cache des métadonnées yt-dlp (info-dict, catalogue de formats compris).
+
+Une même URL passait deux à trois fois par ``extract_info`` (récupération
+des infos, lancement du téléchargement, aperçu de l'API mobile), à 1–4 s
+chacune. L'info-dict assaini est désormais conservé en base avec une durée
+de vie (``youtube_downloader.info_cache_ttl``), derrière un LRU en mémoire
+par processus. Clé : ID vidéo, ID playlist, ou à défaut l'URL normalisée,
+suffixée d'une empreinte de la session d'extraction (cookies d'un compte,
+proxy) : un info-dict extrait avec les cookies d'un compte ou via un proxy
+n'est réutilisé que par les extractions de même session (métadonnées
+réservées aux membres, URLs de formats liées à la session et à l'IP).
+
+Les récupérations en lot (extract_infos_parallel) tournent sur un pool de
+threads borné, avec un espacement minimal des requêtes vers un même hôte.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_INFO_CACHE_TTL = 3600  # secondes (les URLs de formats expirent après ~6 h)
+MAX_INFO_CACHE_TTL = 6 * 3600
+INFO_LRU_SIZE = 256
+
+# Options yt-dlp qui définissent la session d'extraction (portée du cache)
+SESSION_OPTS = ('cookiefile', 'cookiesfrombrowser', 'proxy')
+
+# Récupération en lot : threads d'extraction et espacement par hôte
+DEFAULT_FETCH_THREADS = 4
+MAX_FETCH_THREADS = 16
+DEFAULT_HOST_INTERVAL = 0.5  # secondes entre deux requêtes vers un même hôte
+
+
+def session_scope(ydl_opts):
+    """
+    Empreinte de la session d'extraction de `ydl_opts` (cookies, proxy), ou
+    None pour une extraction anonyme directe. Hachée : ni chemin de cookies
+    ni identifiants de proxy dans la clé.
+    """
+    session = {opt: (ydl_opts or {}).get(opt) for opt in SESSION_OPTS}
+    session = {opt: value for opt, value in session.items() if value}
+    if not session:
+        return None
+    return hashlib.sha1(json.dumps(session, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class InfoLRU:
+    """
+    LRU en mémoire devant la table youtube.info.cache (par processus).
+    Conserve le JSON : chaque lecture produit un info-dict neuf, que yt-dlp
+    peut modifier sans altérer le cache.
+    """
+
+    def __init__(self, size=INFO_LRU_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {(dbname, clé): (expiration epoch, JSON)}
+
+    def get(self, dbname, key):
+        with self._lock:
+            entry = self._entries.get((dbname, key))
+            if not entry:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[(dbname, key)]
+                return None
+            self._entries.move_to_end((dbname, key))
+            return entry[1]
+
+    def set(self, dbname, key, info_json, expires_at):
+        with self._lock:
+            self._entries[(dbname, key)] = (expires_at, info_json)
+            self._entries.move_to_end((dbname, key))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, dbname, key):
+        with self._lock:
+            self._entries.pop((dbname, key), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+info_lru = InfoLRU()
+
+
+def _host_key(url):
+    """Hôte d'une URL, alias YouTube regroupés (youtu.be, m., www.)."""
+    host = (urlparse(url).hostname or '').lower()
+    for prefix in ('www.', 'm.', 'music.'):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    return 'youtube.com' if host == 'youtu.be' else host
+
+
+class HostRateLimiter:
+    """Espace d'au moins `interval` secondes les requêtes vers un même hôte (tous threads)."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next = {}  # {hôte: instant monotone du prochain créneau}
+
+    def wait(self, url):
+        host = _host_key(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def extract_infos_parallel(yt_dlp, items, max_workers, host_interval, on_result):
+    """
+    Extrait en parallèle les info-dicts de `items` ([(id, url, ydl_opts)]),
+    sans accès base. `on_result(id, info, error)` est appelé dans le thread
+    appelant au fil des résultats (écriture groupée à la charge de l'appelant).
+    """
+    limiter = HostRateLimiter(host_interval)
+
+    def _extract(url, ydl_opts):
+        limiter.wait(url)
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='yt-info') as executor:
+        futures = {
+            executor.submit(_extract, url, ydl_opts): item_id
+            for item_id, url, ydl_opts in items
+        }
+        for future in as_completed(futures):
+            try:
+                info, error = future.result(), None
+            except Exception as e:
+                info, error = None, str(e)
+            on_result(futures[future], info, error)
+
+
+class YoutubeInfoCache(models.Model):
+    _name = 'youtube.info.cache'
+    _description = "Cache des métadonnées yt-dlp"
+    _order = 'expires_at desc'
+
+    key = fields.Char(string='Clé', required=True, readonly=True)
+    is_playlist = fields.Boolean(string='Playlist', readonly=True)
+    info_json = fields.Text(string='Info-dict (JSON)', readonly=True)
+    expires_at = fields.Datetime(string='Expire le', required=True, index=True, readonly=True)
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', 'La clé de cache doit être unique !'),
+    ]
+
+    @api.model
+    def _cache_key(self, url, ydl_opts=None):
+        """
+        Clé stable d'une URL : playlist:<id>, video:<id> ou url:<url
+        normalisée>, suffixée de @<session> si `ydl_opts` porte des cookies
+        ou un proxy (voir session_scope).
+        """
+        Download = self.env['youtube.download']
+        url = (url or '').strip()
+        key = None
+        if Download._is_playlist_url(url):
+            playlist_id = Download._extract_playlist_id(url)
+            if playlist_id:
+                key = f"playlist:{playlist_id}"
+        if key is None:
+            video_id = Download._extract_video_id(url)
+            key = f"video:{video_id}" if video_id else f"url:{url.rstrip('/')}"
+        scope = session_scope(ydl_opts)
+        return f"{key}@{scope}" if scope else key
+
+    @api.model
+    def _get_ttl(self):
+        try:
+            ttl = int(self.env['ir.config_parameter'].sudo().get_param(
+                'youtube_downloader.info_cache_ttl', DEFAULT_INFO_CACHE_TTL,
+            ))
+        except (ValueError, TypeError):
+            ttl = DEFAULT_INFO_CACHE_TTL
+        return max(0, min(ttl, MAX_INFO_CACHE_TTL))
+
+    @api.model
+    def _get_fetch_settings(self):
+        """(threads d'extraction, espacement par hôte en secondes) des récupérations en lot."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            threads = int(ICP.get_param('youtube_downloader.metadata_fetch_threads', DEFAULT_FETCH_THREADS))
+        except (ValueError, TypeError):
+            threads = DEFAULT_FETCH_THREADS
+        try:
+            interval = float(ICP.get_param('youtube_downloader.metadata_host_interval', DEFAULT_HOST_INTERVAL))
+        except (ValueError, TypeError):
+            interval = DEFAULT_HOST_INTERVAL
+        return max(1, min(threads, MAX_FETCH_THREADS)), max(0.0, min(interval, 10.0))
+
+    @api.model
+    def _get(self, url, ydl_opts=None):
+        """
+        Info-dict en cache et non expiré pour `url` (copie neuve), ou None.
+        `ydl_opts` : options de l'extraction, qui fixent la session (portée).
+        """
+        key = self._cache_key(url, ydl_opts)
+        dbname = self.env.cr.dbname
+        info_json = info_lru.get(dbname, key)
+        if info_json is None:
+            self.env.cr.execute("""
+                SELECT info_json, EXTRACT(EPOCH FROM expires_at) FROM youtube_info_cache
+                 WHERE key = %s AND expires_at > (now() at time zone 'UTC')
+            """, (key,))
+            row = self.env.cr.fetchone()
+            if not row:
+                return None
+            info_json = row[0]
+            info_lru.set(dbname, key, info_json, float(row[1]))
+        try:
+            return json.loads(info_json)
+        except (ValueError, TypeError):
+            return None
+
+    @api.model
+    def _set(self, url, info, ydl_opts=None):
+        """Mémorise l'info-dict (assaini, sérialisable) de `url`, extrait avec `ydl_opts`."""
+        ttl = self._get_ttl()
+        if not ttl or not info:
+            return
+        key = self._cache_key(url, ydl_opts)
+        info_json = json.dumps(info)
+        expires_at = fields.Datetime.now() + timedelta(seconds=ttl)
+        self.env.cr.execute("""
+            INSERT INTO youtube_info_cache
+                   (key, is_playlist, info_json, expires_at,
+                    create_uid, write_uid, create_date, write_date)
+            VALUES (%s, %s, %s, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')
+            ON CONFLICT (key) DO UPDATE
+               SET is_playlist = EXCLUDED.is_playlist,
+                   info_json = EXCLUDED.info_json,
+                   expires_at = EXCLUDED.expires_at,
+                   write_uid = EXCLUDED.write_uid,
+                   write_date = EXCLUDED.write_date
+        """, (key, info.get('_type') == 'playlist' or 'entries' in info,
+              info_json, expires_at, self.env.uid, self.env.uid))
+        info_lru.set(self.env.cr.dbname, key, info_json, time.time() + ttl)
+
+    @api.model
+    def _invalidate(self, url, ydl_opts=None):
+        """Oublie l'entrée de `url` (URLs de formats refusées, vidéo modifiée…)."""
+        key = self._cache_key(url, ydl_opts)
+        info_lru.discard(self.env.cr.dbname, key)
+        self.env.cr.execute("DELETE FROM youtube_info_cache WHERE key = %s", (key,))
+
+    @api.model
+    def _extract_info(self, yt_dlp, url, ydl_opts):
+        """
+        extract_info(download=False) avec cache : retourne l'info-dict en
+        cache s'il est valide, sinon extrait, assainit et mémorise le résultat.
+        """
+        info = self._get(url, ydl_opts)
+        if info is not None:
+            return info
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+        self._set(url, info, ydl_opts)
+        return info
+
+    @api.autovacuum
+    def _gc_expired(self):
+        """Supprime les entrées expirées."""
+        self.env.cr.execute(
+            "DELETE FROM youtube_info_cache WHERE expires_at <= (now() at time zone 'UTC')"
+        )
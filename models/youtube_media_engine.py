@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de traitement média commun à youtube.download, youtube.external.media
+et telegram.channel.video (conversion MP4, réparation audio).
+
+Aucun thread ad hoc : chaque fichier à traiter devient un job de la file
+(youtube.download.job, types convert_mp4 / fix_audio), exécuté par le pool
+de workers borné et limité par les créneaux « conversion » partagés par
+toute la base (youtube_downloader.max_concurrent_conversions).
+
+- Déduplication : la clé d'un job est le chemin réel du fichier. Un fichier
+  déjà en file ou en cours de traitement n'est pas remis en file, y compris
+  depuis un autre modèle qui le partage (vidéo Telegram et son média
+  externe, téléchargements dédupliqués).
+- Contre-pression : au-delà de youtube_downloader.max_queued_conversions
+  jobs média en attente, les demandes manuelles sont refusées (et comptées
+  dans la notification) au lieu d'allonger la file sans fin. Les conversions
+  automatiques de fin de téléchargement ne sont pas concernées.
+- Visibilité : les jobs média apparaissent dans la file de téléchargement
+  (filtre « Traitements média ») et le demandeur est notifié à la fin de
+  chaque lot (youtube.download.job._notify_batch_done). Pendant l'exécution,
+  la progression ffmpeg (pourcentage, vitesse, ETA) passe par
+  media_progress_registry, qui la flushe sur le job et la publie sur le bus ;
+  à la fin, la vitesse d'encodage mesurée reste sur le job (planification
+  de capacité : vue pivot des traitements média).
+- Répartition des cœurs : chaque ffmpeg reçoit les cœurs du nœud divisés
+  par le nombre de conversions en cours sur ce même hôte (bornée par la
+  limite de la base ; youtube_downloader.conversion_threads pour fixer la
+  valeur) au lieu de se disputer tous les cœurs, et passe en priorité
+  basse (nice / ionice) quand la charge de la machine dépasse
+  youtube_downloader.conversion_low_priority_load.
+"""
+import logging
+import os
+import shutil
+import socket
+import uuid
+from contextlib import contextmanager
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+from .youtube_download_progress import media_progress_registry
+from .youtube_media_remux import (
+    AUDIO_EXTENSIONS, BROWSER_COMPATIBLE_EXTENSIONS, available_cpus, cpu_load, ffmpeg_threads,
+    fix_audio_file, plan_label, remux_file_to_mp4,
+)
+
+_logger = logging.getLogger(__name__)
+
+# Modèles traités par le moteur (un même fichier peut être partagé entre eux)
+MEDIA_MODELS = ('youtube.download', 'youtube.external.media', 'telegram.channel.video')
+MEDIA_JOB_TYPES = ('convert_mp4', 'fix_audio')
+# Contre-pression : nombre maximal de jobs média en attente
+MAX_QUEUED_PARAM = 'youtube_downloader.max_queued_conversions'
+DEFAULT_MAX_QUEUED = 500
+# Threads ffmpeg par conversion (0 = cœurs répartis entre les créneaux)
+CONVERSION_THREADS_PARAM = 'youtube_downloader.conversion_threads'
+# Charge (par cœur) au-delà de laquelle ffmpeg passe en priorité basse (0 = jamais)
+LOW_PRIORITY_LOAD_PARAM = 'youtube_downloader.conversion_low_priority_load'
+DEFAULT_LOW_PRIORITY_LOAD = 0.75
+
+
+def media_dedup_key(path):
+    """Clé de déduplication des jobs média : le chemin réel du fichier."""
+    return 'media:%s' % os.path.realpath(path)
+
+
+class YoutubeMediaMixin(models.AbstractModel):
+    _name = 'youtube.media.mixin'
+    _description = 'Traitements média (conversion MP4, réparation audio)'
+
+    remux_plan = fields.Char(
+        string='Plan de conversion', readonly=True, copy=False,
+        help="Dernière conversion MP4 ou réparation audio : stratégie vidéo/audio "
+             "(copy = flux copié, h264 / aac = ré-encodé) et codecs d'origine.",
+    )
+
+    @contextmanager
+    def _short_cursor(self):
+        """
+        Ouvre un curseur court sur l'enregistrement : committé puis rendu au
+        pool à la sortie du bloc. Utilisé par les threads de téléchargement
+        et les jobs média pour ne jamais garder de connexion PostgreSQL
+        pendant le transfert réseau, les pauses de retry ou ffmpeg.
+        """
+        with self.pool.cursor() as cr:
+            yield self.with_env(self.env(cr=cr))
+
+    # ─── Éligibilité et mise en file ─────────────────────────────────────────
+    def _media_eligible(self, job_type):
+        """Vrai si le fichier de l'enregistrement relève du traitement `job_type`."""
+        self.ensure_one()
+        if self.state != 'done' or not self.file_path or not os.path.exists(self.file_path):
+            return False
+        ext = os.path.splitext(self.file_path)[1].lower()
+        if ext in AUDIO_EXTENSIONS:
+            return False
+        if job_type == 'convert_mp4':
+            return ext not in BROWSER_COMPATIBLE_EXTENSIONS
+        return True
+
+    @api.model
+    def _get_max_queued_media_jobs(self):
+        try:
+            limit = int(self.env['ir.config_parameter'].sudo().get_param(
+                MAX_QUEUED_PARAM, DEFAULT_MAX_QUEUED,
+            ))
+        except (TypeError, ValueError):
+            limit = DEFAULT_MAX_QUEUED
+        return max(1, limit)
+
+    @api.model
+    def _media_ffmpeg_tuning(self):
+        """
+        Réglage ffmpeg d'une conversion sur ce nœud : {'threads': cœurs
+        répartis entre les conversions en cours sur l'hôte, 'low_priority':
+        machine chargée (serveur HTTP, autres workers) au moment du lancement}.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            override = int(ICP.get_param(CONVERSION_THREADS_PARAM, 0))
+        except (TypeError, ValueError):
+            override = 0
+        try:
+            threshold = float(ICP.get_param(LOW_PRIORITY_LOAD_PARAM, DEFAULT_LOW_PRIORITY_LOAD))
+        except (TypeError, ValueError):
+            threshold = DEFAULT_LOW_PRIORITY_LOAD
+        slots = self._media_local_slots(self.env['youtube.download.slot']._get_limit('conversion'))
+        load = cpu_load() if threshold > 0 else None
+        return {
+            'threads': ffmpeg_threads(available_cpus(), slots, override),
+            'low_priority': load is not None and load >= threshold,
+        }
+
+    @api.model
+    def _media_local_slots(self, limit):
+        """
+        Conversions simultanées sur cet hôte : jobs média en cours dont le
+        worker tourne ici (tous processus Odoo confondus), la conversion qui
+        démarre comprise. La limite `limit` vaut pour toute la base : avec
+        plusieurs nœuds, chacun n'en exécute qu'une partie.
+        """
+        self.env['youtube.download.job'].flush_model(['state', 'job_type', 'worker_id'])
+        self.env.cr.execute("""
+            SELECT count(*) FROM youtube_download_job
+             WHERE state = 'running' AND job_type IN %s
+               AND split_part(worker_id, ':', 1) = %s
+        """, (MEDIA_JOB_TYPES, socket.gethostname()))
+        running = self.env.cr.fetchone()[0]
+        return max(1, min(running, limit))
+
+    @api.model
+    def _count_queued_media_jobs(self):
+        return self.env['youtube.download.job'].sudo().search_count([
+            ('job_type', 'in', MEDIA_JOB_TYPES),
+            ('state', '=', 'queued'),
+        ])
+
+    def _enqueue_media_jobs(self, job_type, batch_ref=None, enforce_capacity=True):
+        """
+        Met en file un job `job_type` par enregistrement éligible. Retourne
+        les compteurs {queued, duplicates, refused, skipped} : déjà en file
+        ou en cours (même fichier), refusés faute de place dans la file
+        (`enforce_capacity`), non éligibles.
+        """
+        eligible = self.filtered(lambda rec: rec._media_eligible(job_type))
+        stats = {'queued': 0, 'duplicates': 0, 'refused': 0, 'skipped': len(self) - len(eligible)}
+        if enforce_capacity:
+            capacity = max(0, self._get_max_queued_media_jobs() - self._count_queued_media_jobs())
+            stats['refused'] = max(0, len(eligible) - capacity)
+            eligible = eligible[:capacity]
+        if eligible:
+            jobs = self.env['youtube.download.job']._enqueue(
+                eligible, job_type,
+                dedup_keys={rec.id: media_dedup_key(rec.file_path) for rec in eligible},
+                batch_ref=batch_ref,
+            )
+            stats['queued'] = len(jobs)
+            stats['duplicates'] = len(eligible) - len(jobs)
+        return stats
+
+    @api.model
+    def _media_queue_notification(self, job_type, stats, extra=''):
+        """Notification de mise en file d'un lot de traitements média."""
+        if job_type == 'convert_mp4':
+            title = _("Conversion MP4 en file")
+        else:
+            title = _("Réparation audio en file")
+        limit = self.env['youtube.download.slot']._get_limit('conversion')
+        message = _(
+            "%d fichier(s) mis en file (max %d simultané(s), %d traitement(s) en attente).",
+            stats['queued'], limit, self._count_queued_media_jobs(),
+        )
+        if stats['duplicates']:
+            message += _(" %d déjà en file ou en cours.", stats['duplicates'])
+        if stats['refused']:
+            message += _(
+                " %d refusé(s) : file pleine (%d max), réessayez plus tard.",
+                stats['refused'], self._get_max_queued_media_jobs(),
+            )
+        if stats['skipped']:
+            message += _(" %d ignoré(s) (non prêt ou non concerné).", stats['skipped'])
+        if stats['queued']:
+            message += _(" Vous serez notifié à la fin du lot.")
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': title,
+                'message': message + extra,
+                'type': 'warning' if stats['refused'] else 'info',
+                'sticky': bool(stats['refused']),
+            },
+        }
+
+    def _action_enqueue_media(self, job_type):
+        if not shutil.which('ffmpeg'):
+            raise UserError(_("ffmpeg n'est pas installé sur le serveur. Le traitement est impossible."))
+        stats = self._enqueue_media_jobs(job_type, batch_ref=uuid.uuid4().hex)
+        if not any(stats[key] for key in ('queued', 'duplicates', 'refused')):
+            if job_type == 'convert_mp4':
+                raise UserError(_(
+                    "Aucun fichier éligible à la conversion.\n"
+                    "Seuls les fichiers vidéo non-MP4 terminés peuvent être convertis."
+                ))
+            raise UserError(_("Aucun fichier vidéo éligible à la réparation audio."))
+        return self._media_queue_notification(job_type, stats)
+
+    # ─── Actions ─────────────────────────────────────────────────────────────
+    def action_convert_to_mp4(self):
+        """
+        Action manuelle (formulaire) : met en file la conversion MP4 d'un
+        fichier non compatible navigateur (MKV, AVI, MOV…).
+        """
+        self.ensure_one()
+        if self.state != 'done':
+            raise UserError(_("Le fichier n'est pas prêt (téléchargement ou import non terminé)."))
+        if not self.file_path or not os.path.exists(self.file_path):
+            raise UserError(_("Le fichier n'existe pas sur le serveur."))
+        ext = os.path.splitext(self.file_path)[1].lower()
+        if ext == '.mp4':
+            raise UserError(_("Le fichier est déjà au format MP4."))
+        if ext in AUDIO_EXTENSIONS:
+            raise UserError(_("Ce fichier est un fichier audio, la conversion en MP4 n'est pas applicable."))
+        return self._action_enqueue_media('convert_mp4')
+
+    def action_convert_to_mp4_batch(self):
+        """Conversion MP4 groupée (sélection multiple → menu Action)."""
+        return self._action_enqueue_media('convert_mp4')
+
+    def action_fix_audio_batch(self):
+        """
+        Réparation audio groupée (sélection multiple → menu Action) : l'audio
+        des fichiers vidéo est ré-encodé en AAC s'il n'est pas lisible.
+        """
+        return self._action_enqueue_media('fix_audio')
+
+    # ─── Handlers de la file ─────────────────────────────────────────────────
+    def _media_progress_callback(self):
+        """
+        Callback de progression ffmpeg du job en cours (contexte
+        youtube_job_id), ou None hors de la file. Aucun accès base : le
+        registre en mémoire est flushé par son propre thread.
+        """
+        job_id = self.env.context.get('youtube_job_id')
+        if not job_id:
+            return None
+        dbname = self.pool.db_name
+
+        def on_progress(percent, speed, eta):
+            media_progress_registry.update(dbname, job_id, percent or 0.0, speed=speed, eta=eta)
+        return on_progress
+
+    def _record_job_stats(self, plan):
+        """Vitesse d'encodage mesurée, conservée sur le job pour la planification de capacité."""
+        job_id = self.env.context.get('youtube_job_id')
+        media_progress_registry.discard(self.pool.db_name, job_id)
+        if not job_id or not plan:
+            return
+        self.env['youtube.download.job'].sudo().browse(job_id).write({
+            'progress': 100.0,
+            'encode_speed': plan.get('speed') or 0.0,
+            'media_duration': plan.get('duration') or 0.0,
+            'processing_time': plan.get('elapsed') or 0.0,
+            'ffmpeg_threads': plan.get('threads') or 0,
+            'low_priority': bool(plan.get('low_priority')),
+        })
+
+    def _run_convert_mp4_job(self, payload):
+        """
+        Handler de la file : conversion MP4. Exécuté sans curseur ouvert,
+        ffmpeg tourne entre deux curseurs courts.
+        """
+        self.ensure_one()
+        with self._short_cursor() as rec:
+            if not rec._media_eligible('convert_mp4'):
+                _logger.info("%s [%s] : conversion MP4 sans objet, job ignoré.", self._name, self.id)
+                return
+            source_path = rec.file_path
+            tuning = rec._media_ffmpeg_tuning()
+        try:
+            mp4_path, plan = remux_file_to_mp4(source_path, self._media_progress_callback(), tuning)
+            content_hash = self._media_content_hash(mp4_path) if mp4_path else None
+        except Exception as e:
+            with self._short_cursor() as rec:
+                rec._record_job_stats(None)
+                rec.message_post(body=_("❌ Échec de la conversion MP4 : %s", str(e)))
+            raise
+        with self._short_cursor() as rec:
+            rec._record_job_stats(plan)
+            if mp4_path:
+                rec._record_mp4_conversion(source_path, mp4_path, plan, content_hash)
+
+    def _run_fix_audio_job(self, payload):
+        """Handler de la file : réparation audio, ffmpeg exécuté sans curseur."""
+        self.ensure_one()
+        with self._short_cursor() as rec:
+            if not rec._media_eligible('fix_audio'):
+                _logger.info("%s [%s] : réparation audio sans objet, job ignoré.", self._name, self.id)
+                return
+            file_path = rec.file_path
+            tuning = rec._media_ffmpeg_tuning()
+        try:
+            plan, changed = fix_audio_file(file_path, self._media_progress_callback(), tuning)
+        except Exception as e:
+            with self._short_cursor() as rec:
+                rec._record_job_stats(None)
+                rec.message_post(body=_("❌ Échec réparation audio : %s", str(e)))
+            raise
+        with self._short_cursor() as rec:
+            rec._record_job_stats(plan if changed else None)
+            if plan:
+                rec._record_audio_fix(file_path, plan, changed)
+
+    # ─── Persistance des résultats ───────────────────────────────────────────
+    def _media_content_hash(self, path):
+        """Empreinte du fichier produit, calculée sans curseur (None : non suivie)."""
+        return None
+
+    def _media_sharing(self, path):
+        """Enregistrements de tous les modèles média qui référencent `path`, self compris."""
+        self.ensure_one()
+        sharing = []
+        for model in MEDIA_MODELS:
+            records = self.env[model].sudo().search([('file_path', '=', path)])
+            if model == self._name:
+                records |= self.sudo()
+            if records:
+                sharing.append(records)
+        return sharing
+
+    def _record_mp4_conversion(self, source_path, mp4_path, plan=None, content_hash=None):
+        """
+        Enregistre le résultat d'une conversion MP4 sur toutes les références
+        au fichier, puis supprime l'ancien fichier.
+        """
+        self.ensure_one()
+        ext = os.path.splitext(source_path)[1].lower()
+        new_size_mb = round(os.path.getsize(mp4_path) / (1024 * 1024), 2)
+        label = plan_label(plan) if plan else ''
+        for records in self._media_sharing(source_path):
+            records.write({
+                'file_path': mp4_path,
+                'file_name': os.path.basename(mp4_path),
+                'file_size': new_size_mb,
+                'remux_plan': label or False,
+            })
+
+        try:
+            if os.path.exists(source_path) and source_path != mp4_path:
+                os.remove(source_path)
+        except Exception:
+            _logger.warning("Impossible de supprimer l'ancien fichier: %s", source_path)
+
+        self.message_post(body=_(
+            "🔄 <b>Converti en MP4</b><br/>"
+            "Format original : <code>%s</code> → <code>.mp4</code><br/>"
+            "⚙️ Plan : <code>%s</code><br/>"
+            "📦 Nouvelle taille : %.2f Mo",
+            ext, label or '—', new_size_mb,
+        ))
+
+    def _record_audio_fix(self, file_path, plan, changed):
+        """Enregistre le résultat d'une réparation audio sur toutes les références au fichier."""
+        self.ensure_one()
+        if not changed:
+            for records in self._media_sharing(file_path):
+                records.write({'remux_plan': plan_label(plan, noop=True)})
+            return
+        new_size_mb = round(os.path.getsize(file_path) / (1024 * 1024), 2)
+        for records in self._media_sharing(file_path):
+            records.write({'file_size': new_size_mb, 'remux_plan': plan_label(plan)})
+        self.message_post(body=_(
+            "🔊 <b>Audio réparé</b> : plan <code>%s</code> (%.2f Mo)", plan_label(plan), new_size_mb,
+        ))
@@ -0,0 +1,412 @@
+# -*- coding: utf-8 -*-
+"""
+Plan de conversion MP4 guidé par ffprobe (youtube.download,
+youtube.external.media, telegram.channel.video).
+
+Avant toute conversion, les flux du fichier sont inspectés puis chaque flux
+reçoit sa stratégie : copie s'il est déjà lisible dans un MP4 par les
+navigateurs, ré-encodage sinon (vidéo → H.264, audio → AAC). Un MP4 déjà
+conforme n'est pas retouché : relancer la conversion ou la réparation audio
+ne coûte qu'un ffprobe. Sans ffprobe, ou si l'inspection échoue, le plan
+retombe sur l'ancien comportement (vidéo copiée, audio AAC, ré-encodage
+complet si la copie vidéo échoue).
+
+Le plan retenu est résumé (plan_label) et enregistré sur l'enregistrement
+(champ remux_plan), par exemple « copy/aac (vp9/opus) ». remux_file_to_mp4
+et fix_audio_file sont les deux traitements exécutés par les jobs du moteur
+média (youtube_media_engine), sans aucun accès base.
+
+ffmpeg est lancé avec ``-progress pipe:1`` : la progression (temps encodé,
+vitesse) est lue en continu et remontée par un callback (pourcentage,
+vitesse, ETA), stderr n'est conservé que dans un tampon circulaire borné
+(dernières lignes, pour le message d'erreur) et le délai maximal dépend de
+la durée du média au lieu d'un plafond fixe d'une heure.
+
+Les cœurs de la machine sont répartis entre les conversions simultanées :
+le plan porte le nombre de threads ffmpeg du job ('threads', ``-threads``)
+et, quand la machine est déjà chargée, une priorité basse ('low_priority' :
+ffmpeg lancé sous nice / ionice) pour ne pas ralentir le serveur HTTP.
+"""
+import collections
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Extensions lues telles quelles par les navigateurs (pas de conversion MP4)
+BROWSER_COMPATIBLE_EXTENSIONS = {'.mp4', '.webm', '.ogg', '.ogv'}
+AUDIO_EXTENSIONS = {'.mp3', '.wav', '.m4a', '.ogg', '.flac', '.aac', '.wma', '.opus'}
+
+STREAM_COPY = 'copy'
+STREAM_ENCODE = 'encode'
+
+# Codecs (noms ffprobe) copiés tels quels dans un MP4. Pas de HEVC : illisible
+# dans Firefox et la plupart des builds Chromium, il est ré-encodé en H.264.
+MP4_COPY_VIDEO_CODECS = {'h264', 'av1', 'vp9'}
+MP4_COPY_AUDIO_CODECS = {'aac', 'mp3'}
+# Codecs cibles des flux ré-encodés, pour le résumé du plan
+ENCODE_LABELS = {'video': 'h264', 'audio': 'aac'}
+
+FFPROBE_TIMEOUT = 60  # secondes
+# Délais sans durée connue (ffprobe absent ou durée non renseignée)
+REMUX_TIMEOUT = 600  # secondes (copie vidéo, audio éventuellement ré-encodé)
+ENCODE_TIMEOUT = 3600  # secondes (ré-encodage vidéo)
+# Délais proportionnels à la durée du média : marge fixe + secondes de
+# traitement tolérées par seconde de média (ré-encodage à 0,25× au pire)
+TIMEOUT_MARGIN = 300  # secondes
+REMUX_TIMEOUT_FACTOR = 0.5
+ENCODE_TIMEOUT_FACTOR = 4.0
+
+# stderr de ffmpeg : seules les dernières lignes sont gardées en mémoire
+STDERR_TAIL_LINES = 40
+STDERR_LINE_MAX = 500  # caractères
+
+# Priorité basse des conversions quand la machine est chargée
+LOW_PRIORITY_NICE = 10
+IONICE_IDLE_CLASS = '3'
+
+VIDEO_ENCODE_ARGS = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23']
+AUDIO_ENCODE_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+
+def probe_streams(path):
+    """
+    Codecs du premier flux vidéo et du premier flux audio de `path`, et
+    durée du média : {'video': 'vp9' | None, 'audio': 'opus' | None,
+    'duration': 212.4 | None}, ou None si ffprobe est indisponible ou échoue.
+    """
+    if not shutil.which('ffprobe'):
+        return None
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_entries', 'stream=codec_type,codec_name:stream_disposition=attached_pic:format=duration',
+        '-of', 'json', path,
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, timeout=FFPROBE_TIMEOUT)
+        if result.returncode != 0:
+            return None
+        data = json.loads(result.stdout or b'{}')
+    except (OSError, ValueError, subprocess.TimeoutExpired) as e:
+        _logger.warning("ffprobe impossible sur %s : %s", path, str(e))
+        return None
+    streams = data.get('streams') or []
+    probe = {'video': None, 'audio': None, 'duration': _parse_duration((data.get('format') or {}).get('duration'))}
+    for stream in streams:
+        kind = stream.get('codec_type')
+        # Pochette (MJPEG / PNG en « vidéo ») : pas un flux vidéo
+        if kind == 'video' and (stream.get('disposition') or {}).get('attached_pic'):
+            continue
+        if kind in probe and probe[kind] is None:
+            probe[kind] = stream.get('codec_name') or ''
+    return probe
+
+
+def _parse_duration(value):
+    try:
+        duration = float(value)
+    except (TypeError, ValueError):
+        return None
+    return duration if duration > 0 else None
+
+
+def plan_mp4(probe):
+    """
+    Stratégie par flux pour obtenir un MP4 lisible par les navigateurs :
+    {'video': copy | encode | None, 'audio': copy | encode | None,
+    'source': 'vp9/opus' | None, 'duration': secondes | None}. Sans
+    inspection (probe None), plan de repli : vidéo copiée, audio ré-encodé.
+    """
+    if probe is None:
+        return {'video': STREAM_COPY, 'audio': STREAM_ENCODE, 'source': None, 'duration': None}
+    plan = {
+        'source': '/'.join(codec or '-' for codec in (probe['video'], probe['audio'])),
+        'duration': probe.get('duration'),
+    }
+    for kind, copyable in (('video', MP4_COPY_VIDEO_CODECS), ('audio', MP4_COPY_AUDIO_CODECS)):
+        codec = probe[kind]
+        if codec is None:
+            plan[kind] = None
+        else:
+            plan[kind] = STREAM_COPY if codec in copyable else STREAM_ENCODE
+    return plan
+
+
+def plan_is_noop(plan, path):
+    """Vrai si `path` est déjà un MP4 dont tous les flux seraient copiés."""
+    return (
+        os.path.splitext(path)[1].lower() == '.mp4'
+        and plan.get('source') is not None
+        and STREAM_ENCODE not in (plan['video'], plan['audio'])
+    )
+
+
+def plan_label(plan, noop=False):
+    """Résumé du plan pour l'enregistrement, ex. « copy/aac (vp9/opus) »."""
+    if noop:
+        return "conforme (%s)" % plan['source']
+    parts = []
+    for kind in ('video', 'audio'):
+        strategy = plan.get(kind)
+        parts.append(ENCODE_LABELS[kind] if strategy == STREAM_ENCODE else (strategy or '-'))
+    label = '/'.join(parts)
+    return "%s (%s)" % (label, plan['source']) if plan.get('source') else label
+
+
+def conversion_timeout(plan):
+    """Délai maximal d'exécution de `plan`, proportionnel à la durée du média si connue."""
+    encode = plan.get('video') == STREAM_ENCODE
+    duration = plan.get('duration')
+    if not duration:
+        return ENCODE_TIMEOUT if encode else REMUX_TIMEOUT
+    factor = ENCODE_TIMEOUT_FACTOR if encode else REMUX_TIMEOUT_FACTOR
+    return TIMEOUT_MARGIN + duration * factor
+
+
+def available_cpus():
+    """Cœurs utilisables par ce processus (affinité CPU / conteneur compris)."""
+    try:
+        return len(os.sched_getaffinity(0)) or 1
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def ffmpeg_threads(cpus, slots, override=0):
+    """
+    Threads ffmpeg d'une conversion : les `cpus` cœurs répartis entre les
+    `slots` conversions simultanées (au moins 1), ou `override` s'il est
+    fixé (borné au nombre de cœurs).
+    """
+    if override and override > 0:
+        return max(1, min(override, cpus))
+    return max(1, cpus // max(1, slots))
+
+
+def cpu_load():
+    """Charge moyenne sur une minute rapportée au nombre de cœurs, None si inconnue."""
+    try:
+        return os.getloadavg()[0] / available_cpus()
+    except (AttributeError, OSError):
+        return None
+
+
+def low_priority_prefix():
+    """Préfixe de commande abaissant la priorité CPU (nice) et disque (ionice)."""
+    prefix = []
+    if shutil.which('nice'):
+        prefix += ['nice', '-n', str(LOW_PRIORITY_NICE)]
+    if shutil.which('ionice'):
+        prefix += ['ionice', '-c', IONICE_IDLE_CLASS]
+    return prefix
+
+
+def build_mp4_command(source_path, dest_path, plan):
+    """
+    Ligne de commande ffmpeg appliquant `plan` (progression sur stdout),
+    limitée à plan['threads'] threads et sous priorité basse si
+    plan['low_priority'].
+    """
+    cmd = ['ffmpeg', '-nostdin', '-nostats', '-progress', 'pipe:1', '-i', source_path]
+    if plan.get('video') == STREAM_ENCODE:
+        cmd += VIDEO_ENCODE_ARGS
+    elif plan.get('video') == STREAM_COPY:
+        cmd += ['-c:v', 'copy']
+    if plan.get('audio') == STREAM_ENCODE:
+        cmd += AUDIO_ENCODE_ARGS
+    elif plan.get('audio') == STREAM_COPY:
+        cmd += ['-c:a', 'copy']
+    if plan.get('threads'):
+        cmd += ['-threads', str(plan['threads'])]
+    cmd += ['-movflags', '+faststart', '-y', dest_path]
+    if plan.get('low_priority'):
+        cmd = low_priority_prefix() + cmd
+    return cmd
+
+
+FfmpegResult = collections.namedtuple('FfmpegResult', 'returncode stderr speed elapsed')
+
+
+def _parse_speed(value):
+    """« 2.35x » → 2.35 ; None si ffmpeg ne l'a pas encore estimée (« N/A »)."""
+    try:
+        return float(value.rstrip('x'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _drain_stderr(stream, tail):
+    for raw in iter(stream.readline, b''):
+        tail.append(raw.decode('utf-8', errors='replace').rstrip()[:STDERR_LINE_MAX])
+
+
+def _run(cmd, timeout, duration=None, on_progress=None):
+    """
+    Exécute ffmpeg en lisant sa progression (``-progress pipe:1``) au fil de
+    l'eau. `on_progress(percent, speed, eta)` est appelé à chaque bloc de
+    progression (percent None si la durée est inconnue). stderr est lu par
+    un thread dans un tampon circulaire borné. Au-delà de `timeout`, ffmpeg
+    est tué et subprocess.TimeoutExpired levée.
+    Retourne un FfmpegResult (stderr : dernières lignes, speed : vitesse
+    moyenne en multiple du temps réel si mesurable).
+    """
+    started = time.monotonic()
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    tail = collections.deque(maxlen=STDERR_TAIL_LINES)
+    reader = threading.Thread(target=_drain_stderr, args=(proc.stderr, tail), daemon=True,
+                              name="ffmpeg-stderr")
+    reader.start()
+    timed_out = threading.Event()
+
+    def _kill():
+        timed_out.set()
+        proc.kill()
+
+    watchdog = threading.Timer(timeout, _kill)
+    watchdog.daemon = True
+    watchdog.start()
+    encoded = 0.0
+    block = {}
+    try:
+        for raw in iter(proc.stdout.readline, b''):
+            key, _sep, value = raw.decode('ascii', errors='replace').strip().partition('=')
+            if key != 'progress':
+                block[key] = value
+                continue
+            # Fin d'un bloc : out_time_us (ou out_time_ms, en µs lui aussi)
+            try:
+                encoded = int(block.get('out_time_us') or block.get('out_time_ms')) / 1e6
+            except (TypeError, ValueError):
+                pass
+            speed = _parse_speed(block.get('speed'))
+            block = {}
+            if on_progress:
+                percent = eta = None
+                if duration:
+                    percent = max(0.0, min(encoded / duration * 100, 100.0))
+                    if speed:
+                        eta = max(0.0, (duration - encoded) / speed)
+                try:
+                    on_progress(percent, speed, eta)
+                except Exception as e:
+                    _logger.debug("Callback de progression ffmpeg en erreur : %s", str(e))
+        returncode = proc.wait()
+    finally:
+        watchdog.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        reader.join(timeout=5)
+        proc.stdout.close()
+        proc.stderr.close()
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    elapsed = time.monotonic() - started
+    speed = encoded / elapsed if encoded and elapsed > 0 else None
+    return FfmpegResult(returncode, '\n'.join(tail), speed, elapsed)
+
+
+def convert_with_plan(source_path, dest_path, plan, on_progress=None):
+    """
+    Produit `dest_path` (MP4) depuis `source_path` selon `plan`. Si la
+    copie vidéo échoue (conteneur ou flux inattendu), la vidéo est
+    ré-encodée. `on_progress` : voir _run.
+    Retourne le plan effectivement appliqué, complété de la vitesse
+    d'encodage mesurée ('speed', × temps réel) et du temps passé
+    ('elapsed', secondes) ; lève une exception en cas d'échec (le fichier
+    de destination vide est supprimé).
+    """
+    duration = plan.get('duration')
+    try:
+        result = _run(build_mp4_command(source_path, dest_path, plan), conversion_timeout(plan),
+                      duration, on_progress)
+        if result.returncode != 0 and plan.get('video') != STREAM_ENCODE:
+            _logger.info("Copie vidéo impossible, ré-encodage complet de %s", source_path)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            plan = dict(plan, video=STREAM_ENCODE)
+            result = _run(build_mp4_command(source_path, dest_path, plan), conversion_timeout(plan),
+                          duration, on_progress)
+        if result.returncode != 0:
+            raise Exception(f"Ré-encodage échoué: {result.stderr[-300:]}")
+        if not os.path.exists(dest_path) or os.path.getsize(dest_path) == 0:
+            raise Exception("Le fichier MP4 généré est vide ou inexistant")
+        if result.speed:
+            _logger.info("ffmpeg %s : %.2fx temps réel (%.0f s)", plan_label(plan), result.speed, result.elapsed)
+        return dict(plan, speed=result.speed, elapsed=result.elapsed)
+    except subprocess.TimeoutExpired:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    except Exception:
+        if os.path.exists(dest_path) and os.path.getsize(dest_path) == 0:
+            os.remove(dest_path)
+        raise
+
+
+def remux_file_to_mp4(source_path, on_progress=None, tuning=None):
+    """
+    Convertit `source_path` en MP4 à côté de l'original : retourne (chemin
+    du MP4 produit, plan appliqué), ou (None, None) si rien n'a été fait
+    (fichier absent, déjà MP4, ffmpeg indisponible). `tuning` complète le
+    plan ({'threads': n, 'low_priority': bool}).
+    """
+    if not source_path or not os.path.exists(source_path):
+        return None, None
+    if not shutil.which('ffmpeg'):
+        _logger.warning("ffmpeg non disponible, impossible de convertir en MP4")
+        return None, None
+    ext = os.path.splitext(source_path)[1].lower()
+    if ext == '.mp4':
+        return None, None
+
+    mp4_path = os.path.splitext(source_path)[0] + '.mp4'
+    plan = dict(plan_mp4(probe_streams(source_path)), **(tuning or {}))
+    _logger.info("Conversion %s → MP4, plan %s...", source_path, plan_label(plan))
+    try:
+        plan = convert_with_plan(source_path, mp4_path, plan, on_progress)
+    except subprocess.TimeoutExpired:
+        _logger.error("Timeout lors de la conversion MP4 de %s", source_path)
+        raise
+    except Exception as e:
+        _logger.error("Erreur conversion MP4 de %s : %s", source_path, str(e))
+        raise
+    _logger.info("Conversion MP4 réussie : %s → %s", source_path, mp4_path)
+    return mp4_path, plan
+
+
+def fix_audio_file(file_path, on_progress=None, tuning=None):
+    """
+    Rend l'audio de `file_path` lisible par les navigateurs (AAC), en place.
+    Retourne (plan, modifié) : un fichier déjà conforme n'est pas retouché
+    (modifié = False), ou (None, False) si rien n'a pu être fait. `tuning` :
+    voir remux_file_to_mp4.
+    """
+    if not file_path or not os.path.exists(file_path):
+        return None, False
+    if not shutil.which('ffmpeg'):
+        _logger.warning("ffmpeg non disponible")
+        return None, False
+
+    plan = dict(plan_mp4(probe_streams(file_path)), **(tuning or {}))
+    if plan_is_noop(plan, file_path):
+        _logger.info("Réparation audio inutile, fichier déjà conforme : %s", file_path)
+        return plan, False
+
+    tmp_path = file_path + '.fixing.mp4'
+    _logger.info("Réparation audio pour : %s, plan %s", file_path, plan_label(plan))
+    try:
+        plan = convert_with_plan(file_path, tmp_path, plan, on_progress)
+    except subprocess.TimeoutExpired:
+        _logger.error("Timeout réparation audio : %s", file_path)
+        raise
+    except Exception as e:
+        _logger.error("Erreur réparation audio de %s : %s", file_path, str(e))
+        raise
+    os.replace(tmp_path, file_path)
+    _logger.info("Audio réparé : %s", file_path)
+    return plan, True
@@ -17,31 +17,69 @@ export class YoutubeDashboard extends Component {
         this.state = useState({
             data: null,
             loading: true,
+            chartRange: "days",
         });
         this._refreshInterval = null;
-        this._activeRefreshInterval = null;
+        this._telegramRefreshInterval = null;
+        this._reloadTimeout = null;
+        this.busService = useService("bus_service");
+        this._onBusProgress = (payloads) => this._patchActiveProgress(payloads);
+        this._onBusState = () => this._scheduleReload();
 
         onWillStart(async () => {
             await this._loadData();
         });
 
         onMounted(() => {
-            // Rafraîchir le dashboard toutes les 30 secondes
+            // Progression et changements d'état poussés par le bus
+            this.busService.subscribe("youtube_download/progress", this._onBusProgress);
+            this.busService.subscribe("youtube_download/state", this._onBusState);
+            // Filet de sécurité : rafraîchir le dashboard toutes les 30 secondes
             this._refreshInterval = setInterval(() => this._loadData(), 30000);
-            // Si téléchargements actifs (YouTube OU Telegram), rafraîchir toutes les 5 secondes
-            this._activeRefreshInterval = setInterval(() => {
-                if (this.state.data && this._hasActiveDownloads()) {
+            // Les téléchargements Telegram ne publient pas sur le bus :
+            // rafraîchissement rapide uniquement tant qu'ils sont actifs
+            this._telegramRefreshInterval = setInterval(() => {
+                if (this.state.data?.telegram?.downloading > 0) {
                     this._loadData();
                 }
             }, 5000);
         });
 
         onWillUnmount(() => {
+            this.busService.unsubscribe("youtube_download/progress", this._onBusProgress);
+            this.busService.unsubscribe("youtube_download/state", this._onBusState);
             if (this._refreshInterval) clearInterval(this._refreshInterval);
-            if (this._activeRefreshInterval) clearInterval(this._activeRefreshInterval);
+            if (this._telegramRefreshInterval) clearInterval(this._telegramRefreshInterval);
+            if (this._reloadTimeout) clearTimeout(this._reloadTimeout);
         });
     }
 
+    /**
+     * Met à jour la progression des téléchargements actifs affichés,
+     * sans recharger les statistiques.
+     */
+    _patchActiveProgress(payloads) {
+        const active = this.state.data?.active_downloads || [];
+        for (const payload of payloads || []) {
+            const dl = active.find((d) => d.id === payload.id);
+            if (dl) {
+                dl.progress = payload.progress;
+            }
+        }
+    }
+
+    /**
+     * Un changement d'état modifie les compteurs : rechargement groupé
+     * (anti-rebond) plutôt qu'un appel par événement.
+     */
+    _scheduleReload() {
+        if (this._reloadTimeout) return;
+        this._reloadTimeout = setTimeout(() => {
+            this._reloadTimeout = null;
+            this._loadData();
+        }, 2000);
+    }
+
     async _loadData() {
         try {
             const data = await this.orm.call(
@@ -62,21 +100,6 @@ export class YoutubeDashboard extends Component {
         await this._loadData();
     }
 
-    /**
-     * Vérifie si des téléchargements sont actifs (YouTube, Telegram ou les deux)
-     */
-    _hasActiveDownloads() {
-        const d = this.state.data;
-        if (!d) return false;
-        // YouTube en cours
-        if (d.in_progress > 0) return true;
-        // Telegram en cours
-        if (d.telegram && d.telegram.downloading > 0) return true;
-        // Fallback global
-        if (d.global && d.global.in_progress > 0) return true;
-        return false;
-    }
-
     // ─── Navigation actions ────────────────────────────────────────────
 
     onClickTotal() {
@@ -243,10 +266,18 @@ export class YoutubeDashboard extends Component {
         return `${this.state.data.success_rate}%`;
     }
 
+    // Graphique à barres — 14 derniers jours ou 12 derniers mois
+    setChartRange(range) {
+        this.state.chartRange = range;
+    }
+
     // Graphique à barres — données avec hauteur calculée
     get chartData() {
-        if (!this.state.data || !this.state.data.daily_chart) return [];
-        const chart = this.state.data.daily_chart;
+        if (!this.state.data) return [];
+        const chart = this.state.chartRange === "months"
+            ? this.state.data.monthly_chart
+            : this.state.data.daily_chart;
+        if (!chart) return [];
         const maxCount = Math.max(...chart.map(d => d.count), 1);
         return chart.map(d => ({
             ...d,
@@ -1,8 +1,8 @@
 /** @odoo-module **/
 /**
  * YouTube Downloader — JavaScript Odoo 17
- * Polling automatique de la progression des téléchargements
- * Amélioré avec notifications, polling intelligent et gestion d'erreurs
+ * Suivi de la progression des téléchargements poussé par le bus Odoo,
+ * avec notifications et polling de secours lent
  */
 
 import { patch } from "@web/core/utils/patch";
@@ -12,11 +12,19 @@ import { useService } from "@web/core/utils/hooks";
 import { onWillUnmount, onMounted } from "@odoo/owl";
 
 // ─── Configuration ───────────────────────────────────────────────────────────
-const POLL_INTERVAL = 2500; // ms
-const POLL_INTERVAL_SLOW = 5000; // ms (quand en attente)
+// La progression et les changements d'état arrivent par le bus
+// (youtube_download/progress, youtube_download/state) ; le polling n'est
+// plus qu'un filet de sécurité lent.
+const POLL_INTERVAL_FALLBACK = 30000; // ms
+const LIST_RELOAD_FALLBACK = 60000; // ms
+const LIST_RELOAD_DEBOUNCE = 1000; // ms
 const MAX_POLL_ERRORS = 5;
+const BUS_PROGRESS = "youtube_download/progress";
+const BUS_STATE = "youtube_download/state";
+const BUS_FETCH_INFO = "youtube_download/fetch_info";
+const BUS_MEDIA_PROGRESS = "youtube_media/progress";
 
-// ─── Polling de progression sur le formulaire ────────────────────────────────
+// ─── Suivi de progression sur le formulaire ──────────────────────────────────
 patch(FormController.prototype, {
     setup() {
         super.setup(...arguments);
@@ -25,15 +33,48 @@ patch(FormController.prototype, {
 
         this.rpc = useService("rpc");
         this.notification = useService("notification");
+        this.busService = useService("bus_service");
         this._pollingInterval = null;
         this._pollErrors = 0;
         this._lastState = null;
+        this._busChannel = null;
+        this._onBusPayloads = (payloads) => this._onBusNotification(payloads);
 
         onMounted(() => {
+            this._subscribeBus();
             this._startPollingIfNeeded();
             this._setupVideoPlayerSrc();
         });
-        onWillUnmount(() => this._stopPolling());
+        onWillUnmount(() => {
+            this._stopPolling();
+            this._unsubscribeBus();
+        });
+    },
+
+    _subscribeBus() {
+        const recordId = this.model?.root?.resId;
+        if (!recordId) return;
+        this._busChannel = `youtube_download_${recordId}`;
+        this.busService.addChannel(this._busChannel);
+        this.busService.subscribe(BUS_PROGRESS, this._onBusPayloads);
+        this.busService.subscribe(BUS_STATE, this._onBusPayloads);
+    },
+
+    _unsubscribeBus() {
+        this.busService.unsubscribe(BUS_PROGRESS, this._onBusPayloads);
+        this.busService.unsubscribe(BUS_STATE, this._onBusPayloads);
+        if (this._busChannel) {
+            this.busService.deleteChannel(this._busChannel);
+            this._busChannel = null;
+        }
+    },
+
+    _onBusNotification(payloads) {
+        const recordId = this.model?.root?.resId;
+        const payload = (payloads || []).find((p) => p.id === recordId);
+        if (payload) {
+            this._applyStatus(payload);
+        }
     },
 
     async _startPollingIfNeeded() {
@@ -41,11 +82,11 @@ patch(FormController.prototype, {
         const state = this.model.root.data.state;
         if (state === "downloading" || state === "pending") {
             this._lastState = state;
-            this._startPolling(state === "pending" ? POLL_INTERVAL_SLOW : POLL_INTERVAL);
+            this._startPolling();
         }
     },
 
-    _startPolling(interval = POLL_INTERVAL) {
+    _startPolling(interval = POLL_INTERVAL_FALLBACK) {
         if (this._pollingInterval) return;
         this._pollErrors = 0;
         this._pollingInterval = setInterval(async () => {
@@ -78,8 +119,25 @@ patch(FormController.prototype, {
             }
 
             this._pollErrors = 0;
+            await this._applyStatus(result);
+        } catch (e) {
+            this._pollErrors++;
+            console.warn("[YouTubeDownloader] Polling error:", e);
+            if (this._pollErrors >= MAX_POLL_ERRORS) {
+                this._stopPolling();
+                console.error("[YouTubeDownloader] Arrêt du polling après trop d'erreurs.");
+            }
+        }
+    },
 
-            // Mise à jour de la progression dans l'UI
+    /**
+     * Applique un statut (bus ou polling de secours) : seule la barre de
+     * progression est mise à jour ; le formulaire n'est rechargé qu'en fin
+     * de téléchargement.
+     */
+    async _applyStatus(result) {
+        // Mise à jour de la progression dans l'UI
+        if (result.progress !== undefined) {
             const progressBar = document.getElementById("yt_progress_bar");
             const progressText = document.getElementById("yt_progress_text");
             if (progressBar) {
@@ -89,46 +147,48 @@ patch(FormController.prototype, {
             if (progressText) {
                 progressText.textContent = `${result.progress}%`;
             }
+        }
+        if (!result.state || result.state === this._lastState) return;
 
-            // Détection du changement d'état pending -> downloading
-            if (this._lastState === "pending" && result.state === "downloading") {
-                this._stopPolling();
-                this._startPolling(POLL_INTERVAL);
-                this.notification.add(
-                    `📥 Téléchargement démarré : ${result.name}`,
-                    { type: "info", title: "Téléchargement en cours", sticky: false }
-                );
-            }
-            this._lastState = result.state;
+        // Détection du changement d'état pending -> downloading
+        if (this._lastState === "pending" && result.state === "downloading") {
+            this.notification.add(
+                `📥 Téléchargement démarré : ${result.name}`,
+                { type: "info", title: "Téléchargement en cours", sticky: false }
+            );
+        }
+        const previousState = this._lastState;
+        this._lastState = result.state;
 
-            // Téléchargement terminé
-            if (result.state === "done") {
-                this._stopPolling();
-                this.notification.add(
-                    `✅ Téléchargement terminé : ${result.name} (${result.file_size})`,
-                    { type: "success", title: "Terminé", sticky: false }
-                );
+        if (result.state === "pending" || result.state === "downloading") {
+            this._startPolling();
+            if (previousState !== "pending" && previousState !== "downloading") {
                 await this.model.root.load();
             }
-            // Erreur
-            else if (result.state === "error") {
-                this._stopPolling();
-                const retryInfo = result.retry_count > 0
-                    ? ` (tentative ${result.retry_count}/${result.max_retries})`
-                    : "";
-                this.notification.add(
-                    `❌ Erreur${retryInfo} : ${result.error_message || "Erreur inconnue"}`,
-                    { type: "danger", title: "Échec du téléchargement", sticky: true }
-                );
-                await this.model.root.load();
-            }
-        } catch (e) {
-            this._pollErrors++;
-            console.warn("[YouTubeDownloader] Polling error:", e);
-            if (this._pollErrors >= MAX_POLL_ERRORS) {
-                this._stopPolling();
-                console.error("[YouTubeDownloader] Arrêt du polling après trop d'erreurs.");
-            }
+        }
+        // Téléchargement terminé
+        else if (result.state === "done") {
+            this._stopPolling();
+            this.notification.add(
+                `✅ Téléchargement terminé : ${result.name} (${result.file_size})`,
+                { type: "success", title: "Terminé", sticky: false }
+            );
+            await this.model.root.load();
+        }
+        // Erreur
+        else if (result.state === "error") {
+            this._stopPolling();
+            const retryInfo = result.retry_count > 0
+                ? ` (tentative ${result.retry_count}/${result.max_retries})`
+                : "";
+            this.notification.add(
+                `❌ Erreur${retryInfo} : ${result.error_message || "Erreur inconnue"}`,
+                { type: "danger", title: "Échec du téléchargement", sticky: true }
+            );
+            await this.model.root.load();
+        } else {
+            this._stopPolling();
+            await this.model.root.load();
         }
     },
 
@@ -160,31 +220,130 @@ patch(FormController.prototype, {
     },
 });
 
-// ─── Rafraîchissement automatique de la liste ───────────────────────────
+// ─── Mise à jour de la liste via le bus ───────────────────────────────────
 patch(ListController.prototype, {
     setup() {
         super.setup(...arguments);
 
         if (this.props.resModel !== "youtube.download") return;
 
+        this.busService = useService("bus_service");
+        this.notification = useService("notification");
         this._listPollingInterval = null;
+        this._listReloadTimeout = null;
+        this._onListProgress = (payloads) => this._patchListProgress(payloads);
+        this._onListState = () => this._scheduleListReload();
+        this._onFetchInfo = (payload) => this._onFetchInfoProgress(payload);
 
         onMounted(() => {
-            this._listPollingInterval = setInterval(async () => {
-                try {
-                    await this.model.root.load();
-                } catch (e) {
-                    // Ignorer les erreurs silencieuses
-                }
-            }, 10000); // Toutes les 10 secondes
+            this.busService.subscribe(BUS_PROGRESS, this._onListProgress);
+            this.busService.subscribe(BUS_STATE, this._onListState);
+            this.busService.subscribe(BUS_FETCH_INFO, this._onFetchInfo);
+            // Filet de sécurité lent (bus indisponible, autre processus, etc.)
+            this._listPollingInterval = setInterval(
+                () => this._reloadList(), LIST_RELOAD_FALLBACK
+            );
         });
 
         onWillUnmount(() => {
+            this.busService.unsubscribe(BUS_PROGRESS, this._onListProgress);
+            this.busService.unsubscribe(BUS_STATE, this._onListState);
+            this.busService.unsubscribe(BUS_FETCH_INFO, this._onFetchInfo);
             if (this._listPollingInterval) {
                 clearInterval(this._listPollingInterval);
                 this._listPollingInterval = null;
             }
+            if (this._listReloadTimeout) {
+                clearTimeout(this._listReloadTimeout);
+                this._listReloadTimeout = null;
+            }
+        });
+    },
+
+    /**
+     * Met à jour uniquement la progression des lignes concernées, sans
+     * recharger la liste.
+     */
+    _patchListProgress(payloads) {
+        const records = this.model?.root?.records || [];
+        for (const payload of payloads || []) {
+            const record = records.find((r) => r.resId === payload.id);
+            if (record) {
+                Object.assign(record.data, { progress: payload.progress });
+            }
+        }
+    },
+
+    /**
+     * Récupération des infos en lot : chaque paquet écrit recharge la liste
+     * (anti-rebond) ; un résumé est affiché à la fin.
+     */
+    _onFetchInfoProgress(payload) {
+        this._scheduleListReload();
+        if (!payload?.finished) return;
+        const errors = payload.errors
+            ? ` — ${payload.errors} échec(s)`
+            : "";
+        this.notification.add(
+            `🔍 Informations récupérées : ${payload.done}/${payload.total}${errors}`,
+            { type: payload.errors ? "warning" : "success", sticky: false }
+        );
+    },
+
+    /**
+     * Un changement d'état peut faire entrer / sortir des lignes du filtre
+     * courant : rechargement groupé (anti-rebond).
+     */
+    _scheduleListReload() {
+        if (this._listReloadTimeout) return;
+        this._listReloadTimeout = setTimeout(() => {
+            this._listReloadTimeout = null;
+            this._reloadList();
+        }, LIST_RELOAD_DEBOUNCE);
+    },
+
+    async _reloadList() {
+        try {
+            await this.model.root.load();
+        } catch (e) {
+            // Ignorer les erreurs silencieuses
+        }
+    },
+});
+
+// ─── Progression des traitements média (liste des jobs) ───────────────────
+patch(ListController.prototype, {
+    setup() {
+        super.setup(...arguments);
+
+        if (this.props.resModel !== "youtube.download.job") return;
+
+        this.busService = useService("bus_service");
+        this._onMediaProgress = (payloads) => this._patchMediaProgress(payloads);
+
+        onMounted(() => {
+            this.busService.subscribe(BUS_MEDIA_PROGRESS, this._onMediaProgress);
         });
+        onWillUnmount(() => {
+            this.busService.unsubscribe(BUS_MEDIA_PROGRESS, this._onMediaProgress);
+        });
+    },
+
+    /**
+     * Met à jour la progression et la vitesse d'encodage des jobs affichés,
+     * sans recharger la liste.
+     */
+    _patchMediaProgress(payloads) {
+        const records = this.model?.root?.records || [];
+        for (const payload of payloads || []) {
+            const record = records.find((r) => r.resId === payload.id);
+            if (record) {
+                Object.assign(record.data, {
+                    progress: payload.progress,
+                    encode_speed: payload.speed || record.data.encode_speed,
+                });
+            }
+        }
     },
 });
 
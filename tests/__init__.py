@@ -1,3 +1,19 @@
 # -*- coding: utf-8 -*-
 from . import test_youtube_download
 from . import test_youtube_wizard
+from . import test_youtube_download_job
+from . import test_dashboard_benchmark
+from . import test_youtube_download_stats
+from . import test_youtube_info_cache
+from . import test_youtube_playlist_expansion
+from . import test_youtube_download_blob
+from . import test_youtube_download_retry
+from . import test_youtube_download_concurrency
+from . import test_youtube_download_bandwidth
+from . import test_youtube_download_control
+from . import test_youtube_download_process
+from . import test_youtube_worker_node
+from . import test_youtube_media_remux
+from . import test_youtube_media_engine
+from . import test_media_conversion_benchmark
+from . import test_youtube_controllers
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Banc d'essai du tableau de bord (get_dashboard_data) à 10k, 100k et 1M lignes.
+Non exécuté par défaut ; à lancer explicitement :
+
+    odoo-bin -d <base> -u youtube_downloader --test-tags /youtube_downloader:youtube_downloader_benchmark --stop-after-init
+"""
+import logging
+import time
+
+from odoo.tests import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_SIZES = (10_000, 100_000, 1_000_000)
+
+
+@tagged('post_install', '-at_install', '-standard', 'youtube_downloader_benchmark')
+class TestDashboardBenchmark(TransactionCase):
+    """Nombre de requêtes et latence du tableau de bord selon le volume."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from odoo.addons.youtube_downloader.models.youtube_dashboard import dashboard_cache
+        cls.dashboard_cache = dashboard_cache
+        cls.Download = cls.env['youtube.download']
+
+    def _insert_rows(self, start, stop):
+        """Insère des téléchargements synthétiques (états, qualités et dates variés)."""
+        self.env.cr.execute("""
+            INSERT INTO youtube_download (
+                reference, name, url, state, quality, output_format,
+                file_size, video_duration, download_duration, download_date,
+                video_author, is_playlist, retry_count, max_retries, priority,
+                user_id, company_id, create_uid, write_uid, create_date, write_date
+            )
+            SELECT 'BENCH/' || g, 'Bench ' || g,
+                   'https://www.youtube.com/watch?v=' || lpad(g::text, 11, '0'),
+                   (ARRAY['done', 'done', 'done', 'error', 'draft', 'cancelled'])[1 + g %% 6],
+                   (ARRAY['720p', '1080p', '480p', 'audio_only'])[1 + g %% 4],
+                   (ARRAY['mp4', 'mkv', 'mp3'])[1 + g %% 3],
+                   (g %% 500) + 0.5, g %% 3600, 1 + g %% 60,
+                   now() at time zone 'UTC' - (g %% 30) * interval '1 day',
+                   'Auteur ' || (g %% 200), false, 0, 3, '0',
+                   %(uid)s, %(company)s, %(uid)s, %(uid)s,
+                   now() at time zone 'UTC', now() at time zone 'UTC'
+              FROM generate_series(%(start)s, %(stop)s - 1) AS g
+        """, {'uid': self.env.uid, 'company': self.env.company.id, 'start': start, 'stop': stop})
+        self.env.cr.execute("ANALYZE youtube_download")
+
+    def _measure(self):
+        """Retourne (requêtes, secondes) d'un appel à get_dashboard_data."""
+        cr = self.env.cr
+        queries = cr.sql_log_count
+        started = time.perf_counter()
+        self.Download.get_dashboard_data()
+        return cr.sql_log_count - queries, time.perf_counter() - started
+
+    def test_dashboard_benchmark(self):
+        inserted = 0
+        query_counts = []
+        for size in BENCHMARK_SIZES:
+            self._insert_rows(inserted, size)
+            inserted = size
+            self.env.invalidate_all()
+            self.env.cr.postcommit.clear()
+            self.dashboard_cache.clear(self.env.cr.dbname)
+
+            cold_queries, cold_time = self._measure()
+            warm_queries, warm_time = self._measure()
+            query_counts.append(cold_queries)
+            _logger.info(
+                "Tableau de bord %7d lignes : %d requêtes / %.3f s (cache froid), "
+                "%d requêtes / %.3f s (cache chaud)",
+                size, cold_queries, cold_time, warm_queries, warm_time,
+            )
+            self.assertLess(warm_queries, cold_queries)
+
+        # Le nombre de requêtes ne dépend pas du volume
+        self.assertEqual(len(set(query_counts)), 1, query_counts)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Banc d'essai des conversions ffmpeg simultanées sur une machine de 8 et de
+32 cœurs : débit (secondes de média encodées par seconde) sans -threads
+(comportement historique, chaque libx264 prend tous les cœurs) et avec les
+cœurs répartis entre les conversions (ffmpeg_threads).
+Non exécuté par défaut ; à lancer explicitement :
+
+    odoo-bin -d <base> -u youtube_downloader --test-tags /youtube_downloader:youtube_downloader_benchmark --stop-after-init
+
+La taille de machine est simulée en restreignant l'affinité CPU du processus
+(héritée par ffmpeg) ; une taille supérieure au nombre de cœurs disponibles
+est ignorée. Nécessite ffmpeg compilé avec libx264.
+"""
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from odoo.tests import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+BENCHMARK_CPUS = (8, 32)
+# Conversions simultanées comparées (défaut du module, puis limite élevée)
+BENCHMARK_SLOTS = (2, 5)
+CONVERSIONS_PER_SLOT = 2
+CLIP_SECONDS = 20
+CLIP_SIZE = '1280x720'
+
+
+@tagged('post_install', '-at_install', '-standard', 'youtube_downloader_benchmark')
+class TestMediaConversionBenchmark(TransactionCase):
+    """Débit des conversions MP4 simultanées selon la répartition des threads."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.mkdtemp(prefix='yt_conv_bench_')
+        cls.addClassCleanup(shutil.rmtree, cls.tmp, True)
+
+    def setUp(self):
+        super().setUp()
+        if not shutil.which('ffmpeg'):
+            self.skipTest("ffmpeg non disponible")
+        encoders = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                  capture_output=True, text=True).stdout
+        if 'libx264' not in encoders:
+            self.skipTest("ffmpeg sans libx264")
+        if not hasattr(os, 'sched_setaffinity'):
+            self.skipTest("Affinité CPU non disponible sur ce système")
+        self.source = os.path.join(self.tmp, 'source.mkv')
+        if not os.path.exists(self.source):
+            subprocess.run([
+                'ffmpeg', '-nostdin', '-y', '-f', 'lavfi',
+                '-i', f'testsrc2=size={CLIP_SIZE}:rate=30', '-t', str(CLIP_SECONDS),
+                '-c:v', 'mpeg4', '-q:v', '5', self.source,
+            ], check=True, capture_output=True)
+
+    def _measure(self, slots, threads):
+        """Débit (× temps réel) de slots × CONVERSIONS_PER_SLOT encodages, `slots` à la fois."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import (
+            STREAM_ENCODE, convert_with_plan,
+        )
+        plan = {'video': STREAM_ENCODE, 'audio': None, 'source': None,
+                'duration': float(CLIP_SECONDS), 'threads': threads}
+        count = slots * CONVERSIONS_PER_SLOT
+
+        def convert(index):
+            dest = os.path.join(self.tmp, f'out_{index}.mp4')
+            try:
+                convert_with_plan(self.source, dest, plan)
+            finally:
+                if os.path.exists(dest):
+                    os.remove(dest)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=slots) as executor:
+            list(executor.map(convert, range(count)))
+        return count * CLIP_SECONDS / (time.perf_counter() - started)
+
+    def test_conversion_thread_split_benchmark(self):
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import ffmpeg_threads
+        host_cpus = sorted(os.sched_getaffinity(0))
+        self.addCleanup(os.sched_setaffinity, 0, host_cpus)
+        measured = 0
+        for cpus in BENCHMARK_CPUS:
+            if cpus > len(host_cpus):
+                _logger.info("Machine de %d cœurs ignorée (%d disponibles)", cpus, len(host_cpus))
+                continue
+            os.sched_setaffinity(0, host_cpus[:cpus])
+            for slots in BENCHMARK_SLOTS:
+                threads = ffmpeg_threads(cpus, slots)
+                previous = self._measure(slots, None)
+                split = self._measure(slots, threads)
+                _logger.info(
+                    "Conversions %2d cœurs, %d simultanées : %.2fx sans -threads, "
+                    "%.2fx avec -threads %d (%+.0f %%)",
+                    cpus, slots, previous, split, threads, (split / previous - 1) * 100,
+                )
+                # La répartition ne doit pas dégrader le débit (marge de mesure)
+                self.assertGreater(split, previous * 0.9)
+                measured += 1
+        if not measured:
+            self.skipTest("Moins de %d cœurs disponibles" % min(BENCHMARK_CPUS))
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Tests des routes JSON de suivi (polling).
+Couvre : statut du téléchargement d'une vidéo Telegram.
+"""
+import json
+
+from odoo.tests import HttpCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestTelegramStatusRoute(HttpCase):
+    """Route /youtube_downloader/telegram_download_status."""
+
+    def _call(self, url):
+        response = self.url_open(
+            url,
+            data=json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': {}}),
+            headers={'Content-Type': 'application/json'},
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()['result']
+
+    def test_telegram_download_status(self):
+        """La progression de la vidéo Telegram est renvoyée, sans erreur."""
+        channel = self.env['telegram.channel'].create({'name': 'Canal', 'channel_identifier': '@c'})
+        video = self.env['telegram.channel.video'].create({
+            'channel_id': channel.id,
+            'name': 'Vidéo',
+            'state': 'downloading',
+            'progress': 42.0,
+        })
+        self.authenticate('admin', 'admin')
+        result = self._call('/youtube_downloader/telegram_download_status/%d' % video.id)
+        self.assertNotIn('error', result)
+        self.assertEqual((result['id'], result['state'], result['progress']),
+                         (video.id, 'downloading', 42.0))
+
+    def test_telegram_download_status_missing_record(self):
+        """Un enregistrement inexistant renvoie une erreur explicite."""
+        self.authenticate('admin', 'admin')
+        result = self._call('/youtube_downloader/telegram_download_status/999999999')
+        self.assertEqual(result, {'error': 'Record not found'})
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 """
 Tests unitaires pour le module youtube_downloader.
-Couvre : extraction d'URL, contraintes, calculs, états, actions, dashboard.
+Couvre : extraction d'URL, contraintes, calculs, formats, états, actions, dashboard.
 """
 import os
+import tempfile
+import threading
 from datetime import datetime, timedelta
+from types import SimpleNamespace
 from unittest.mock import patch
 
 from odoo.tests import TransactionCase, tagged
@@ -44,6 +47,60 @@ class TestYoutubeDownloadBase(TransactionCase):
         vals.update(kwargs)
         return self.Download.create(vals)
 
+    # Vrai pour les classes dont le moteur ouvre ses propres curseurs courts
+    # (handlers de la file, flush, _do_download)
+    TEST_MODE = False
+
+    def setUp(self):
+        super().setUp()
+        if self.TEST_MODE:
+            self._enter_test_mode()
+
+    def _enter_test_mode(self):
+        """Les curseurs courts du moteur partagent la transaction du test."""
+        self.registry.enter_test_mode(self.cr)
+        self.addCleanup(self.registry.leave_test_mode)
+
+    @staticmethod
+    def _make_yt_dlp(extract_info, **methods):
+        """
+        Module yt-dlp factice. YoutubeDL(opts) s'utilise comme contexte et
+        garde ses options (ydl.opts) ; extract_info(url, download, **kwargs)
+        délègue à `extract_info(ydl, url, download, **kwargs)` et `methods`
+        ajoute d'autres méthodes (process_ie_result…). sanitize_info renvoie
+        l'info-dict tel quel.
+        """
+        class FakeYoutubeDL:
+            def __init__(self, opts):
+                self.opts = opts
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            @staticmethod
+            def sanitize_info(info):
+                return info
+
+            def extract_info(self, url, download=True, **kwargs):
+                return extract_info(self, url, download, **kwargs)
+
+        for name, method in methods.items():
+            setattr(FakeYoutubeDL, name, method)
+        return SimpleNamespace(YoutubeDL=FakeYoutubeDL)
+
+    def _run_do_download(self, record, yt_dlp, dest_path, **kwargs):
+        """_do_download avec `yt_dlp` factice et un registre de progression sans flusher."""
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import ProgressRegistry
+        self.env.flush_all()
+        with patch.object(type(self.Download), '_get_yt_dlp', return_value=yt_dlp), \
+                patch('odoo.addons.youtube_downloader.models.youtube_download.progress_registry',
+                      ProgressRegistry(autostart=False)):
+            record._do_download(dest_path, **kwargs)
+        self.env.invalidate_all()
+
 
 @tagged('post_install', '-at_install')
 class TestYoutubeDownloadCreation(TestYoutubeDownloadBase):
@@ -386,6 +443,80 @@ class TestFormatString(TestYoutubeDownloadBase):
             self.assertTrue(fmt, f"Format vide pour qualité {q}")
 
 
+@tagged('post_install', '-at_install')
+class TestBrowserNativeFormats(TestYoutubeDownloadBase):
+    """Tests de la sélection des formats « natif navigateur »."""
+
+    def _set_mode(self, mode):
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.format_selection', mode)
+
+    def test_sort_prefers_h264_aac_at_requested_height(self):
+        """La résolution reste le premier critère, puis H.264 et AAC."""
+        self._set_mode('browser_native')
+        opts = self._create_download(quality='720p')._prepare_download_opts('/tmp')
+        self.assertEqual(opts['format_sort'], ['res:720', 'vcodec:h264', 'acodec:aac'])
+        self.assertEqual(opts['merge_output_format'], 'mp4')
+        self.assertIn('720', opts['format'])
+
+    def test_other_containers_merge_to_mp4_when_compatible(self):
+        """MKV demandé : fusion MP4 si les flux le permettent, MKV sinon."""
+        self._set_mode('browser_native')
+        opts = self._create_download(output_format='mkv')._prepare_download_opts('/tmp')
+        self.assertEqual(opts['merge_output_format'], 'mp4/mkv')
+
+    def test_default_mode_and_free_formats_untouched(self):
+        """Mode par défaut, WEBM et audio : options inchangées."""
+        self._set_mode('default')
+        opts = self._create_download(output_format='mkv')._prepare_download_opts('/tmp')
+        self.assertNotIn('format_sort', opts)
+        self.assertEqual(opts['merge_output_format'], 'mkv')
+        self._set_mode('browser_native')
+        self.assertNotIn('format_sort', self._create_download(output_format='webm')._prepare_download_opts('/tmp'))
+        audio = self._create_download(quality='audio_only', output_format='mp3')
+        self.assertNotIn('format_sort', audio._prepare_download_opts('/tmp'))
+
+    def _download(self, record, produced_name):
+        """
+        Exécute _do_download avec un yt-dlp factice produisant `produced_name`.
+        Retourne les jobs de conversion MP4 mis en file pour l'enregistrement.
+        """
+        import shutil
+        self._enter_test_mode()
+        dest = tempfile.mkdtemp(prefix='yt_test_')
+        self.addCleanup(shutil.rmtree, dest, True)
+        work_dir = record._get_work_dir(dest)
+
+        def extract_info(ydl, url, download):
+            path = os.path.join(work_dir, produced_name)
+            with open(path, 'wb') as f:
+                f.write(b'data')
+            return {'id': 'dQw4w9WgXcQ', 'title': 'Test', 'vcodec': 'avc1.64001F',
+                    'acodec': 'mp4a.40.2', 'requested_downloads': [{'filepath': path}]}
+
+        self._run_do_download(record, self._make_yt_dlp(extract_info), dest)
+        return self.env['youtube.download.job'].search([
+            ('res_model', '=', record._name), ('res_id', '=', record.id), ('job_type', '=', 'convert_mp4'),
+        ])
+
+    def test_direct_mp4_merge_counts_avoided_conversion(self):
+        """Fusion directe en MP4 : aucune conversion, comptée comme évitée."""
+        self._set_mode('browser_native')
+        record = self._create_download(state='pending', output_format='mkv')
+        self.assertFalse(self._download(record, 'Test.mp4'))
+        self.assertEqual(record.state, 'done')
+        self.assertTrue(record.conversion_avoided)
+        self.assertEqual(self.Download._compute_dashboard_aggregates()['conversions_avoided'], 1)
+
+    def test_fallback_container_still_converted(self):
+        """Sans flux H.264 + AAC, la conversion du conteneur demandé est mise en file."""
+        self._set_mode('browser_native')
+        record = self._create_download(state='pending', output_format='mkv')
+        jobs = self._download(record, 'Test.mkv')
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs.state, 'queued')
+        self.assertFalse(record.conversion_avoided)
+
+
 @tagged('post_install', '-at_install')
 class TestOnchange(TestYoutubeDownloadBase):
     """Tests des onchange."""
@@ -611,36 +742,93 @@ class TestEnsureDirectory(TestYoutubeDownloadBase):
 
 
 @tagged('post_install', '-at_install')
-class TestCleanupPartialFiles(TestYoutubeDownloadBase):
-    """Tests de nettoyage des fichiers partiels."""
-
-    def test_cleanup_partial_files(self):
-        """Les fichiers .part, .ytdl, .temp sont supprimés."""
-        import tempfile
-        tmpdir = tempfile.mkdtemp(prefix='yt_test_')
-        try:
-            # Créer des fichiers partiels
-            for ext in ['.part', '.ytdl', '.temp']:
-                with open(os.path.join(tmpdir, f'test{ext}'), 'w') as f:
-                    f.write('test')
-            # Fichier normal (ne doit pas être supprimé)
-            with open(os.path.join(tmpdir, 'test.mp4'), 'w') as f:
-                f.write('video content')
-
-            record = self._create_download()
-            record._cleanup_partial_files(tmpdir, 'test_id')
-
-            remaining = os.listdir(tmpdir)
-            self.assertEqual(len(remaining), 1)
-            self.assertEqual(remaining[0], 'test.mp4')
-        finally:
-            import shutil
-            shutil.rmtree(tmpdir, ignore_errors=True)
-
-    def test_cleanup_partial_files_empty_path(self):
-        """Pas d'erreur si le chemin est vide."""
+class TestWorkDirectories(TestYoutubeDownloadBase):
+    """Tests des répertoires de travail par téléchargement."""
+
+    def setUp(self):
+        super().setUp()
+        import shutil
+        self.dest = tempfile.mkdtemp(prefix='yt_test_')
+        self.addCleanup(shutil.rmtree, self.dest, True)
+
+    def _touch(self, path, content=b'data'):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_work_dir_is_per_record(self):
+        """Chaque enregistrement a son propre répertoire de travail."""
+        first, second = self._create_download(), self._create_download()
+        self.assertNotEqual(first._get_work_dir(self.dest), second._get_work_dir(self.dest))
+        self.assertTrue(first._get_work_dir(self.dest).startswith(self.dest))
+
+    def test_move_to_library_without_overwrite(self):
+        """Les fichiers terminés rejoignent la bibliothèque sans écraser un homonyme."""
         record = self._create_download()
-        record._cleanup_partial_files(None, 'test_id')  # Ne doit pas lever d'exception
+        work_dir = record._get_work_dir(self.dest)
+        existing = self._touch(os.path.join(self.dest, 'Titre.mp4'), b'autre')
+        media = self._touch(os.path.join(work_dir, 'Titre.mp4'))
+        self._touch(os.path.join(work_dir, 'Titre.fr.vtt'))
+        self._touch(os.path.join(work_dir, 'Titre.f137.mp4.part'))
+        final = record._move_to_library(work_dir, self.dest, media)
+        self.assertEqual(final, os.path.join(self.dest, 'Titre (2).mp4'))
+        with open(existing, 'rb') as f:
+            self.assertEqual(f.read(), b'autre')
+        self.assertTrue(os.path.exists(os.path.join(self.dest, 'Titre.fr.vtt')))
+        self.assertFalse(os.path.exists(work_dir))
+
+    def test_retry_resumes_partial_file(self):
+        """Une tentative échouée laisse son fichier partiel à la suivante."""
+        self._enter_test_mode()
+        record = self._create_download(state='pending', max_retries=2, auto_retry=True)
+        # Fichier partiel d'un autre téléchargement du même dossier : intact
+        other_partial = self._touch(os.path.join(self.dest, 'autre.mp4.part'))
+        work_dir = record._get_work_dir(self.dest)
+        partial = os.path.join(work_dir, 'Test.mp4.part')
+        final = os.path.join(work_dir, 'Test.mp4')
+        attempts = []
+
+        def extract_info(ydl, url, download):
+            self.assertTrue(ydl.opts['outtmpl'].startswith(work_dir))
+            attempts.append(os.path.exists(partial))
+            if len(attempts) == 1:
+                self._touch(partial, b'0' * 900)
+                raise Exception('Connexion interrompue à 90 %')
+            os.rename(partial, final)
+            return {'id': 'dQw4w9WgXcQ', 'title': 'Test', 'requested_downloads': [{'filepath': final}]}
+
+        yt_dlp = self._make_yt_dlp(extract_info)
+        self._run_do_download(record, yt_dlp, self.dest)
+        # Échec transitoire : reprise planifiée par la file, créneau libéré
+        self.assertEqual(record.state, 'pending')
+        retry_job = self.env['youtube.download.job'].search([('res_id', '=', record.id)])
+        self.assertTrue(retry_job.next_attempt_at)
+        self._run_do_download(record, yt_dlp, self.dest)
+        self.assertEqual(attempts, [False, True])
+        self.assertEqual(record.retry_count, 2)
+        self.assertEqual(record.state, 'done')
+        self.assertEqual(record.file_path, os.path.join(self.dest, 'Test.mp4'))
+        self.assertTrue(os.path.exists(other_partial))
+        self.assertFalse(os.path.exists(work_dir))
+
+    def test_janitor_removes_abandoned_work_dirs(self):
+        """Le nettoyage supprime les répertoires anciens, sauf téléchargement actif."""
+        import time
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.download_path', self.dest)
+        abandoned = self._create_download(state='error')
+        active = self._create_download(state='downloading')
+        recent = self._create_download(state='error')
+        old = time.time() - 30 * 86400
+        for record in (abandoned, active):
+            path = self._touch(os.path.join(record._get_work_dir(self.dest), 'x.part'))
+            os.utime(path, (old, old))
+            os.utime(os.path.dirname(path), (old, old))
+        self._touch(os.path.join(recent._get_work_dir(self.dest), 'x.part'))
+        self.assertEqual(self.Download._cron_clean_work_dirs(), 1)
+        self.assertFalse(os.path.exists(abandoned._get_work_dir(self.dest)))
+        self.assertTrue(os.path.exists(active._get_work_dir(self.dest)))
+        self.assertTrue(os.path.exists(recent._get_work_dir(self.dest)))
 
 
 @tagged('post_install', '-at_install')
@@ -692,6 +880,199 @@ class TestActionStartDownload(TestYoutubeDownloadBase):
             record.action_start_download()
 
 
+@tagged('post_install', '-at_install')
+class TestDownloadConnections(TestYoutubeDownloadBase):
+    """Le moteur de téléchargement ne garde aucune connexion pendant le transfert."""
+
+    # TestCursor : un seul curseur court à la fois grâce au verrou du mode test
+    TEST_MODE = True
+
+    def setUp(self):
+        super().setUp()
+        self.open_cursors = 0
+        self.peak_cursors = 0
+        counter_lock = threading.Lock()
+        original_cursor = type(self.registry).cursor
+        test = self
+
+        def counting_cursor(registry, *args, **kwargs):
+            cr = original_cursor(registry, *args, **kwargs)
+            with counter_lock:
+                test.open_cursors += 1
+                test.peak_cursors = max(test.peak_cursors, test.open_cursors)
+            original_close = cr.close
+
+            def close(*a, **kw):
+                with counter_lock:
+                    test.open_cursors -= 1
+                return original_close(*a, **kw)
+            cr.close = close
+            return cr
+
+        patcher = patch.object(type(self.registry), 'cursor', counting_cursor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Pas de thread flusher de progression pendant la mesure
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import ProgressRegistry
+        progress_patcher = patch(
+            'odoo.addons.youtube_downloader.models.youtube_download.progress_registry',
+            ProgressRegistry(autostart=False),
+        )
+        progress_patcher.start()
+        self.addCleanup(progress_patcher.stop)
+
+    def _fake_yt_dlp(self, barrier, filepath):
+        """yt-dlp factice : tous les transferts doivent être en vol en même temps."""
+        def extract_info(ydl, url, download):
+            for hook in ydl.opts['progress_hooks']:
+                hook({'status': 'downloading', 'total_bytes': 100, 'downloaded_bytes': 50})
+            # Si un curseur était conservé pendant le transfert, les autres
+            # téléchargements resteraient bloqués et la barrière expirerait.
+            barrier.wait(timeout=20)
+            self.assertEqual(self.open_cursors, 0)
+            return {'id': 'dQw4w9WgXcQ', 'title': 'Test',
+                    'requested_downloads': [{'filepath': filepath}]}
+
+        return self._make_yt_dlp(extract_info)
+
+    def _run_downloads(self, count):
+        tmpdir = tempfile.mkdtemp()
+        filepath = os.path.join(tmpdir, 'video.webm')
+        with open(filepath, 'wb') as f:
+            f.write(b'0' * 1024)
+        records = self.Download.browse([
+            self._create_download(state='pending', max_retries=1, auto_retry=False).id
+            for _i in range(count)
+        ])
+        self.env.flush_all()
+        self.peak_cursors = 0
+        barrier = threading.Barrier(count)
+        with patch.object(type(self.Download), '_get_yt_dlp',
+                          return_value=self._fake_yt_dlp(barrier, filepath)):
+            threads = [
+                threading.Thread(target=rec._do_download, args=(tmpdir,))
+                for rec in records
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(timeout=60)
+        self.env.invalidate_all()
+        self.assertEqual(set(records.mapped('state')), {'done'})
+        return self.peak_cursors
+
+    def test_peak_connections_independent_of_downloads_in_flight(self):
+        """Le pic de connexions ne dépend pas du nombre de téléchargements en vol."""
+        peak_single = self._run_downloads(1)
+        peak_many = self._run_downloads(4)
+        self.assertEqual(peak_single, 1)
+        self.assertEqual(peak_many, peak_single)
+
+
+@tagged('post_install', '-at_install')
+class TestProgressRegistry(TestYoutubeDownloadBase):
+    """Tests du registre de progression en mémoire et de son flush groupé."""
+
+    def setUp(self):
+        super().setUp()
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import ProgressRegistry
+        self.progress = ProgressRegistry(autostart=False)
+        self.dbname = self.env.cr.dbname
+
+    def test_update_and_get(self):
+        """La progression est lisible en mémoire avec vitesse et ETA."""
+        self.progress.update(self.dbname, 42, 12.5, downloaded_bytes=125,
+                             total_bytes=1000, speed=2048.0, eta=30)
+        entry = self.progress.get(self.dbname, 42)
+        self.assertEqual(entry['progress'], 12.5)
+        self.assertEqual(entry['speed'], 2048.0)
+        self.assertEqual(entry['eta'], 30)
+        self.progress.discard(self.dbname, 42)
+        self.assertIsNone(self.progress.get(self.dbname, 42))
+
+    def test_flush_single_bulk_update(self):
+        """Les lignes modifiées sont persistées en un seul UPDATE."""
+        rec1 = self._create_download(state='downloading')
+        rec2 = self._create_download(state='downloading')
+        self.env.flush_all()
+        self.progress.update(self.dbname, rec1.id, 30.0)
+        self.progress.update(self.dbname, rec2.id, 60.0)
+        with patch.object(type(self.env.cr), 'execute', autospec=True,
+                          side_effect=type(self.env.cr).execute) as mock_execute:
+            flushed = self.progress.flush(self.env.cr, self.dbname)
+        self.assertEqual(set(flushed), {rec1.id, rec2.id})
+        self.assertEqual(mock_execute.call_count, 1)
+        self.env.invalidate_all()
+        self.assertEqual(rec1.progress, 30.0)
+        self.assertEqual(rec2.progress, 60.0)
+        # Rien à flusher tant qu'aucune nouvelle progression n'arrive
+        self.assertFalse(self.progress.flush(self.env.cr, self.dbname))
+
+    def test_flush_does_not_overwrite_final_state(self):
+        """Un téléchargement terminé n'est pas écrasé par une progression en retard."""
+        record = self._create_download(state='done', progress=100.0)
+        self.env.flush_all()
+        self.progress.update(self.dbname, record.id, 50.0)
+        self.assertFalse(self.progress.flush(self.env.cr, self.dbname))
+        self.env.invalidate_all()
+        self.assertEqual(record.progress, 100.0)
+
+    def test_progress_hook_does_not_write(self):
+        """Le hook yt-dlp ne fait aucune écriture ORM."""
+        record = self._create_download(state='downloading')
+        with patch('odoo.addons.youtube_downloader.models.youtube_download.progress_registry',
+                   self.progress), \
+                patch.object(type(record), 'write') as mock_write:
+            hook = record._make_progress_hook()
+            hook({'status': 'downloading', 'total_bytes': 200, 'downloaded_bytes': 50,
+                  'speed': 1000.0, 'eta': 5})
+            mock_write.assert_not_called()
+            live = record._get_live_progress()[record.id]
+        self.assertEqual(live['progress'], 25.0)
+        self.assertEqual(live['eta'], 5)
+
+
+@tagged('post_install', '-at_install')
+class TestBusNotifications(TestYoutubeDownloadBase):
+    """Tests des notifications temps réel publiées sur le bus."""
+
+    def test_state_change_published_to_user_and_record(self):
+        """Un changement d'état est publié au propriétaire et sur le canal du téléchargement."""
+        record = self._create_download()
+        with patch.object(type(self.env['bus.bus']), '_sendone') as mock_send:
+            record.write({'state': 'pending'})
+        targets = [call.args[0] for call in mock_send.call_args_list]
+        self.assertIn(f'youtube_download_{record.id}', targets)
+        self.assertIn(record.user_id.partner_id, targets)
+        payload = mock_send.call_args_list[0].args[2][0]
+        self.assertEqual(payload['id'], record.id)
+        self.assertEqual(payload['state'], 'pending')
+        self.assertEqual(mock_send.call_args_list[0].args[1], 'youtube_download/state')
+
+    def test_write_without_state_not_published(self):
+        """Une écriture sans changement d'état ne publie rien."""
+        record = self._create_download()
+        with patch.object(type(self.env['bus.bus']), '_sendone') as mock_send:
+            record.write({'note': '<p>Note</p>'})
+        mock_send.assert_not_called()
+
+    def test_progress_grouped_per_user(self):
+        """La progression de plusieurs téléchargements d'un utilisateur part en un seul message."""
+        rec1 = self._create_download(state='downloading')
+        rec2 = self._create_download(state='downloading')
+        records = rec1 | rec2
+        with patch.object(type(self.env['bus.bus']), '_sendone') as mock_send:
+            records._bus_send_progress({
+                rec1.id: {'progress': 10.0, 'speed': None, 'eta': None},
+                rec2.id: {'progress': 20.0, 'speed': 100.0, 'eta': 3},
+            })
+        partner_calls = [c for c in mock_send.call_args_list
+                         if c.args[0] == self.env.user.partner_id]
+        self.assertEqual(len(partner_calls), 1)
+        self.assertEqual(len(partner_calls[0].args[2]), 2)
+        self.assertEqual(partner_calls[0].args[1], 'youtube_download/progress')
+
+
 @tagged('post_install', '-at_install')
 class TestActionBatchDownload(TestYoutubeDownloadBase):
     """Tests du téléchargement par lot."""
@@ -815,6 +1196,110 @@ class TestDashboardData(TestYoutubeDownloadBase):
         self.assertLessEqual(data['success_rate'], 100)
 
 
+@tagged('post_install', '-at_install')
+class TestDashboardEngine(TestYoutubeDownloadBase):
+    """Tests du moteur agrégé et du cache du tableau de bord."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from odoo.addons.youtube_downloader.models.youtube_dashboard import dashboard_cache
+        cls.dashboard_cache = dashboard_cache
+
+    def setUp(self):
+        super().setUp()
+        self.dashboard_cache.clear(self.env.cr.dbname)
+
+    def _simulate_commit(self):
+        """Les postcommit ne tournent pas en test : on simule la fin de transaction."""
+        self.env.cr.postcommit.clear()
+        self.dashboard_cache.clear(self.env.cr.dbname)
+
+    def test_aggregates_match_records(self):
+        """Les compteurs agrégés en SQL reflètent les enregistrements."""
+        before = self.Download.get_dashboard_data()
+        self._create_download(quality='audio_only', output_format='mp3').write({
+            'state': 'done', 'file_size': 10.0, 'video_duration': 120,
+            'video_author': 'AuteurDashboard', 'download_date': datetime.now(),
+        })
+        self._create_download(quality='1080p').write({
+            'state': 'done', 'file_size': 30.0, 'video_duration': 60,
+            'video_author': 'AuteurDashboard', 'download_date': datetime.now(),
+        })
+        self._create_download().write({'state': 'error'})
+        data = self.Download.get_dashboard_data()
+        self.assertEqual(data['total'], before['total'] + 3)
+        self.assertEqual(data['done'], before['done'] + 2)
+        self.assertEqual(data['errors'], before['errors'] + 1)
+        self.assertEqual(data['audio_count'], before['audio_count'] + 1)
+        self.assertEqual(data['video_count'], before['video_count'] + 1)
+        self.assertAlmostEqual(data['total_size_mb'], before['total_size_mb'] + 40.0)
+        self.assertEqual(data['total_duration_sec'], before['total_duration_sec'] + 180)
+        self.assertEqual(data['recent_count'], before['recent_count'] + 2)
+        self.assertEqual(data['daily_chart'][-1]['count'], before['daily_chart'][-1]['count'] + 2)
+        self.assertEqual(len(data['daily_chart']), 14)
+        self.assertIn(['AuteurDashboard', 2], [list(author) for author in data['top_authors']])
+
+    def test_aggregates_respect_record_rules(self):
+        """Un utilisateur simple ne compte que ses propres téléchargements."""
+        user = self.env['res.users'].create({
+            'name': 'Utilisateur Dashboard',
+            'login': 'dashboard_user_test',
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_user').id,
+                self.env.ref('youtube_downloader.group_youtube_user').id,
+            ])],
+        })
+        self._create_download().write({'state': 'done', 'file_size': 5.0})
+        data = self.Download.with_user(user).get_dashboard_data()
+        self.assertEqual(data['total'], 0)
+        self.Download.with_user(user).create({'url': self.VALID_URL})
+        data = self.Download.with_user(user).get_dashboard_data()
+        self.assertEqual(data['total'], 1)
+        self.assertEqual(data['drafts'], 1)
+
+    def test_cache_hit_skips_aggregation(self):
+        """Un second appel sans modification est servi par le cache."""
+        from odoo.addons.youtube_downloader.models.youtube_download import YoutubeDownload
+        self._simulate_commit()
+        original = YoutubeDownload._compute_dashboard_aggregates
+        with patch.object(YoutubeDownload, '_compute_dashboard_aggregates',
+                          autospec=True, side_effect=original) as mock_compute:
+            self.Download.get_dashboard_data()
+            self.Download.get_dashboard_data()
+        self.assertEqual(mock_compute.call_count, 1)
+
+    def test_cache_invalidated_on_state_change(self):
+        """Un changement d'état invalide le cache."""
+        record = self._create_download()
+        self._simulate_commit()
+        before = self.Download.get_dashboard_data()
+        record.write({'state': 'done', 'file_size': 12.0})
+        data = self.Download.get_dashboard_data()
+        self.assertEqual(data['done'], before['done'] + 1)
+        self.assertTrue(self.dashboard_cache.has_pending_invalidation(self.env.cr))
+
+    def test_cache_not_invalidated_by_other_fields(self):
+        """Une écriture hors champs agrégés conserve le cache."""
+        record = self._create_download()
+        self._simulate_commit()
+        self.Download.get_dashboard_data()
+        record.write({'note': '<p>Sans effet</p>'})
+        self.assertFalse(self.dashboard_cache.has_pending_invalidation(self.env.cr))
+
+    def test_active_downloads_use_live_progress(self):
+        """La progression des téléchargements actifs vient du registre en mémoire."""
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import ProgressRegistry
+        record = self._create_download()
+        record.write({'state': 'downloading', 'progress': 10.0})
+        registry = ProgressRegistry(autostart=False)
+        registry.update(self.env.cr.dbname, record.id, 55.0)
+        with patch('odoo.addons.youtube_downloader.models.youtube_download.progress_registry', registry):
+            data = self.Download.get_dashboard_data()
+        active = {item['id']: item for item in data['active_downloads']}
+        self.assertEqual(active[record.id]['progress'], 55.0)
+
+
 @tagged('post_install', '-at_install')
 class TestActionViewPlaylistItems(TestYoutubeDownloadBase):
     """Tests de l'action vue playlist."""
@@ -923,27 +1408,68 @@ class TestSQLConstraints(TestYoutubeDownloadBase):
 
 @tagged('post_install', '-at_install')
 class TestSemaphore(TestYoutubeDownloadBase):
-    """Tests du mécanisme de sémaphore."""
+    """Tests des créneaux de concurrence partagés (baux en base)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Slot = cls.env['youtube.download.slot']
+        cls.Slot.search([]).unlink()
 
     def test_semaphore_creation(self):
-        """Le sémaphore est créé correctement."""
-        from odoo.addons.youtube_downloader.models.youtube_download import _get_semaphore
-        sem = _get_semaphore(3)
+        """Le sémaphore de téléchargement est créé correctement."""
+        from odoo.addons.youtube_downloader.models.youtube_download_slot import get_cluster_semaphore
+        sem = get_cluster_semaphore(self.env.cr.dbname, 'download')
         self.assertIsNotNone(sem)
 
     def test_semaphore_reuse(self):
-        """Le même sémaphore est retourné pour la même valeur."""
-        from odoo.addons.youtube_downloader.models.youtube_download import _get_semaphore
-        sem1 = _get_semaphore(5)
-        sem2 = _get_semaphore(5)
+        """Le même sémaphore est retourné pour la même base, quelle que soit la limite."""
+        from odoo.addons.youtube_downloader.models.youtube_download_slot import get_cluster_semaphore
+        sem1 = get_cluster_semaphore(self.env.cr.dbname, 'download')
+        sem2 = get_cluster_semaphore(self.env.cr.dbname, 'download')
         self.assertIs(sem1, sem2)
 
-    def test_semaphore_different_values(self):
-        """Des sémaphores différents pour des valeurs différentes."""
-        from odoo.addons.youtube_downloader.models.youtube_download import _get_semaphore
-        sem1 = _get_semaphore(10)
-        sem2 = _get_semaphore(20)
-        self.assertIsNot(sem1, sem2)
+    def test_semaphore_download_and_conversion_distinct(self):
+        """Téléchargements et conversions ont des créneaux distincts."""
+        from odoo.addons.youtube_downloader.models.youtube_download_slot import get_cluster_semaphore
+        dbname = self.env.cr.dbname
+        self.assertIsNot(get_cluster_semaphore(dbname, 'download'), get_cluster_semaphore(dbname, 'conversion'))
+
+    def test_slot_limit_enforced(self):
+        """Pas plus de créneaux que youtube_downloader.max_concurrent."""
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.max_concurrent', '2')
+        self.assertTrue(self.Slot._try_acquire('download', 'w1'))
+        self.assertTrue(self.Slot._try_acquire('download', 'w2'))
+        self.assertFalse(self.Slot._try_acquire('download', 'w3'))
+        # Les conversions ont leur propre limite
+        self.assertTrue(self.Slot._try_acquire('conversion', 'w3'))
+
+    def test_slot_limit_resizes_live(self):
+        """Une modification de la limite s'applique sans redémarrage."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param('youtube_downloader.max_concurrent', '1')
+        self.assertTrue(self.Slot._try_acquire('download', 'w1'))
+        self.assertFalse(self.Slot._try_acquire('download', 'w2'))
+        ICP.set_param('youtube_downloader.max_concurrent', '2')
+        self.assertTrue(self.Slot._try_acquire('download', 'w2'))
+
+    def test_slot_release_frees_capacity(self):
+        """Libérer un créneau permet une nouvelle acquisition."""
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.max_concurrent', '1')
+        slot_id = self.Slot._try_acquire('download', 'w1')
+        self.assertFalse(self.Slot._try_acquire('download', 'w2'))
+        self.Slot._release([slot_id])
+        self.assertTrue(self.Slot._try_acquire('download', 'w2'))
+
+    def test_expired_slot_reclaimed(self):
+        """Le créneau d'un processus mort (bail expiré) est récupéré."""
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.max_concurrent', '1')
+        slot_id = self.Slot._try_acquire('download', 'w1')
+        self.Slot.browse(slot_id).write({
+            'expires_at': datetime.now() - timedelta(minutes=5),
+        })
+        self.assertTrue(self.Slot._try_acquire('download', 'w2'))
+        self.assertFalse(self.Slot.browse(slot_id).exists())
 
 
 @tagged('post_install', '-at_install')
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires de la limitation de bande passante (seaux à jetons partagés).
+Couvre : seau à jetons, partage entre téléchargements concurrents, plafonds
+utilisateur / priorité, répartition entre processus, plage de jour, hook.
+"""
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    """Horloge monotone factice : sleep() avance le temps."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@tagged('post_install', '-at_install')
+class TestBandwidthShaping(TestYoutubeDownloadBase):
+    """Tests de la limitation de bande passante."""
+
+    def setUp(self):
+        super().setUp()
+        from odoo.addons.youtube_downloader.models.youtube_download_bandwidth import BandwidthShaper
+        self.clock = FakeClock()
+        self.shaper = BandwidthShaper(clock=self.clock, sleep=self.clock.sleep)
+        self.dbname = self.env.cr.dbname
+
+    def _limits(self, global_cap=0, user_cap=0, priorities=None, cluster=None):
+        return {
+            'global': global_cap * MB,
+            'user': user_cap * MB,
+            'priorities': {p: cap * MB for p, cap in (priorities or {}).items()},
+            'cluster': cluster or {},
+        }
+
+    def test_global_cap_shared_by_concurrent_downloads(self):
+        """Deux téléchargements simultanés se partagent le plafond global."""
+        self.shaper.set_limits(self.dbname, self._limits(global_cap=1))
+        self.shaper.register(self.dbname, 1, 10, '0')
+        self.shaper.register(self.dbname, 2, 11, '0')
+        # Rafale initiale : 2 s de débit
+        self.assertEqual(self.shaper.consume(self.dbname, 1, MB), 0.0)
+        self.assertEqual(self.shaper.consume(self.dbname, 2, MB), 0.0)
+        # Le seau est vide : chaque Mo supplémentaire coûte une seconde
+        self.assertAlmostEqual(self.shaper.consume(self.dbname, 1, MB), 1.0)
+        self.assertAlmostEqual(self.shaper.consume(self.dbname, 2, MB), 1.0)
+
+    def test_unlimited_when_no_cap(self):
+        """Sans plafond, aucune attente."""
+        self.shaper.set_limits(self.dbname, {})
+        self.shaper.register(self.dbname, 1, 10, '0')
+        self.assertEqual(self.shaper.consume(self.dbname, 1, 100 * MB), 0.0)
+        self.assertFalse(self.clock.slept)
+
+    def test_user_and_priority_caps(self):
+        """Le plus strict des plafonds applicables l'emporte."""
+        self.shaper.set_limits(self.dbname, self._limits(global_cap=10, user_cap=2, priorities={'1': 1}))
+        self.shaper.register(self.dbname, 1, 10, '1')
+        self.shaper.register(self.dbname, 2, 11, '0')
+        self.shaper.consume(self.dbname, 1, 2 * MB)  # rafale du seau priorité basse
+        self.assertAlmostEqual(self.shaper.consume(self.dbname, 1, MB), 1.0)
+        # Autre utilisateur, priorité normale : son propre seau, sans plafond de priorité
+        self.assertEqual(self.shaper.consume(self.dbname, 2, 3 * MB), 0.0)
+
+    def test_cap_split_across_processes(self):
+        """Le plafond est réparti au prorata des téléchargements de chaque processus."""
+        self.shaper.set_limits(self.dbname, self._limits(global_cap=4, cluster={'total': 4}))
+        self.shaper.register(self.dbname, 1, 10, '0')
+        # 1 téléchargement local sur 4 : 1 Mo/s, rafale de 2 Mo
+        self.shaper.consume(self.dbname, 1, 2 * MB)
+        self.assertAlmostEqual(self.shaper.consume(self.dbname, 1, MB), 1.0)
+
+    def test_limits_from_settings(self):
+        """Les plafonds sont lus dans les paramètres et convertis en o/s."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        self.assertEqual(self.Download._get_bandwidth_limits(), {})
+        ICP.set_param('youtube_downloader.bandwidth_global_cap', 2.5)
+        ICP.set_param('youtube_downloader.bandwidth_high_cap', 1)
+        self._create_download(state='downloading', priority='2')
+        limits = self.Download._get_bandwidth_limits()
+        self.assertEqual(limits['global'], 2.5 * MB)
+        self.assertEqual(limits['priorities']['2'], MB)
+        self.assertEqual(limits['cluster']['priorities']['2'], 1)
+
+    def test_daytime_only_profile(self):
+        """Plafonds restreints à la journée : levés hors de la plage."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param('youtube_downloader.bandwidth_global_cap', 1)
+        ICP.set_param('youtube_downloader.bandwidth_daytime_only', 'True')
+        ICP.set_param('youtube_downloader.bandwidth_day_start', 0)
+        ICP.set_param('youtube_downloader.bandwidth_day_end', 24)
+        self.assertEqual(self.Download._get_bandwidth_limits()['global'], MB)
+        ICP.set_param('youtube_downloader.bandwidth_day_end', 0)
+        self.assertEqual(self.Download._get_bandwidth_limits(), {})
+
+    def test_progress_hook_consumes_received_bytes(self):
+        """Le hook de progression prélève les octets reçus depuis l'appel précédent."""
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import ProgressRegistry
+        record = self._create_download(state='downloading')
+        module = 'odoo.addons.youtube_downloader.models.youtube_download'
+        with patch(f'{module}.progress_registry', ProgressRegistry(autostart=False)), \
+                patch(f'{module}.bandwidth_shaper') as shaper:
+            hook = record._make_progress_hook()
+            for downloaded in (100, 250, 250):
+                hook({'status': 'downloading', 'filename': 'a.mp4',
+                      'downloaded_bytes': downloaded, 'total_bytes': 1000})
+            hook({'status': 'downloading', 'filename': 'b.m4a',
+                  'downloaded_bytes': 40, 'total_bytes': 1000})
+        consumed = [call.args[2] for call in shaper.consume.call_args_list]
+        self.assertEqual(consumed, [100, 150, 0, 40])
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires de la déduplication des fichiers (youtube.download.blob).
+Couvre : réservation de clé, réutilisation, attente d'un téléchargement en
+cours, empreinte de contenu, comptage de références à la suppression.
+"""
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+
+@tagged('post_install', '-at_install')
+class TestDownloadBlob(TestYoutubeDownloadBase):
+    """Tests de la déduplication."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Blob = cls.env['youtube.download.blob']
+        cls.Job = cls.env['youtube.download.job']
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, True)
+
+    def _write_file(self, name, content=b'0' * 1024):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def _finish_owner(self, record, path, content_hash='abc'):
+        """Simule la fin du téléchargement du propriétaire de la clé."""
+        record.write({
+            'state': 'done',
+            'file_path': path,
+            'file_name': os.path.basename(path),
+            'file_size': 1.0,
+        })
+        record._publish_blob(content_hash)
+
+    def test_blob_key(self):
+        """La clé réunit vidéo, qualité, format et sous-titres incrustés."""
+        record = self._create_download()
+        self.assertEqual(record._get_blob_key(), 'dQw4w9WgXcQ/720p/mp4')
+        record.write({'download_subtitles': True, 'embed_subtitles': True, 'subtitle_lang': 'fr'})
+        self.assertEqual(record._get_blob_key(), 'dQw4w9WgXcQ/720p/mp4/subs-fr')
+        self.assertNotEqual(
+            self._create_download(quality='1080p')._get_blob_key(),
+            self._create_download()._get_blob_key(),
+        )
+
+    def test_second_request_waits_then_shares_file(self):
+        """Une demande identique attend le téléchargement en cours puis partage le fichier."""
+        owner = self._create_download(state='pending')
+        waiter = self._create_download(state='pending')
+        self.assertFalse(owner._attach_or_wait_blob())
+        owner.state = 'downloading'
+        self.assertTrue(waiter._attach_or_wait_blob())
+        self.assertEqual(waiter.state, 'pending')
+        self.assertEqual(waiter.blob_id, owner.blob_id)
+
+        path = self._write_file('video.mp4')
+        self._finish_owner(owner, path)
+        self.assertEqual(waiter.state, 'done')
+        self.assertEqual(waiter.file_path, path)
+        self.assertEqual(owner.blob_id.state, 'done')
+        self.assertEqual(owner.blob_id.ref_count, 2)
+
+    def test_done_blob_is_attached_without_download(self):
+        """Le job d'une clé déjà disponible réutilise le fichier sans télécharger."""
+        owner = self._create_download(state='pending')
+        owner._attach_or_wait_blob()
+        self._finish_owner(owner, self._write_file('video.mp4'))
+        record = self._create_download(state='pending')
+        self._enter_test_mode()
+        self.env.flush_all()
+        with patch.object(type(self.Download), '_do_download') as do_download:
+            record._run_download_job({})
+        do_download.assert_not_called()
+        self.env.invalidate_all()
+        self.assertEqual(record.state, 'done')
+        self.assertEqual(record.file_path, owner.file_path)
+
+    def test_identical_content_is_shared(self):
+        """Deux clés au contenu identique partagent un seul fichier."""
+        first = self._create_download(state='pending', quality='best')
+        first._attach_or_wait_blob()
+        self._finish_owner(first, self._write_file('best.mp4'), content_hash='same')
+        second = self._create_download(state='pending', quality='1080p')
+        second._attach_or_wait_blob()
+        copy = self._write_file('1080p.mp4')
+        self._finish_owner(second, copy, content_hash='same')
+        self.assertFalse(os.path.exists(copy))
+        self.assertEqual(second.file_path, first.file_path)
+
+    def test_file_removed_only_by_last_reference(self):
+        """Le fichier partagé n'est supprimé qu'à la dernière référence."""
+        owner = self._create_download(state='pending')
+        waiter = self._create_download(state='pending')
+        owner._attach_or_wait_blob()
+        owner.state = 'downloading'
+        waiter._attach_or_wait_blob()
+        path = self._write_file('video.mp4')
+        self._finish_owner(owner, path)
+
+        owner.action_delete_file()
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(owner.file_path)
+        self.assertEqual(self.Blob.search([('file_path', '=', path)]).ref_count, 1)
+
+        waiter.action_delete_file()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(self.Blob.search([('file_path', '=', path)]))
+
+    def test_failed_owner_requeues_waiters(self):
+        """L'échec du propriétaire remet en file les demandes en attente."""
+        owner = self._create_download(state='pending')
+        waiter = self._create_download(state='pending')
+        owner._attach_or_wait_blob()
+        owner.state = 'downloading'
+        waiter._attach_or_wait_blob()
+        blob = owner.blob_id
+        owner.state = 'error'
+        owner._abandon_blob()
+        self.assertEqual(blob.state, 'error')
+        self.assertFalse(blob.owner_id)
+        job = self.Job.search([('res_id', '=', waiter.id), ('job_type', '=', 'download')])
+        self.assertEqual(len(job), 1)
+        # Le job remis en file reprend la clé à son compte
+        self.assertFalse(waiter._attach_or_wait_blob())
+        self.assertEqual(blob.owner_id, waiter)
+
+    def test_orphan_waiters_requeued_by_cron(self):
+        """Une attente dont le propriétaire a disparu est remise en file par le cron."""
+        owner = self._create_download(state='pending')
+        waiter = self._create_download(state='pending')
+        owner._attach_or_wait_blob()
+        owner.state = 'downloading'
+        waiter._attach_or_wait_blob()
+        owner.state = 'error'  # job échoué sans passer par _abandon_blob
+        self.assertEqual(self.Download._requeue_blob_waiters(), waiter)
+        self.assertFalse(self.Download._requeue_blob_waiters())
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires du contrôleur de concurrence adaptatif (AIMD).
+Couvre : règle AIMD, limite des créneaux en mode adaptatif, évaluation par
+cron (saturation, erreurs de bridage), débit persisté par le flush.
+"""
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+
+@tagged('post_install', '-at_install')
+class TestAdaptiveConcurrency(TestYoutubeDownloadBase):
+    """Tests de la concurrence adaptative."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Sample = cls.env['youtube.concurrency.sample']
+        cls.Slot = cls.env['youtube.download.slot']
+        cls.Job = cls.env['youtube.download.job']
+
+    def setUp(self):
+        super().setUp()
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param('youtube_downloader.adaptive_concurrency', 'True')
+        ICP.set_param('youtube_downloader.adaptive_min_concurrent', 1)
+        ICP.set_param('youtube_downloader.adaptive_max_concurrent', 8)
+        ICP.set_param('youtube_downloader.adaptive_concurrency_target', 4)
+        self.Slot.search([]).unlink()
+        self.Job.search([('state', 'in', ('queued', 'running'))]).write({'state': 'cancelled'})
+
+    def _occupy_slots(self, count):
+        expires_at = fields.Datetime.now() + timedelta(minutes=2)
+        self.Slot.create([
+            {'kind': 'download', 'holder': f'test:{i}', 'expires_at': expires_at}
+            for i in range(count)
+        ])
+
+    def test_aimd_rule(self):
+        """Croissance additive, décroissance multiplicative, bornes respectées."""
+        from odoo.addons.youtube_downloader.models.youtube_download_concurrency import aimd_next_target
+        common = {'throughput': 10.0, 'previous_throughput': 10.0, 'last_decision': 'hold'}
+        self.assertEqual(aimd_next_target(4, 1, 8, 0, True, **common), (5, 'increase'))
+        self.assertEqual(aimd_next_target(8, 1, 8, 0, True, **common), (8, 'hold'))
+        self.assertEqual(aimd_next_target(4, 1, 8, 0, False, **common), (4, 'hold'))
+        self.assertEqual(aimd_next_target(6, 1, 8, 2, True, **common), (3, 'decrease'))
+        self.assertEqual(aimd_next_target(1, 1, 8, 2, True, **common), (1, 'hold'))
+        # Débit en baisse après une augmentation : le créneau ajouté est retiré
+        self.assertEqual(
+            aimd_next_target(5, 1, 8, 0, True, throughput=7.0, previous_throughput=10.0,
+                             last_decision='increase'),
+            (4, 'decrease'),
+        )
+
+    def test_slot_limit_follows_target(self):
+        """En mode adaptatif, la limite des créneaux est la cible courante."""
+        self.assertEqual(self.Slot._get_limit('download'), 4)
+        self.assertEqual(self.Slot._get_capacity('download'), 8)
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.adaptive_concurrency', 'False')
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.max_concurrent', 3)
+        self.assertEqual(self.Slot._get_limit('download'), 3)
+        self.assertEqual(self.Slot._get_capacity('download'), 3)
+
+    def test_cron_increases_when_saturated(self):
+        """Créneaux tous occupés et jobs en attente : un créneau de plus."""
+        self._occupy_slots(4)
+        self.Job._enqueue(self._create_download(state='pending'), 'download')
+        sample = self.Sample._cron_adapt()
+        self.assertEqual(sample.decision, 'increase')
+        self.assertEqual(sample.target, 5)
+        self.assertEqual(sample.active_slots, 4)
+        self.assertEqual(self.Slot._get_limit('download'), 5)
+
+    def test_cron_halves_on_throttling(self):
+        """Une erreur 429 depuis la dernière mesure divise la cible par deux."""
+        self.Sample.create({
+            'sampled_at': fields.Datetime.now() - timedelta(minutes=1),
+            'target': 4, 'decision': 'hold',
+        })
+        self._create_download(
+            state='pending',
+            error_message='ERROR: unable to download video data: HTTP Error 429: Too Many Requests',
+            last_error_date=fields.Datetime.now(),
+        )
+        sample = self.Sample._cron_adapt()
+        self.assertEqual(sample.throttle_errors, 1)
+        self.assertEqual(sample.decision, 'decrease')
+        self.assertEqual(self.Slot._get_limit('download'), 2)
+
+    def test_cron_idle_when_disabled(self):
+        """Mode adaptatif désactivé : aucune évaluation."""
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.adaptive_concurrency', 'False')
+        self.assertFalse(self.Sample._cron_adapt())
+        self.assertFalse(self.Sample.search([]))
+
+    def test_throughput_from_flushed_speed(self):
+        """Le débit agrégé provient des vitesses persistées par le flush."""
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import ProgressRegistry
+        progress = ProgressRegistry(autostart=False)
+        first = self._create_download(state='downloading')
+        second = self._create_download(state='downloading')
+        self.env.flush_all()
+        progress.update(self.env.cr.dbname, first.id, 10.0, speed=1024 * 1024)
+        progress.update(self.env.cr.dbname, second.id, 20.0, speed=3 * 1024 * 1024)
+        progress.flush(self.env.cr, self.env.cr.dbname)
+        self.env.invalidate_all()
+        self.assertAlmostEqual(self.Sample._measure_throughput(), 4.0)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires de l'annulation coopérative et de la pause / reprise.
+Couvre : jeton d'interruption levé par le hook, annulation et pause d'un
+transfert en cours, jeton posé par le flush (autre processus), pause d'un
+téléchargement en attente, reprise via la file sans consommer de tentative,
+annulation tardive.
+"""
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+
+@tagged('post_install', '-at_install')
+class TestDownloadControl(TestYoutubeDownloadBase):
+    """Tests de l'interruption des téléchargements en cours."""
+
+    TEST_MODE = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env['youtube.download.job']
+
+    def setUp(self):
+        super().setUp()
+        self.dest = tempfile.mkdtemp(prefix='yt_test_')
+        self.addCleanup(shutil.rmtree, self.dest, True)
+        self.dbname = self.env.cr.dbname
+
+    def _fake_yt_dlp(self, record, on_download):
+        """yt-dlp factice : écrit un fichier partiel, puis appelle `on_download`."""
+        work_dir = record._get_work_dir(self.dest)
+
+        def extract_info(ydl, url, download):
+            partial = os.path.join(work_dir, 'Test.mp4.part')
+            with open(partial, 'wb') as f:
+                f.write(b'0' * 500)
+            on_download()
+            for hook in ydl.opts['progress_hooks']:
+                hook({'status': 'downloading', 'filename': partial,
+                      'downloaded_bytes': 500, 'total_bytes': 1000})
+            final = os.path.join(work_dir, 'Test.mp4')
+            os.rename(partial, final)
+            return {'id': 'dQw4w9WgXcQ', 'title': 'Test', 'requested_downloads': [{'filepath': final}]}
+
+        return self._make_yt_dlp(extract_info)
+
+    def _download(self, record, on_download, resumed=False):
+        self._run_do_download(record, self._fake_yt_dlp(record, on_download), self.dest, resumed=resumed)
+
+    def _interrupt(self, record, state, action):
+        """Simule une interruption demandée pendant le transfert."""
+        from odoo.addons.youtube_downloader.models.youtube_download_control import download_control
+
+        def on_download():
+            self.env.cr.execute(
+                "UPDATE youtube_download SET state = %s WHERE id = %s", (state, record.id),
+            )
+            download_control.request(self.dbname, record.id, action)
+        return on_download
+
+    def test_hook_raises_when_interrupted(self):
+        """Le hook de progression lève DownloadInterrupted dès qu'un jeton est posé."""
+        from odoo.addons.youtube_downloader.models.youtube_download_control import (
+            INTERRUPT_CANCEL, DownloadInterrupted, download_control,
+        )
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import ProgressRegistry
+        record = self._create_download(state='downloading')
+        self.addCleanup(download_control.clear, self.dbname, record.id)
+        with patch('odoo.addons.youtube_downloader.models.youtube_download.progress_registry',
+                   ProgressRegistry(autostart=False)):
+            hook = record._make_progress_hook()
+            hook({'status': 'downloading', 'downloaded_bytes': 10, 'total_bytes': 100})
+            download_control.request(self.dbname, record.id, INTERRUPT_CANCEL)
+            with self.assertRaises(DownloadInterrupted) as ctx:
+                hook({'status': 'downloading', 'downloaded_bytes': 20, 'total_bytes': 100})
+        self.assertEqual(ctx.exception.action, INTERRUPT_CANCEL)
+
+    def test_cancel_running_download(self):
+        """Annulation en cours : transfert arrêté, fichiers partiels supprimés."""
+        from odoo.addons.youtube_downloader.models.youtube_download_control import download_control
+        record = self._create_download(state='pending', download_path=self.dest)
+        self._download(record, self._interrupt(record, 'cancelled', 'cancel'))
+        self.assertEqual(record.state, 'cancelled')
+        self.assertEqual(record.progress, 0.0)
+        self.assertFalse(os.path.exists(record._get_work_dir(self.dest)))
+        self.assertFalse(self.Job.search([('res_id', '=', record.id), ('state', '=', 'queued')]))
+        self.assertIsNone(download_control.get(self.dbname, record.id))
+
+    def test_pause_keeps_partial_file(self):
+        """Pause en cours : fichier partiel conservé pour la reprise."""
+        record = self._create_download(state='pending', download_path=self.dest)
+        self._download(record, self._interrupt(record, 'paused', 'pause'))
+        self.assertEqual(record.state, 'paused')
+        partial = os.path.join(record._get_work_dir(self.dest), 'Test.mp4.part')
+        self.assertTrue(os.path.exists(partial))
+
+    def test_late_cancel_not_overwritten(self):
+        """Annulation juste avant la fin du transfert : l'état n'est pas écrasé par « terminé »."""
+        record = self._create_download(state='pending', download_path=self.dest)
+
+        def on_download():
+            self.env.cr.execute(
+                "UPDATE youtube_download SET state = 'cancelled' WHERE id = %s", (record.id,),
+            )
+        self._download(record, on_download)
+        self.assertEqual(record.state, 'cancelled')
+        self.assertFalse(record.file_path)
+
+    def test_flush_requests_interrupt_for_other_process(self):
+        """Le flush pose le jeton d'un téléchargement annulé depuis un autre processus."""
+        from odoo.addons.youtube_downloader.models.youtube_download_control import (
+            INTERRUPT_PAUSE, download_control,
+        )
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import ProgressRegistry
+        progress = ProgressRegistry(autostart=False)
+        running = self._create_download(state='downloading')
+        paused = self._create_download(state='paused')
+        self.addCleanup(download_control.clear, self.dbname, paused.id)
+        self.env.flush_all()
+        progress.update(self.dbname, running.id, 10.0)
+        progress.update(self.dbname, paused.id, 20.0)
+        progress.flush(self.env.cr, self.dbname)
+        self.assertIsNone(download_control.get(self.dbname, running.id))
+        self.assertEqual(download_control.get(self.dbname, paused.id), INTERRUPT_PAUSE)
+
+    def test_pause_pending_cancels_job(self):
+        """Pause d'un téléchargement en attente : son job est retiré de la file."""
+        record = self._create_download(state='pending')
+        job = self.Job._enqueue(record, 'download')
+        record.action_pause()
+        self.assertEqual(record.state, 'paused')
+        self.assertEqual(job.state, 'cancelled')
+
+    def test_resume_enqueues_download(self):
+        """Reprise : le téléchargement repasse en attente avec un nouveau job."""
+        record = self._create_download(state='paused', download_path=self.dest)
+        record.action_resume()
+        self.assertEqual(record.state, 'pending')
+        job = self.Job.search([
+            ('res_model', '=', 'youtube.download'), ('res_id', '=', record.id),
+            ('state', '=', 'queued'),
+        ])
+        self.assertEqual(len(job), 1)
+        self.assertEqual(job.job_type, 'download')
+
+    def test_resume_does_not_consume_retry(self):
+        """Pauses et reprises successives : une seule tentative consommée."""
+        record = self._create_download(state='pending', download_path=self.dest, max_retries=3)
+        self._download(record, self._interrupt(record, 'paused', 'pause'))
+        self.assertEqual(record.retry_count, 1)
+        for _i in range(3):
+            record.action_resume()
+            job = self.Job.search([
+                ('res_model', '=', 'youtube.download'), ('res_id', '=', record.id),
+                ('state', '=', 'queued'),
+            ])
+            self.assertTrue(job._get_payload()['resumed'])
+            job.state = 'cancelled'
+            self._download(record, self._interrupt(record, 'paused', 'pause'), resumed=True)
+            self.assertEqual(record.state, 'paused')
+        self.assertEqual(record.retry_count, 1)
+        self.assertFalse(record.message_ids.filtered(lambda m: 'Tentative' in (m.body or '')))
+
+    def test_pause_ignores_playlists(self):
+        """Les playlists ne se mettent pas en pause."""
+        record = self._create_download(state='pending', is_playlist=True)
+        record.action_pause()
+        self.assertEqual(record.state, 'pending')
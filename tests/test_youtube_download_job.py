@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires de la file de téléchargement persistante (youtube.download.job).
+Couvre : mise en file, réclamation SKIP LOCKED, ordre de service (priorité,
+part équitable entre utilisateurs), acquittement, annulation, récupération
+des baux expirés.
+"""
+from datetime import timedelta
+from unittest.mock import patch, MagicMock
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+
+@tagged('post_install', '-at_install')
+class TestDownloadJobQueue(TestYoutubeDownloadBase):
+    """Tests de la file de jobs."""
+
+    # Les handlers ouvrent leurs propres curseurs courts
+    TEST_MODE = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env['youtube.download.job']
+
+    def _enqueue(self, record, priority=0):
+        return self.Job._enqueue(record, 'download', payload={'dest_path': '/tmp'}, priority=priority)
+
+    @patch('odoo.addons.youtube_downloader.models.youtube_download.YoutubeDownload._get_yt_dlp')
+    def test_start_download_enqueues_job(self, mock_ytdlp):
+        """Lancer un téléchargement crée un job en file, sans démarrer de thread."""
+        mock_ytdlp.return_value = MagicMock()
+        record = self._create_download()
+        record.action_start_download()
+        self.assertEqual(record.state, 'pending')
+        job = self.Job.search([('res_model', '=', 'youtube.download'), ('res_id', '=', record.id)])
+        self.assertEqual(len(job), 1)
+        self.assertEqual(job.state, 'queued')
+        self.assertEqual(job.job_type, 'download')
+        self.assertEqual(job.user_id, self.env.user)
+
+    def test_claim_marks_running_and_sets_lease(self):
+        """La réclamation passe le job en cours avec un bail et un worker."""
+        self.Job.search([('state', '=', 'queued')]).write({'state': 'cancelled'})
+        job = self._enqueue(self._create_download())
+        claimed = self.Job._claim('test-worker')
+        self.assertEqual(claimed, job)
+        self.assertEqual(claimed.state, 'running')
+        self.assertEqual(claimed.worker_id, 'test-worker')
+        self.assertEqual(claimed.attempts, 1)
+        self.assertTrue(claimed.lease_expires_at)
+
+    def test_claim_empty_queue(self):
+        """Aucun job réclamé quand la file est vide."""
+        self.Job.search([('state', '=', 'queued')]).write({'state': 'cancelled'})
+        self.assertFalse(self.Job._claim('test-worker'))
+
+    def test_claim_respects_priority(self):
+        """Le job de plus haute priorité est réclamé en premier."""
+        self.Job.search([('state', '=', 'queued')]).write({'state': 'cancelled'})
+        low = self._enqueue(self._create_download(), priority=0)
+        high = self._enqueue(self._create_download(), priority=3)
+        self.assertEqual(self.Job._claim('w1'), high)
+        self.assertEqual(self.Job._claim('w2'), low)
+
+    def _enqueue_as(self, user, count, priority=0):
+        jobs = self.Job.browse()
+        for _i in range(count):
+            jobs |= self._enqueue(self._create_download(), priority=priority)
+        jobs.write({'user_id': user.id})
+        return jobs
+
+    def test_claim_shares_fairly_between_users(self):
+        """À priorité égale, les utilisateurs sont servis à tour de rôle."""
+        from odoo.tests.common import new_test_user
+        self.Job.search([('state', 'in', ('queued', 'running'))]).write({'state': 'cancelled'})
+        bulk_user = new_test_user(self.env, login='yt_bulk_user')
+        other_user = new_test_user(self.env, login='yt_other_user')
+        bulk = self._enqueue_as(bulk_user, 5)
+        other = self._enqueue_as(other_user, 2)
+        claimed = [self.Job._claim(f'w{i}') for i in range(4)]
+        self.assertEqual([job.user_id for job in claimed], [bulk_user, other_user] * 2)
+        self.assertEqual(claimed[0], bulk[0])
+        self.assertEqual(claimed[1], other[0])
+
+    def test_running_jobs_count_toward_fair_share(self):
+        """Un utilisateur ayant déjà des jobs en cours passe après les autres."""
+        from odoo.tests.common import new_test_user
+        self.Job.search([('state', 'in', ('queued', 'running'))]).write({'state': 'cancelled'})
+        busy_user = new_test_user(self.env, login='yt_busy_user')
+        idle_user = new_test_user(self.env, login='yt_idle_user')
+        busy = self._enqueue_as(busy_user, 3)
+        self.Job._claim('w1')
+        self.Job._claim('w2')
+        idle = self._enqueue_as(idle_user, 1)
+        self.assertEqual(self.Job._claim('w3'), idle)
+        self.assertEqual(self.Job._claim('w4'), busy[2])
+
+    def test_urgent_priority_preempts_queued_jobs(self):
+        """Passer un téléchargement en urgent le place devant les jobs en file."""
+        self.Job.search([('state', '=', 'queued')]).write({'state': 'cancelled'})
+        self._enqueue_as(self.env.user, 3, priority=2)
+        record = self._create_download()
+        job = self._enqueue(record, priority=record._get_queue_priority())
+        record.action_set_priority('3')
+        self.assertEqual(job.priority, record._get_queue_priority())
+        self.assertEqual(self.Job._claim('w1'), job)
+
+    def test_schedule_view_shows_service_order(self):
+        """La vue d'ordre de planification donne l'ordre de réclamation."""
+        from odoo.tests.common import new_test_user
+        self.Job.search([('state', 'in', ('queued', 'running'))]).write({'state': 'cancelled'})
+        other_user = new_test_user(self.env, login='yt_schedule_user')
+        mine = self._enqueue_as(self.env.user, 3)
+        others = self._enqueue_as(other_user, 2)
+        urgent = self._enqueue_as(other_user, 1, priority=3)
+        self.env.flush_all()
+        schedule = self.env['youtube.download.job.schedule'].search([('job_type', '=', 'download')])
+        self.assertEqual(schedule.mapped('position'), list(range(1, 7)))
+        self.assertEqual(
+            schedule.mapped('job_id').ids,
+            [urgent.id, mine[0].id, others[0].id, mine[1].id, others[1].id, mine[2].id],
+        )
+        self.assertEqual(self.Job._claim('w1'), urgent)
+
+    @patch('odoo.addons.youtube_downloader.models.youtube_download.YoutubeDownload._do_download')
+    def test_execute_runs_download_on_pending_record(self, mock_do):
+        """L'exécution d'un job appelle _do_download avec le chemin du payload."""
+        record = self._create_download()
+        record.write({'state': 'pending'})
+        job = self._enqueue(record)
+        self.env.flush_all()
+        job._execute()
+        mock_do.assert_called_once_with('/tmp')
+
+    @patch('odoo.addons.youtube_downloader.models.youtube_download.YoutubeDownload._do_download')
+    def test_execute_skips_non_pending_record(self, mock_do):
+        """Un enregistrement annulé entre-temps n'est pas téléchargé."""
+        record = self._create_download()
+        record.write({'state': 'cancelled'})
+        job = self._enqueue(record)
+        self.env.flush_all()
+        job._execute()
+        mock_do.assert_not_called()
+
+    def test_cancel_pending_download_cancels_job(self):
+        """Annuler un téléchargement en attente annule son job en file."""
+        record = self._create_download()
+        record.write({'state': 'pending'})
+        job = self._enqueue(record)
+        record.action_cancel()
+        self.assertEqual(record.state, 'cancelled')
+        self.assertEqual(job.state, 'cancelled')
+
+    def test_fail_marks_record_in_error(self):
+        """Un job échoué passe son enregistrement en erreur."""
+        record = self._create_download()
+        record.write({'state': 'downloading'})
+        job = self._enqueue(record)
+        job._fail('boom')
+        self.assertEqual(job.state, 'failed')
+        self.assertEqual(record.state, 'error')
+        self.assertEqual(record.error_message, 'boom')
+
+    def test_requeue_expired_lease(self):
+        """Un job dont le bail a expiré est remis en file et son téléchargement en attente."""
+        record = self._create_download()
+        record.write({'state': 'downloading'})
+        job = self._enqueue(record)
+        job.write({
+            'state': 'running',
+            'attempts': 1,
+            'lease_expires_at': fields.Datetime.now() - timedelta(minutes=1),
+        })
+        self.Job._requeue_expired()
+        self.assertEqual(job.state, 'queued')
+        self.assertFalse(job.worker_id)
+        self.assertEqual(record.state, 'pending')
+
+    def test_requeue_expired_poison_job_fails(self):
+        """Un job interrompu trop souvent est abandonné."""
+        record = self._create_download()
+        job = self._enqueue(record)
+        job.write({
+            'state': 'running',
+            'attempts': 3,
+            'lease_expires_at': fields.Datetime.now() - timedelta(minutes=1),
+        })
+        self.Job._requeue_expired()
+        self.assertEqual(job.state, 'failed')
+        self.assertEqual(record.state, 'error')
+
+    def test_queue_priority_rank(self):
+        """Le rang de file suit l'ordre Basse < Normale < Haute < Urgente."""
+        ranks = [
+            self._create_download(priority=p)._get_queue_priority()
+            for p in ('1', '0', '2', '3')
+        ]
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertEqual(len(set(ranks)), 4)
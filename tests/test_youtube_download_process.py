@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires de l'exécution de yt-dlp en processus enfants.
+Couvre : protocole du runner (hooks, interruption), relais des hooks par le
+pool, réutilisation et recyclage des enfants, enfant mort en cours de job,
+téléchargement complet en mode isolé.
+"""
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+# Enfant factice : même protocole que youtube_download_runner.py, sans yt-dlp
+FAKE_RUNNER = textwrap.dedent("""
+    import json, os, sys
+    max_jobs = int(sys.argv[sys.argv.index('--max-jobs') + 1])
+    done = 0
+
+    def send(message):
+        sys.stdout.write(json.dumps(message) + '\\n')
+        sys.stdout.flush()
+
+    for line in sys.stdin:
+        job = json.loads(line)
+        done += 1
+        if job['url'] == 'crash':
+            sys.exit(3)
+        send({'type': 'progress', 'data': {'status': 'downloading', 'downloaded_bytes': 50,
+                                           'total_bytes': 100, 'filename': 'a.mp4'}})
+        reply = json.loads(sys.stdin.readline())
+        recycle = bool(max_jobs and done >= max_jobs)
+        if reply['action']:
+            send({'type': 'error', 'message': 'interrupted', 'interrupt': reply['action'],
+                  'recycle': recycle})
+        elif job['url'] == 'fail':
+            send({'type': 'error', 'message': 'ERROR: Private video', 'interrupt': None,
+                  'recycle': recycle})
+        else:
+            send({'type': 'result', 'info': {'id': 'x', 'pid': os.getpid()},
+                  'filepath': '/tmp/x.mp4', 'recycle': recycle})
+        if recycle:
+            break
+""")
+
+
+@tagged('post_install', '-at_install')
+class TestRunnerPool(TestYoutubeDownloadBase):
+    """Tests du pool de processus enfants."""
+
+    def setUp(self):
+        super().setUp()
+        from odoo.addons.youtube_downloader.models.youtube_download_process import RunnerPool
+        tmp = tempfile.mkdtemp(prefix='yt_runner_')
+        self.addCleanup(shutil.rmtree, tmp, True)
+        script = os.path.join(tmp, 'fake_runner.py')
+        with open(script, 'w') as f:
+            f.write(FAKE_RUNNER)
+        self.pool = RunnerPool(command=[sys.executable, script])
+        self.addCleanup(self.pool.shutdown)
+        self.events = []
+        self.settings = {'max_jobs': 0, 'max_memory_mb': 0, 'max_idle': 2}
+
+    def _run(self, url, progress_hook=None, settings=None):
+        return self.pool.run(
+            {'url': url, 'opts': {}, 'cached_info': None},
+            progress_hook or self.events.append, self.events.append,
+            settings or self.settings,
+        )
+
+    def test_hooks_relayed_and_process_reused(self):
+        """Les hooks de l'enfant sont rejoués dans le parent ; l'enfant est réutilisé."""
+        info, filepath = self._run('ok')
+        self.assertEqual(filepath, '/tmp/x.mp4')
+        self.assertEqual(self.events[0]['downloaded_bytes'], 50)
+        self.assertEqual(self.pool.idle_count(), 1)
+        second, _filepath = self._run('ok')
+        self.assertEqual(second['pid'], info['pid'])
+
+    def test_recycled_after_max_jobs(self):
+        """Un enfant ayant atteint son quota de jobs est remplacé."""
+        settings = dict(self.settings, max_jobs=1)
+        first, _filepath = self._run('ok', settings=settings)
+        self.assertEqual(self.pool.idle_count(), 0)
+        second, _filepath = self._run('ok', settings=settings)
+        self.assertNotEqual(first['pid'], second['pid'])
+
+    def test_interrupt_sent_back_to_child(self):
+        """Une interruption levée par le hook du parent arrête l'enfant et remonte."""
+        from odoo.addons.youtube_downloader.models.youtube_download_control import (
+            INTERRUPT_PAUSE, DownloadInterrupted,
+        )
+
+        def hook(d):
+            raise DownloadInterrupted(INTERRUPT_PAUSE)
+
+        with self.assertRaises(DownloadInterrupted) as ctx:
+            self._run('ok', progress_hook=hook)
+        self.assertEqual(ctx.exception.action, INTERRUPT_PAUSE)
+        # L'enfant a terminé proprement son job : il reste disponible
+        self.assertEqual(self.pool.idle_count(), 1)
+
+    def test_child_error_keeps_message(self):
+        """L'erreur yt-dlp de l'enfant remonte telle quelle (classement des erreurs)."""
+        with self.assertRaisesRegex(RuntimeError, 'Private video'):
+            self._run('fail')
+
+    def test_crashed_child_discarded(self):
+        """Un enfant mort en cours de job lève une erreur et n'est pas conservé."""
+        with self.assertRaisesRegex(RuntimeError, 'code 3'):
+            self._run('crash')
+        self.assertEqual(self.pool.idle_count(), 0)
+
+
+@tagged('post_install', '-at_install')
+class TestRunnerProtocol(TestYoutubeDownloadBase):
+    """Tests du script enfant (youtube_download_runner.py)."""
+
+    def _fake_yt_dlp(self):
+        def extract_info(ydl, url, download):
+            for hook in ydl.opts['progress_hooks']:
+                hook({'status': 'downloading', 'downloaded_bytes': 10, 'total_bytes': 20,
+                      'info_dict': {'formats': ['...']}})
+            return {'id': 'x', 'title': 'Test', 'formats': ['...'],
+                    'requested_downloads': [{'filepath': '/tmp/Test.mp4'}]}
+
+        return self._make_yt_dlp(extract_info)
+
+    def test_run_job_asks_parent_on_each_hook(self):
+        """Chaque événement de hook est envoyé au parent ; seules les clés utiles partent."""
+        from odoo.addons.youtube_downloader.models.youtube_download_runner import Channel, run_job
+        stdout = io.StringIO()
+        channel = Channel(io.StringIO('{"type": "reply", "action": null}\n'), stdout)
+        info, filepath = run_job(self._fake_yt_dlp(), channel, {'url': 'u', 'opts': {}})
+        self.assertEqual(filepath, '/tmp/Test.mp4')
+        self.assertEqual(info, {'id': 'x', 'title': 'Test'})
+        sent = json.loads(stdout.getvalue().splitlines()[0])
+        self.assertEqual(sent['type'], 'progress')
+        self.assertNotIn('info_dict', sent['data'])
+
+    def test_run_job_interrupted_by_reply(self):
+        """Une réponse portant une interruption arrête le transfert."""
+        from odoo.addons.youtube_downloader.models.youtube_download_runner import (
+            Channel, Interrupted, run_job,
+        )
+        channel = Channel(io.StringIO('{"type": "reply", "action": "cancel"}\n'), io.StringIO())
+        with self.assertRaises(Interrupted) as ctx:
+            run_job(self._fake_yt_dlp(), channel, {'url': 'u', 'opts': {}})
+        self.assertEqual(ctx.exception.action, 'cancel')
+
+
+@tagged('post_install', '-at_install')
+class TestIsolatedDownload(TestYoutubeDownloadBase):
+    """Téléchargement complet en mode « processus isolés »."""
+
+    def test_download_through_runner_pool(self):
+        """En mode isolé, _do_download délègue yt-dlp au pool et persiste le résultat."""
+        self._enter_test_mode()
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.process_isolation', 'True')
+        dest = tempfile.mkdtemp(prefix='yt_test_')
+        self.addCleanup(shutil.rmtree, dest, True)
+        record = self._create_download(state='pending')
+        calls = []
+
+        def fake_run(job, progress_hook, postprocessor_hook, settings, on_cache_invalid=None):
+            calls.append((job, settings))
+            progress_hook({'status': 'downloading', 'downloaded_bytes': 5, 'total_bytes': 10})
+            return {'id': 'dQw4w9WgXcQ', 'title': 'Isolé'}, None
+
+        with patch('odoo.addons.youtube_downloader.models.youtube_download.runner_pool',
+                   SimpleNamespace(run=fake_run)):
+            self._run_do_download(record, SimpleNamespace(), dest)
+        self.assertEqual(record.state, 'done')
+        self.assertEqual(record.video_title, 'Isolé')
+        job, settings = calls[0]
+        self.assertEqual(job['url'], record.url)
+        self.assertNotIn('progress_hooks', job['opts'])
+        json.dumps(job['opts'])  # options transmissibles à l'enfant
+        self.assertEqual(settings['max_jobs'], 20)
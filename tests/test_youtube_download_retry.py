@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires des reprises planifiées et du classement des erreurs.
+Couvre : classement permanente / bridée / transitoire, bornes du backoff,
+échec immédiat et cache négatif, reprise différée via la file, jobs non
+réclamés avant leur date.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+
+@tagged('post_install', '-at_install')
+class TestDownloadRetry(TestYoutubeDownloadBase):
+    """Tests des reprises après échec."""
+
+    TEST_MODE = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env['youtube.download.job']
+        cls.DeadVideo = cls.env['youtube.dead.video']
+
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+    def _fake_yt_dlp(self, error):
+        def extract_info(ydl, url, download):
+            self.calls.append(url)
+            raise Exception(error)
+
+        return self._make_yt_dlp(extract_info)
+
+    def _download(self, record, error):
+        self._run_do_download(record, self._fake_yt_dlp(error), '/tmp')
+
+    def _jobs(self, record):
+        return self.Job.search([
+            ('res_model', '=', 'youtube.download'), ('res_id', '=', record.id),
+        ])
+
+    def test_classify_errors(self):
+        """Les messages yt-dlp sont classés permanente, bridée ou transitoire."""
+        from odoo.addons.youtube_downloader.models.youtube_download_retry import (
+            ERROR_PERMANENT, ERROR_THROTTLED, ERROR_TRANSIENT, classify_download_error,
+        )
+        self.assertEqual(classify_download_error('ERROR: [youtube] x: Private video'), ERROR_PERMANENT)
+        self.assertEqual(classify_download_error('ERROR: Video unavailable'), ERROR_PERMANENT)
+        self.assertEqual(classify_download_error('Sign in to confirm your age'), ERROR_PERMANENT)
+        self.assertEqual(classify_download_error('HTTP Error 429: Too Many Requests'), ERROR_THROTTLED)
+        self.assertEqual(classify_download_error("Sign in to confirm you're not a bot"), ERROR_THROTTLED)
+        self.assertEqual(classify_download_error('Connection reset by peer'), ERROR_TRANSIENT)
+        self.assertEqual(classify_download_error(None), ERROR_TRANSIENT)
+
+    def test_backoff_is_bounded_with_jitter(self):
+        """Le délai croît exponentiellement, reste plafonné et varie (gigue)."""
+        from odoo.addons.youtube_downloader.models.youtube_download_retry import (
+            ERROR_THROTTLED, ERROR_TRANSIENT, RETRY_BACKOFF, retry_delay,
+        )
+        base, cap = RETRY_BACKOFF[ERROR_TRANSIENT]
+        for attempt in (1, 2, 3):
+            ceiling = base * 2 ** (attempt - 1)
+            delay = retry_delay(ERROR_TRANSIENT, attempt)
+            self.assertGreaterEqual(delay, ceiling / 2)
+            self.assertLessEqual(delay, ceiling)
+        self.assertLessEqual(retry_delay(ERROR_TRANSIENT, 50), cap)
+        self.assertGreaterEqual(retry_delay(ERROR_THROTTLED, 1), RETRY_BACKOFF[ERROR_THROTTLED][0] / 2)
+        self.assertGreater(len({retry_delay(ERROR_TRANSIENT, 5) for _i in range(10)}), 1)
+
+    def test_transient_error_requeues_with_delay(self):
+        """Une erreur transitoire replanifie un job différé au lieu de dormir."""
+        record = self._create_download(state='pending', max_retries=3, auto_retry=True)
+        now = fields.Datetime.now()
+        with patch('time.sleep') as sleep:
+            self._download(record, 'Connection reset by peer')
+        sleep.assert_not_called()
+        self.assertEqual(record.state, 'pending')
+        self.assertEqual(record.retry_count, 1)
+        job = self._jobs(record)
+        self.assertEqual(len(job), 1)
+        self.assertGreater(job.next_attempt_at, now)
+        self.assertEqual(job._get_payload()['dest_path'], '/tmp')
+
+    def test_last_attempt_fails_record(self):
+        """Les tentatives épuisées passent l'enregistrement en erreur."""
+        record = self._create_download(state='pending', max_retries=2, auto_retry=True)
+        self._download(record, 'Connection reset by peer')
+        self._download(record, 'Connection reset by peer')
+        self.assertEqual(record.state, 'error')
+        self.assertEqual(len(self._jobs(record)), 1)
+        self.assertFalse(self.DeadVideo.search([]))
+
+    def test_permanent_error_fails_fast_and_is_remembered(self):
+        """Une erreur permanente échoue aussitôt et sert les demandes suivantes."""
+        record = self._create_download(state='pending', max_retries=3, auto_retry=True)
+        self._download(record, 'ERROR: [youtube] dQw4w9WgXcQ: Private video')
+        self.assertEqual(record.state, 'error')
+        self.assertFalse(self._jobs(record))
+        self.assertEqual(self.DeadVideo.search([]).video_id, 'dQw4w9WgXcQ')
+
+        other = self._create_download(state='pending')
+        self.env.flush_all()
+        with patch.object(type(self.Download), '_do_download') as do_download:
+            other._run_download_job({})
+        do_download.assert_not_called()
+        self.env.invalidate_all()
+        self.assertEqual(other.state, 'error')
+        self.assertIn('Private video', other.error_message)
+        self.assertEqual(self.DeadVideo.search([]).hit_count, 1)
+
+    def test_expired_dead_video_is_retried(self):
+        """Une entrée expirée du cache négatif ne bloque plus la vidéo."""
+        self.DeadVideo._remember('dQw4w9WgXcQ', 'Private video')
+        self.DeadVideo.search([]).write({'expires_at': fields.Datetime.now() - timedelta(hours=1)})
+        self.assertFalse(self.DeadVideo._lookup('dQw4w9WgXcQ'))
+        self.DeadVideo._gc_expired()
+        self.assertFalse(self.DeadVideo.search([]))
+
+    def test_manual_retry_forgets_dead_video(self):
+        """Une relance manuelle retire la vidéo du cache négatif."""
+        self.DeadVideo._remember('dQw4w9WgXcQ', 'Private video')
+        record = self._create_download(state='error', video_id='dQw4w9WgXcQ', video_duration=60)
+        with patch.object(type(self.Download), '_get_yt_dlp'), \
+                patch.object(type(self.Download), '_check_disk_space'):
+            record.action_retry_download()
+        self.assertFalse(self.DeadVideo.search([]))
+        self.assertEqual(record.state, 'pending')
+
+    def test_manual_retry_without_video_id(self):
+        """Sans video_id (assistant, API, playlist), la relance retire l'ID extrait de l'URL."""
+        record = self._create_download(state='pending', max_retries=3, auto_retry=True)
+        self.assertFalse(record.video_id)
+        self._download(record, 'ERROR: [youtube] dQw4w9WgXcQ: Private video')
+        self.assertEqual((record.state, record.video_id), ('error', False))
+        self.assertEqual(self.DeadVideo.search([]).video_id, 'dQw4w9WgXcQ')
+        record.video_duration = 60
+        with patch.object(type(self.Download), '_get_yt_dlp'), \
+                patch.object(type(self.Download), '_check_disk_space'):
+            record.action_retry_download()
+        self.assertFalse(self.DeadVideo.search([]))
+        self.assertEqual(record.state, 'pending')
+
+    def test_deferred_job_not_claimed_before_due(self):
+        """Un job différé n'est réclamé qu'à sa date de prochaine tentative."""
+        record = self._create_download(state='pending')
+        job = self.Job._enqueue(
+            record, 'download', next_attempt_at=fields.Datetime.now() + timedelta(minutes=5),
+        )
+        self.assertNotIn('download', self.Job._get_queued_job_types())
+        self.assertFalse(self.Job._claim('test-worker'))
+        job.next_attempt_at = fields.Datetime.now() - timedelta(seconds=1)
+        self.assertEqual(self.Job._claim('test-worker'), job)
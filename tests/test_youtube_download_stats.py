@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires des statistiques journalières (youtube.download.stats.daily).
+Couvre : agrégation initiale, filigrane incrémental, jours à recalculer,
+historique mensuel et règles d'accès.
+"""
+from datetime import datetime, timedelta
+
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+
+@tagged('post_install', '-at_install')
+class TestDownloadStatsDaily(TestYoutubeDownloadBase):
+    """Tests de l'agrégation des statistiques journalières."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Stats = cls.env['youtube.download.stats.daily']
+
+    def _done_download(self, day=None, **kwargs):
+        record = self._create_download(**kwargs)
+        record.write({
+            'state': 'done',
+            'file_size': 10.0,
+            'video_duration': 60,
+            'download_duration': 5.0,
+            'download_date': day or datetime.now(),
+        })
+        return record
+
+    def _youtube_stats(self, day):
+        return self.Stats.search([('source', '=', 'youtube'), ('day', '=', day)])
+
+    def test_rollup_aggregates_done_downloads(self):
+        """Le cron agrège les téléchargements terminés par jour et qualité."""
+        day = datetime.now() - timedelta(days=3)
+        self._done_download(day=day, quality='1080p')
+        self._done_download(day=day, quality='1080p')
+        self._done_download(day=day, quality='audio_only')
+        self._create_download().write({'state': 'error', 'download_date': day})
+        self.Stats._cron_rollup()
+        stats = self._youtube_stats(day.date())
+        by_quality = {s.quality: s for s in stats if s.user_id == self.env.user}
+        self.assertEqual(by_quality['1080p'].download_count, 2)
+        self.assertAlmostEqual(by_quality['1080p'].size_mb, 20.0)
+        self.assertEqual(by_quality['1080p'].duration_sec, 120)
+        self.assertAlmostEqual(by_quality['1080p'].download_time, 10.0)
+        self.assertEqual(by_quality['audio_only'].download_count, 1)
+
+    def test_rollup_is_incremental(self):
+        """Un second passage ne recalcule que les jours modifiés depuis le filigrane."""
+        self._done_download()
+        self.Stats._cron_rollup()
+        self.env['ir.config_parameter'].sudo().set_param(
+            'youtube_downloader.stats_watermark',
+            str(datetime.now() + timedelta(hours=2)),
+        )
+        self.assertEqual(self.Stats._cron_rollup(), 0)
+
+    def test_rollup_recomputes_dirty_day_after_unlink(self):
+        """Supprimer un téléchargement marque son jour à recalculer."""
+        day = datetime.now() - timedelta(days=5)
+        record = self._done_download(day=day)
+        self.Stats._cron_rollup()
+        before = sum(self._youtube_stats(day.date()).mapped('download_count'))
+        record.unlink()
+        self.assertTrue(any(self._youtube_stats(day.date()).mapped('dirty')))
+        self.Stats._cron_rollup()
+        stats = self._youtube_stats(day.date())
+        self.assertEqual(sum(stats.mapped('download_count')), before - 1)
+        self.assertFalse(any(stats.mapped('dirty')))
+
+    def test_monthly_history(self):
+        """L'historique couvre 12 mois et inclut le mois courant."""
+        self._done_download()
+        self.Stats._cron_rollup()
+        history = self.Stats._get_monthly_history()
+        self.assertEqual(len(history), 12)
+        self.assertEqual(history[-1]['date'], datetime.now().strftime('%m/%Y'))
+        self.assertGreaterEqual(history[-1]['youtube'], 1)
+        self.assertEqual(history[-1]['count'],
+                         history[-1]['youtube'] + history[-1]['telegram'] + history[-1]['external'])
+
+    def test_monthly_history_in_dashboard(self):
+        """Le tableau de bord expose l'historique mensuel."""
+        data = self.Download.get_dashboard_data()
+        self.assertEqual(len(data['monthly_chart']), 12)
+
+    def test_user_sees_only_own_stats(self):
+        """Un utilisateur simple ne lit que ses propres statistiques."""
+        user = self.env['res.users'].create({
+            'name': 'Utilisateur Statistiques',
+            'login': 'stats_user_test',
+            'groups_id': [(6, 0, [
+                self.env.ref('base.group_user').id,
+                self.env.ref('youtube_downloader.group_youtube_user').id,
+            ])],
+        })
+        self._done_download()
+        self.Stats._cron_rollup()
+        history = self.Stats.with_user(user)._get_monthly_history()
+        self.assertEqual(sum(month['count'] for month in history), 0)
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires du moteur de traitement média (conversion MP4, réparation
+audio) commun aux trois modèles.
+Couvre : mise en file par lot, déduplication par fichier, contre-pression,
+fichier partagé entre modèles, notification de fin de lot, progression et
+vitesse d'encodage suivies sur le job, threads et priorité de ffmpeg.
+"""
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+REMUX = 'odoo.addons.youtube_downloader.models.youtube_media_remux'
+ENGINE = 'odoo.addons.youtube_downloader.models.youtube_media_engine'
+
+
+@tagged('post_install', '-at_install')
+class TestMediaEngine(TestYoutubeDownloadBase):
+    """Tests des jobs média de la file."""
+
+    TEST_MODE = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env['youtube.download.job']
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp(prefix='yt_engine_')
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        patcher = patch('shutil.which', return_value='/usr/bin/ffmpeg')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _touch(self, name):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(b'data')
+        return path
+
+    def _media_jobs(self):
+        return self.Job.search([('job_type', 'in', ('convert_mp4', 'fix_audio'))])
+
+    def test_batch_enqueues_one_job_per_eligible_file(self):
+        """Conversion groupée : un job par fichier non MP4, un même lot."""
+        first = self._create_download(state='done', file_path=self._touch('a.mkv'))
+        second = self._create_download(state='done', file_path=self._touch('b.avi'))
+        already = self._create_download(state='done', file_path=self._touch('c.mp4'))
+        action = (first | second | already).action_convert_to_mp4_batch()
+        jobs = self._media_jobs()
+        self.assertEqual(sorted(jobs.mapped('res_id')), sorted((first | second).ids))
+        self.assertEqual(len(set(jobs.mapped('batch_ref'))), 1)
+        self.assertIn('1 ignoré', action['params']['message'])
+
+    def test_same_file_not_queued_twice(self):
+        """Un fichier déjà en file n'est pas remis en file, même depuis un autre modèle."""
+        path = self._touch('shared.mkv')
+        download = self._create_download(state='done', file_path=path)
+        media = self.env['youtube.external.media'].create({
+            'name': 'Partagé', 'media_type': 'video', 'file_path': path, 'state': 'done',
+        })
+        download.action_convert_to_mp4_batch()
+        stats = media._enqueue_media_jobs('convert_mp4')
+        self.assertEqual((stats['queued'], stats['duplicates']), (0, 1))
+        self.assertEqual(len(self._media_jobs()), 1)
+
+    def test_finished_job_releases_dedup_key(self):
+        """Un job terminé libère son fichier : un nouveau traitement peut être mis en file."""
+        record = self._create_download(state='done', file_path=self._touch('again.mp4'))
+        first = record._enqueue_media_jobs('fix_audio')
+        self.assertEqual(first['queued'], 1)
+        self._media_jobs()._ack('done')
+        self.assertEqual(record._enqueue_media_jobs('fix_audio')['queued'], 1)
+
+    def test_backpressure_refuses_beyond_limit(self):
+        """File pleine : les demandes au-delà de max_queued_conversions sont refusées."""
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.max_queued_conversions', '1')
+        records = self._create_download(state='done', file_path=self._touch('x.mkv')) \
+            | self._create_download(state='done', file_path=self._touch('y.mkv'))
+        action = records.action_convert_to_mp4_batch()
+        self.assertEqual(len(self._media_jobs()), 1)
+        self.assertEqual(action['params']['type'], 'warning')
+        self.assertIn('1 refusé', action['params']['message'])
+
+    def test_automatic_conversion_ignores_backpressure(self):
+        """La conversion de fin de téléchargement passe même si la file est pleine."""
+        self.env['ir.config_parameter'].sudo().set_param('youtube_downloader.max_queued_conversions', '1')
+        self._create_download(state='done', file_path=self._touch('full.mkv'))._enqueue_media_jobs('convert_mp4')
+        record = self._create_download(state='done', file_path=self._touch('auto.mkv'))
+        stats = record._enqueue_media_jobs('convert_mp4', enforce_capacity=False)
+        self.assertEqual(stats['queued'], 1)
+
+    def test_conversion_follows_shared_file(self):
+        """Vidéo Telegram convertie : son média externe suit le nouveau fichier."""
+        path = self._touch('tg.mkv')
+        channel = self.env['telegram.channel'].create({'name': 'Canal', 'channel_identifier': '@c'})
+        media = self.env['youtube.external.media'].create({
+            'name': 'Média', 'media_type': 'video', 'file_path': path, 'state': 'done',
+        })
+        video = self.env['telegram.channel.video'].create({
+            'channel_id': channel.id, 'name': 'Vidéo', 'file_path': path, 'state': 'done',
+            'external_media_id': media.id,
+        })
+
+        def fake_convert(source_path, dest_path, plan, on_progress=None):
+            with open(dest_path, 'wb') as f:
+                f.write(b'converted')
+            return plan
+
+        with patch(f'{REMUX}.probe_streams', return_value={'video': 'vp9', 'audio': 'aac'}), \
+                patch(f'{REMUX}.convert_with_plan', side_effect=fake_convert):
+            video._run_convert_mp4_job({})
+        mp4_path = os.path.join(self.tmp, 'tg.mp4')
+        self.assertEqual(video.file_path, mp4_path)
+        self.assertEqual(media.file_path, mp4_path)
+        self.assertEqual(media.remux_plan, 'copy/copy (vp9/aac)')
+        self.assertFalse(os.path.exists(path))
+
+    def test_batch_notified_when_last_job_finishes(self):
+        """La fin de lot n'est signalée qu'une fois le dernier job terminé."""
+        records = self._create_download(state='done', file_path=self._touch('n1.mp4')) \
+            | self._create_download(state='done', file_path=self._touch('n2.mp4'))
+        records.action_fix_audio_batch()
+        first, second = self._media_jobs()
+        first._ack('done')
+        self.assertFalse(first._notify_batch_done())
+        second._fail('ffmpeg: erreur')
+        self.assertTrue(second._notify_batch_done())
+
+    def test_repair_wizard_enqueues_single_batch(self):
+        """L'assistant de réparation met en file un seul lot pour les trois modèles."""
+        download = self._create_download(state='done', file_path=self._touch('w1.mp4'))
+        media = self.env['youtube.external.media'].create({
+            'name': 'Média', 'media_type': 'video', 'file_path': self._touch('w2.mkv'), 'state': 'done',
+        })
+        wizard = self.env['audio.repair.wizard'].create({
+            'state': 'result',
+            'youtube_ids': '[%d]' % download.id,
+            'external_ids': '[%d]' % media.id,
+        })
+        wizard.action_repair()
+        jobs = self._media_jobs()
+        self.assertEqual(set(jobs.mapped('res_model')), {'youtube.download', 'youtube.external.media'})
+        self.assertEqual(len(set(jobs.mapped('batch_ref'))), 1)
+        self.assertEqual(wizard.state, 'done')
+
+    def test_job_records_encode_speed(self):
+        """La vitesse d'encodage mesurée et la durée du média restent sur le job."""
+        record = self._create_download(state='done', file_path=self._touch('speed.mkv'))
+        record._enqueue_media_jobs('convert_mp4')
+        job = self._media_jobs()
+        self.env.flush_all()
+
+        def fake_convert(source_path, dest_path, plan, on_progress=None):
+            on_progress(50.0, 2.0, 30.0)
+            with open(dest_path, 'wb') as f:
+                f.write(b'converted')
+            return dict(plan, speed=2.0, elapsed=60.0)
+
+        with patch(f'{REMUX}.probe_streams', return_value={'video': 'vp8', 'audio': 'opus', 'duration': 120.0}), \
+                patch(f'{REMUX}.convert_with_plan', side_effect=fake_convert):
+            job._execute()
+        self.env.invalidate_all()
+        self.assertEqual((job.encode_speed, job.media_duration, job.processing_time), (2.0, 120.0, 60.0))
+        self.assertEqual(job.progress, 100.0)
+
+    def test_media_progress_flushed_on_running_job(self):
+        """Le registre de progression média met à jour les jobs en cours seulement."""
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import MediaProgressRegistry
+        registry = MediaProgressRegistry(autostart=False)
+        running = self._create_download(state='done', file_path=self._touch('p1.mkv'))
+        queued = self._create_download(state='done', file_path=self._touch('p2.mkv'))
+        (running | queued)._enqueue_media_jobs('convert_mp4')
+        jobs = self._media_jobs()
+        running_job = jobs.filtered(lambda job: job.res_id == running.id)
+        running_job.state = 'running'
+        self.env.flush_all()
+        dbname = self.env.cr.dbname
+        for job in jobs:
+            registry.update(dbname, job.id, 40.0, speed=1.5, eta=12.0)
+        updated = registry.flush(self.env.cr, dbname)
+        self.assertEqual(list(updated), running_job.ids)
+        self.env.invalidate_all()
+        self.assertEqual((running_job.progress, running_job.encode_speed), (40.0, 1.5))
+        self.assertEqual((jobs - running_job).progress, 0.0)
+
+    def test_ffmpeg_tuning_splits_cores_and_lowers_priority(self):
+        """Threads = cœurs / conversions en cours sur ce nœud ; priorité basse au-delà de la charge."""
+        import socket
+        ICP = self.env['ir.config_parameter'].sudo()
+        ICP.set_param('youtube_downloader.max_concurrent_conversions', '5')
+        records = self._create_download(state='done', file_path=self._touch('t1.mkv')) \
+            | self._create_download(state='done', file_path=self._touch('t2.mkv')) \
+            | self._create_download(state='done', file_path=self._touch('t3.mkv'))
+        record = records[0]
+        with patch(f'{ENGINE}.available_cpus', return_value=8), \
+                patch(f'{ENGINE}.cpu_load', return_value=0.2):
+            # Conversion seule : tous les cœurs, malgré la limite de 5
+            self.assertEqual(record._media_ffmpeg_tuning(), {'threads': 8, 'low_priority': False})
+            records._enqueue_media_jobs('convert_mp4')
+            local, other, remote = self._media_jobs()
+            host = socket.gethostname()
+            local.write({'state': 'running', 'worker_id': f'{host}:10:0'})
+            other.write({'state': 'running', 'worker_id': f'{host}:11:0'})
+            remote.write({'state': 'running', 'worker_id': 'autre-noeud:10:0'})
+            self.assertEqual(record._media_ffmpeg_tuning()['threads'], 4)
+            ICP.set_param('youtube_downloader.max_concurrent_conversions', '1')
+            self.assertEqual(record._media_ffmpeg_tuning()['threads'], 8)
+        with patch(f'{ENGINE}.available_cpus', return_value=8), \
+                patch(f'{ENGINE}.cpu_load', return_value=1.5):
+            self.assertTrue(record._media_ffmpeg_tuning()['low_priority'])
+            ICP.set_param('youtube_downloader.conversion_low_priority_load', '0')
+            ICP.set_param('youtube_downloader.conversion_threads', '2')
+            self.assertEqual(record._media_ffmpeg_tuning(), {'threads': 2, 'low_priority': False})
+
+    def test_job_records_ffmpeg_tuning(self):
+        """Le réglage ffmpeg est passé à la conversion et reste sur le job."""
+        record = self._create_download(state='done', file_path=self._touch('threads.mkv'))
+        record._enqueue_media_jobs('convert_mp4')
+        job = self._media_jobs()
+        self.env.flush_all()
+        plans = []
+
+        def fake_convert(source_path, dest_path, plan, on_progress=None):
+            plans.append(plan)
+            with open(dest_path, 'wb') as f:
+                f.write(b'converted')
+            return dict(plan, speed=1.0, elapsed=10.0)
+
+        tuning = {'threads': 3, 'low_priority': True}
+        with patch.object(type(record), '_media_ffmpeg_tuning', return_value=tuning), \
+                patch(f'{REMUX}.probe_streams', return_value={'video': 'vp8', 'audio': 'opus', 'duration': 10.0}), \
+                patch(f'{REMUX}.convert_with_plan', side_effect=fake_convert):
+            job._execute()
+        self.assertEqual((plans[0]['threads'], plans[0]['low_priority']), (3, True))
+        self.env.invalidate_all()
+        self.assertEqual((job.ffmpeg_threads, job.low_priority), (3, True))
+
+    def test_idle_flush_loop_opens_no_cursor(self):
+        """Sans progression modifiée, le flusher n'ouvre aucun curseur."""
+        from odoo.addons.youtube_downloader.models.youtube_download_progress import MediaProgressRegistry
+        progress_module = 'odoo.addons.youtube_downloader.models.youtube_download_progress'
+
+        class StopLoop(Exception):
+            pass
+
+        registry = MediaProgressRegistry(autostart=False)
+        dbname = self.env.cr.dbname
+        with patch(f'{progress_module}.Registry') as db_registry, \
+                patch(f'{progress_module}.time.sleep', side_effect=[None, None, StopLoop]):
+            with self.assertRaises(StopLoop):
+                registry._flush_loop(dbname)
+        db_registry.assert_not_called()
+
+        registry.update(dbname, 1, 10.0)
+        with patch(f'{progress_module}.Registry') as db_registry, \
+                patch(f'{progress_module}.time.sleep', side_effect=[None, StopLoop]):
+            with self.assertRaises(StopLoop):
+                registry._flush_loop(dbname)
+        db_registry.assert_called_once_with(dbname)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires du plan de conversion MP4 guidé par ffprobe.
+Couvre : stratégie par flux, MP4 conforme laissé tel quel, commande ffmpeg,
+repli en ré-encodage, plan enregistré sur les trois modèles, progression
+ffmpeg lue en continu (tampon stderr borné, délai selon la durée), threads
+et priorité de ffmpeg.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+REMUX = 'odoo.addons.youtube_downloader.models.youtube_media_remux'
+
+# Processus imitant ffmpeg -progress pipe:1 : deux blocs de progression sur
+# stdout, beaucoup de bruit sur stderr
+FAKE_FFMPEG = """
+import sys
+for i in range(500):
+    sys.stderr.write('frame=%d noise\\n' % i)
+for out_time, speed in ((5000000, '2.0x'), (10000000, '2.5x')):
+    sys.stdout.write('out_time_us=%d\\nspeed=%s\\nprogress=continue\\n' % (out_time, speed))
+    sys.stdout.flush()
+sys.stdout.write('progress=end\\n')
+"""
+
+
+@tagged('post_install', '-at_install')
+class TestRemuxPlanner(TestYoutubeDownloadBase):
+    """Tests des fonctions du planificateur (sans ffmpeg)."""
+
+    def test_plan_per_stream(self):
+        """Chaque flux est copié s'il est lisible dans un MP4, ré-encodé sinon."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import plan_label, plan_mp4
+        cases = [
+            ({'video': 'h264', 'audio': 'aac'}, 'copy/copy (h264/aac)'),
+            ({'video': 'vp9', 'audio': 'opus'}, 'copy/aac (vp9/opus)'),
+            ({'video': 'vp8', 'audio': 'vorbis'}, 'h264/aac (vp8/vorbis)'),
+            ({'video': 'h264', 'audio': None}, 'copy/- (h264/-)'),
+        ]
+        for probe, label in cases:
+            self.assertEqual(plan_label(plan_mp4(probe)), label)
+
+    def test_plan_without_probe_keeps_previous_behaviour(self):
+        """Sans ffprobe : vidéo copiée, audio ré-encodé (comportement historique)."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import (
+            STREAM_COPY, STREAM_ENCODE, plan_is_noop, plan_mp4,
+        )
+        plan = plan_mp4(None)
+        self.assertEqual((plan['video'], plan['audio']), (STREAM_COPY, STREAM_ENCODE))
+        self.assertFalse(plan_is_noop(plan, '/tmp/a.mp4'))
+
+    def test_hevc_is_reencoded(self):
+        """Un MP4 HEVC n'est pas « conforme » : la vidéo est ré-encodée en H.264."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import (
+            STREAM_COPY, STREAM_ENCODE, plan_is_noop, plan_label, plan_mp4,
+        )
+        plan = plan_mp4({'video': 'hevc', 'audio': 'aac'})
+        self.assertEqual((plan['video'], plan['audio']), (STREAM_ENCODE, STREAM_COPY))
+        self.assertFalse(plan_is_noop(plan, '/tmp/a.mp4'))
+        self.assertEqual(plan_label(plan), 'h264/copy (hevc/aac)')
+
+    def test_compliant_mp4_is_noop(self):
+        """Un MP4 H.264 + AAC n'est pas retouché ; un MKV identique est rempaqueté."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import plan_is_noop, plan_mp4
+        plan = plan_mp4({'video': 'h264', 'audio': 'aac'})
+        self.assertTrue(plan_is_noop(plan, '/tmp/a.mp4'))
+        self.assertFalse(plan_is_noop(plan, '/tmp/a.mkv'))
+        self.assertFalse(plan_is_noop(plan_mp4({'video': 'h264', 'audio': 'opus'}), '/tmp/a.mp4'))
+
+    def test_command_copies_compatible_audio(self):
+        """L'audio AAC est copié : plus de -c:a aac systématique."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import build_mp4_command, plan_mp4
+        cmd = build_mp4_command('in.mkv', 'out.mp4', plan_mp4({'video': 'h264', 'audio': 'aac'}))
+        self.assertIn('-c:a', cmd)
+        self.assertEqual(cmd[cmd.index('-c:a') + 1], 'copy')
+        self.assertEqual(cmd[cmd.index('-c:v') + 1], 'copy')
+        self.assertNotIn('libx264', cmd)
+
+    def test_failed_video_copy_falls_back_to_encode(self):
+        """Si la copie vidéo échoue, la vidéo est ré-encodée ; l'audio garde sa stratégie."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import (
+            STREAM_COPY, STREAM_ENCODE, FfmpegResult, convert_with_plan, plan_mp4,
+        )
+        tmp = tempfile.mkdtemp(prefix='yt_remux_')
+        self.addCleanup(shutil.rmtree, tmp, True)
+        dest = os.path.join(tmp, 'out.mp4')
+        commands = []
+
+        def fake_run(cmd, timeout, duration=None, on_progress=None):
+            commands.append(cmd)
+            if 'libx264' not in cmd:
+                return FfmpegResult(1, 'codec not supported', None, 0.1)
+            with open(dest, 'wb') as f:
+                f.write(b'data')
+            return FfmpegResult(0, '', 3.0, 0.1)
+
+        with patch(f'{REMUX}._run', side_effect=fake_run):
+            plan = convert_with_plan('in.mkv', dest, plan_mp4({'video': 'vp9', 'audio': 'aac'}))
+        self.assertEqual(len(commands), 2)
+        self.assertEqual((plan['video'], plan['audio']), (STREAM_ENCODE, STREAM_COPY))
+        self.assertEqual(plan['speed'], 3.0)
+
+
+@tagged('post_install', '-at_install')
+class TestFfmpegProgress(TestYoutubeDownloadBase):
+    """Exécution de ffmpeg : progression en continu, mémoire et délai bornés."""
+
+    def test_progress_streamed_and_stderr_bounded(self):
+        """Chaque bloc -progress est remonté ; seules les dernières lignes de stderr sont gardées."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import STDERR_TAIL_LINES, _run
+        events = []
+        result = _run([sys.executable, '-c', FAKE_FFMPEG], 30, duration=20.0,
+                      on_progress=lambda *args: events.append(args))
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual([event[:2] for event in events[:2]], [(25.0, 2.0), (50.0, 2.5)])
+        self.assertAlmostEqual(events[1][2], 4.0)  # ETA : 10 s restantes à 2,5×
+        lines = result.stderr.splitlines()
+        self.assertEqual(len(lines), STDERR_TAIL_LINES)
+        self.assertEqual(lines[-1], 'frame=499 noise')
+        self.assertGreater(result.speed, 0)
+
+    def test_timeout_kills_process(self):
+        """Au-delà du délai, le processus est tué et TimeoutExpired levée."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import _run
+        with self.assertRaises(subprocess.TimeoutExpired):
+            _run([sys.executable, '-c', 'import time; time.sleep(30)'], 0.5)
+
+    def test_timeout_follows_media_duration(self):
+        """Délai proportionnel à la durée ; plafonds fixes sans durée connue."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import (
+            ENCODE_TIMEOUT, REMUX_TIMEOUT, conversion_timeout, plan_mp4,
+        )
+        short = plan_mp4({'video': 'vp8', 'audio': 'aac', 'duration': 60.0})
+        long = plan_mp4({'video': 'vp8', 'audio': 'aac', 'duration': 4 * 3600.0})
+        self.assertLess(conversion_timeout(short), ENCODE_TIMEOUT)
+        self.assertGreater(conversion_timeout(long), ENCODE_TIMEOUT)
+        self.assertLess(conversion_timeout(plan_mp4({'video': 'h264', 'audio': 'aac', 'duration': 60.0})),
+                        conversion_timeout(short))
+        self.assertEqual(conversion_timeout(plan_mp4(None)), REMUX_TIMEOUT)
+
+    def test_command_reports_progress_on_stdout(self):
+        """La commande ffmpeg écrit sa progression sur stdout, sans statistiques sur stderr."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import build_mp4_command, plan_mp4
+        cmd = build_mp4_command('in.mkv', 'out.mp4', plan_mp4(None))
+        self.assertEqual(cmd[cmd.index('-progress') + 1], 'pipe:1')
+        self.assertIn('-nostats', cmd)
+
+
+@tagged('post_install', '-at_install')
+class TestFfmpegThreads(TestYoutubeDownloadBase):
+    """Répartition des cœurs entre conversions et priorité basse."""
+
+    def test_cores_split_between_slots(self):
+        """Les cœurs sont répartis entre les conversions simultanées, au moins un thread."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import ffmpeg_threads
+        self.assertEqual(ffmpeg_threads(8, 2), 4)
+        self.assertEqual(ffmpeg_threads(32, 5), 6)
+        self.assertEqual(ffmpeg_threads(2, 5), 1)
+        self.assertEqual(ffmpeg_threads(8, 2, override=3), 3)
+        self.assertEqual(ffmpeg_threads(8, 2, override=64), 8)
+
+    def test_command_limits_threads(self):
+        """-threads est une option de sortie ; absente sans réglage (comportement historique)."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import build_mp4_command, plan_mp4
+        plan = plan_mp4({'video': 'vp8', 'audio': 'aac'})
+        self.assertNotIn('-threads', build_mp4_command('in.mkv', 'out.mp4', plan))
+        cmd = build_mp4_command('in.mkv', 'out.mp4', dict(plan, threads=4))
+        self.assertEqual(cmd[cmd.index('-threads') + 1], '4')
+        self.assertGreater(cmd.index('-threads'), cmd.index('-i'))
+        self.assertEqual(cmd[0], 'ffmpeg')
+
+    def test_low_priority_prefix(self):
+        """Machine chargée : ffmpeg lancé sous nice et ionice (si disponibles)."""
+        from odoo.addons.youtube_downloader.models.youtube_media_remux import build_mp4_command, plan_mp4
+        with patch('shutil.which', side_effect=lambda name: '/usr/bin/' + name):
+            cmd = build_mp4_command('in.mkv', 'out.mp4', dict(plan_mp4(None), low_priority=True))
+        self.assertEqual(cmd[:6], ['nice', '-n', '10', 'ionice', '-c', '3'])
+        self.assertEqual(cmd[6], 'ffmpeg')
+        with patch('shutil.which', return_value=None):
+            cmd = build_mp4_command('in.mkv', 'out.mp4', dict(plan_mp4(None), low_priority=True))
+        self.assertEqual(cmd[0], 'ffmpeg')
+
+
+@tagged('post_install', '-at_install')
+class TestRemuxPlanRecorded(TestYoutubeDownloadBase):
+    """Plan enregistré par les jobs média ; relance sans effet sur un fichier conforme."""
+
+    TEST_MODE = True
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = tempfile.mkdtemp(prefix='yt_remux_')
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        patcher = patch('shutil.which', return_value='/usr/bin/ffmpeg')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _touch(self, name):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(b'data')
+        return path
+
+    def _fake_convert(self, source_path, dest_path, plan, on_progress=None):
+        with open(dest_path, 'wb') as f:
+            f.write(b'converted')
+        return plan
+
+    def test_download_fix_audio_noop_when_compliant(self):
+        """Réparation audio d'un MP4 déjà H.264 + AAC : aucun ffmpeg lancé."""
+        path = self._touch('ok.mp4')
+        record = self._create_download(state='done', file_path=path)
+        with patch(f'{REMUX}.probe_streams', return_value={'video': 'h264', 'audio': 'aac'}), \
+                patch(f'{REMUX}.convert_with_plan') as convert:
+            record._run_fix_audio_job({})
+        convert.assert_not_called()
+        self.assertEqual(record.remux_plan, 'conforme (h264/aac)')
+
+    def test_download_remux_records_plan(self):
+        """Conversion MKV → MP4 : le plan retenu est enregistré."""
+        path = self._touch('video.mkv')
+        record = self._create_download(state='done', file_path=path)
+        with patch(f'{REMUX}.probe_streams', return_value={'video': 'vp9', 'audio': 'opus'}), \
+                patch(f'{REMUX}.convert_with_plan', side_effect=self._fake_convert):
+            record._run_convert_mp4_job({})
+        self.assertEqual(record.file_path, os.path.join(self.tmp, 'video.mp4'))
+        self.assertEqual(record.remux_plan, 'copy/aac (vp9/opus)')
+        self.assertFalse(os.path.exists(path))
+
+    def test_external_media_fix_audio_records_plan(self):
+        """Réparation audio d'un média externe : plan copy/aac enregistré."""
+        path = self._touch('clip.mp4')
+        media = self.env['youtube.external.media'].create({
+            'name': 'Clip', 'media_type': 'video', 'file_path': path, 'state': 'done',
+        })
+        with patch(f'{REMUX}.probe_streams', return_value={'video': 'h264', 'audio': 'opus'}), \
+                patch(f'{REMUX}.convert_with_plan', side_effect=self._fake_convert):
+            media._run_fix_audio_job({})
+        self.assertEqual(media.remux_plan, 'copy/aac (h264/opus)')
+
+    def test_telegram_fix_audio_noop_when_compliant(self):
+        """Vidéo Telegram déjà conforme : relancer la réparation ne fait rien."""
+        path = self._touch('tg.mp4')
+        channel = self.env['telegram.channel'].create({'name': 'Canal', 'channel_identifier': '@c'})
+        video = self.env['telegram.channel.video'].create({
+            'channel_id': channel.id, 'name': 'Vidéo', 'file_path': path, 'state': 'done',
+        })
+        with patch(f'{REMUX}.probe_streams', return_value={'video': 'h264', 'audio': 'aac'}), \
+                patch(f'{REMUX}.convert_with_plan') as convert:
+            video._run_fix_audio_job({})
+            video._run_fix_audio_job({})
+        convert.assert_not_called()
+        self.assertEqual(video.remux_plan, 'conforme (h264/aac)')
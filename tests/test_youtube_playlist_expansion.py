@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires de l'analyse de playlist en arrière-plan (_run_expand_playlist_job).
+Couvre : mise en file, consommation paresseuse des entrées, création par
+paquets, reprise sans doublon, annulation, playlist vide et abonnements
+(vérification incrémentale, arrêt anticipé, cron étalé).
+"""
+from datetime import timedelta
+from unittest.mock import patch, MagicMock
+
+from odoo import fields
+from odoo.tests import tagged
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+
+@tagged('post_install', '-at_install')
+class TestPlaylistExpansion(TestYoutubeDownloadBase):
+    """Tests de l'analyse de playlist par paquets."""
+
+    TEST_MODE = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env['youtube.download.job']
+
+    def setUp(self):
+        super().setUp()
+        self.consumed = []
+        self.jobs_seen = {}
+
+    def _fake_yt_dlp(self, count, zero_duration=(), ids=None):
+        """yt-dlp factice produisant les entrées à la demande (comme la pagination)."""
+        test = self
+        ids = ids or [f'vid{i:08d}' for i in range(count)]
+
+        def entries():
+            for i, video_id in enumerate(ids):
+                # Jobs de téléchargement déjà en file au moment de lister l'entrée i
+                test.jobs_seen[i] = test.Job.search_count([('job_type', '=', 'download')])
+                test.consumed.append(i)
+                yield {
+                    'id': video_id,
+                    'title': f'Vidéo {i}',
+                    'duration': 0 if i in zero_duration else 60,
+                }
+
+        def extract_info(ydl, url, download, process=True, ie_key=None):
+            assert not process, "les entrées doivent rester paresseuses"
+            return {'_type': 'playlist', 'title': 'Ma playlist', 'entries': entries()}
+
+        return self._make_yt_dlp(extract_info)
+
+    def _playlist(self, state='pending'):
+        return self._create_download(
+            url=self.VALID_PLAYLIST_URL, is_playlist=True, state=state,
+        )
+
+    def _expand(self, playlist, yt_dlp, incremental=False):
+        self.env.flush_all()
+        with patch.object(type(self.Download), '_get_yt_dlp', return_value=yt_dlp):
+            playlist._run_expand_playlist_job({'dest_path': '/tmp', 'incremental': incremental})
+        self.env.invalidate_all()
+
+    def test_start_playlist_enqueues_expansion(self):
+        """Lancer une playlist met en file son analyse sans rien extraire."""
+        playlist = self._playlist(state='draft')
+        with patch.object(type(self.Download), '_get_yt_dlp', return_value=MagicMock()):
+            result = playlist.action_start_download()
+        self.assertEqual(result['tag'], 'display_notification')
+        self.assertEqual(playlist.state, 'pending')
+        job = self.Job.search([('res_id', '=', playlist.id), ('res_model', '=', 'youtube.download')])
+        self.assertEqual(job.job_type, 'expand_playlist')
+        self.assertFalse(playlist.playlist_item_ids)
+
+    def test_expansion_creates_children_in_batches(self):
+        """Les premières vidéos sont en file avant la fin de l'énumération."""
+        from odoo.addons.youtube_downloader.models.youtube_download import PLAYLIST_FIRST_BATCH
+        playlist = self._playlist()
+        self._expand(playlist, self._fake_yt_dlp(150, zero_duration={5}))
+        children = playlist.playlist_item_ids
+        self.assertEqual(len(children), 149)
+        self.assertEqual(set(children.mapped('state')), {'pending'})
+        self.assertEqual(self.Job.search_count([('job_type', '=', 'download')]), 149)
+        self.assertEqual(self.jobs_seen[0], 0)
+        self.assertEqual(self.jobs_seen[PLAYLIST_FIRST_BATCH + 1], PLAYLIST_FIRST_BATCH)
+        self.assertEqual(playlist.state, 'done')
+        self.assertEqual(playlist.playlist_count, 149)
+        self.assertEqual(playlist.playlist_title, 'Ma playlist')
+
+    def test_expansion_resumes_without_duplicates(self):
+        """Une reprise (bail expiré) ne recrée pas les vidéos déjà créées."""
+        playlist = self._playlist()
+        self._expand(playlist, self._fake_yt_dlp(30))
+        playlist.write({'state': 'downloading'})
+        self._expand(playlist, self._fake_yt_dlp(40))
+        self.assertEqual(len(playlist.playlist_item_ids), 40)
+        self.assertEqual(playlist.playlist_count, 40)
+
+    def test_expansion_job_runs_after_claim_cursor_closed(self):
+        """Comme _process_one : le curseur de réclamation est fermé avant l'appel du handler."""
+        from odoo.addons.youtube_downloader.models.youtube_info_cache import info_lru
+        info_lru.clear()
+        self.addCleanup(info_lru.clear)
+        playlist = self._playlist()
+        for incremental in (False, True):
+            job = self.Job._enqueue(
+                playlist, 'expand_playlist', payload={'dest_path': '/tmp', 'incremental': incremental},
+            )
+            # Rien en cache : le handler doit relire ses champs sur ses curseurs courts
+            self.env.flush_all()
+            self.env.invalidate_all()
+            with self.registry.cursor() as cr:
+                call = self.env(cr=cr)['youtube.download.job'].browse(job.id)._get_execution()
+            with patch.object(type(self.Download), '_get_yt_dlp', return_value=self._fake_yt_dlp(10)):
+                call()
+            self.env.invalidate_all()
+            self.assertEqual(len(playlist.playlist_item_ids), 10)
+            self.assertEqual(playlist.state, 'done')
+
+    def test_cancelled_playlist_stops_expansion(self):
+        """Une playlist annulée pendant l'analyse arrête l'énumération."""
+        playlist = self._playlist()
+        original = type(self.Download)._create_playlist_children
+
+        def cancel_then_create(rec, indexed_entries, dest_path):
+            rec.write({'state': 'cancelled'})
+            return original(rec, indexed_entries, dest_path)
+
+        with patch.object(type(self.Download), '_create_playlist_children', cancel_then_create):
+            self._expand(playlist, self._fake_yt_dlp(500))
+        self.assertFalse(playlist.playlist_item_ids)
+        self.assertLess(len(self.consumed), 500)
+
+    def test_empty_playlist_fails_job(self):
+        """Une playlist sans vidéo téléchargeable fait échouer le job."""
+        from odoo.exceptions import UserError
+        playlist = self._playlist()
+        self.env.flush_all()
+        with patch.object(type(self.Download), '_get_yt_dlp',
+                          return_value=self._fake_yt_dlp(3, zero_duration={0, 1, 2})), \
+                self.assertRaises(UserError):
+            playlist._run_expand_playlist_job({'dest_path': '/tmp'})
+
+    # ─── Abonnements ──────────────────────────────────────────────────────────
+    def test_subscription_enqueues_only_new_entries(self):
+        """Une vérification d'abonnement ne crée que les vidéos inconnues."""
+        playlist = self._playlist()
+        self._expand(playlist, self._fake_yt_dlp(20))
+        self.assertEqual(len(playlist._get_known_video_ids()), 20)
+        self._expand(playlist, self._fake_yt_dlp(23), incremental=True)
+        self.assertEqual(len(playlist.playlist_item_ids), 23)
+        self.assertEqual(playlist.state, 'done')
+        self.assertTrue(playlist.subscription_last_check)
+        self.assertEqual(len(playlist._get_known_video_ids()), 23)
+
+    def test_subscription_remembers_deleted_children(self):
+        """Une vidéo supprimée après téléchargement n'est pas recréée."""
+        playlist = self._playlist()
+        self._expand(playlist, self._fake_yt_dlp(5))
+        playlist.playlist_item_ids[:2].unlink()
+        self._expand(playlist, self._fake_yt_dlp(5), incremental=True)
+        self.assertEqual(len(playlist.playlist_item_ids), 3)
+
+    def test_date_sorted_subscription_stops_at_first_known(self):
+        """Nouveautés en tête : l'énumération s'arrête à la première vidéo connue."""
+        playlist = self._playlist()
+        old_ids = [f'old{i:08d}' for i in range(200)]
+        self._expand(playlist, self._fake_yt_dlp(0, ids=old_ids))
+        playlist.subscription_date_sorted = True
+        self.consumed.clear()
+        self._expand(playlist, self._fake_yt_dlp(0, ids=['new00000001', 'new00000002'] + old_ids),
+                     incremental=True)
+        self.assertEqual(len(self.consumed), 3)
+        self.assertEqual(len(playlist.playlist_item_ids), 202)
+
+    def test_subscribe_spreads_first_check(self):
+        """La première vérification est répartie sur l'intervalle."""
+        playlist = self._playlist(state='done')
+        playlist.subscription_interval_days = 7
+        now = fields.Datetime.now()
+        playlist.action_subscribe()
+        self.assertTrue(playlist.subscription_active)
+        self.assertGreaterEqual(playlist.subscription_next_check, now)
+        self.assertLessEqual(playlist.subscription_next_check, now + timedelta(days=7, seconds=1))
+
+    def test_cron_enqueues_due_subscriptions_with_jitter(self):
+        """Le cron met en file les abonnements échus et replanifie avec dispersion."""
+        due = self._playlist(state='done')
+        later = self._playlist(state='done')
+        now = fields.Datetime.now()
+        due.write({'subscription_active': True, 'subscription_next_check': now - timedelta(hours=1)})
+        later.write({'subscription_active': True, 'subscription_next_check': now + timedelta(days=1)})
+        self.assertEqual(self.Download._cron_check_subscriptions(), 1)
+        job = self.Job.search([('job_type', '=', 'expand_playlist')])
+        self.assertEqual(job.res_id, due.id)
+        self.assertTrue(job._get_payload()['incremental'])
+        self.assertGreaterEqual(due.subscription_next_check, now + timedelta(days=7 * 0.9))
+        self.assertLessEqual(due.subscription_next_check, now + timedelta(days=7 * 1.1, seconds=1))
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Tests unitaires des nœuds de workers (intégrés ou dédiés).
+Couvre : option youtube_embedded_workers, heartbeat des nœuds, filtre des
+types de jobs d'un pool dédié, téléchargements Telegram exécutés par la file.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import tagged
+from odoo.tools import config
+
+from .test_youtube_download import TestYoutubeDownloadBase
+
+
+@tagged('post_install', '-at_install')
+class TestWorkerNodes(TestYoutubeDownloadBase):
+    """Tests des pools de workers et de leur présence en base."""
+
+    TEST_MODE = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env['youtube.download.job']
+        cls.Node = cls.env['youtube.worker.node']
+
+    def test_embedded_workers_option(self):
+        """youtube_embedded_workers = False réserve les jobs aux nœuds dédiés."""
+        from odoo.addons.youtube_downloader.models.youtube_download_job import embedded_workers_enabled
+        with patch.dict(config.options, {'youtube_embedded_workers': 'False'}):
+            self.assertFalse(embedded_workers_enabled())
+        with patch.dict(config.options, {'youtube_embedded_workers': 'True'}):
+            self.assertTrue(embedded_workers_enabled())
+
+    def test_node_heartbeat_upsert(self):
+        """Un nœud est créé au premier signal, puis mis à jour."""
+        node = self.Node._heartbeat('worker-1:4242', {'mode': 'standalone', 'concurrency': 4})
+        self.assertEqual((node.hostname, node.pid), ('worker-1', 4242))
+        self.assertTrue(node.is_alive)
+        again = self.Node._heartbeat('worker-1:4242', {'running_jobs': 2, 'stopped': True})
+        self.assertEqual(again, node)
+        self.assertEqual(node.running_jobs, 2)
+        self.assertFalse(node.is_alive)
+
+    def test_stale_nodes_garbage_collected(self):
+        """Les nœuds muets depuis plus d'un jour sont supprimés."""
+        node = self.Node._heartbeat('old:1', {'mode': 'embedded'})
+        node.last_heartbeat = fields.Datetime.now() - timedelta(days=2)
+        self.Node._gc_stale_nodes()
+        self.assertFalse(node.exists())
+
+    def test_pool_heartbeat_records_node(self):
+        """Le heartbeat d'un pool renouvelle ses baux et signale le nœud."""
+        from odoo.addons.youtube_downloader.models.youtube_download_job import _JobWorkerPool
+        pool = _JobWorkerPool(self.env.cr.dbname, mode='standalone', job_types=['download'])
+        job = self.Job._enqueue(self._create_download(state='pending'), 'download')
+        job.write({'state': 'running', 'lease_expires_at': fields.Datetime.now()})
+        pool.running_job_ids.add(job.id)
+        self.env.flush_all()
+        pool._heartbeat()
+        self.env.invalidate_all()
+        node = self.Node.search([('name', '=', pool.node_name)])
+        self.assertEqual(node.mode, 'standalone')
+        self.assertEqual(node.job_types, 'download')
+        self.assertEqual(node.running_jobs, 1)
+        self.assertGreater(job.lease_expires_at, fields.Datetime.now() + timedelta(minutes=1))
+
+    def test_pool_claims_only_its_job_types(self):
+        """Un pool dédié à certains types de jobs ignore les autres."""
+        from odoo.addons.youtube_downloader.models.youtube_download_job import _JobWorkerPool
+        pool = _JobWorkerPool(self.env.cr.dbname, mode='standalone', job_types=['telegram_download'])
+        job = self.Job._enqueue(self._create_download(state='pending'), 'download')
+        self.env.flush_all()
+        self.assertFalse(pool._process_one('test:0'))
+        self.env.invalidate_all()
+        self.assertEqual(job.state, 'queued')
+
+
+@tagged('post_install', '-at_install')
+class TestTelegramJobs(TestYoutubeDownloadBase):
+    """Téléchargements Telegram exécutés par la file de jobs."""
+
+    TEST_MODE = True
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env['youtube.download.job']
+        cls.channel = cls.env['telegram.channel'].create({
+            'name': 'Canal test',
+            'channel_identifier': '@canal_test',
+        })
+        cls.Video = cls.env['telegram.channel.video']
+        cls.video = cls.Video.create({
+            'channel_id': cls.channel.id,
+            'name': 'Vidéo test',
+            'telegram_message_id': '42',
+        })
+
+    def setUp(self):
+        super().setUp()
+        patcher = patch.object(
+            type(self.env['telegram.channel']), '_check_telegram_prerequisites',
+            return_value={'session_path': '/tmp/session', 'api_id': 1, 'api_hash': 'x'},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _jobs(self, record):
+        return self.Job.search([('res_model', '=', record._name), ('res_id', '=', record.id)])
+
+    def test_video_download_enqueues_job(self):
+        """Télécharger une vidéo met un job en file au lieu de démarrer un thread."""
+        self.video.action_download()
+        self.assertEqual(self.video.state, 'downloading')
+        job = self._jobs(self.video)
+        self.assertEqual(job.job_type, 'telegram_download')
+        self.assertEqual(job.state, 'queued')
+
+    def test_download_all_enqueues_single_batch(self):
+        """Tout télécharger met en file un seul job de lot (un seul client Telegram)."""
+        other = self.Video.create({'channel_id': self.channel.id, 'name': 'Autre', 'telegram_message_id': '43'})
+        self.channel.action_download_all()
+        job = self._jobs(self.channel)
+        self.assertEqual(job.job_type, 'telegram_batch')
+        self.assertEqual(sorted(job._get_payload()['video_ids']), sorted((self.video | other).ids))
+
+    def test_download_job_runs_video_download(self):
+        """Le handler relit les prérequis et télécharge la vidéo."""
+        self.video.write({'state': 'downloading'})
+        job = self.Job._enqueue(self.video, 'telegram_download')
+        self.env.flush_all()
+        with patch.object(type(self.Video), '_download_video_thread') as download:
+            job._execute()
+        download.assert_called_once()
+        self.assertEqual(download.call_args.args[0], self.video.id)
+
+    def test_download_job_skipped_when_reset(self):
+        """Une vidéo remise en brouillon entre-temps n'est pas téléchargée."""
+        job = self.Job._enqueue(self.video, 'telegram_download')
+        self.env.flush_all()
+        with patch.object(type(self.Video), '_download_video_thread') as download:
+            job._execute()
+        download.assert_not_called()
+
+    def test_batch_job_runs_batch_download(self):
+        """Le handler de lot télécharge toutes les vidéos du payload."""
+        job = self.Job._enqueue(self.channel, 'telegram_batch', payload={'video_ids': self.video.ids})
+        self.env.flush_all()
+        with patch.object(type(self.Video), '_download_batch_thread') as batch:
+            job._execute()
+        self.assertEqual(batch.call_args.args[0], self.video.ids)
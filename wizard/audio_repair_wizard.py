@@ -4,7 +4,7 @@ import os
 import logging
 import shutil
 import subprocess
-import threading
+import uuid
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
@@ -194,8 +194,8 @@ class AudioRepairWizard(models.TransientModel):
 
     def action_repair(self):
         """
-        Lance la réparation audio en arrière-plan pour tous les fichiers
-        identifiés par le scan. Utilise le sémaphore global.
+        Met en file la réparation audio de tous les fichiers identifiés par
+        le scan, en un seul lot du moteur média (notification à la fin).
         """
         self.ensure_one()
 
@@ -210,64 +210,21 @@ class AudioRepairWizard(models.TransientModel):
         if total == 0:
             raise UserError(_("Aucun fichier à réparer."))
 
-        from ..models.youtube_download import _get_conversion_semaphore, _spawn_batch_coordinator
-        max_concurrent = int(self.env['ir.config_parameter'].sudo().get_param(
-            'youtube_downloader.max_concurrent_conversions', '2'
-        ))
-        max_concurrent = max(1, min(max_concurrent, 5))
-        semaphore = _get_conversion_semaphore(max_concurrent)
-
-        batch_tracker = {
-            'total': total,
-            'done': 0,
-            'errors': 0,
-            'lock': threading.Lock(),
-            'uid': self.env.uid,
-            'dbname': self.env.cr.dbname,
-        }
-
-        # Construire la liste de travail unifiée (évite RuntimeError: can't start new thread)
-        work_items = []
-
-        if yt_ids:
-            yt_model = self.env['youtube.download']
-            work_items.extend(
-                (yt_model._fix_audio_thread, (rid, semaphore, batch_tracker))
-                for rid in yt_ids
-            )
-
-        if ext_ids:
-            ext_model = self.env['youtube.external.media']
-            work_items.extend(
-                (ext_model._fix_audio_thread, (rid, semaphore, batch_tracker))
-                for rid in ext_ids
-            )
-
-        if tg_ids:
-            tg_model = self.env['telegram.channel.video']
-            work_items.extend(
-                (tg_model._fix_audio_thread, (rid, semaphore, batch_tracker))
-                for rid in tg_ids
-            )
-
-        _spawn_batch_coordinator(work_items, max_concurrent)
+        batch_ref = uuid.uuid4().hex
+        stats = dict.fromkeys(('queued', 'duplicates', 'refused', 'skipped'), 0)
+        for model, ids in (
+            ('youtube.download', yt_ids),
+            ('youtube.external.media', ext_ids),
+            ('telegram.channel.video', tg_ids),
+        ):
+            records = self.env[model].browse(ids).exists()
+            stats['skipped'] += len(ids) - len(records)
+            for key, count in records._enqueue_media_jobs('fix_audio', batch_ref=batch_ref).items():
+                stats[key] += count
 
         self.write({'state': 'done'})
 
-        return {
-            'type': 'ir.actions.client',
-            'tag': 'display_notification',
-            'params': {
-                'title': _("🔊 Réparation audio lancée"),
-                'message': _(
-                    "%d fichier(s) en cours de réparation "
-                    "(max %d simultané(s)).\n"
-                    "🎬 YouTube: %d | 📂 Externes: %d | 📱 Telegram: %d\n"
-                    "Vous recevrez une notification quand tout sera terminé.",
-                    total, max_concurrent,
-                    len(yt_ids), len(ext_ids), len(tg_ids),
-                ),
-                'type': 'info',
-                'sticky': True,
-            },
-        }
+        return self.env['youtube.media.mixin']._media_queue_notification('fix_audio', stats, extra=_(
+            "\n🎬 YouTube: %d | 📂 Externes: %d | 📱 Telegram: %d",
+            len(yt_ids), len(ext_ids), len(tg_ids),
+        ))
@@ -155,6 +155,12 @@ class YoutubeDownloadWizard(models.TransientModel):
                         'error_message': str(e),
                     })
 
+        # Titres, durées et miniatures des URLs restées en brouillon :
+        # récupérés en un seul lot d'arrière-plan
+        Download.browse(created_ids).filtered(
+            lambda r: r.state == 'draft'
+        )._enqueue_fetch_info()
+
         return {
             'type': 'ir.actions.act_window',
             'name': _('Téléchargements créés'),